@@ -0,0 +1,83 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import time
+
+import numpy as np
+from paddlenlp.taskflow.dependency_decoding import (eisner, chuliu_edmonds,
+                                                    istree_batch)
+
+from utils import eisner as reference_eisner, istree as reference_istree
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--batch_size", type=int, default=64, help="Numbers of sentences in a batch.")
+parser.add_argument("--min_len", type=int, default=5, help="The minimum number of words in a sentence.")
+parser.add_argument("--max_len", type=int, default=80, help="The maximum number of words in a sentence.")
+parser.add_argument("--num_batches", type=int, default=5, help="Numbers of batches to decode.")
+parser.add_argument("--seed", type=int, default=1000, help="Random seed for initialization.")
+args = parser.parse_args()
+# yapf: enable
+
+
+def create_batch(rng):
+    """Creates random arc scores and masks of sentences with random lengths."""
+    lens = rng.randint(args.min_len, args.max_len + 1, args.batch_size)
+    # The root and eos are included in the sequence
+    seq_len = lens.max() + 2
+    scores = rng.randn(args.batch_size, seq_len, seq_len).astype("float32")
+    mask = np.zeros((args.batch_size, seq_len), dtype=bool)
+    for i, length in enumerate(lens):
+        mask[i, 1:length + 1] = True
+    return scores, mask
+
+
+def timeit(fn, batches):
+    start = time.perf_counter()
+    outputs = [fn(scores, mask) for scores, mask in batches]
+    return time.perf_counter() - start, outputs
+
+
+def reference_check(arc_preds, mask):
+    lens = mask.sum(-1)
+    return np.array(
+        [reference_istree(seq[:i + 1]) for i, seq in zip(lens, arc_preds)])
+
+
+if __name__ == "__main__":
+    rng = np.random.RandomState(args.seed)
+    batches = [create_batch(rng) for _ in range(args.num_batches)]
+
+    reference_time, reference_preds = timeit(reference_eisner, batches)
+    eisner_time, eisner_preds = timeit(eisner, batches)
+    consistent = all(
+        np.array_equal(a[m], b[m])
+        for a, b, (_, m) in zip(reference_preds, eisner_preds, batches))
+    print("eisner (reference): {:.3f}s".format(reference_time))
+    print("eisner: {:.3f}s, speedup: {:.1f}x, consistent: {}".format(
+        eisner_time, reference_time / eisner_time, consistent))
+
+    check_batches = [(preds, mask)
+                     for preds, (_, mask) in zip(eisner_preds, batches)]
+    reference_time, reference_trees = timeit(reference_check, check_batches)
+    check_time, trees = timeit(istree_batch, check_batches)
+    consistent = all(
+        np.array_equal(a, b) for a, b in zip(reference_trees, trees))
+    print("istree (reference): {:.3f}s".format(reference_time))
+    print("istree_batch: {:.3f}s, speedup: {:.1f}x, consistent: {}".format(
+        check_time, reference_time / check_time, consistent))
+
+    cle_time, cle_preds = timeit(chuliu_edmonds, batches)
+    print("chuliu_edmonds: {:.3f}s".format(cle_time))
@@ -0,0 +1,116 @@
+# -*- coding: UTF-8 -*-
+#   Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import random
+import time
+
+from paddlenlp.transformers import GPTTokenizer
+from paddlenlp.transformers.gpt.tokenizer import get_pairs
+from paddlenlp.transformers.tokenizer_utils import bpe_merge
+
+parser = argparse.ArgumentParser()
+
+# yapf: disable
+parser.add_argument("--model_name", default="gpt2-en", type=str, help="The pretrained BPE tokenizer to benchmark.")
+parser.add_argument("--epochs", default=3, type=int, help="Total number of merging epochs to perform.")
+parser.add_argument("--seed", default=2022, type=int, help="Random seed for generating long tokens.")
+# yapf: enable
+args = parser.parse_args()
+
+ordinary_text = (
+    "The quick brown fox jumps over the lazy dog. Byte pair encoding merges "
+    "the most frequent pairs of symbols, so ordinary words are split into a "
+    "few subwords, while rare words are split into many of them. ") * 20
+
+
+def create_long_tokens(rng):
+    """Creates pathological long tokens such as URLs, code and numbers."""
+    return [
+        "https://github.com/PaddlePaddle/PaddleNLP/blob/develop/paddlenlp/" * 8,
+        "".join(rng.choice("0123456789") for _ in range(2000)),
+        "".join(rng.choice("0123456789abcdef") for _ in range(2000)),
+        "self.assertEqual(" * 100,
+        "a" * 3000,
+    ]
+
+
+def reference_bpe_merge(word, bpe_ranks):
+    """The merge loop scanning all pairs for each merge."""
+    pairs = get_pairs(word)
+    while True:
+        bigram = min(
+            pairs, key=lambda pair: bpe_ranks.get(pair, float('inf')))
+        if bigram not in bpe_ranks:
+            break
+        first, second = bigram
+        new_word = []
+        i = 0
+        while i < len(word):
+            try:
+                j = word.index(first, i)
+                new_word.extend(word[i:j])
+                i = j
+            except ValueError:
+                new_word.extend(word[i:])
+                break
+
+            if word[i] == first and i < len(word) - 1 and word[i +
+                                                               1] == second:
+                new_word.append(first + second)
+                i += 2
+            else:
+                new_word.append(word[i])
+                i += 1
+        word = tuple(new_word)
+        if len(word) == 1:
+            break
+        else:
+            pairs = get_pairs(word)
+    return word
+
+
+def timeit(fn, words, bpe_ranks):
+    start = time.perf_counter()
+    for _ in range(args.epochs):
+        outputs = [fn(word, bpe_ranks) for word in words]
+    return time.perf_counter() - start, outputs
+
+
+if __name__ == "__main__":
+    tokenizer = GPTTokenizer.from_pretrained(args.model_name)
+    rng = random.Random(args.seed)
+
+    def to_words(texts):
+        words = []
+        for text in texts:
+            for token in tokenizer.pat.findall(text):
+                token = "".join(tokenizer.byte_encoder[b]
+                                for b in token.encode("utf-8"))
+                if len(token) > 1:
+                    words.append(tuple(token))
+        return words
+
+    for name, words in (("ordinary", to_words([ordinary_text])),
+                        ("long_tokens", to_words(create_long_tokens(rng)))):
+        reference_time, reference_outputs = timeit(
+            reference_bpe_merge, words, tokenizer.bpe_ranks)
+        merge_time, outputs = timeit(bpe_merge, words, tokenizer.bpe_ranks)
+        print("[{}] {} words, {} symbols".format(name,
+                                                 len(words),
+                                                 sum(map(len, words))))
+        print("  merge (reference): {:.3f}s".format(reference_time))
+        print("  bpe_merge: {:.3f}s, speedup: {:.1f}x, consistent: {}".format(
+            merge_time, reference_time / merge_time,
+            outputs == reference_outputs))
@@ -0,0 +1,78 @@
+# -*- coding: UTF-8 -*-
+#   Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import time
+
+from paddlenlp.transformers import BasicTokenizer, BertTokenizer
+
+parser = argparse.ArgumentParser()
+
+# yapf: disable
+parser.add_argument("--model_name", default="bert-base-uncased", type=str, help="The pretrained tokenizer to benchmark.")
+parser.add_argument("--epochs", default=10, type=int, help="Total number of tokenization epochs to perform.")
+parser.add_argument("--num_samples", default=1000, type=int, help="The number of samples to be tokenized")
+# yapf: enable
+args = parser.parse_args()
+
+texts = {
+    "english":
+    "The quick brown fox jumps over the lazy dog, and Émile's café serves "
+    "naïve crème brûlée! Tokenizers split text into words and word pieces.",
+    "chinese":
+    "在世界几大古代文明中，中华文明源远流长、从未中断，至今仍充满蓬勃生机与旺盛生命力，"
+    "这在人类历史上是了不起的奇迹。",
+    "long_tokens":
+    "https://github.com/PaddlePaddle/PaddleNLP/blob/develop/paddlenlp/transformers/bert/tokenizer.py "
+    "0x7f3a9c2e81d04b56aa31 3.14159265358979323846264338327950288419716939937510",
+}
+
+
+class StepwiseBasicTokenizer(BasicTokenizer):
+    # Overriding a step disables the fast path of BasicTokenizer
+    def _clean_text(self, text):
+        return super(StepwiseBasicTokenizer, self)._clean_text(text)
+
+
+def throughput(fn, data):
+    fn(data[0])
+    start = time.time()
+    num_chars = 0
+    for _ in range(args.epochs):
+        for text in data:
+            fn(text)
+            num_chars += len(text)
+    return num_chars / (time.time() - start)
+
+
+if __name__ == "__main__":
+    tokenizer = BertTokenizer.from_pretrained(args.model_name)
+    do_lower_case = tokenizer.basic_tokenizer.do_lower_case
+    basic_tokenizer = BasicTokenizer(do_lower_case)
+    stepwise_basic_tokenizer = StepwiseBasicTokenizer(do_lower_case)
+    wordpiece_tokenizer = tokenizer.wordpiece_tokenizer
+
+    for name, text in texts.items():
+        data = [text] * args.num_samples
+        words = basic_tokenizer.tokenize(text)
+        print("[{}]".format(name))
+        print("  BasicTokenizer (stepwise): {:,.0f} chars/s".format(
+            throughput(stepwise_basic_tokenizer.tokenize, data)))
+        print("  BasicTokenizer: {:,.0f} chars/s".format(
+            throughput(basic_tokenizer.tokenize, data)))
+        print("  WordpieceTokenizer: {:,.0f} chars/s".format(
+            throughput(wordpiece_tokenizer.tokenize, [" ".join(words)] *
+                       args.num_samples)))
+        print("  BertTokenizer: {:,.0f} chars/s".format(
+            throughput(tokenizer.tokenize, data)))
@@ -20,9 +20,17 @@ import os
 import warnings
 import sys
 import inspect
+import hashlib
+import pickle
+import queue
+import random
+import shutil
+import threading
+import uuid
 from collections import namedtuple
-from multiprocess import Pool, RLock
+from multiprocess import Pool
 import time
+import numpy as np
 import paddlenlp
 import datasets
 
@@ -32,15 +40,19 @@ except Exception as e:
     import warnings
     warnings.warn("paddle.distributed is not contains in you paddle!")
 
-from paddle.io import Dataset, IterableDataset
+from paddle.io import Dataset, IterableDataset, get_worker_info
 from paddle.dataset.common import md5file
 from paddle.utils.download import get_path_from_url, _get_unique_endpoints
 from paddlenlp.utils.env import DATA_HOME
+from paddlenlp.utils.file_lock import FileLock
+from .mmap_storage import ColumnStore, MMapExamples
 from typing import Iterable, Iterator, Optional, List, Any, Callable, Union
 import importlib
 from functools import partial
 
-__all__ = ['MapDataset', 'DatasetBuilder', 'IterDataset', 'load_dataset']
+__all__ = [
+    'MapDataset', 'DatasetBuilder', 'IterDataset', 'load_dataset', 'read_lines'
+]
 
 DATASETS_MODULE_PATH = "paddlenlp.datasets."
 
@@ -142,6 +154,7 @@ def load_dataset(path_or_read_func,
                  data_files=None,
                  splits=None,
                  lazy=None,
+                 mmap=False,
                  **kwargs):
     """
     This method will load a dataset, either form PaddleNLP library or from a 
@@ -164,6 +177,14 @@ def load_dataset(path_or_read_func,
         lazy (bool, optional): Weather to return `MapDataset` or an `IterDataset`.
             True for `IterDataset`. False for `MapDataset`. If None, return the 
             default type of this dataset. Defaults to None.
+        mmap (bool, optional): Whether to save examples of `MapDataset` into
+            memory-mapped column files under `DATA_HOME` rather than Python lists.
+            It helps to load corpora bigger than memory. Files of datasets in
+            PaddleNLP library are named by the fingerprint of data files, thus
+            processes and later runs loading the same data files share one copy
+            of examples. Files of custom reading functions are temporary and
+            removed when the dataset is garbage collected or the process exits.
+            Defaults to False.
         kwargs (dict): Other keyword arguments to be passed to the `DatasetBuilder`.
 
     Returns:
@@ -185,7 +206,8 @@ def load_dataset(path_or_read_func,
             if name in kwargs.keys():
                 custom_kwargs[name] = kwargs[name]
 
-        reader_instance = SimpleBuilder(lazy=lazy, read_func=path_or_read_func)
+        reader_instance = SimpleBuilder(
+            lazy=lazy, read_func=path_or_read_func, mmap=mmap)
         return reader_instance.read(**custom_kwargs)
     else:
         try:
@@ -194,7 +216,8 @@ def load_dataset(path_or_read_func,
             datasets = load_from_hf(
                 path_or_read_func, name=name, splits=splits, **kwargs)
         else:
-            reader_instance = reader_cls(lazy=lazy, name=name, **kwargs)
+            reader_instance = reader_cls(
+                lazy=lazy, name=name, mmap=mmap, **kwargs)
 
             # Check if selected name and split is valid in this DatasetBuilder
             if hasattr(reader_instance, 'BUILDER_CONFIGS'):
@@ -228,6 +251,165 @@ def load_dataset(path_or_read_func,
         return datasets
 
 
+def _get_global_names(code):
+    """
+    Returns the global names referred to by `code` and the code nested in it,
+    such as lambdas and comprehensions.
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _get_global_names(const)
+    return names
+
+
+def _update_fingerprint(hasher, obj, seen=None):
+    """
+    Updates `hasher` with the content of `obj`, which is used to identify the
+    results of `MapDataset.map` when caching. Functions are hashed by their
+    code, defaults, closures and the global values they refer to, tokenizers
+    are hashed by their configurations and vocabulary files, and modules and
+    classes are identified by their names. Other objects are hashed by their
+    pickled bytes or their attributes.
+
+    Raises:
+        TypeError: If `obj` or a value it refers to can't be hashed.
+    """
+    from paddlenlp.transformers import PretrainedTokenizer
+
+    seen = set() if seen is None else seen
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        hasher.update(repr(obj).encode("utf-8"))
+        return
+    if isinstance(obj, tuple):
+        hasher.update(b"tuple")
+        for item in obj:
+            _update_fingerprint(hasher, item, seen)
+        return
+    # Objects referred to again, such as recursive functions
+    if id(obj) in seen:
+        hasher.update(b"seen")
+        return
+    seen.add(id(obj))
+    if isinstance(obj, list):
+        hasher.update(b"list")
+        for item in obj:
+            _update_fingerprint(hasher, item, seen)
+    elif isinstance(obj, dict):
+        hasher.update(b"dict")
+        for key in sorted(obj.keys(), key=repr):
+            _update_fingerprint(hasher, key, seen)
+            _update_fingerprint(hasher, obj[key], seen)
+    elif isinstance(obj, (set, frozenset)):
+        # Iteration order of sets changes with the hash seed of processes
+        hasher.update(b"set")
+        digests = []
+        for item in obj:
+            item_hasher = hashlib.md5()
+            _update_fingerprint(item_hasher, item, seen)
+            digests.append(item_hasher.digest())
+        for digest in sorted(digests):
+            hasher.update(digest)
+    elif isinstance(obj, partial):
+        hasher.update(b"partial")
+        _update_fingerprint(hasher, obj.func, seen)
+        _update_fingerprint(hasher, obj.args, seen)
+        _update_fingerprint(hasher, obj.keywords, seen)
+    elif inspect.ismethod(obj):
+        _update_fingerprint(hasher, obj.__func__, seen)
+        _update_fingerprint(hasher, obj.__self__, seen)
+    elif inspect.isfunction(obj):
+        hasher.update((obj.__module__ + "." + obj.__qualname__).encode("utf-8"))
+        _update_fingerprint(hasher, obj.__code__, seen)
+        _update_fingerprint(hasher, obj.__defaults__, seen)
+        _update_fingerprint(hasher, obj.__kwdefaults__, seen)
+        for cell in obj.__closure__ or ():
+            _update_fingerprint(hasher, cell.cell_contents, seen)
+        for name in sorted(_get_global_names(obj.__code__)):
+            if name in obj.__globals__:
+                _update_fingerprint(hasher, name, seen)
+                _update_fingerprint(hasher, obj.__globals__[name], seen)
+    elif inspect.iscode(obj):
+        hasher.update(obj.co_code)
+        _update_fingerprint(hasher, obj.co_consts, seen)
+        _update_fingerprint(hasher, obj.co_names, seen)
+    elif inspect.ismodule(obj):
+        hasher.update(("module " + obj.__name__).encode("utf-8"))
+    elif inspect.isclass(obj):
+        hasher.update(("class " + obj.__module__ + "." + obj.__qualname__)
+                      .encode("utf-8"))
+    elif isinstance(obj, PretrainedTokenizer):
+        hasher.update(type(obj).__name__.encode("utf-8"))
+        for key, value in sorted(obj.init_config.items()):
+            if key in obj.resource_files_names and isinstance(
+                    value, str) and os.path.isfile(value):
+                value = md5file(value)
+            _update_fingerprint(hasher, key, seen)
+            _update_fingerprint(hasher, value, seen)
+        _update_fingerprint(hasher, obj.added_tokens_encoder, seen)
+        _update_fingerprint(hasher, obj.padding_side, seen)
+    else:
+        try:
+            hasher.update(pickle.dumps(obj, protocol=4))
+        except Exception:
+            if not isinstance(getattr(obj, "__dict__", None), dict):
+                raise TypeError("Can't fingerprint the object of type {}.".
+                                format(type(obj).__qualname__))
+            # Unpicklable objects such as those holding lambdas are hashed by
+            # their attributes
+            hasher.update(("object " + type(obj).__module__ + "." + type(obj)
+                           .__qualname__).encode("utf-8"))
+            _update_fingerprint(hasher, vars(obj), seen)
+
+
+def _get_store_path(examples=None, name=None):
+    """
+    Returns a path for a new `ColumnStore`, which is placed beside the stores
+    of `examples` if provided. A random `name` is used if not provided, and
+    such stores should be opened as temporary since no other process or run
+    could find them again.
+    """
+    if examples is not None and examples.stores:
+        store_dir = os.path.dirname(examples.stores[0].path)
+    else:
+        store_dir = os.path.join(DATA_HOME, "mmap")
+    if not os.path.exists(store_dir):
+        os.makedirs(store_dir, exist_ok=True)
+    return os.path.join(store_dir, name or uuid.uuid4().hex)
+
+
+# Examples shared with the worker processes of `MapDataset.map` and
+# `MapDataset.filter`. They are passed as initializer arguments, which are
+# inherited by forked workers instead of being pickled for every task.
+_worker_examples = None
+
+
+def _init_worker_examples(examples):
+    global _worker_examples
+    _worker_examples = examples
+
+
+def _worker_map(args):
+    fn, batched, start, end, store_path = args
+    examples = (_worker_examples[idx] for idx in range(start, end))
+    if batched:
+        examples = fn([example for example in examples])
+    else:
+        examples = (fn(example) for example in examples)
+    if store_path is None:
+        return list(examples)
+    # Only the path of the store is sent back to the parent process
+    ColumnStore.write(store_path, examples)
+    return store_path
+
+
+def _worker_filter(args):
+    fn, start, end = args
+    return np.array(
+        [idx for idx in range(start, end) if fn(_worker_examples[idx])],
+        dtype=np.int64)
+
+
 class MapDataset(Dataset):
     """
     Wraps a map-style dataset-like object as an instance of `MapDataset`, and equips it 
@@ -237,6 +419,9 @@ class MapDataset(Dataset):
     Args:
         data (list|Dataset): An object with `__getitem__` and `__len__` methods. It could 
             be a list or a subclass of `paddle.io.Dataset`.
+        fingerprint (str, optional): A string identifying the content of `data`,
+            which is used to locate caches of `map`. If None, it would be computed
+            from the content of `data` when needed. Defaults to None.
         kwargs (dict, optional): Other information to be passed to the dataset. 
 
     For examples of this class, please see `dataset_self_defined 
@@ -251,12 +436,25 @@ class MapDataset(Dataset):
         self.info = kwargs
         self.label_list = self.info.pop('label_list', None)
         self.vocab_info = self.info.pop('vocab_info', None)
+        self._fingerprint = self.info.pop('fingerprint', None)
 
     def _transform(self, data):
         for fn in self._transform_pipline:
             data = fn(data)
         return data
 
+    def _get_fingerprint(self):
+        """
+        Returns the fingerprint identifying current `new_data`. It is computed
+        from the content of `new_data` if unknown.
+        """
+        if self._fingerprint is None:
+            hasher = hashlib.md5()
+            for idx in range(len(self.new_data)):
+                _update_fingerprint(hasher, self.new_data[idx])
+            self._fingerprint = hasher.hexdigest()
+        return self._fingerprint
+
     def __getitem__(self, idx):
         """
         Basic function of `MapDataset` to get sample from dataset with a given 
@@ -283,35 +481,51 @@ class MapDataset(Dataset):
                 set to 0, it doesn't use multiprocessing. Defaults to `0`.
         """
         assert num_workers >= 0, "num_workers should be a non-negative value"
+        self._fingerprint = None
         if num_workers > 1:
-            shards = [
-                self._shard(
-                    num_shards=num_workers, index=index, contiguous=True)
-                for index in range(num_workers)
-            ]
-            kwds_per_shard = [
-                dict(
-                    self=shards[rank], fn=fn) for rank in range(num_workers)
-            ]
-            pool = Pool(num_workers, initargs=(RLock(), ))
-
-            results = [
-                pool.apply_async(
-                    self.__class__._filter, kwds=kwds)
-                for kwds in kwds_per_shard
-            ]
-            transformed_shards = [r.get() for r in results]
-
-            pool.close()
-            pool.join()
-            self.new_data = []
-            for i in range(num_workers):
-                self.new_data += transformed_shards[i].new_data
+            # Workers only send back indices of kept samples
+            tasks = [(fn, start, end)
+                     for start, end in self._get_shard_ranges(num_workers)]
+            indices = np.concatenate(
+                self._run_workers(_worker_filter, tasks, num_workers))
+            if isinstance(self.new_data, MMapExamples):
+                self.new_data = self.new_data.select(indices)
+            else:
+                self.new_data = [self.new_data[idx] for idx in indices]
             return self
         else:
             return self._filter(fn)
 
+    def _get_shard_ranges(self, num_shards):
+        """
+        Returns the ranges of contiguous shards as a list of (start, end).
+        """
+        div, mod = divmod(len(self.new_data), num_shards)
+        ranges = []
+        for index in range(num_shards):
+            start = div * index + min(index, mod)
+            ranges.append((start, start + div + (1 if index < mod else 0)))
+        return ranges
+
+    def _run_workers(self, worker_fn, tasks, num_workers):
+        pool = Pool(
+            num_workers,
+            initializer=_init_worker_examples,
+            initargs=(self.new_data, ))
+        try:
+            results = pool.map(worker_fn, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        return results
+
     def _filter(self, fn):
+        if isinstance(self.new_data, MMapExamples):
+            self.new_data = self.new_data.select([
+                idx for idx in range(len(self.new_data))
+                if fn(self.new_data[idx])
+            ])
+            return self
         self.new_data = [
             self.new_data[idx] for idx in range(len(self.new_data))
             if fn(self.new_data[idx])
@@ -321,6 +535,7 @@ class MapDataset(Dataset):
     def shard(self, num_shards=None, index=None, contiguous=False):
         self.new_data = self._shard(
             num_shards=num_shards, index=index, contiguous=contiguous).data
+        self._fingerprint = None
         return self
 
     def _shard(self, num_shards=None, index=None, contiguous=False):
@@ -347,20 +562,21 @@ class MapDataset(Dataset):
             index = dist.get_rank()
 
         if contiguous:
-            div = len(self) // num_shards
-            mod = len(self) % num_shards
-            start = div * index + min(index, mod)
-            end = start + div + (1 if index < mod else 0)
-            new_data = [self.new_data[idx] for idx in range(start, end)]
+            indices = range(*self._get_shard_ranges(num_shards)[index])
         else:
-            new_data = [
-                self.new_data[idx] for idx in range(len(self.new_data))
-                if idx % num_shards == index
-            ]
-
-        return MapDataset(new_data)
-
-    def map(self, fn, lazy=True, batched=False, num_workers=0):
+            indices = range(index, len(self.new_data), num_shards)
+
+        if isinstance(self.new_data, MMapExamples):
+            return MapDataset(self.new_data.select(np.array(indices)))
+        return MapDataset([self.new_data[idx] for idx in indices])
+
+    def map(self,
+            fn,
+            lazy=True,
+            batched=False,
+            num_workers=0,
+            use_cache=False,
+            mmap=False):
         """
         Performs specific function on the dataset to transform and update every sample.
 
@@ -377,40 +593,108 @@ class MapDataset(Dataset):
             num_workers(int, optional): Number of processes for multiprocessing. If 
                 set to 0, it doesn't use multiprocessing. Note that if set to positive
                 value, `lazy` option would be ignored. Defaults to 0.
+            use_cache(bool, optional): If True, transformed samples would be saved
+                to a memory-mapped cache file under `DATA_HOME`, which is keyed
+                by the fingerprint of the dataset, the code, bound arguments
+                and referred global values of `fn` (tokenizers are identified
+                by their configurations and vocabulary files). Later runs and
+                other processes applying the same `fn` to the same data load
+                the cache instead of recomputing. If `fn` refers to values that
+                can't be fingerprinted, results are not cached. Note that if set
+                True, `lazy` option would be ignored. Defaults to False.
+            mmap(bool, optional): If True, transformed samples would be written
+                into memory-mapped files under `DATA_HOME` instead of kept in
+                memory, where lists of ints such as token ids are saved as flat
+                arrays with offsets. With `num_workers`, each worker writes its
+                own files and only sends back their paths, thus samples are not
+                pickled between processes. The files are temporary and removed
+                when the dataset is garbage collected or the process exits. It
+                is always enabled for datasets loaded with `mmap=True`. Note that
+                if set True, `lazy` option would be ignored. Defaults to False.
         """
 
         assert num_workers >= 0, "num_workers should be a non-negative value"
+        if use_cache:
+            return self._map_with_cache(
+                fn, batched=batched, num_workers=num_workers)
+
+        if not lazy or batched or num_workers > 1 or mmap:
+            self._fingerprint = None
         if num_workers > 1:
-            shards = [
-                self._shard(
-                    num_shards=num_workers, index=index, contiguous=True)
-                for index in range(num_workers)
-            ]
-            kwds_per_shard = [
-                dict(
-                    self=shards[rank], fn=fn, lazy=False, batched=batched)
-                for rank in range(num_workers)
-            ]
-            pool = Pool(num_workers, initargs=(RLock(), ))
-            results = [
-                pool.apply_async(
-                    self.__class__._map, kwds=kwds) for kwds in kwds_per_shard
-            ]
-            transformed_shards = [r.get() for r in results]
-            pool.close()
-            pool.join()
-            self.new_data = []
-            for i in range(num_workers):
-                self.new_data += transformed_shards[i].new_data
+            store_examples = self.new_data if isinstance(
+                self.new_data, MMapExamples) else None
+            mmap = mmap or store_examples is not None
+            tasks = [(fn, batched, start, end, _get_store_path(store_examples)
+                      if mmap else None)
+                     for start, end in self._get_shard_ranges(num_workers)]
+            try:
+                results = self._run_workers(_worker_map, tasks, num_workers)
+            except BaseException:
+                # Remove the stores written by the workers that succeeded
+                for task in tasks:
+                    if task[-1] is not None:
+                        shutil.rmtree(task[-1], ignore_errors=True)
+                raise
+            if mmap:
+                self.new_data = MMapExamples(
+                    [ColumnStore(path, temporary=True) for path in results])
+            else:
+                self.new_data = []
+                for result in results:
+                    self.new_data += result
             return self
         else:
-            return self._map(fn, lazy=lazy, batched=batched)
+            return self._map(
+                fn, lazy=lazy and not mmap, batched=batched, mmap=mmap)
 
-    def _map(self, fn, lazy=True, batched=False):
+    def _map_with_cache(self, fn, batched=False, num_workers=0):
+        hasher = hashlib.md5()
+        try:
+            hasher.update(self._get_fingerprint().encode("utf-8"))
+            hasher.update(repr(batched).encode("utf-8"))
+            _update_fingerprint(hasher, fn)
+        except TypeError as e:
+            # A cache with an inexact key might be stale
+            warnings.warn("Results of `map` are not cached: {}".format(e))
+            return self.map(
+                fn, lazy=False, batched=batched, num_workers=num_workers)
+        fingerprint = hasher.hexdigest()
+
+        cache_dir = os.path.join(DATA_HOME, "map_cache")
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        cache_path = os.path.join(cache_dir, fingerprint)
+        # Only one process computes the results while the others wait for
+        # and then load the cache.
+        with FileLock(cache_path + ".lock"):
+            if not ColumnStore.exists(cache_path):
+                self.map(
+                    fn, lazy=False, batched=batched, num_workers=num_workers)
+                ColumnStore.write(cache_path, self.new_data)
+        self.new_data = MMapExamples([ColumnStore(cache_path)])
+        self._fingerprint = fingerprint
+        return self
+
+    def _map(self, fn, lazy=True, batched=False, mmap=False):
+        store_examples = self.new_data if isinstance(self.new_data,
+                                                     MMapExamples) else None
+        mmap = mmap or store_examples is not None
         if batched:
-            self.new_data = fn(self.new_data)
+            if mmap:
+                self.new_data = MMapExamples.from_examples(
+                    _get_store_path(store_examples),
+                    fn(self.new_data),
+                    temporary=True)
+            else:
+                self.new_data = fn(self.new_data)
         elif lazy:
             self._transform_pipline.append(fn)
+        elif mmap:
+            # Write transformed samples into a new store instead of a list
+            self.new_data = MMapExamples.from_examples(
+                _get_store_path(store_examples),
+                (fn(self.new_data[idx]) for idx in range(len(self.new_data))),
+                temporary=True)
         else:
             self.new_data = [
                 fn(self.new_data[idx]) for idx in range(len(self.new_data))
@@ -418,15 +702,91 @@ class MapDataset(Dataset):
         return self
 
 
+def _is_shard_aware(fn):
+    """
+    Whether `fn` reads its own shard given `num_shards` and `index` arguments.
+    """
+    try:
+        parameters = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+    return 'num_shards' in parameters and 'index' in parameters
+
+
+def read_lines(data_files, num_shards=1, index=0, encoding='utf-8'):
+    """
+    Yields the lines belonging to shard `index` of `num_shards` shards of text
+    files. Files are regarded as concatenated and split into byte ranges of
+    equal size, and a line belongs to the shard where its first byte lies.
+    Thus each shard only reads its own part of the files, and all lines are
+    read exactly once by all the shards.
+
+    It can be used in a reading function accepting `num_shards` and `index`
+    arguments, which lets `IterDataset` shard by byte ranges across trainers
+    and `DataLoader` workers instead of reading and skipping every example.
+
+    Args:
+        data_files (str|list[str]): Path or paths of text files.
+        num_shards (int, optional): The number of shards. Defaults to 1.
+        index (int, optional): The index of current shard. Defaults to 0.
+        encoding (str, optional): The encoding of files. Defaults to 'utf-8'.
+
+    Example:
+        .. code-block::
+
+            from paddlenlp.datasets import load_dataset, read_lines
+
+            def read(data_files, num_shards=1, index=0):
+                for line in read_lines(data_files, num_shards, index):
+                    query, title, label = line.rstrip('\\n').split('\\t')
+                    yield {'query': query, 'title': title, 'label': label}
+
+            ds = load_dataset(read, data_files=['part-0', 'part-1'], lazy=True)
+    """
+    if isinstance(data_files, str):
+        data_files = [data_files]
+    sizes = [os.path.getsize(filename) for filename in data_files]
+    total_size = sum(sizes)
+    shard_start = total_size * index // num_shards
+    shard_end = total_size * (index + 1) // num_shards
+
+    file_start = 0
+    for filename, size in zip(data_files, sizes):
+        file_end = file_start + size
+        start = max(shard_start, file_start) - file_start
+        end = min(shard_end, file_end) - file_start
+        file_start = file_end
+        if start >= end:
+            continue
+        with open(filename, 'rb') as f:
+            if start > 0:
+                # Skip the line started in the previous shard
+                f.seek(start - 1)
+                f.readline()
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                yield line.decode(encoding)
+
+
 class IterDataset(IterableDataset):
     """
     Wraps a dataset-like object as an instance of `IterDataset`, and equips it with
     `map` and other utility methods. All non-magic methods of the raw object
     also accessible.
 
+    When iterated by multiple trainers (after `shard`) or in `DataLoader` workers,
+    each process only yields its own part of examples. If `data` is a function
+    accepting `num_shards` and `index` arguments, it is called with the shard
+    of current process and expected to only read its own part of input, such as
+    a function reading with `read_lines`. Otherwise every process iterates over
+    `data` and keeps the examples of its shard.
+
     Args:
-        data (Iterable): An object with `__iter__` function. It can be a Iterable or a
-            subclass of `paddle.io.IterableDataset`.
+        data (Iterable|callable): An object with `__iter__` function, or a function
+            returning an iterable. It can be a Iterable or a subclass of
+            `paddle.io.IterableDataset`.
         kwargs (dict, optional): Other information to be passed to the dataset. 
 
     For examples of this class, please see `dataset_self_defined 
@@ -437,6 +797,12 @@ class IterDataset(IterableDataset):
         self.data = data
         self._transform_pipline = []
         self._filter_pipline = []
+        self._num_shards = 1
+        self._shard_index = 0
+        self._shuffle_buffer_size = 0
+        self._shuffle_seed = None
+        self._prefetch_size = 0
+        self._epoch = 0
 
         self.label_list = kwargs.pop('label_list', None)
         self.vocab_info = kwargs.pop('vocab_info', None)
@@ -446,40 +812,108 @@ class IterDataset(IterableDataset):
             data = fn(data)
         return data
 
-    def _shard_filter(self, num_samples):
-        return True
-
     def _filter(self, data):
         for fn in self._filter_pipline:
             if not fn(data):
                 return False
         return True
 
-    def __iter__(self):
+    def _get_shard_info(self):
         """
-        yields sample sequentially.
+        Returns the number of shards and the index of current shard, which
+        take both trainers and `DataLoader` workers into account.
         """
-        num_samples = 0
+        num_shards, index = self._num_shards, self._shard_index
+        worker_info = get_worker_info()
+        if worker_info is not None:
+            index = index * worker_info.num_workers + worker_info.id
+            num_shards = num_shards * worker_info.num_workers
+        return num_shards, index
+
+    def _read_shard(self, num_shards, index):
+        if callable(self.data) and _is_shard_aware(self.data):
+            for example in self.data(num_shards=num_shards, index=index):
+                yield example
+            return
+
         if inspect.isfunction(self.data):
-            for example in self.data():
-                if (not self._filter_pipline or
-                        self._filter(self._filter_pipline)
-                    ) and self._shard_filter(num_samples=num_samples):
-                    yield self._transform(
-                        example) if self._transform_pipline else example
-                num_samples += 1
+            data = self.data()
         else:
             if inspect.isgenerator(self.data):
                 warnings.warn(
                     'Reciving generator as data source, data can only be iterated once'
                 )
-            for example in self.data:
-                if (not self._filter_pipline or
-                        self._filter(self._filter_pipline)
-                    ) and self._shard_filter(num_samples=num_samples):
-                    yield self._transform(
-                        example) if self._transform_pipline else example
-                num_samples += 1
+            data = self.data
+        for num_samples, example in enumerate(data):
+            if num_samples % num_shards == index:
+                yield example
+
+    def _shuffle_examples(self, examples):
+        rng = random.Random(None if self._shuffle_seed is None else
+                            self._shuffle_seed + self._epoch)
+        buffer = []
+        for example in examples:
+            if len(buffer) < self._shuffle_buffer_size:
+                buffer.append(example)
+                continue
+            idx = rng.randrange(len(buffer))
+            yield buffer[idx]
+            buffer[idx] = example
+        rng.shuffle(buffer)
+        for example in buffer:
+            yield example
+
+    def _prefetch_examples(self, examples):
+        examples_queue = queue.Queue(maxsize=self._prefetch_size)
+        stop_event = threading.Event()
+        end_of_data = object()
+
+        def put(item):
+            while not stop_event.is_set():
+                try:
+                    examples_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for example in examples:
+                    if not put((example, None)):
+                        return
+                put((end_of_data, None))
+            except Exception as e:
+                put((end_of_data, e))
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                example, error = examples_queue.get()
+                if error is not None:
+                    raise error
+                if example is end_of_data:
+                    break
+                yield example
+        finally:
+            stop_event.set()
+
+    def __iter__(self):
+        """
+        yields sample sequentially.
+        """
+        num_shards, index = self._get_shard_info()
+        examples = (
+            self._transform(example) if self._transform_pipline else example
+            for example in self._read_shard(num_shards, index)
+            if not self._filter_pipline or self._filter(example))
+        if self._shuffle_buffer_size > 0:
+            examples = self._shuffle_examples(examples)
+        if self._prefetch_size > 0:
+            examples = self._prefetch_examples(examples)
+        for example in examples:
+            yield example
 
     def filter(self, fn):
         """
@@ -497,7 +931,8 @@ class IterDataset(IterableDataset):
 
     def shard(self, num_shards=None, index=None):
         """
-        Split the dataset into `num_shards` pieces.
+        Split the dataset into `num_shards` pieces. If the dataset is iterated
+        in `DataLoader` workers, the piece would be further split for workers.
 
         Args:
             num_shards (int, optional): An integer representing the number of
@@ -512,14 +947,49 @@ class IterDataset(IterableDataset):
         if index is None:
             index = dist.get_rank()
 
-        def sharder(num_shards, index, num_samples):
-            if num_samples % num_shards == index:
-                return True
-            else:
-                return False
+        self._num_shards = num_shards
+        self._shard_index = index
+        return self
+
+    def shuffle(self, buffer_size, seed=None):
+        """
+        Shuffles samples with a buffer. Samples are read into the buffer, and
+        a random one in the buffer is yielded when the buffer is full.
+
+        Args:
+            buffer_size (int): The number of samples in the buffer.
+            seed (int, optional): The random seed. The seed of each epoch is
+                `seed` plus the epoch set by `set_epoch`. If None, the order
+                would not be reproducible. Defaults to None.
+        """
+        assert buffer_size > 0, "buffer_size should be a positive value"
+        self._shuffle_buffer_size = buffer_size
+        self._shuffle_seed = seed
+        return self
 
-        fn = partial(sharder, num_shards=num_shards, index=index)
-        self._shard_filter = fn
+    def set_epoch(self, epoch):
+        """
+        Sets the epoch for shuffling, which should be called before iterating
+        each epoch to get a different order. `DataLoader` workers iterate
+        copies of the dataset, thus the epoch can only be set on the dataset
+        in the main process, before the workers of the epoch are started.
+
+        Args:
+            epoch (int): The number of the epoch.
+        """
+        self._epoch = epoch
+        return self
+
+    def prefetch(self, buffer_size):
+        """
+        Reads, filters and transforms samples in a background thread, and puts
+        at most `buffer_size` samples in a queue ahead of the consumer.
+
+        Args:
+            buffer_size (int): The maximum number of prefetched samples.
+        """
+        assert buffer_size > 0, "buffer_size should be a positive value"
+        self._prefetch_size = buffer_size
         return self
 
     def map(self, fn):
@@ -549,10 +1019,11 @@ class DatasetBuilder:
     """
     lazy = False
 
-    def __init__(self, lazy=None, name=None, **config):
+    def __init__(self, lazy=None, name=None, mmap=False, **config):
         if lazy is not None:
             self.lazy = lazy
         self.name = name
+        self.mmap = mmap
         self.config = config
 
     def read_datasets(self, splits=None, data_files=None):
@@ -691,43 +1162,78 @@ class DatasetBuilder:
                 labels = label_dict[labels]
             return labels
 
-        if self.lazy:
-
-            def generate_examples():
+        def generate_examples(**shard_kwargs):
+            if shard_kwargs:
+                generator = self._read(
+                    filename, split=split, **shard_kwargs
+                ) if 'split' in inspect.signature(
+                    self._read).parameters else self._read(filename,
+                                                          **shard_kwargs)
+            else:
                 generator = self._read(
                     filename, split
                 ) if self._read.__code__.co_argcount > 2 else self._read(
                     filename)
-                for example in generator:
-                    # We need to check if the example contains label column and confirm its name.
-                    # For now we only allow `label` or `labels` to be the name of label column.
-                    if 'labels' in example.keys():
-                        label_col = 'labels'
-                    elif 'label' in example.keys():
-                        label_col = 'label'
-                    else:
-                        label_col = None
-
-                    # Convert class label to label ids.
-                    if label_list is not None and example.get(label_col, None):
-                        label_dict = _create_dict(label_list)
-                        # For multiple labels in the form of list.
-                        if isinstance(label_dict, list):
-                            for idx, sub_dict in enumerate(label_dict):
-                                example[label_col][idx] = _convert_label_to_id(
-                                    example[label_col][idx], sub_dict)
-                        else:
-                            example[label_col] = _convert_label_to_id(
-                                example[label_col], label_dict)
+            for example in generator:
+                # We need to check if the example contains label column and confirm its name.
+                # For now we only allow `label` or `labels` to be the name of label column.
+                if 'labels' in example.keys():
+                    label_col = 'labels'
+                elif 'label' in example.keys():
+                    label_col = 'label'
+                else:
+                    label_col = None
 
-                        yield example
+                # Convert class label to label ids.
+                if label_list is not None and example.get(label_col, None):
+                    label_dict = _create_dict(label_list)
+                    # For multiple labels in the form of list.
+                    if isinstance(label_dict, list):
+                        for idx, sub_dict in enumerate(label_dict):
+                            example[label_col][idx] = _convert_label_to_id(
+                                example[label_col][idx], sub_dict)
                     else:
-                        yield example
+                        example[label_col] = _convert_label_to_id(
+                            example[label_col], label_dict)
 
+                    yield example
+                else:
+                    yield example
+
+        if self.lazy:
+            if _is_shard_aware(self._read):
+                # `_read` only reads the part of given shard
+                def data(num_shards, index):
+                    return generate_examples(
+                        num_shards=num_shards, index=index)
+            else:
+                data = generate_examples
             return IterDataset(
-                generate_examples(),
+                data, label_list=label_list, vocab_info=vocab_info)
+        elif self.mmap:
+            # Examples are written into column files one by one instead of
+            # being materialized as a list.
+            fingerprint = self._get_fingerprint(filename, split)
+            if fingerprint is None:
+                examples = MMapExamples.from_examples(
+                    _get_store_path(), generate_examples(), temporary=True)
+            else:
+                store_path = _get_store_path(name=fingerprint)
+                with FileLock(store_path + ".lock"):
+                    if not ColumnStore.exists(store_path):
+                        ColumnStore.write(store_path, generate_examples())
+                examples = MMapExamples([ColumnStore(store_path)])
+
+            if not len(examples):
+                raise ValueError(
+                    "No instances were read from the given filepath {}. "
+                    "Is the path correct?".format(filename))
+
+            return MapDataset(
+                examples,
                 label_list=label_list,
-                vocab_info=vocab_info)
+                vocab_info=vocab_info,
+                fingerprint=fingerprint)
         else:
             examples = self._read(
                 filename,
@@ -766,7 +1272,29 @@ class DatasetBuilder:
                             examples[idx][label_col], label_dict)
 
             return MapDataset(
-                examples, label_list=label_list, vocab_info=vocab_info)
+                examples,
+                label_list=label_list,
+                vocab_info=vocab_info,
+                fingerprint=self._get_fingerprint(filename, split))
+
+    def _get_fingerprint(self, filename, split):
+        """
+        Returns a fingerprint identifying the examples read from `filename`,
+        which avoids hashing the content of examples for caches of `map`.
+        """
+        if not isinstance(filename, str) or not os.path.isfile(filename):
+            return None
+        hasher = hashlib.md5()
+        stat = os.stat(filename)
+        try:
+            _update_fingerprint(hasher, [
+                self.__class__.__name__, type(self)._read, self.name,
+                self.config, split, os.path.abspath(filename), stat.st_size,
+                stat.st_mtime
+            ])
+        except TypeError:
+            return None
+        return hasher.hexdigest()
 
     def _read(self, filename: str, *args):
         """
@@ -800,19 +1328,32 @@ class DatasetBuilder:
 
 
 class SimpleBuilder(DatasetBuilder):
-    def __init__(self, lazy, read_func):
+    def __init__(self, lazy, read_func, mmap=False):
         self._read = read_func
         self.lazy = lazy
+        self.mmap = mmap
 
     def read(self, **kwargs):
         if self.lazy:
+            if _is_shard_aware(self._read):
 
-            def generate_examples():
-                generator = self._read(**kwargs)
-                for example in generator:
-                    yield example
+                def generate_examples(num_shards, index):
+                    generator = self._read(
+                        num_shards=num_shards, index=index, **kwargs)
+                    for example in generator:
+                        yield example
+            else:
+
+                def generate_examples():
+                    generator = self._read(**kwargs)
+                    for example in generator:
+                        yield example
 
             return IterDataset(generate_examples)
+        elif self.mmap:
+            return MapDataset(
+                MMapExamples.from_examples(
+                    _get_store_path(), self._read(**kwargs), temporary=True))
         else:
             examples = self._read(**kwargs)
             if hasattr(examples, '__len__') and hasattr(examples,
@@ -0,0 +1,409 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import pickle
+import shutil
+import struct
+import uuid
+import weakref
+from array import array
+
+import numpy as np
+
+__all__ = ['ColumnStore', 'MMapExamples']
+
+# Types of rows
+_DICT_ROW = 0
+_TUPLE_ROW = 1
+_LIST_ROW = 2
+_VALUE_ROW = 3
+
+# Types of values in a column
+_MISSING = 0
+_OBJECT = 1
+_STR = 2
+_INT = 3
+_FLOAT = 4
+_INT32_LIST = 5
+_INT64_LIST = 6
+
+# Column holding rows which are not dict, tuple or list
+_VALUE_COLUMN = "__value__"
+
+_INT32_MIN, _INT32_MAX = -2**31, 2**31 - 1
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+
+
+def _encode_value(value):
+    value_type = type(value)
+    if value_type is str:
+        return _STR, value.encode("utf-8")
+    elif value_type is int and _INT64_MIN <= value <= _INT64_MAX:
+        return _INT, struct.pack("<q", value)
+    elif value_type is float:
+        return _FLOAT, struct.pack("<d", value)
+    elif value_type is list and value and all(type(x) is int for x in value):
+        try:
+            ids = np.array(value, dtype="<i8")
+        except OverflowError:
+            pass
+        else:
+            if ids.min() >= _INT32_MIN and ids.max() <= _INT32_MAX:
+                return _INT32_LIST, ids.astype("<i4").tobytes()
+            return _INT64_LIST, ids.tobytes()
+    return _OBJECT, pickle.dumps(value, protocol=4)
+
+
+def _decode_value(value_type, buffer):
+    if value_type == _STR:
+        return buffer.tobytes().decode("utf-8")
+    elif value_type == _INT:
+        return struct.unpack("<q", buffer.tobytes())[0]
+    elif value_type == _FLOAT:
+        return struct.unpack("<d", buffer.tobytes())[0]
+    elif value_type == _INT32_LIST:
+        return np.frombuffer(buffer, dtype="<i4").tolist()
+    elif value_type == _INT64_LIST:
+        return np.frombuffer(buffer, dtype="<i8").tolist()
+    return pickle.loads(buffer.tobytes())
+
+
+def _remove_files(path, owner_pid):
+    """
+    Removes the temporary store or index file at `path`. Copies of examples in
+    other processes, such as forked workers, never remove the files.
+    """
+    if os.getpid() != owner_pid:
+        return
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        # Files still mapped can't be removed on some platforms
+        pass
+
+
+class _ColumnWriter(object):
+    def __init__(self, path, num_missing):
+        self.file = open(path, "wb")
+        self.types = array("B", [_MISSING] * num_missing)
+        self.offsets = array("q", [0] * (num_missing + 1))
+
+    def append(self, value):
+        value_type, data = _encode_value(value)
+        self.file.write(data)
+        self.types.append(value_type)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def append_missing(self):
+        self.types.append(_MISSING)
+        self.offsets.append(self.offsets[-1])
+
+
+class ColumnStore(object):
+    """
+    A columnar store of examples saved in a directory and read by memory
+    mapping. Rows can be dicts with str keys, tuples or lists, and each of
+    their fields makes a column. Values of a column are concatenated into a
+    flat data file with an offsets index, and lists of ints such as token ids
+    are saved as raw int32/int64 arrays, strings as utf-8 bytes, and others
+    are pickled. Rows are only decoded when accessed, and processes reading
+    the same store share one copy of data in page cache.
+
+    Args:
+        path (str): The directory of the store written by `ColumnStore.write`.
+        temporary (bool, optional): Whether the store is removed when it is
+            garbage collected or the process exits. Only the process opening
+            the store as temporary removes it, and copies of the store passed
+            to other processes are not temporary. Defaults to False.
+    """
+
+    def __init__(self, path, temporary=False):
+        self.path = path
+        self.temporary = temporary
+        if temporary:
+            weakref.finalize(self, _remove_files, path, os.getpid())
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.num_rows = meta["num_rows"]
+        self.columns = meta["columns"]
+        self._column_ids = {name: i for i, name in enumerate(self.columns)}
+        # Plain ndarray views of the memory maps are much faster to index
+        # than np.memmap
+        self._row_types = np.load(
+            os.path.join(path, "row_types.npy"),
+            mmap_mode="r").view(np.ndarray)
+        self._types = []
+        self._offsets = []
+        self._data = []
+        for i in range(len(self.columns)):
+            prefix = os.path.join(path, "column_{}".format(i))
+            self._types.append(
+                np.load(
+                    prefix + ".types.npy", mmap_mode="r").view(np.ndarray))
+            self._offsets.append(
+                np.load(
+                    prefix + ".offsets.npy", mmap_mode="r").view(np.ndarray))
+            if os.path.getsize(prefix + ".data") > 0:
+                self._data.append(
+                    np.memmap(
+                        prefix + ".data", dtype=np.uint8,
+                        mode="r").view(np.ndarray))
+            else:
+                self._data.append(np.zeros([0], dtype=np.uint8))
+
+    @classmethod
+    def write(cls, path, examples, temporary=False):
+        """
+        Writes examples into a new store at `path` and returns it. Examples
+        are consumed one by one, thus `examples` can be a generator. The store
+        is written to a temporary directory first and then renamed, so a store
+        at `path` is always complete.
+
+        Args:
+            path (str): The directory to save the store, which should not exist.
+            examples (Iterable): The examples to be saved.
+            temporary (bool, optional): Whether the returned store is removed
+                when it is garbage collected. Defaults to False.
+
+        Returns:
+            ColumnStore: The store written.
+        """
+        tmp_path = "{}.tmp-{}".format(path, uuid.uuid4().hex)
+        os.makedirs(tmp_path)
+        columns = []
+        writers = []
+        row_types = array("B")
+        try:
+            for num_rows, example in enumerate(examples):
+                if isinstance(example, dict) and all(
+                        isinstance(key, str) for key in example.keys()):
+                    row_type, fields = _DICT_ROW, example
+                elif isinstance(example, (tuple, list)):
+                    row_type = _TUPLE_ROW if isinstance(example,
+                                                        tuple) else _LIST_ROW
+                    fields = {str(i): value for i, value in enumerate(example)}
+                else:
+                    row_type, fields = _VALUE_ROW, {_VALUE_COLUMN: example}
+                row_types.append(row_type)
+                for name in fields.keys():
+                    if name not in columns:
+                        columns.append(name)
+                        writers.append(
+                            _ColumnWriter(
+                                os.path.join(tmp_path, "column_{}.data".format(
+                                    len(writers))), num_rows))
+                for name, writer in zip(columns, writers):
+                    if name in fields:
+                        writer.append(fields[name])
+                    else:
+                        writer.append_missing()
+
+            for i, writer in enumerate(writers):
+                writer.file.close()
+                prefix = os.path.join(tmp_path, "column_{}".format(i))
+                np.save(prefix + ".types.npy",
+                        np.frombuffer(
+                            writer.types, dtype=np.uint8))
+                np.save(prefix + ".offsets.npy",
+                        np.frombuffer(
+                            writer.offsets, dtype=np.int64))
+            np.save(
+                os.path.join(tmp_path, "row_types.npy"),
+                np.frombuffer(
+                    row_types, dtype=np.uint8))
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump({
+                    "num_rows": len(row_types),
+                    "columns": columns
+                }, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            for writer in writers:
+                writer.file.close()
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        return cls(path, temporary)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    def __len__(self):
+        return self.num_rows
+
+    def _get_field(self, column_id, idx):
+        value_type = self._types[column_id][idx]
+        start = self._offsets[column_id][idx]
+        end = self._offsets[column_id][idx + 1]
+        return value_type, self._data[column_id][start:end]
+
+    def get(self, idx):
+        """
+        Decodes and returns the example at row `idx`.
+        """
+        row_type = self._row_types[idx]
+        if row_type == _DICT_ROW:
+            example = {}
+            for column_id, name in enumerate(self.columns):
+                value_type, buffer = self._get_field(column_id, idx)
+                if value_type != _MISSING:
+                    example[name] = _decode_value(value_type, buffer)
+            return example
+        elif row_type == _VALUE_ROW:
+            return _decode_value(*self._get_field(self._column_ids[
+                _VALUE_COLUMN], idx))
+        fields = []
+        while str(len(fields)) in self._column_ids:
+            value_type, buffer = self._get_field(self._column_ids[str(
+                len(fields))], idx)
+            if value_type == _MISSING:
+                break
+            fields.append(_decode_value(value_type, buffer))
+        return tuple(fields) if row_type == _TUPLE_ROW else fields
+
+    def __getstate__(self):
+        # Subprocesses map the files again instead of copying the data
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+class MMapExamples(object):
+    """
+    A read-only sequence of examples backed by one or more `ColumnStore`.
+    Positions of the stores are concatenated in order, and an optional index
+    file selects and reorders rows of them, thus selecting or concatenating
+    examples only writes a new index file instead of copying examples.
+
+    Args:
+        stores (list[ColumnStore]): The stores holding examples.
+        indices (numpy.ndarray, optional): The positions of selected rows in
+            the concatenation of `stores`. If None, all rows are selected in
+            order. Defaults to None.
+
+    Index files written by `select` and `concat` are temporary, which are
+    removed together with the `MMapExamples` owning them.
+    """
+
+    def __init__(self, stores, indices=None):
+        self.stores = stores
+        self.indices = indices
+        self._ends = np.cumsum([len(store) for store in stores])
+
+    @classmethod
+    def from_examples(cls, path, examples, temporary=False):
+        """
+        Writes examples into a new `ColumnStore` at `path` and returns the
+        `MMapExamples` over it. If `temporary` is True, the store is removed
+        when no longer used.
+        """
+        return cls([ColumnStore.write(path, examples, temporary)])
+
+    def __len__(self):
+        if self.indices is not None:
+            return len(self.indices)
+        return int(self._ends[-1]) if len(self._ends) else 0
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("Index out of range.")
+        pos = int(self.indices[idx]) if self.indices is not None else idx
+        store_id = int(np.searchsorted(self._ends, pos, side="right"))
+        if store_id > 0:
+            pos -= int(self._ends[store_id - 1])
+        return self.stores[store_id].get(pos)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def _positions(self):
+        if self.indices is not None:
+            return np.asarray(self.indices)
+        return np.arange(len(self), dtype=np.int64)
+
+    @staticmethod
+    def _from_positions(stores, positions):
+        path = os.path.join(stores[0].path,
+                            "indices-{}.npy".format(uuid.uuid4().hex))
+        np.save(path, np.asarray(positions, dtype=np.int64))
+        examples = MMapExamples(stores, np.load(path, mmap_mode="r"))
+        weakref.finalize(examples, _remove_files, path, os.getpid())
+        return examples
+
+    def select(self, indices):
+        """
+        Returns examples at `indices` of this sequence. Only a new index file
+        is written.
+
+        Args:
+            indices (list[int]|numpy.ndarray): Indices of selected examples.
+
+        Returns:
+            MMapExamples: The selected examples.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        return self._from_positions(self.stores, self._positions()[indices])
+
+    @staticmethod
+    def concat(sequences):
+        """
+        Concatenates several `MMapExamples` without copying examples.
+
+        Args:
+            sequences (list[MMapExamples]): The sequences to be concatenated.
+
+        Returns:
+            MMapExamples: The concatenated examples.
+        """
+        stores = []
+        store_paths = []
+        indices = []
+        for sequence in sequences:
+            if not sequence.stores:
+                continue
+            paths = [store.path for store in sequence.stores]
+            if paths == store_paths[-len(paths):]:
+                # Sequences selected from the same stores, such as shards
+                base = sum(len(store) for store in stores) - int(
+                    sequence._ends[-1])
+            else:
+                base = sum(len(store) for store in stores)
+                stores.extend(sequence.stores)
+                store_paths.extend(paths)
+            indices.append(sequence._positions() + base)
+        if not stores:
+            return MMapExamples([])
+        return MMapExamples._from_positions(stores, np.concatenate(indices))
+
+    def __getstate__(self):
+        # Only paths are passed to subprocesses, which map the files again
+        state = {"stores": self.stores, "indices": self.indices}
+        if isinstance(self.indices, np.memmap):
+            state["indices"] = self.indices.filename
+        return state
+
+    def __setstate__(self, state):
+        indices = state["indices"]
+        if isinstance(indices, str):
+            indices = np.load(indices, mmap_mode="r")
+        self.__init__(state["stores"], indices)
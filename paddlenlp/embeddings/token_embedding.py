@@ -39,6 +39,71 @@ def list_embedding_name():
     return list(EMBEDDING_NAME_LIST)
 
 
+def _convert_vectors(vector_path, table_path, vocab_path):
+    """
+    Converts the compressed `.npz` file of a pretrained embedding to an
+    uncompressed `.npy` file of the embedding table, with two rows reserved for
+    the unknown and padding tokens at the end, and a vocab file of one word per
+    line.
+    """
+    logger.info("Converting token embedding to {}...".format(table_path))
+    vector_np = np.load(vector_path)
+    words = list(vector_np['vocab'])
+    if any("\n" in word for word in words):
+        raise ValueError(
+            "Words of the embedding should not contain line breaks.")
+    embedding = vector_np['embedding']
+    # Write to temporary files first, since other processes may load the
+    # embedding at the same time
+    tmp_table_path = "{}.{}.tmp".format(table_path, os.getpid())
+    table = np.lib.format.open_memmap(
+        tmp_table_path,
+        mode="w+",
+        dtype=embedding.dtype,
+        shape=(embedding.shape[0] + 2, embedding.shape[1]))
+    table[:embedding.shape[0]] = embedding
+    table[embedding.shape[0]:] = 0
+    table.flush()
+    del table, embedding
+    tmp_vocab_path = "{}.{}.tmp".format(vocab_path, os.getpid())
+    # Newlines are not translated, so that words may contain "\r"
+    with open(tmp_vocab_path, "w", encoding="utf-8", newline="") as f:
+        f.write("\n".join(words))
+    os.replace(tmp_vocab_path, vocab_path)
+    os.replace(tmp_table_path, table_path)
+
+
+def _load_vectors(embedding_name):
+    """
+    Loads the words and the embedding table of a pretrained embedding. The
+    `.npz` file is converted to an uncompressed `.npy` file and a vocab file at
+    the first time, and then the table is memory-mapped in copy-on-write mode
+    instead of being decompressed at each loading. Note that the weight of
+    `TokenEmbedding` is still a copy of the table owned by each process.
+
+    Returns:
+        tuple: The list of words and the embedding table, which has two rows
+        reserved for the unknown and padding tokens at the end.
+    """
+    table_path = osp.join(EMBEDDING_HOME, embedding_name + ".npy")
+    vocab_path = osp.join(EMBEDDING_HOME, embedding_name + ".vocab")
+    if not osp.exists(table_path) or not osp.exists(vocab_path):
+        vector_path = osp.join(EMBEDDING_HOME, embedding_name + ".npz")
+        if not osp.exists(vector_path):
+            # download
+            url = EMBEDDING_URL_ROOT + "/" + embedding_name + ".tar.gz"
+            get_path_from_url(url, EMBEDDING_HOME)
+        _convert_vectors(vector_path, table_path, vocab_path)
+    with open(vocab_path, "r", encoding="utf-8", newline="") as f:
+        words = f.read().split("\n")
+    table = np.load(table_path, mmap_mode="c")
+    if len(words) + 2 != table.shape[0]:
+        raise ValueError(
+            "The vocab file {} doesn't match the embedding table {}, please "
+            "remove them and retry.".format(vocab_path, table_path))
+    return words, table
+
+
 class TokenEmbedding(nn.Embedding):
     """
     A `TokenEmbedding` can load pre-trained embedding model which paddlenlp provides by
@@ -75,15 +140,9 @@ class TokenEmbedding(nn.Embedding):
                  extended_vocab_path=None,
                  trainable=True,
                  keep_extended_vocab_only=False):
-        vector_path = osp.join(EMBEDDING_HOME, embedding_name + ".npz")
-        if not osp.exists(vector_path):
-            # download
-            url = EMBEDDING_URL_ROOT + "/" + embedding_name + ".tar.gz"
-            get_path_from_url(url, EMBEDDING_HOME)
-
         logger.info("Loading token embedding...")
-        vector_np = np.load(vector_path)
-        self.embedding_dim = vector_np['embedding'].shape[1]
+        pretrained_words, vector_table = _load_vectors(embedding_name)
+        self.embedding_dim = vector_table.shape[1]
         self.unknown_token = unknown_token
         if unknown_token_vector is not None:
             unk_vector = np.array(unknown_token_vector).astype(
@@ -95,22 +154,23 @@ class TokenEmbedding(nn.Embedding):
         pad_vector = np.array(
             [0] * self.embedding_dim).astype(paddle.get_default_dtype())
         if extended_vocab_path is not None:
-            embedding_table = self._extend_vocab(extended_vocab_path, vector_np,
-                                                 pad_vector, unk_vector,
-                                                 keep_extended_vocab_only)
+            embedding_table = self._extend_vocab(
+                extended_vocab_path, pretrained_words,
+                vector_table[:len(pretrained_words)], pad_vector, unk_vector,
+                keep_extended_vocab_only)
             trainable = True
         else:
             embedding_table = self._init_without_extend_vocab(
-                vector_np, pad_vector, unk_vector)
+                pretrained_words, vector_table, pad_vector, unk_vector)
 
-        self.vocab = Vocab.from_dict(
-            self._word_to_idx, unk_token=unknown_token, pad_token=PAD_TOKEN)
+        # The vocab and the index of words are built at the first access
+        self._vocab = None
         self.num_embeddings = embedding_table.shape[0]
         # import embedding
         super(TokenEmbedding, self).__init__(
             self.num_embeddings,
             self.embedding_dim,
-            padding_idx=self._word_to_idx[PAD_TOKEN])
+            padding_idx=self._pad_idx)
         self.weight.set_value(embedding_table)
         self.set_trainable(trainable)
         logger.info("Finish loading embedding vector.")
@@ -120,23 +180,48 @@ class TokenEmbedding(nn.Embedding):
              \nPadding index: {}\
              \nPadding token: {}\
              \nShape :{}".format(
-            self._word_to_idx[self.unknown_token], self.unknown_token,
-            self._word_to_idx[PAD_TOKEN], PAD_TOKEN, self.weight.shape)
+            self._unk_idx, self.unknown_token, self._pad_idx, PAD_TOKEN,
+            self.weight.shape)
         logger.info(s)
 
-    def _init_without_extend_vocab(self, vector_np, pad_vector, unk_vector):
+    @property
+    def vocab(self):
+        """
+        The `Vocab` of the embedding, which is built at the first access.
+        """
+        if self._vocab is None:
+            self._vocab = Vocab.from_dict(
+                self._word_to_idx,
+                unk_token=self.unknown_token,
+                pad_token=PAD_TOKEN)
+        return self._vocab
+
+    @property
+    def _word_to_idx(self):
+        """
+        The dict from words to indexes, which is built at the first lookup,
+        since building it for millions of pretrained words is slow.
+        """
+        if self._word_index is None:
+            self._word_index = self._construct_word_to_idx(self._idx_to_word)
+        return self._word_index
+
+    def _init_without_extend_vocab(self, pretrained_words, vector_table,
+                                   pad_vector, unk_vector):
         """
         Constructs index to word list, word to index dict and embedding weight.
         """
-        self._idx_to_word = list(vector_np['vocab'])
+        self._idx_to_word = pretrained_words
         self._idx_to_word.append(self.unknown_token)
         self._idx_to_word.append(PAD_TOKEN)
-        self._word_to_idx = self._construct_word_to_idx(self._idx_to_word)
-        # insert unk, pad embedding
-        embedding_table = np.append(
-            vector_np['embedding'], [unk_vector, pad_vector], axis=0)
+        self._word_index = None
+        self._unk_idx = len(self._idx_to_word) - 2
+        self._pad_idx = len(self._idx_to_word) - 1
+        # Fill the reserved rows of unk and pad, which are copied on write
+        vector_table[-2] = unk_vector
+        vector_table[-1] = pad_vector
 
-        return embedding_table
+        return vector_table
 
     def _read_vocab_list_from_file(self, extended_vocab_path):
         # load new vocab table from file
@@ -147,8 +232,9 @@ class TokenEmbedding(nn.Embedding):
                 vocab_list.append(vocab)
         return vocab_list
 
-    def _extend_vocab(self, extended_vocab_path, vector_np, pad_vector,
-                      unk_vector, keep_extended_vocab_only):
+    def _extend_vocab(self, extended_vocab_path, pretrained_words,
+                      pretrained_embedding_table, pad_vector, unk_vector,
+                      keep_extended_vocab_only):
         """
         Constructs index to word list, word to index dict and embedding weight using
         extended vocab.
@@ -158,65 +244,64 @@ class TokenEmbedding(nn.Embedding):
         extend_vocab_set = set(extend_vocab_list)
         # update idx_to_word
         self._idx_to_word = extend_vocab_list
-        self._word_to_idx = self._construct_word_to_idx(self._idx_to_word)
+        extend_word_to_idx = self._construct_word_to_idx(self._idx_to_word)
+
+        # Split pretrained words by whether they are in the extended vocab,
+        # without building the index of all pretrained words
+        pretrained_vocab_intersect_index = []
+        pretrained_vocab_subtract_index = []
+        for idx, word in enumerate(pretrained_words):
+            if word in extend_vocab_set:
+                pretrained_vocab_intersect_index.append(idx)
+            else:
+                pretrained_vocab_subtract_index.append(idx)
+        extend_vocab_intersect_index = [
+            extend_word_to_idx[pretrained_words[idx]]
+            for idx in pretrained_vocab_intersect_index
+        ]
+        if keep_extended_vocab_only:
+            pretrained_vocab_subtract_index = []
+
+        # Allocate the rows of all words once rather than appending rows
+        num_extend_words = len(self._idx_to_word)
+        num_words = num_extend_words + len(pretrained_vocab_subtract_index)
+        num_words += (self.unknown_token not in extend_vocab_set) + (
+            PAD_TOKEN not in extend_vocab_set)
+        embedding_table = np.empty(
+            (num_words, self.embedding_dim), dtype=paddle.get_default_dtype())
 
         # use the Xavier init the embedding
         xavier_scale = np.sqrt(
-            6.0 / float(len(self._idx_to_word) + self.embedding_dim))
-        embedding_table = np.random.uniform(
+            6.0 / float(num_extend_words + self.embedding_dim))
+        embedding_table[:num_extend_words] = np.random.uniform(
             low=-1.0 * xavier_scale,
             high=xavier_scale,
-            size=(len(self._idx_to_word),
-                  self.embedding_dim)).astype(paddle.get_default_dtype())
-
-        pretrained_idx_to_word = list(vector_np['vocab'])
-        pretrained_word_to_idx = self._construct_word_to_idx(
-            pretrained_idx_to_word)
-        pretrained_embedding_table = np.array(vector_np['embedding'])
-
-        pretrained_vocab_set = set(pretrained_idx_to_word)
-        extend_vocab_set = set(self._idx_to_word)
-        vocab_intersection = pretrained_vocab_set & extend_vocab_set
-        vocab_subtraction = pretrained_vocab_set - extend_vocab_set
+            size=(num_extend_words, self.embedding_dim))
 
         # assignment from pretrained_vocab_embedding to extend_vocab_embedding
-        pretrained_vocab_intersect_index = [
-            pretrained_word_to_idx[word] for word in vocab_intersection
-        ]
-        pretrained_vocab_subtract_index = [
-            pretrained_word_to_idx[word] for word in vocab_subtraction
-        ]
-        extend_vocab_intersect_index = [
-            self._word_to_idx[word] for word in vocab_intersection
-        ]
         embedding_table[
             extend_vocab_intersect_index] = pretrained_embedding_table[
                 pretrained_vocab_intersect_index]
-        if not keep_extended_vocab_only:
-            for idx in pretrained_vocab_subtract_index:
-                word = pretrained_idx_to_word[idx]
-                self._idx_to_word.append(word)
-                self._word_to_idx[word] = len(self._idx_to_word) - 1
-
-            embedding_table = np.append(
-                embedding_table,
-                pretrained_embedding_table[pretrained_vocab_subtract_index],
-                axis=0)
-
-        if self.unknown_token not in extend_vocab_set:
-            self._idx_to_word.append(self.unknown_token)
-            self._word_to_idx[self.unknown_token] = len(self._idx_to_word) - 1
-            embedding_table = np.append(embedding_table, [unk_vector], axis=0)
+        self._idx_to_word.extend(pretrained_words[idx]
+                                 for idx in pretrained_vocab_subtract_index)
+        embedding_table[num_extend_words:len(
+            self._idx_to_word)] = pretrained_embedding_table[
+                pretrained_vocab_subtract_index]
+
+        if self.unknown_token in extend_vocab_set:
+            self._unk_idx = extend_word_to_idx[self.unknown_token]
         else:
-            unk_idx = self._word_to_idx[self.unknown_token]
-            embedding_table[unk_idx] = unk_vector
+            self._idx_to_word.append(self.unknown_token)
+            self._unk_idx = len(self._idx_to_word) - 1
+        embedding_table[self._unk_idx] = unk_vector
 
-        if PAD_TOKEN not in extend_vocab_set:
-            self._idx_to_word.append(PAD_TOKEN)
-            self._word_to_idx[PAD_TOKEN] = len(self._idx_to_word) - 1
-            embedding_table = np.append(embedding_table, [pad_vector], axis=0)
+        if PAD_TOKEN in extend_vocab_set:
+            self._pad_idx = extend_word_to_idx[PAD_TOKEN]
         else:
-            embedding_table[self._word_to_idx[PAD_TOKEN]] = pad_vector
+            self._idx_to_word.append(PAD_TOKEN)
+            self._pad_idx = len(self._idx_to_word) - 1
+        embedding_table[self._pad_idx] = pad_vector
+        self._word_index = None
 
         logger.info("Finish extending vocab.")
         return embedding_table
@@ -266,8 +351,7 @@ class TokenEmbedding(nn.Embedding):
             `int`: The index of specifying word.
 
         """
-        return get_idx_from_word(word, self.vocab.token_to_idx,
-                                 self.unknown_token)
+        return get_idx_from_word(word, self._word_to_idx, self.unknown_token)
 
     def get_idx_list_from_words(self, words):
         """
@@ -375,10 +459,7 @@ class TokenEmbedding(nn.Embedding):
             `Dict`: The word to index dict constructed by idx_to_word.
 
         """
-        word_to_idx = {}
-        for i, word in enumerate(idx_to_word):
-            word_to_idx[word] = i
-        return word_to_idx
+        return dict(zip(idx_to_word, range(len(idx_to_word))))
 
     def __repr__(self):
         """
@@ -393,6 +474,6 @@ class TokenEmbedding(nn.Embedding):
              \nPadding token: {}\
              \n{}".format(
             super(TokenEmbedding, self).__repr__(),
-            self._word_to_idx[self.unknown_token], self.unknown_token,
-            self._word_to_idx[PAD_TOKEN], PAD_TOKEN, self.weight)
+            self._unk_idx, self.unknown_token, self._pad_idx, PAD_TOKEN,
+            self.weight)
         return info
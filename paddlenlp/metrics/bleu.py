@@ -15,10 +15,12 @@
 import math
 import sys
 from collections import defaultdict
+from functools import partial
 
+import numpy as np
 import paddle
 
-from .utils import default_trans_func
+from .utils import default_trans_func, intern_sentences, iter_ngram_ids, map_chunks
 
 __all__ = ["BLEU", "BLEUForDuReader"]
 
@@ -54,6 +56,67 @@ def get_ngram(sent, n_size, label=None):
     return ngram_list
 
 
+def count_ngram_matches(cands, ref_lists, n_size):
+    """
+    Counts the clipped matches and the number of candidate n-grams for a batch
+    of candidates, as well as the lengths for brevity penalty. N-grams are
+    mapped to integer ids and counted with numpy.
+
+    Args:
+        cands (list): Tokenized candidate sentences.
+        ref_lists (list): Lists of tokenized ground truth sentences.
+        n_size (int): Number of gram.
+
+    Returns:
+        tuple: The lists of matches and candidate n-gram numbers of each gram
+        size, the total length of candidates and the total length of the
+        closest references.
+    """
+    sentences = list(cands)
+    inst_ids = list(range(len(cands)))
+    for i, ref_list in enumerate(ref_lists):
+        sentences.extend(ref_list)
+        inst_ids.extend([i] * len(ref_list))
+    inst_ids = np.array(inst_ids, dtype=np.int64)
+    num_cands = len(cands)
+
+    match_sizes, cand_sizes = [], []
+    token_ids, lengths = intern_sentences(sentences)
+    for _, _, sentence_ids, ngram_ids in iter_ngram_ids(token_ids, lengths,
+                                                        n_size):
+        num_ngrams = int(ngram_ids.max()) + 1 if len(ngram_ids) > 0 else 1
+        # Count each n-gram in each sentence
+        keys, counts = np.unique(
+            sentence_ids * num_ngrams + ngram_ids, return_counts=True)
+        key_sentences, key_ngrams = keys // num_ngrams, keys % num_ngrams
+        is_cand = key_sentences < num_cands
+        cand_keys = key_sentences[is_cand] * num_ngrams + key_ngrams[is_cand]
+        cand_counts = counts[is_cand]
+        # Maximum count of each n-gram in the references of an instance
+        ref_keys, inverse = np.unique(
+            inst_ids[key_sentences[~is_cand]] * num_ngrams +
+            key_ngrams[~is_cand],
+            return_inverse=True)
+        ref_counts = np.zeros(len(ref_keys), dtype=np.int64)
+        np.maximum.at(ref_counts, inverse, counts[~is_cand])
+
+        pos = np.minimum(
+            np.searchsorted(ref_keys, cand_keys), max(len(ref_keys) - 1, 0))
+        if len(ref_keys) > 0:
+            clipped = np.where(ref_keys[pos] == cand_keys,
+                               np.minimum(cand_counts, ref_counts[pos]), 0)
+        else:
+            clipped = np.zeros_like(cand_counts)
+        match_sizes.append(int(clipped.sum()))
+        cand_sizes.append(int(cand_counts.sum()))
+
+    bp_c = sum(len(cand) for cand in cands)
+    bp_r = sum(
+        min([(abs(len(cand) - len(ref)), len(ref)) for ref in ref_list])[1]
+        for cand, ref_list in zip(cands, ref_lists))
+    return match_sizes, cand_sizes, bp_c, bp_r
+
+
 class BLEU(paddle.metric.Metric):
     r'''
     BLEU (bilingual evaluation understudy) is an algorithm for evaluating the
@@ -164,8 +227,41 @@ class BLEU(paddle.metric.Metric):
         if len(cand_list) != len(ref_list):
             raise ValueError(
                 "Length error! Please check the output of network.")
-        for i in range(len(cand_list)):
-            self.add_inst(cand_list[i], ref_list[i])
+        if type(self).add_inst is BLEU.add_inst:
+            self.add_insts(cand_list, ref_list)
+        else:
+            for i in range(len(cand_list)):
+                self.add_inst(cand_list[i], ref_list[i])
+
+    def add_insts(self, cand_list, ref_lists, num_workers=0):
+        '''
+        Update the states based on a batch of candidates and references, which
+        is the same as calling `BLEU.add_inst` for each pair but much faster.
+        Large batches could be split across a process pool.
+
+        Args:
+            cand_list (list): Tokenized candidate sentences.
+            ref_lists (list): Lists of tokenized ground truth sentences of
+                each candidate.
+            num_workers (int, optional): The number of processes. Defaults to
+                0, which counts in the current process.
+        '''
+        if len(cand_list) != len(ref_lists):
+            raise ValueError(
+                "Length error! Please check the candidates and references.")
+        if len(cand_list) == 0:
+            return
+        count_fn = partial(count_ngram_matches, n_size=self.n_size)
+        results = map_chunks(count_fn, (cand_list, ref_lists), num_workers)
+        for match_sizes, cand_sizes, bp_c, bp_r in results:
+            for n_size in range(self.n_size):
+                if n_size not in self.match_ngram:
+                    self.match_ngram[n_size] = 0
+                    self.candi_ngram[n_size] = 0
+                self.match_ngram[n_size] += match_sizes[n_size]
+                self.candi_ngram[n_size] += cand_sizes[n_size]
+            self.bp_c += bp_c
+            self.bp_r += bp_r
 
     def add_inst(self, cand, ref_list):
         '''
@@ -12,12 +12,40 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from functools import partial
+
 import numpy as np
 import paddle
 
+from .utils import map_chunks
+
 __all__ = ['Distinct']
 
 
+def collect_ngrams(cand_list, n_size):
+    """
+    Collects the distinct n-grams of a batch of candidates, and counts all the
+    n-grams. N-grams are sliced by `zip` and joined by `map`, which iterate in
+    C instead of a Python loop for each n-gram.
+
+    Args:
+        cand_list (list): Tokenized candidate sentences.
+        n_size (int): Number of gram.
+
+    Returns:
+        tuple: The set of distinct n-grams joined by spaces and the number of
+        n-grams.
+    """
+    ngrams = set()
+    count = 0
+    for cand in cand_list:
+        if len(cand) >= n_size:
+            ngrams.update(
+                map(' '.join, zip(* [cand[i:] for i in range(n_size)])))
+            count += len(cand) - n_size + 1
+    return ngrams, count
+
+
 class Distinct(paddle.metric.Metric):
     """
     `Distinct` is an algorithm for evaluating the textual diversity of the 
@@ -115,8 +143,34 @@ class Distinct(paddle.metric.Metric):
             "to provide `trans_func` when initializing `Distinct`."
         cand_list = self.trans_func(output)
 
-        for cand in cand_list:
-            self.add_inst(cand)
+        if type(self).add_inst is Distinct.add_inst:
+            self.add_insts(cand_list)
+        else:
+            for cand in cand_list:
+                self.add_inst(cand)
+
+    def add_insts(self, cand_list, num_workers=0):
+        """
+        Updates the states based on a batch of candidates, which is the same
+        as calling :meth:`add_inst` for each candidate but much faster. Large
+        batches could be split across a process pool.
+
+        Args:
+            cand_list (list): Tokenized candidate sentences generated by model.
+            num_workers (int, optional): The number of processes. Defaults to
+                0, which computes in the current process.
+        """
+        if len(cand_list) == 0:
+            return
+        if self.n_size < 1:
+            for cand in cand_list:
+                self.add_inst(cand)
+            return
+        collect_fn = partial(collect_ngrams, n_size=self.n_size)
+        for ngrams, count in map_chunks(collect_fn, (cand_list, ),
+                                        num_workers):
+            self.diff_ngram.update(ngrams)
+            self.count += count
 
     def add_inst(self, cand):
         """
@@ -6,6 +6,7 @@ This file is expected to map question ID's to the model's predicted probability
 that a question is unanswerable.
 """
 import collections
+import functools
 import re
 import string
 import json
@@ -14,11 +15,19 @@ import os
 import math
 from paddlenlp.metrics.bleu import BLEU
 from paddlenlp.metrics.rouge import RougeL
+from paddlenlp.metrics.utils import best_spans, map_chunks
 from nltk.translate.bleu_score import sentence_bleu, corpus_bleu
 
 
-def compute_predictions(all_examples, all_features, all_results, n_best_size,
-                        max_answer_length, do_lower_case, verbose, tokenizer):
+def compute_predictions(all_examples,
+                        all_features,
+                        all_results,
+                        n_best_size,
+                        max_answer_length,
+                        do_lower_case,
+                        verbose,
+                        tokenizer,
+                        num_workers=0):
     """Write final predictions to the json file and log-odds of null if needed."""
 
     example_index_to_features = collections.defaultdict(list)
@@ -29,62 +38,91 @@ def compute_predictions(all_examples, all_features, all_results, n_best_size,
     for result in all_results:
         unique_id_to_result[result.unique_id] = result
 
+    preds_for_eval = collections.OrderedDict()
+    preds_for_test = []
+
+    print(len(unique_id_to_result))
+    example_features = []
+    example_results = []
+    for (example_index, example) in enumerate(all_examples):
+        features = example_index_to_features[example_index]
+        example_features.append(features)
+        example_results.append(
+            [unique_id_to_result[feature.unique_id] for feature in features])
+
+    fn = functools.partial(
+        _compute_predictions_chunk,
+        n_best_size=n_best_size,
+        max_answer_length=max_answer_length,
+        do_lower_case=do_lower_case,
+        verbose=verbose,
+        tokenizer=tokenizer)
+    for chunk_preds_for_eval, chunk_preds_for_test in map_chunks(
+            fn, (list(all_examples), example_features, example_results),
+            num_workers):
+        preds_for_eval.update(chunk_preds_for_eval)
+        preds_for_test.extend(chunk_preds_for_test)
+
+    return preds_for_eval, preds_for_test
+
+
+def _compute_predictions_chunk(all_examples, example_features, example_results,
+                               n_best_size, max_answer_length, do_lower_case,
+                               verbose, tokenizer):
+    """Compute the predictions of a chunk of examples for `compute_predictions`."""
+    features = [
+        feature for feature_list in example_features for feature in feature_list
+    ]
+    results = [result for result_list in example_results for result in result_list]
+    feature_bounds = np.cumsum([0] + [len(x) for x in example_features])
+
+    # We could hypothetically create invalid predictions, e.g., predict
+    # that the start of the span is in the question. We throw out all
+    # invalid predictions.
+    def is_valid_start(feature_index, indexes):
+        feature = features[feature_index]
+        return [
+            index < len(feature.tokens) and
+            index in feature.token_to_orig_map and
+            feature.token_is_max_context.get(index, False) for index in indexes
+        ]
+
+    def is_valid_end(feature_index, indexes):
+        feature = features[feature_index]
+        return [
+            index < len(feature.tokens) and index in feature.token_to_orig_map
+            for index in indexes
+        ]
+
+    span_features, span_starts, span_ends, span_start_logits, span_end_logits = best_spans(
+        [result.start_logits for result in results],
+        [result.end_logits for result in results], n_best_size,
+        max_answer_length, is_valid_start, is_valid_end)
+    span_bounds = np.searchsorted(span_features, feature_bounds)
+    span_examples = np.repeat(
+        np.arange(len(all_examples)), np.diff(span_bounds))
+    span_order = np.lexsort(
+        (-(span_start_logits + span_end_logits), span_examples))
+
     _PrelimPrediction = collections.namedtuple(  # pylint: disable=invalid-name
         "PrelimPrediction", [
             "feature_index", "start_index", "end_index", "start_logit",
             "end_logit"
         ])
+    _NbestPrediction = collections.namedtuple(  # pylint: disable=invalid-name
+        "NbestPrediction", ["text", "start_logit", "end_logit"])
 
     preds_for_eval = collections.OrderedDict()
     preds_for_test = []
 
-    print(len(unique_id_to_result))
     for (example_index, example) in enumerate(all_examples):
-        features = example_index_to_features[example_index]
-
-        prelim_predictions = []
-        # keep track of the minimum score of null start+end of position 0
-        for (feature_index, feature) in enumerate(features):
-            result = unique_id_to_result[feature.unique_id]
-            start_indexes = _get_best_indexes(result.start_logits, n_best_size)
-            end_indexes = _get_best_indexes(result.end_logits, n_best_size)
-            # if we could have irrelevant answers, get the min score of irrelevant
-
-            for start_index in start_indexes:
-                for end_index in end_indexes:
-                    # We could hypothetically create invalid predictions, e.g., predict
-                    # that the start of the span is in the question. We throw out all
-                    # invalid predictions.
-                    if start_index >= len(feature.tokens):
-                        continue
-                    if end_index >= len(feature.tokens):
-                        continue
-                    if start_index not in feature.token_to_orig_map:
-                        continue
-                    if end_index not in feature.token_to_orig_map:
-                        continue
-                    if not feature.token_is_max_context.get(start_index, False):
-                        continue
-                    if end_index < start_index:
-                        continue
-                    length = end_index - start_index + 1
-                    if length > max_answer_length:
-                        continue
-                    prelim_predictions.append(
-                        _PrelimPrediction(
-                            feature_index=feature_index,
-                            start_index=start_index,
-                            end_index=end_index,
-                            start_logit=result.start_logits[start_index],
-                            end_logit=result.end_logits[end_index]))
-
-        prelim_predictions = sorted(
-            prelim_predictions,
-            key=lambda x: (x.start_logit + x.end_logit),
-            reverse=True)
-
-        _NbestPrediction = collections.namedtuple(  # pylint: disable=invalid-name
-            "NbestPrediction", ["text", "start_logit", "end_logit"])
+        top = span_order[span_bounds[example_index]:span_bounds[example_index +
+                                                                1]]
+        prelim_predictions = map(_PrelimPrediction, span_features[top].tolist(),
+                                 span_starts[top].tolist(),
+                                 span_ends[top].tolist(),
+                                 span_start_logits[top].tolist(),
+                                 span_end_logits[top].tolist())
 
         seen_predictions = {}
         nbest = []
@@ -15,7 +15,7 @@
 import numpy as np
 
 import paddle
-from .utils import default_trans_func
+from .utils import default_trans_func, intern_sentences, lcs_lengths, map_chunks
 
 __all__ = ['RougeL', 'RougeLForDuReader']
 
@@ -108,6 +108,39 @@ class Rouge2(RougeN):
         super(Rouge2, self).__init__(n=2)
 
 
+def compute_lcs(cand_list, ref_lists):
+    """
+    Calculates the lengths of longest common subsequences between each
+    candidate and its references in a batch.
+
+    Args:
+        cand_list (list): The candidate sentences.
+        ref_lists (list): Lists of ground truth sentences of each candidate.
+
+    Returns:
+        list: The lists of LCS lengths of each candidate.
+    """
+    sentences = []
+    for cand, ref_list in zip(cand_list, ref_lists):
+        sentences.append(cand)
+        sentences.extend(ref_list)
+    token_ids, lengths = intern_sentences(sentences)
+    sequences = np.split(token_ids, np.cumsum(lengths)[:-1])
+    cand_seqs, ref_seqs = [], []
+    start = 0
+    for ref_list in ref_lists:
+        cand_seqs.extend([sequences[start]] * len(ref_list))
+        ref_seqs.extend(sequences[start + 1:start + 1 + len(ref_list)])
+        start += 1 + len(ref_list)
+    lcs = lcs_lengths(cand_seqs, ref_seqs).tolist()
+    results = []
+    start = 0
+    for ref_list in ref_lists:
+        results.append(lcs[start:start + len(ref_list)])
+        start += len(ref_list)
+    return results
+
+
 class RougeL(paddle.metric.Metric):
     r'''
     Rouge-L is Recall-Oriented Understudy for Gisting Evaluation based on Longest Common Subsequence (LCS).
@@ -193,9 +226,38 @@ class RougeL(paddle.metric.Metric):
             cand (str): The candidate sentence generated by model.
             ref_list (list): List of ground truth sentences.
         '''
+        self._add_inst_score(cand, ref_list,
+                             [self.lcs(cand, ref) for ref in ref_list])
+
+    def add_insts(self, cand_list, ref_lists, num_workers=0):
+        '''
+        Update the states based on a batch of candidates and references, which
+        is the same as calling `RougeL.add_inst` for each pair but much faster.
+        Large batches could be split across a process pool.
+
+        Args:
+            cand_list (list): The candidate sentences generated by model.
+            ref_lists (list): Lists of ground truth sentences of each candidate.
+            num_workers (int, optional): The number of processes. Defaults to
+                0, which computes in the current process.
+        '''
+        if len(cand_list) != len(ref_lists):
+            raise ValueError(
+                "Length error! Please check the candidates and references.")
+        if len(cand_list) == 0:
+            return
+        lcs_lists = []
+        for lcs_chunk in map_chunks(compute_lcs, (cand_list, ref_lists),
+                                    num_workers):
+            lcs_lists.extend(lcs_chunk)
+        for cand, ref_list, lcs_list in zip(cand_list, ref_lists, lcs_lists):
+            # The same float type as `lcs`
+            self._add_inst_score(cand, ref_list,
+                                 [np.float64(lcs) for lcs in lcs_list])
+
+    def _add_inst_score(self, cand, ref_list, lcs_list):
         precs, recalls = [], []
-        for ref in ref_list:
-            basic_lcs = self.lcs(cand, ref)
+        for ref, basic_lcs in zip(ref_list, lcs_list):
             prec = basic_lcs / len(cand) if len(cand) > 0. else 0.
             rec = basic_lcs / len(ref) if len(ref) > 0. else 0.
             precs.append(prec)
@@ -224,8 +286,11 @@ class RougeL(paddle.metric.Metric):
         if len(cand_list) != len(ref_list):
             raise ValueError(
                 "Length error! Please check the output of network.")
-        for i in range(len(cand_list)):
-            self.add_inst(cand_list[i], ref_list[i])
+        if type(self).add_inst is RougeL.add_inst:
+            self.add_insts(cand_list, ref_list)
+        else:
+            for i in range(len(cand_list)):
+                self.add_inst(cand_list[i], ref_list[i])
 
     def accumulate(self):
         '''
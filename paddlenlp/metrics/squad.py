@@ -14,11 +14,14 @@
 # limitations under the License.
 
 import collections
+import functools
 import re
 import string
 import json
 import numpy as np
 
+from .utils import best_spans, map_chunks
+
 
 def compute_prediction(examples,
                        features,
@@ -26,7 +29,8 @@ def compute_prediction(examples,
                        version_2_with_negative=False,
                        n_best_size=20,
                        max_answer_length=30,
-                       null_score_diff_threshold=0.0):
+                       null_score_diff_threshold=0.0,
+                       num_workers=0):
     """
     Post-processes the predictions of a question-answering model to convert 
     them to answers that are substrings of the original contexts. This is 
@@ -53,6 +57,9 @@ def compute_prediction(examples,
         null_score_diff_threshold (float, optional): The threshold used to select
             the null answer. Only useful when `version_2_with_negative` is True.
             Defaults to 0.0.
+        num_workers (int, optional): The number of processes to post-process
+            the examples. Defaults to 0, which post-processes in the current
+            process.
     
     Returns:
         A tuple of three dictionaries containing final selected answer, all n_best 
@@ -72,7 +79,17 @@ def compute_prediction(examples,
     features_per_example = collections.defaultdict(list)
     for i, feature in enumerate(features):
         features_per_example[example_id_to_index[feature["example_id"]]].append(
-            i)
+            (feature["offset_mapping"], feature.get("token_is_max_context",
+                                                    None), all_start_logits[i],
+             all_end_logits[i]))
+
+    example_ids = []
+    contexts = []
+    example_features = []
+    for example_index, example in enumerate(examples):
+        example_ids.append(example["id"])
+        contexts.append(example["context"])
+        example_features.append(features_per_example[example_index])
 
     # The dictionaries we have to fill.
     all_predictions = collections.OrderedDict()
@@ -80,87 +97,125 @@ def compute_prediction(examples,
 
     scores_diff_json = collections.OrderedDict()
 
-    # Let's loop over all the examples!
-    for example_index, example in enumerate(examples):
-        # Those are the indices of the features associated to the current example.
-        feature_indices = features_per_example[example_index]
-
-        min_null_prediction = None
-        prelim_predictions = []
-
-        # Looping through all the features associated to the current example.
-        for feature_index in feature_indices:
-            # We grab the predictions of the model for this feature.
-            start_logits = all_start_logits[feature_index]
-            end_logits = all_end_logits[feature_index]
-            # This is what will allow us to map some the positions in our logits to span of texts in the original
-            # context.
-            offset_mapping = features[feature_index]["offset_mapping"]
-            # Optional `token_is_max_context`, if provided we will remove answers that do not have the maximum context
-            # available in the current feature.
-            token_is_max_context = features[feature_index].get(
-                "token_is_max_context", None)
-
-            # Update minimum null prediction.
-            feature_null_score = start_logits[0] + end_logits[0]
-            if min_null_prediction is None or min_null_prediction[
-                    "score"] > feature_null_score:
-                min_null_prediction = {
-                    "offsets": (0, 0),
-                    "score": feature_null_score,
-                    "start_logit": start_logits[0],
-                    "end_logit": end_logits[0],
-                }
-
-            # Go through all possibilities for the `n_best_size` greater start and end logits.
-            start_indexes = np.argsort(start_logits)[-1:-n_best_size - 1:
-                                                     -1].tolist()
-            end_indexes = np.argsort(end_logits)[-1:-n_best_size - 1:-1].tolist(
-            )
-            for start_index in start_indexes:
-                for end_index in end_indexes:
-                    # Don't consider out-of-scope answers, either because the indices are out of bounds or correspond
-                    # to part of the input_ids that are not in the context.
-                    if (start_index >= len(offset_mapping) or
-                            end_index >= len(offset_mapping) or
-                            offset_mapping[start_index] is None or
-                            offset_mapping[end_index] is None or
-                            len(offset_mapping[start_index]) == 0 or
-                            len(offset_mapping[end_index]) == 0):
-                        continue
-                    # Don't consider answers with a length that is either < 0 or > max_answer_length.
-                    if end_index < start_index or end_index - start_index + 1 > max_answer_length:
-                        continue
-                    # Don't consider answer that don't have the maximum context available (if such information is
-                    # provided).
-                    if token_is_max_context is not None and not token_is_max_context.get(
-                            str(start_index), False):
-                        continue
-                    prelim_predictions.append({
-                        "offsets": (offset_mapping[start_index][0],
-                                    offset_mapping[end_index][1]),
-                        "score":
-                        start_logits[start_index] + end_logits[end_index],
-                        "start_logit": start_logits[start_index],
-                        "end_logit": end_logits[end_index],
-                    })
-        if version_2_with_negative:
-            # Add the minimum null prediction
-            prelim_predictions.append(min_null_prediction)
-            null_score = min_null_prediction["score"]
+    fn = functools.partial(
+        _compute_prediction_chunk,
+        version_2_with_negative=version_2_with_negative,
+        n_best_size=n_best_size,
+        max_answer_length=max_answer_length,
+        null_score_diff_threshold=null_score_diff_threshold)
+    for chunk_predictions, chunk_nbest_json, chunk_scores_diff in map_chunks(
+            fn, (example_ids, contexts, example_features), num_workers):
+        all_predictions.update(chunk_predictions)
+        all_nbest_json.update(chunk_nbest_json)
+        scores_diff_json.update(chunk_scores_diff)
+
+    return all_predictions, all_nbest_json, scores_diff_json
+
+
+def _compute_prediction_chunk(example_ids, contexts, example_features,
+                              version_2_with_negative, n_best_size,
+                              max_answer_length, null_score_diff_threshold):
+    """
+    Post-processes a chunk of examples for `compute_prediction`, where each
+    feature of `example_features` is a tuple of its offset mapping,
+    `token_is_max_context`, start logits and end logits.
+    """
+    features = [
+        feature for feature_list in example_features for feature in feature_list
+    ]
+    # The range of features of each example
+    feature_bounds = np.cumsum([0] + [len(x) for x in example_features])
+
+    def is_valid_start(feature_index, indexes):
+        # Don't consider out-of-scope answers, either because the indices are out of bounds or correspond
+        # to part of the input_ids that are not in the context. Don't consider answer that don't have the
+        # maximum context available (if such information is provided).
+        offset_mapping, token_is_max_context = features[feature_index][:2]
+        return [
+            index < len(offset_mapping) and
+            offset_mapping[index] is not None and
+            len(offset_mapping[index]) > 0 and
+            (token_is_max_context is None or
+             token_is_max_context.get(str(index), False)) for index in indexes
+        ]
+
+    def is_valid_end(feature_index, indexes):
+        offset_mapping = features[feature_index][0]
+        return [
+            index < len(offset_mapping) and offset_mapping[index] is not None
+            and len(offset_mapping[index]) > 0 for index in indexes
+        ]
+
+    # Go through all possibilities for the `n_best_size` greater start and end logits of all features.
+    # Ties of logits are ordered by indexes descending, as reversing `np.argsort` does.
+    span_features, span_starts, span_ends, span_start_logits, span_end_logits = best_spans(
+        [feature[2] for feature in features],
+        [feature[3] for feature in features],
+        n_best_size,
+        max_answer_length,
+        is_valid_start,
+        is_valid_end,
+        stable=False)
+    span_scores = span_start_logits + span_end_logits
+    # Sort the spans of each example by scores, where spans of the same score keep their order.
+    span_bounds = np.searchsorted(span_features, feature_bounds)
+    span_examples = np.repeat(
+        np.arange(len(example_features)), np.diff(span_bounds))
+    span_order = np.lexsort((-span_scores, span_examples))
+
+    all_predictions = collections.OrderedDict()
+    all_nbest_json = collections.OrderedDict()
+    scores_diff_json = collections.OrderedDict()
 
+    for example_index, example_id in enumerate(example_ids):
         # Only keep the best `n_best_size` predictions.
-        predictions = sorted(
-            prelim_predictions, key=lambda x: x["score"],
-            reverse=True)[:n_best_size]
+        predictions = []
+        top = span_order[span_bounds[example_index]:min(
+            span_bounds[example_index + 1], span_bounds[example_index] +
+            n_best_size)]
+        for feature_index, start_index, end_index, score, start_logit, end_logit in zip(
+                span_features[top].tolist(), span_starts[top].tolist(),
+                span_ends[top].tolist(), span_scores[top],
+                span_start_logits[top], span_end_logits[top]):
+            offset_mapping = features[feature_index][0]
+            predictions.append({
+                "offsets": (offset_mapping[start_index][0],
+                            offset_mapping[end_index][1]),
+                "score": score,
+                "start_logit": start_logit,
+                "end_logit": end_logit,
+            })
 
-        # Add back the minimum null prediction if it was removed because of its low score.
-        if version_2_with_negative and not any(p["offsets"] == (0, 0)
-                                               for p in predictions):
-            predictions.append(min_null_prediction)
+        if version_2_with_negative:
+            min_null_prediction = None
+            for offset_mapping, _, start_logits, end_logits in features[
+                    feature_bounds[example_index]:feature_bounds[example_index +
+                                                                 1]]:
+                # Update minimum null prediction.
+                feature_null_score = start_logits[0] + end_logits[0]
+                if min_null_prediction is None or min_null_prediction[
+                        "score"] > feature_null_score:
+                    min_null_prediction = {
+                        "offsets": (0, 0),
+                        "score": feature_null_score,
+                        "start_logit": start_logits[0],
+                        "end_logit": end_logits[0],
+                    }
+            null_score = min_null_prediction["score"]
+            # The minimum null prediction is sorted after spans of the same score.
+            position = 0
+            while position < len(predictions) and predictions[position][
+                    "score"] >= null_score:
+                position += 1
+            predictions.insert(position, min_null_prediction)
+            predictions = predictions[:n_best_size]
+
+            # Add back the minimum null prediction if it was removed because of its low score.
+            if not any(p["offsets"] == (0, 0) for p in predictions):
+                predictions.append(min_null_prediction)
 
         # Use the offsets to gather the answer text in the original context.
-        context = example["context"]
+        context = contexts[example_index]
         for pred in predictions:
             offsets = pred.pop("offsets")
             pred["text"] = context[offsets[0]:offsets[1]]
@@ -188,7 +243,7 @@ def compute_prediction(examples,
 
         # Pick the best prediction. If the null answer is not possible, this is easy.
         if not version_2_with_negative:
-            all_predictions[example["id"]] = predictions[0]["text"]
+            all_predictions[example_id] = predictions[0]["text"]
         else:
             # Otherwise we first need to find the best non-empty prediction.
             i = 0
@@ -199,15 +254,15 @@ def compute_prediction(examples,
             # Then we compare to the null prediction using the threshold.
             score_diff = null_score - best_non_null_pred[
                 "start_logit"] - best_non_null_pred["end_logit"]
-            scores_diff_json[example["id"]] = float(
+            scores_diff_json[example_id] = float(
                 score_diff)  # To be JSON-serializable.
             if score_diff > null_score_diff_threshold:
-                all_predictions[example["id"]] = ""
+                all_predictions[example_id] = ""
             else:
-                all_predictions[example["id"]] = best_non_null_pred["text"]
+                all_predictions[example_id] = best_non_null_pred["text"]
 
         # Make `predictions` JSON-serializable by casting np.float back to float.
-        all_nbest_json[example["id"]] = [{
+        all_nbest_json[example_id] = [{
             k: (float(v)
                 if isinstance(v, (np.float16, np.float32, np.float64)) else v)
             for k, v in pred.items()
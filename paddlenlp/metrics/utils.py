@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import multiprocessing
+
 import numpy as np
 
 
@@ -38,3 +40,269 @@ def default_trans_func(output, label, seq_mask, vocab):
 
         ref_list.append([token_list])
     return cand, ref_list
+
+
+def intern_sentences(sentences, vocab=None):
+    """
+    Maps the tokens of sentences to integer ids, thus n-grams of the sentences
+    can be counted with numpy.
+
+    Args:
+        sentences (list): The sentences, each of which is a list of hashable
+            tokens or a str.
+        vocab (dict, optional): The mapping from tokens to ids, which is
+            updated with new tokens. Defaults to None.
+
+    Returns:
+        tuple: The flat token ids with shape `[num_tokens]` and the lengths
+        of sentences with shape `[num_sentences]`.
+    """
+    if vocab is None:
+        vocab = {}
+    lengths = np.fromiter(
+        (len(sentence) for sentence in sentences),
+        dtype=np.int64,
+        count=len(sentences))
+    token_ids = np.fromiter(
+        (vocab.setdefault(token, len(vocab))
+         for sentence in sentences for token in sentence),
+        dtype=np.int64,
+        count=int(lengths.sum()))
+    return token_ids, lengths
+
+
+def iter_ngram_ids(token_ids, lengths, max_n):
+    """
+    Generates the ids of n-grams of the sentences for n from 1 to `max_n`. The
+    id of an n-gram is the rank of the pair of its (n-1)-gram prefix and its
+    last token, thus equal n-grams always get the same id without hash
+    collisions.
+
+    Args:
+        token_ids (numpy.ndarray): The flat token ids returned by
+            `intern_sentences`.
+        lengths (numpy.ndarray): The lengths of sentences.
+        max_n (int): The maximum size of n-grams.
+
+    Yields:
+        tuple: The size `n`, the start positions of n-grams in `token_ids`,
+        the sentence indices of n-grams, and the ids of n-grams.
+    """
+    sentence_ids = np.repeat(np.arange(len(lengths)), lengths)
+    # Number of tokens from each position to the end of its sentence
+    remains = np.repeat(np.cumsum(lengths), lengths) - np.arange(
+        len(token_ids))
+    ngram_ids = token_ids
+    vocab_size = int(token_ids.max()) + 1 if len(token_ids) > 0 else 1
+    for n in range(1, max_n + 1):
+        positions = np.flatnonzero(remains >= n)
+        if n > 1:
+            pairs = ngram_ids[positions] * vocab_size + token_ids[positions +
+                                                                   n - 1]
+            _, inverse = np.unique(pairs, return_inverse=True)
+            ngram_ids = np.full_like(token_ids, -1)
+            ngram_ids[positions] = inverse
+        yield n, positions, sentence_ids[positions], ngram_ids[positions]
+
+
+def lcs_lengths(seqs_a, seqs_b, batch_size=256):
+    """
+    Calculates the lengths of longest common subsequences of pairs of id
+    sequences. Pairs are sorted by lengths and padded into batches, and the
+    DP table of a batch is computed row by row, where a row is
+    `L[i][j] = max(L[i][j - 1], L[i - 1][j], L[i - 1][j - 1] + eq(i, j))`,
+    computed as a cumulative maximum over `j`.
+
+    Args:
+        seqs_a (list[numpy.ndarray]): The first id sequences of pairs.
+        seqs_b (list[numpy.ndarray]): The second id sequences of pairs.
+        batch_size (int, optional): The number of pairs computed together.
+            Defaults to 256.
+
+    Returns:
+        numpy.ndarray: The lengths of longest common subsequences.
+    """
+    # The shorter one of a pair is iterated by rows
+    pairs = [(a, b) if len(a) <= len(b) else (b, a)
+             for a, b in zip(seqs_a, seqs_b)]
+    order = sorted(
+        range(len(pairs)), key=lambda i: (len(pairs[i][0]), len(pairs[i][1])))
+    results = np.zeros(len(pairs), dtype=np.int64)
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        rows = max(len(pairs[i][0]) for i in indices)
+        cols = max(len(pairs[i][1]) for i in indices)
+        if rows == 0:
+            continue
+        # Paddings of the two sides never match
+        batch_a = np.full((len(indices), rows), -1, dtype=np.int64)
+        batch_b = np.full((len(indices), cols), -2, dtype=np.int64)
+        for k, i in enumerate(indices):
+            batch_a[k, :len(pairs[i][0])] = pairs[i][0]
+            batch_b[k, :len(pairs[i][1])] = pairs[i][1]
+        lengths = np.zeros((len(indices), cols + 1), dtype=np.int64)
+        for row in range(rows):
+            eq = batch_a[:, row:row + 1] == batch_b
+            np.maximum.accumulate(
+                np.maximum(lengths[:, 1:], lengths[:, :-1] + eq),
+                axis=1,
+                out=lengths[:, 1:])
+        # Padded rows and columns don't change the lengths
+        results[indices] = lengths[:, -1]
+    return results
+
+
+def _top_k_indexes(logits, lengths, k, stable=True):
+    """
+    Gets the indexes of the `k` largest logits of each row in descending
+    order, where ties are ordered by indexes ascending as a stable sort does,
+    or by indexes descending as reversing a stable ascending argsort does if
+    `stable` is False. Paddings beyond `lengths` are filled with `-inf` and
+    are only selected by rows shorter than `k`.
+    """
+    if not stable:
+        # Reverses each row within its length, so that the ties with the
+        # largest indexes come first, while paddings stay at the end.
+        columns = np.arange(logits.shape[1])
+        flipped = np.where(columns < lengths[:, None],
+                           lengths[:, None] - 1 - columns, columns)
+        indexes, valid = _top_k_indexes(
+            np.take_along_axis(logits, flipped, axis=1), lengths, k)
+        return np.take_along_axis(flipped, indexes, axis=1), valid
+    width = logits.shape[1]
+    k = min(k, width)
+    # The k-th largest value of each row
+    kth = np.partition(logits, width - k, axis=1)[:, width - k:width - k + 1]
+    greater = logits > kth
+    equal = logits == kth
+    # Selects the ties with the smallest indexes
+    needed = k - greater.sum(axis=1, keepdims=True)
+    selected = greater | (equal & (np.cumsum(equal, axis=1) <= needed))
+    indexes = np.nonzero(selected)[1].reshape(-1, k)
+    values = np.take_along_axis(logits, indexes, axis=1)
+    order = np.lexsort((indexes, -values), axis=-1)
+    indexes = np.take_along_axis(indexes, order, axis=1)
+    return indexes, indexes < lengths[:, None]
+
+
+def best_spans(start_logits,
+               end_logits,
+               n_best_size,
+               max_answer_length,
+               is_valid_start=None,
+               is_valid_end=None,
+               batch_size=1024,
+               stable=True):
+    """
+    Finds the candidate answer spans of question-answering features in
+    batches. The `n_best_size` largest start and end logits of all features in
+    a batch are selected together, and the valid spans among their pairs are
+    masked by broadcasting, instead of checking the pairs one by one.
+
+    Args:
+        start_logits (list): The start logits of features, each of which is a
+            list or a 1-D numpy.ndarray.
+        end_logits (list): The end logits of features.
+        n_best_size (int): The number of the largest start and end logits of a
+            feature to pair.
+        max_answer_length (int): The maximum number of tokens of a span.
+        is_valid_start (callable, optional): The function taking the index of
+            a feature and a list of token indexes, and returning whether each
+            token can start a span. Defaults to None, which means all tokens.
+        is_valid_end (callable, optional): The function like `is_valid_start`
+            which checks whether tokens can end a span. Defaults to None.
+        batch_size (int, optional): The number of features computed together.
+            Defaults to 1024.
+        stable (bool, optional): Whether the ties of logits are ordered by
+            token indexes ascending. If False, they are ordered by token
+            indexes descending, as `np.argsort(logits)[::-1]` does. Defaults
+            to True.
+
+    Returns:
+        tuple: The feature indexes, the start indexes, the end indexes, the
+        start logits and the end logits of spans, ordered by features, then by
+        start logits and end logits descending, which is the order of looping
+        over the best start indexes and then the best end indexes of each
+        feature.
+    """
+    outputs = [[] for _ in range(5)]
+    for batch_start in range(0, len(start_logits), batch_size):
+        batch_end = min(batch_start + batch_size, len(start_logits))
+        padded = []
+        for logits in (start_logits[batch_start:batch_end],
+                       end_logits[batch_start:batch_end]):
+            logits = [np.asarray(x) for x in logits]
+            lengths = np.array([len(x) for x in logits])
+            dtype = np.result_type(np.float16, *set(x.dtype for x in logits))
+            matrix = np.full(
+                (len(logits), max(lengths.max(), 1)), -np.inf, dtype=dtype)
+            for i, x in enumerate(logits):
+                matrix[i, :len(x)] = x
+            indexes, valid = _top_k_indexes(matrix, lengths, n_best_size,
+                                            stable)
+            padded.append(
+                (indexes, valid, np.take_along_axis(matrix, indexes, axis=1)))
+
+        (start_indexes, start_valid, start_values), (
+            end_indexes, end_valid, end_values) = padded
+        for is_valid, indexes, valid in (
+            (is_valid_start, start_indexes, start_valid),
+            (is_valid_end, end_indexes, end_valid)):
+            if is_valid is None:
+                continue
+            valid &= np.array(
+                [
+                    is_valid(batch_start + i, row)
+                    for i, row in enumerate(indexes.tolist())
+                ],
+                dtype=bool).reshape(valid.shape)
+
+        lengths = end_indexes[:, None, :] - start_indexes[:, :, None] + 1
+        mask = (start_valid[:, :, None] & end_valid[:, None, :] &
+                (lengths >= 1) & (lengths <= max_answer_length))
+        features, starts, ends = np.nonzero(mask)
+        outputs[0].append(features + batch_start)
+        outputs[1].append(start_indexes[features, starts])
+        outputs[2].append(end_indexes[features, ends])
+        outputs[3].append(start_values[features, starts])
+        outputs[4].append(end_values[features, ends])
+    if not outputs[0]:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in range(5))
+    return tuple(np.concatenate(output) for output in outputs)
+
+
+def map_chunks(fn, args, num_workers=0, chunk_size=None):
+    """
+    Splits the lists in `args` into chunks and applies `fn` to each chunk,
+    in a process pool if `num_workers` > 1.
+
+    Args:
+        fn (callable): The function to apply, which should be picklable if
+            `num_workers` > 1.
+        args (tuple): The lists of equal lengths, whose chunks are passed to
+            `fn` as positional arguments.
+        num_workers (int, optional): The number of processes. Defaults to 0,
+            which applies `fn` in the current process.
+        chunk_size (int, optional): The number of items of a chunk. Defaults
+            to None, which splits the lists evenly for workers.
+
+    Returns:
+        list: The results of chunks in order.
+    """
+    total = len(args[0])
+    if num_workers <= 1:
+        return [fn(*args)]
+    if chunk_size is None:
+        chunk_size = max(1, -(-total // (num_workers * 4)))
+    chunks = [
+        tuple(arg[start:start + chunk_size] for arg in args)
+        for start in range(0, total, chunk_size)
+    ]
+    pool = multiprocessing.Pool(num_workers)
+    try:
+        return pool.starmap(fn, chunks)
+    finally:
+        # Workers exit normally instead of being terminated, since paddle
+        # reports the termination signal of each worker
+        pool.close()
+        pool.join()
@@ -0,0 +1,354 @@
+# coding:utf-8
+# Copyright (c) 2022  PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+__all__ = ['eisner', 'chuliu_edmonds', 'istree', 'istree_batch']
+
+
+def _length_buckets(lens, ratio=1.25):
+    """
+    Groups the indices of sentences into buckets, in which the longest
+    sentence is at most `ratio` times as long as the shortest one, thus
+    short sentences are not padded to the longest one of the whole batch.
+    """
+    order = np.argsort(lens, kind='stable')
+    buckets = []
+    start = 0
+    for end in range(1, len(order) + 1):
+        if end == len(order) or lens[order[end]] > lens[order[start]] * ratio:
+            buckets.append(order[start:end])
+            start = end
+    return buckets
+
+
+def _stripe(x, n, w, offset=(0, 0), dim=1):
+    """
+    Returns a view of the diagonal stripe of each matrix in the contiguous
+    batch `x` with shape `[batch_size, seq_len, seq_len]`. The result has
+    shape `[batch_size, n, w]`, where `result[b, k, t]` is
+    `x[b, offset[0] + k, offset[1] + k + t]` if `dim` is 1, or
+    `x[b, offset[0] + k + t, offset[1] + k]` if `dim` is 0.
+    """
+    strides = x.strides
+    step = strides[2] if dim == 1 else strides[1]
+    return np.ndarray(
+        (x.shape[0], n, w),
+        dtype=x.dtype,
+        buffer=x,
+        offset=offset[0] * strides[1] + offset[1] * strides[2],
+        strides=(strides[0], strides[1] + strides[2], step))
+
+
+def _diagonal(x, offset):
+    """
+    Returns a writable view of the diagonal of each matrix in the contiguous
+    batch `x`. The diagonal is above the main diagonal if `offset` > 0, and
+    below it if `offset` < 0.
+    """
+    batch_size, seq_len, _ = x.shape
+    start = offset if offset >= 0 else -offset * seq_len
+    end = start + (seq_len - abs(offset)) * (seq_len + 1)
+    return x.reshape(batch_size, -1)[:, start:end:seq_len + 1]
+
+
+def _eisner(scores, lens, p_i, p_c):
+    """
+    Runs Eisner algorithm for a batch of sentences padded to the same length.
+    All spans of the same width are computed at once on strided views.
+
+    Args:
+        scores (numpy.ndarray): The arc scores with shape
+            `[batch_size, seq_len, seq_len]`, where `scores[b, d, h]` is the
+            score of head `h` for dependent `d`. `seq_len` should be
+            `max(lens) + 1`.
+        lens (numpy.ndarray): The number of words of each sentence.
+        p_i (numpy.ndarray): The output of split positions of incomplete
+            spans for backtracking, with the same shape as `scores`.
+        p_c (numpy.ndarray): The output of split positions of complete spans
+            for backtracking, with the same shape as `scores`.
+    """
+    batch_size, seq_len, _ = scores.shape
+    # Shape: [batch_size, head, dependent]
+    scores = np.ascontiguousarray(scores.transpose(0, 2, 1))
+    # Score for incomplete span
+    s_i = np.full_like(scores, float('-inf'))
+    # Score for complete span
+    s_c = np.full_like(scores, float('-inf'))
+    _diagonal(s_c, 0)[...] = 0
+    not_root_span = lens[:, np.newaxis] != np.arange(seq_len)[np.newaxis, :]
+
+    for w in range(1, seq_len):
+        n = seq_len - w
+        starts = np.arange(n, dtype=np.int64)
+        # ilr = C(i->r) + C(j->r+1), i <= r < j, shape: [batch_size, n, w]
+        ilr = _stripe(s_c, n, w) + _stripe(s_c, n, w, (w, 1))
+
+        # I(j->i) = max(C(i->r) + C(j->r+1) + s(j->i))
+        il = ilr + _diagonal(scores, -w)[..., np.newaxis]
+        _diagonal(s_i, -w)[...] = il.max(-1)
+        _diagonal(p_i, -w)[...] = il.argmax(-1) + starts
+
+        # I(i->j) = max(C(i->r) + C(j->r+1) + s(i->j))
+        ir = ilr + _diagonal(scores, w)[..., np.newaxis]
+        _diagonal(s_i, w)[...] = ir.max(-1)
+        _diagonal(p_i, w)[...] = ir.argmax(-1) + starts
+
+        # C(j->i) = max(C(r->i) + I(j->r)), i <= r < j
+        cl = _stripe(s_c, n, w, (0, 0), 0) + _stripe(s_i, n, w, (w, 0))
+        _diagonal(s_c, -w)[...] = cl.max(-1)
+        _diagonal(p_c, -w)[...] = cl.argmax(-1) + starts
+
+        # C(i->j) = max(I(i->r) + C(r->j)), i < r <= j
+        cr = _stripe(s_i, n, w, (0, 1)) + _stripe(s_c, n, w, (1, w), 0)
+        _diagonal(s_c, w)[...] = cr.max(-1)
+        # The root only heads the complete span of the whole sentence
+        s_c[not_root_span[:, w], 0, w] = float('-inf')
+        _diagonal(p_c, w)[...] = cr.argmax(-1) + starts + 1
+
+
+def _backtrack(p_i, p_c, lens):
+    """
+    Backtracks the split positions of Eisner algorithm to get heads. Spans
+    to visit are kept in an array stack for each sentence, and all sentences
+    of the batch pop and split one span at each iteration.
+    """
+    batch_size, seq_len, _ = p_i.shape
+    rows = np.arange(batch_size)
+    # Split positions of incomplete spans followed by complete spans
+    positions = np.stack([p_i, p_c], axis=1).reshape(-1)
+    heads = np.zeros((batch_size, seq_len), dtype=np.int64)
+    heads[:, 0] = 1
+    # Each span is (i, j, complete), and a sentence with n words has 3n + 1
+    # spans at most in the derivation
+    stack_size = 3 * seq_len + 1
+    starts = np.zeros((batch_size, stack_size), dtype=np.int64)
+    ends = np.zeros((batch_size, stack_size), dtype=np.int64)
+    completes = np.zeros((batch_size, stack_size), dtype=np.int64)
+    ends[:, 0] = lens
+    completes[:, 0] = 1
+    top = np.ones(batch_size, dtype=np.int64)
+    while True:
+        active = np.flatnonzero(top)
+        if len(active) == 0:
+            break
+        top[active] -= 1
+        pos = top[active]
+        i = starts[active, pos]
+        j = ends[active, pos]
+        complete = completes[active, pos]
+        split = i != j
+        active, pos, i, j, complete = (active[split], pos[split], i[split],
+                                       j[split], complete[split])
+        r = positions[((active * 2 + complete) * seq_len + i) * seq_len + j]
+        # The incomplete span (i, j) makes the arc i -> j
+        arc = complete == 0
+        heads[active[arc], j[arc]] = i[arc]
+
+        # C(i, j) -> I(i, r) + C(r, j)
+        # I(i, j) -> C(min(i, j), r) + C(max(i, j), r + 1)
+        starts[active, pos] = np.where(arc, np.minimum(i, j), i)
+        ends[active, pos] = r
+        completes[active, pos] = arc
+        starts[active, pos + 1] = np.where(arc, np.maximum(i, j), r)
+        ends[active, pos + 1] = np.where(arc, r + 1, j)
+        completes[active, pos + 1] = 1
+        top[active] += 2
+    return heads
+
+
+def eisner(scores, mask):
+    """
+    Eisner algorithm is a general dynamic programming decoding algorithm for
+    bilexical grammar, which finds the highest scoring projective tree.
+    Sentences are decoded in buckets of similar lengths, and each bucket is
+    padded only to its longest sentence.
+
+    Args:
+        scores (numpy.ndarray): Adjacency matrix, shape=(batch, seq_len, seq_len)
+        mask (numpy.ndarray): Mask matrix, shape=(batch, seq_len)
+
+    Returns:
+        numpy.ndarray: Shape=(batch, seq_len), the index of the parent node
+        corresponding to the token in the query.
+    """
+    lens = mask.sum(1)
+    batch_size, seq_len, _ = scores.shape
+    p_i = np.zeros((batch_size, seq_len, seq_len), dtype=np.int64)
+    p_c = np.zeros((batch_size, seq_len, seq_len), dtype=np.int64)
+    for idx in _length_buckets(lens):
+        max_len = int(lens[idx].max()) + 1
+        bucket_p_i = np.zeros((len(idx), max_len, max_len), dtype=np.int64)
+        bucket_p_c = np.zeros((len(idx), max_len, max_len), dtype=np.int64)
+        _eisner(scores[idx, :max_len, :max_len], lens[idx], bucket_p_i,
+                bucket_p_c)
+        p_i[idx, :max_len, :max_len] = bucket_p_i
+        p_c[idx, :max_len, :max_len] = bucket_p_c
+    # All sentences are backtracked together
+    return _backtrack(p_i, p_c, lens)
+
+
+def _find_cycle(heads):
+    """
+    Returns a boolean mask of the nodes in a cycle of `heads`, or None if
+    there is no cycle.
+    """
+    num_nodes = len(heads)
+    visited = np.zeros(num_nodes, dtype=np.int64)
+    for start in range(1, num_nodes):
+        if visited[start]:
+            continue
+        node = start
+        # Walk up until reaching the root or a visited node
+        while node != 0 and not visited[node]:
+            visited[node] = start
+            node = heads[node]
+        if node != 0 and visited[node] == start:
+            cycle = np.zeros(num_nodes, dtype=bool)
+            while not cycle[node]:
+                cycle[node] = True
+                node = heads[node]
+            return cycle
+    return None
+
+
+def _chuliu_edmonds(scores):
+    """
+    Finds the maximum spanning arborescence rooted at node 0 of a sentence.
+    Each contraction of a cycle is one O(n^2) pass over the score matrix.
+
+    Args:
+        scores (numpy.ndarray): The arc scores with shape [n, n], where
+            `scores[d, h]` is the score of head `h` for dependent `d`.
+
+    Returns:
+        numpy.ndarray: The heads of nodes, and the head of the root is 0.
+    """
+    scores = scores.astype(np.float64)
+    np.fill_diagonal(scores, float('-inf'))
+    scores[0] = float('-inf')
+    scores[0, 0] = 0
+    heads = scores.argmax(1)
+    cycle = _find_cycle(heads)
+    if cycle is None:
+        return heads
+
+    cycle_ids = np.flatnonzero(cycle)
+    other_ids = np.flatnonzero(~cycle)
+    cycle_scores = scores[cycle_ids, heads[cycle_ids]]
+    # Arcs from the other nodes entering the cycle break the arc of the cycle
+    # entering the same dependent
+    enter = scores[cycle_ids][:, other_ids] - cycle_scores[:, np.newaxis]
+    enter_deps = enter.argmax(0)
+    # Arcs from the cycle leaving to the other nodes
+    leave = scores[other_ids][:, cycle_ids]
+    leave_heads = leave.argmax(1)
+
+    # The cycle is contracted into the last node, and the root stays first
+    num_others = len(other_ids)
+    contracted = np.full((num_others + 1, num_others + 1), float('-inf'))
+    contracted[:num_others, :num_others] = scores[other_ids][:, other_ids]
+    contracted[num_others, :num_others] = enter.max(0) + cycle_scores.sum()
+    contracted[:num_others, num_others] = leave.max(1)
+    contracted_heads = _chuliu_edmonds(contracted)
+
+    heads = heads.copy()
+    for k, head in enumerate(contracted_heads[:num_others]):
+        if k == 0:
+            continue
+        if head == num_others:
+            heads[other_ids[k]] = cycle_ids[leave_heads[k]]
+        else:
+            heads[other_ids[k]] = other_ids[head]
+    head = contracted_heads[num_others]
+    heads[cycle_ids[enter_deps[head]]] = other_ids[head]
+    heads[0] = 0
+    return heads
+
+
+def chuliu_edmonds(scores, mask):
+    """
+    Chu-Liu-Edmonds algorithm finds the highest scoring tree, which is not
+    necessarily projective. The root has exactly one dependent, which is
+    ensured by penalizing arcs from the root.
+
+    Args:
+        scores (numpy.ndarray): Adjacency matrix, shape=(batch, seq_len, seq_len)
+        mask (numpy.ndarray): Mask matrix, shape=(batch, seq_len)
+
+    Returns:
+        numpy.ndarray: Shape=(batch, seq_len), the index of the parent node
+        corresponding to the token in the query.
+    """
+    lens = mask.sum(1)
+    batch_size, seq_len, _ = scores.shape
+    predicts = np.zeros((batch_size, seq_len), dtype=np.int64)
+    for i, length in enumerate(lens.tolist()):
+        sentence_scores = scores[i, :length + 1, :length + 1].astype(np.float64)
+        # Every tree has at least one arc from the root, thus a penalty larger
+        # than the range of scores keeps only one of them
+        penalty = (np.abs(sentence_scores).max() + 1) * (length + 1)
+        sentence_scores[:, 0] -= penalty
+        predicts[i, :length + 1] = _chuliu_edmonds(sentence_scores)
+    return predicts
+
+
+def istree_batch(heads, mask, projective=True):
+    """
+    Checks whether the heads of each sentence form a tree with exactly one
+    dependent of the root, for the whole batch at once.
+
+    Args:
+        heads (numpy.ndarray): The heads of tokens, shape=(batch, seq_len).
+        mask (numpy.ndarray): Mask matrix of words, shape=(batch, seq_len).
+        projective (bool, optional): Whether the tree should be projective,
+            which means that arcs do not cross. Defaults to True.
+
+    Returns:
+        numpy.ndarray: Shape=(batch,), whether each sentence is a tree.
+    """
+    lens = mask.sum(1)
+    batch_size, seq_len = heads.shape
+    positions = np.arange(seq_len)[np.newaxis, :]
+    words = (positions >= 1) & (positions <= lens[:, np.newaxis])
+    in_range = (heads >= 0) & (heads <= lens[:, np.newaxis])
+    valid = np.all(in_range | ~words, axis=1)
+    valid &= np.sum(words & (heads == 0), axis=1) == 1
+
+    # Every word reaches the root by following heads, if there is no cycle
+    ancestors = np.where(words & in_range, heads, 0)
+    for _ in range(max(1, int(np.ceil(np.log2(seq_len)))) + 1):
+        ancestors = np.take_along_axis(ancestors, ancestors, axis=1)
+    valid &= np.all(ancestors == 0, axis=1)
+
+    if projective:
+        # Arcs (l1, r1) and (l2, r2) cross if l1 < l2 < r1 < r2
+        dependents = np.broadcast_to(positions, heads.shape)
+        left = np.where(words, np.minimum(heads, dependents), 0)
+        right = np.where(words, np.maximum(heads, dependents), 0)
+        cross = (left[:, :, np.newaxis] < left[:, np.newaxis, :]) & (
+            left[:, np.newaxis, :] < right[:, :, np.newaxis]) & (
+                right[:, :, np.newaxis] < right[:, np.newaxis, :])
+        cross &= words[:, :, np.newaxis] & words[:, np.newaxis, :]
+        valid &= ~np.any(cross, axis=(1, 2))
+    return valid
+
+
+def istree(sequence):
+    """Is the sequence a projective tree"""
+    sequence = np.asarray(sequence, dtype=np.int64)[np.newaxis, :]
+    mask = np.ones_like(sequence, dtype=bool)
+    mask[:, 0] = False
+    return bool(istree_batch(sequence, mask)[0])
@@ -13,7 +13,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import copy
 import os
 import itertools
 
@@ -23,6 +22,7 @@ from ..data import Vocab, Pad
 from .utils import download_file, dygraph_mode_guard
 from .task import Task
 from .models import BiAffineParser
+from .dependency_decoding import eisner, chuliu_edmonds, istree, istree_batch
 
 usage = r"""
            from paddlenlp import Taskflow 
@@ -79,6 +79,8 @@ class DDParserTask(Task):
         use_pos(bool): Whether to return the postag.
         batch_size(int): Numbers of examples a batch.
         return_visual(bool): If True, the result will contain the dependency visualization.
+        decoding(string): The algorithm to repair predictions that are not trees, "eisner" for
+            projective trees or "chuliu_edmonds" for non-projective trees.
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
     """
 
@@ -147,6 +149,7 @@ class DDParserTask(Task):
                  use_cuda=False,
                  batch_size=1,
                  return_visual=False,
+                 decoding="eisner",
                  **kwargs):
         super().__init__(task=task, model=model, **kwargs)
         self._usage = usage
@@ -172,6 +175,10 @@ class DDParserTask(Task):
         self.use_pos = use_pos
         self.batch_size = batch_size
         self.return_visual = return_visual
+        if decoding not in ["eisner", "chuliu_edmonds"]:
+            raise ValueError(
+                "The decoding should be one of eisner and chuliu_edmonds.")
+        self.decoding = decoding
 
         try:
             from LAC import LAC
@@ -319,7 +326,7 @@ class DDParserTask(Task):
             mask = self.output_handle[3].copy_to_cpu().astype('bool')
 
             arc_preds, rel_preds = decode(arc_preds, rel_preds, s_arc, mask,
-                                          self.tree)
+                                          self.tree, self.decoding)
 
             arcs.extend([arc_pred[m] for arc_pred, m in zip(arc_preds, mask)])
             rels.extend([rel_pred[m] for rel_pred, m in zip(rel_preds, mask)])
@@ -520,247 +527,16 @@ def probability(s_arc, arc_preds):
     return arc_probs
 
 
-def decode(arc_preds, rel_preds, s_arc, mask, tree):
+def decode(arc_preds, rel_preds, s_arc, mask, tree, decoding="eisner"):
     """decode"""
-    lens = np.sum(mask, -1)
-
-    bad = [not istree(seq[:i + 1]) for i, seq in zip(lens, arc_preds)]
-    if tree and any(bad):
-        arc_preds[bad] = eisner(s_arc[bad], mask[bad])
+    if tree:
+        projective = decoding == "eisner"
+        bad = ~istree_batch(arc_preds, mask, projective=projective)
+        if bad.any():
+            decoder = eisner if projective else chuliu_edmonds
+            arc_preds[bad] = decoder(s_arc[bad], mask[bad])
     rel_preds = [
         rel_pred[np.arange(len(arc_pred)), arc_pred]
         for arc_pred, rel_pred in zip(arc_preds, rel_preds)
     ]
     return arc_preds, rel_preds
-
-
-def eisner(scores, mask):
-    """
-    Eisner algorithm is a general dynamic programming decoding algorithm for bilexical grammar.
-
-    Args：
-        scores: Adjacency matrix，shape=(batch, seq_len, seq_len)
-        mask: mask matrix，shape=(batch, sql_len)
-
-    Returns:
-        output，shape=(batch, seq_len)，the index of the parent node corresponding to the token in the query
-
-    """
-    lens = mask.sum(1)
-    batch_size, seq_len, _ = scores.shape
-    scores = scores.transpose(2, 1, 0)
-    # Score for incomplete span
-    s_i = np.full_like(scores, float('-inf'))
-    # Score for complete span
-    s_c = np.full_like(scores, float('-inf'))
-    # Incompelte span position for backtrack
-    p_i = np.zeros((seq_len, seq_len, batch_size), dtype=np.int64)
-    # Compelte span position for backtrack
-    p_c = np.zeros((seq_len, seq_len, batch_size), dtype=np.int64)
-    # Set 0 to s_c.diagonal
-    s_c = fill_diagonal(s_c, 0)
-    # Contiguous
-    s_c = np.ascontiguousarray(s_c)
-    s_i = np.ascontiguousarray(s_i)
-    for w in range(1, seq_len):
-        n = seq_len - w
-        starts = np.arange(n, dtype=np.int64)[np.newaxis, :]
-        # ilr = C(i->r) + C(j->r+1)
-        ilr = stripe(s_c, n, w) + stripe(s_c, n, w, (w, 1))
-        # Shape: [batch_size, n, w]
-        ilr = ilr.transpose(2, 0, 1)
-        # scores.diagonal(-w).shape:[batch, n]
-        il = ilr + scores.diagonal(-w)[..., np.newaxis]
-        # I(j->i) = max(C(i->r) + C(j->r+1) + s(j->i)), i <= r < j
-        il_span, il_path = il.max(-1), il.argmax(-1)
-        s_i = fill_diagonal(s_i, il_span, offset=-w)
-        p_i = fill_diagonal(p_i, il_path + starts, offset=-w)
-
-        ir = ilr + scores.diagonal(w)[..., np.newaxis]
-        # I(i->j) = max(C(i->r) + C(j->r+1) + s(i->j)), i <= r < j
-        ir_span, ir_path = ir.max(-1), ir.argmax(-1)
-        s_i = fill_diagonal(s_i, ir_span, offset=w)
-        p_i = fill_diagonal(p_i, ir_path + starts, offset=w)
-
-        # C(j->i) = max(C(r->i) + I(j->r)), i <= r < j
-        cl = stripe(s_c, n, w, (0, 0), 0) + stripe(s_i, n, w, (w, 0))
-        cl = cl.transpose(2, 0, 1)
-        cl_span, cl_path = cl.max(-1), cl.argmax(-1)
-        s_c = fill_diagonal(s_c, cl_span, offset=-w)
-        p_c = fill_diagonal(p_c, cl_path + starts, offset=-w)
-
-        # C(i->j) = max(I(i->r) + C(r->j)), i < r <= j
-        cr = stripe(s_i, n, w, (0, 1)) + stripe(s_c, n, w, (1, w), 0)
-        cr = cr.transpose(2, 0, 1)
-        cr_span, cr_path = cr.max(-1), cr.argmax(-1)
-        s_c = fill_diagonal(s_c, cr_span, offset=w)
-        s_c[0, w][np.not_equal(lens, w)] = float('-inf')
-        p_c = fill_diagonal(p_c, cr_path + starts + 1, offset=w)
-
-    predicts = []
-    p_c = p_c.transpose(2, 0, 1)
-    p_i = p_i.transpose(2, 0, 1)
-    for i, length in enumerate(lens.tolist()):
-        heads = np.ones(length + 1, dtype=np.int64)
-        backtrack(p_i[i], p_c[i], heads, 0, length, True)
-        predicts.append(heads)
-
-    return pad_sequence(predicts, fix_len=seq_len)
-
-
-def fill_diagonal(x, value, offset=0, dim1=0, dim2=1):
-    """
-    Fill value into the diagoanl of x that offset is ${offset} 
-    and the coordinate system is (dim1, dim2).
-    """
-    strides = x.strides
-    shape = x.shape
-    if dim1 > dim2:
-        dim1, dim2 = dim2, dim1
-    assert 0 <= dim1 < dim2 <= 2
-    assert len(x.shape) == 3
-    assert shape[dim1] == shape[dim2]
-
-    dim_sum = dim1 + dim2
-    dim3 = 3 - dim_sum
-    if offset >= 0:
-        diagonal = np.lib.stride_tricks.as_strided(
-            x[:, offset:] if dim_sum == 1 else x[:, :, offset:],
-            shape=(shape[dim3], shape[dim1] - offset),
-            strides=(strides[dim3], strides[dim1] + strides[dim2]))
-    else:
-        diagonal = np.lib.stride_tricks.as_strided(
-            x[-offset:, :] if dim_sum in [1, 2] else x[:, -offset:],
-            shape=(shape[dim3], shape[dim1] + offset),
-            strides=(strides[dim3], strides[dim1] + strides[dim2]))
-
-    diagonal[...] = value
-    return x
-
-
-def backtrack(p_i, p_c, heads, i, j, complete):
-    """
-    Backtrack the position matrix of eisner to generate the tree
-    """
-    if i == j:
-        return
-    if complete:
-        r = p_c[i, j]
-        backtrack(p_i, p_c, heads, i, r, False)
-        backtrack(p_i, p_c, heads, r, j, True)
-    else:
-        r, heads[j] = p_i[i, j], i
-        i, j = sorted((i, j))
-        backtrack(p_i, p_c, heads, i, r, True)
-        backtrack(p_i, p_c, heads, j, r + 1, True)
-
-
-def stripe(x, n, w, offset=(0, 0), dim=1):
-    """
-    Returns a diagonal stripe of the tensor.
-
-    Args:
-        x (Tensor): the input tensor with 2 or more dims.
-        n (int): the length of the stripe.
-        w (int): the width of the stripe.
-        offset (tuple): the offset of the first two dims.
-        dim (int): 0 if returns a horizontal stripe; 1 else.
-
-    Example:
-    >>> x = np.arange(25).reshape(5, 5)
-    >>> x
-    tensor([[ 0,  1,  2,  3,  4],
-            [ 5,  6,  7,  8,  9],
-            [10, 11, 12, 13, 14],
-            [15, 16, 17, 18, 19],
-            [20, 21, 22, 23, 24]])
-    >>> stripe(x, 2, 3, (1, 1))
-    tensor([[ 6,  7,  8],
-            [12, 13, 14]])
-    >>> stripe(x, 2, 3, dim=0)
-    tensor([[ 0,  5, 10],
-            [ 6, 11, 16]])
-    """
-    if not x.flags['C_CONTIGUOUS']:
-        x = np.ascontiguousarray(x)
-    strides = x.strides
-    m = strides[0] + strides[1]
-    k = strides[1] if dim == 1 else strides[0]
-    return np.lib.stride_tricks.as_strided(
-        x[offset[0]:, offset[1]:],
-        shape=[n, w] + list(x.shape[2:]),
-        strides=[m, k] + list(strides[2:]))
-
-
-class Node:
-    """Node class"""
-
-    def __init__(self, id=None, parent=None):
-        self.lefts = []
-        self.rights = []
-        self.id = int(id)
-        self.parent = parent if parent is None else int(parent)
-
-
-class DepTree:
-    """
-    DepTree class, used to check whether the prediction result is a project Tree.
-    A projective tree means that you can project the tree without crossing arcs.
-    """
-
-    def __init__(self, sentence):
-        # set root head to -1
-        sentence = copy.deepcopy(sentence)
-        sentence[0] = -1
-        self.sentence = sentence
-        self.build_tree()
-        self.visit = [False] * len(sentence)
-
-    def build_tree(self):
-        """Build the tree"""
-        self.nodes = [
-            Node(index, p_index) for index, p_index in enumerate(self.sentence)
-        ]
-        # set root
-        self.root = self.nodes[0]
-        for node in self.nodes[1:]:
-            self.add(self.nodes[node.parent], node)
-
-    def add(self, parent, child):
-        """Add a child node"""
-        if parent.id is None or child.id is None:
-            raise Exception("id is None")
-        if parent.id < child.id:
-            parent.rights = sorted(parent.rights + [child.id])
-        else:
-            parent.lefts = sorted(parent.lefts + [child.id])
-
-    def judge_legal(self):
-        """Determine whether it is a project tree"""
-        target_seq = list(range(len(self.nodes)))
-        if len(self.root.lefts + self.root.rights) != 1:
-            return False
-        cur_seq = self.inorder_traversal(self.root)
-        if target_seq != cur_seq:
-            return False
-        else:
-            return True
-
-    def inorder_traversal(self, node):
-        """Inorder traversal"""
-        if self.visit[node.id]:
-            return []
-        self.visit[node.id] = True
-        lf_list = []
-        rf_list = []
-        for ln in node.lefts:
-            lf_list += self.inorder_traversal(self.nodes[ln])
-        for rn in node.rights:
-            rf_list += self.inorder_traversal(self.nodes[rn])
-
-        return lf_list + [node.id] + rf_list
-
-
-def istree(sequence):
-    """Is the sequence a project tree"""
-    return DepTree(sequence).judge_legal()
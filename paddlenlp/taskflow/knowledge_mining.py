@@ -19,6 +19,7 @@ import math
 import os
 import copy
 import csv
+import pickle
 import itertools
 from collections import OrderedDict
 
@@ -37,8 +38,9 @@ from paddlenlp.utils.tools import compare_version
 from ..datasets import MapDataset, load_dataset
 from ..data import Stack, Pad, Tuple
 from ..transformers import ErnieCtmWordtagModel, ErnieCtmNptagModel, ErnieCtmTokenizer
+from ..utils.log import logger
 from .utils import download_file, add_docstrings, static_mode_guard, dygraph_mode_guard
-from .utils import TermTree, BurkhardKellerTree
+from .utils import TermTree, TermTreeSnapshot, SymSpellIndex
 from .utils import Customization
 from .task import Task
 
@@ -215,7 +217,8 @@ class WordTagTask(Task):
 
         if self._user_dict:
             self._custom = Customization()
-            self._custom.load_customization(self._user_dict)
+            self._custom.load_customization(
+                self._user_dict, cache_dir=self._task_path)
         else:
             self._custom = None
         self._num_workers = self.kwargs[
@@ -271,8 +274,37 @@ class WordTagTask(Task):
             self._term_data_path = os.path.join(self._task_path,
                                                 "termtree_data")
         if self._linking is True:
-            self._termtree = TermTree.from_dir(
-                self._term_schema_path, self._term_data_path, self._linking)
+            self._termtree = self._load_termtree()
+
+    def _load_termtree(self):
+        """
+        Load the TermTree for linking. The TermTree built from the schema and
+        data files is saved as a snapshot in the task path, which is loaded
+        by memory mapping next time if the files are not modified.
+        """
+        version = []
+        for path in (self._term_schema_path, self._term_data_path):
+            stat = os.stat(path)
+            version.append(
+                [os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+        snapshot_path = os.path.join(self._task_path, "termtree_snapshot")
+        if TermTreeSnapshot.exists(snapshot_path):
+            try:
+                termtree = TermTreeSnapshot(snapshot_path)
+                if termtree.meta == {"version": version}:
+                    return termtree
+            except Exception as e:
+                logger.warning("Failed to load the TermTree snapshot {}: {}".
+                               format(snapshot_path, e))
+
+        termtree = TermTree.from_dir(self._term_schema_path,
+                                     self._term_data_path, self._linking)
+        try:
+            termtree.save_snapshot(snapshot_path, meta={"version": version})
+        except OSError as e:
+            logger.warning("Failed to save the TermTree snapshot {}: {}".format(
+                snapshot_path, e))
+        return termtree
 
     def _preprocess_text(self, input_texts):
         """
@@ -300,8 +332,12 @@ class WordTagTask(Task):
                 yield tokenized_output['input_ids'], tokenized_output[
                     'token_type_ids'], tokenized_output['seq_len']
 
+        order = self._get_length_order(
+            [len(text) for text in short_input_texts])
         infer_ds = load_dataset(
-            read, inputs=short_input_texts, lazy=self._lazy_load)
+            read,
+            inputs=[short_input_texts[idx] for idx in order],
+            lazy=self._lazy_load)
         batchify_fn = lambda samples, fn=Tuple(
             Pad(axis=0, pad_val=self._tokenizer.pad_token_id, dtype='int64'
                 ),  # input_ids
@@ -322,6 +358,7 @@ class WordTagTask(Task):
         outputs = {}
         outputs['data_loader'] = infer_data_loader
         outputs['short_input_texts'] = short_input_texts
+        outputs['order'] = order
         return outputs
 
     def _reset_offset(self, pred_words):
@@ -466,7 +503,8 @@ class WordTagTask(Task):
             self.predictor.run()
             pred_tags = self.output_handle[0].copy_to_cpu()
             all_pred_tags.extend(pred_tags.tolist())
-        inputs['all_pred_tags'] = all_pred_tags
+        inputs['all_pred_tags'] = self._restore_order(all_pred_tags,
+                                                      inputs['order'])
         return inputs
 
     def _postprocess(self, inputs):
@@ -574,10 +612,9 @@ class NPTagTask(Task):
         name_dict_path = os.path.join(self._task_path, "name_category_map.json")
         with open(name_dict_path, encoding="utf-8") as fp:
             self._name_dict = json.load(fp)
-        self._tree = BurkhardKellerTree()
+        self._tree = self._load_similar_word_index(name_dict_path)
         self._cls_vocabs = OrderedDict()
         for k in self._name_dict:
-            self._tree.add(k)
             for c in k:
                 if c not in self._cls_vocabs:
                     self._cls_vocabs[c] = len(self._cls_vocabs)
@@ -587,6 +624,41 @@ class NPTagTask(Task):
         self._vocab_ids = self._tokenizer.vocab.to_indices(
             list(self._cls_vocabs.keys()))
 
+    def _load_similar_word_index(self, name_dict_path):
+        """
+        Load the index to search similar category names, which is built from
+        the name dict and cached in the task path.
+        """
+        stat = os.stat(name_dict_path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        index_path = os.path.join(self._task_path, "name_category_index.pkl")
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "rb") as fp:
+                    cache = pickle.load(fp)
+                if cache["version"] == version:
+                    return cache["index"]
+            except Exception as e:
+                logger.warning("Failed to load the name category index {}: {}".
+                               format(index_path, e))
+
+        index = SymSpellIndex()
+        for k in self._name_dict:
+            index.add(k)
+        tmp_path = "{}.tmp-{}".format(index_path, os.getpid())
+        try:
+            with open(tmp_path, "wb") as fp:
+                pickle.dump(
+                    {
+                        "version": version,
+                        "index": index
+                    }, fp, protocol=4)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            logger.warning("Failed to save the name category index {}: {}".
+                           format(index_path, e))
+        return index
+
     def _decode(self, pred_ids):
         tokens = [self._id_vocabs[i] for i in pred_ids]
         valid_token = []
@@ -743,6 +815,8 @@ class NPTagTask(Task):
 
     def _postprocess(self, inputs):
         results = []
+        # Labels out of the name dict, which are replaced by similar names
+        unknown_results = []
 
         for i in range(len(inputs['texts'])):
             cls_label = self._decode(inputs['pred_ids'][i])
@@ -762,11 +836,18 @@ class NPTagTask(Task):
                     if cls_label_can in self._name_dict:
                         result['label'] = cls_label_can
                         break
-                    else:
-                        labels_can = self._tree.search_similar_word(cls_label)
-                        result['label'] = labels_can[0][0]
+                else:
+                    if labels_can:
+                        unknown_results.append(result)
+            results.append(result)
 
-            if self._linking:
+        similar_words = self._tree.search_similar_words(
+            [result['label'] for result in unknown_results])
+        for result, words in zip(unknown_results, similar_words):
+            if words:
+                result['label'] = words[0][0]
+
+        if self._linking:
+            for result in results:
                 result['category'] = self._name_dict[result['label']]
-            results.append(result)
         return results
@@ -122,7 +122,8 @@ class LacTask(Task):
         self._max_seq_len = 512
         if self._user_dict:
             self._custom = Customization()
-            self._custom.load_customization(self._user_dict)
+            self._custom.load_customization(
+                self._user_dict, cache_dir=self._task_path)
         else:
             self._custom = None
 
@@ -207,7 +208,10 @@ class LacTask(Task):
                 lens = len(ids)
                 yield ids, lens
 
-        infer_ds = load_dataset(read, inputs=short_input_texts, lazy=False)
+        order = self._get_length_order(
+            [len(text) for text in short_input_texts])
+        infer_ds = load_dataset(
+            read, inputs=[short_input_texts[idx] for idx in order], lazy=False)
         batchify_fn = lambda samples, fn=Tuple(
             Pad(axis=0, pad_val=0, dtype="int64"),  # input_ids
             Stack(dtype='int64'),  # seq_len
@@ -221,6 +225,7 @@ class LacTask(Task):
             return_list=True)
         outputs = {}
         outputs['text'] = short_input_texts
+        outputs['order'] = order
         outputs['data_loader'] = infer_data_loader
         return outputs
 
@@ -239,8 +244,8 @@ class LacTask(Task):
             results.extend(tags_ids.tolist())
             lens.extend(seq_len.tolist())
 
-        inputs['result'] = results
-        inputs['lens'] = lens
+        inputs['result'] = self._restore_order(results, inputs['order'])
+        inputs['lens'] = self._restore_order(lens, inputs['order'])
         return inputs
 
     def _postprocess(self, inputs):
@@ -106,7 +106,8 @@ class NERWordTagTask(WordTagTask):
         self.entity_only = entity_only
         if self._user_dict:
             self._custom = Customization()
-            self._custom.load_customization(self._user_dict)
+            self._custom.load_customization(
+                self._user_dict, cache_dir=self._task_path)
         else:
             self._custom = None
 
@@ -169,12 +169,11 @@ class SentaTask(Task):
             Pad(axis=0, pad_val=self._tokenizer.vocab.token_to_idx.get('[PAD]', 0)),  # input_ids
             Stack(dtype='int64'),  # seq_len
         ): fn(samples)
-        batches = [
-            examples[idx:idx + batch_size]
-            for idx in range(0, len(examples), batch_size)
-        ]
+        batches, order = self._batchify_by_length(
+            examples, batch_size, [lens for ids, lens in examples])
         outputs = {}
         outputs['data_loader'] = batches
+        outputs['order'] = order
         outputs['text'] = filter_inputs
         self.batchify_fn = batchify_fn
         return outputs
@@ -198,8 +197,8 @@ class SentaTask(Task):
                 results.extend(labels)
                 scores.extend(score)
 
-        inputs['result'] = results
-        inputs['score'] = scores
+        inputs['result'] = self._restore_order(results, inputs['order'])
+        inputs['score'] = self._restore_order(scores, inputs['order'])
         return inputs
 
     def _postprocess(self, inputs):
@@ -312,12 +311,11 @@ class SkepTask(Task):
             Pad(axis=0, pad_val=self._tokenizer.pad_token_id),  # input ids
             Pad(axis=0, pad_val=self._tokenizer.pad_token_type_id),  # token type ids
         ): [data for data in fn(samples)]
-        batches = [
-            examples[idx:idx + batch_size]
-            for idx in range(0, len(examples), batch_size)
-        ]
+        batches, order = self._batchify_by_length(
+            examples, batch_size, [len(ids) for ids, segment_ids in examples])
         outputs = {}
         outputs['text'] = filter_inputs
+        outputs['order'] = order
         outputs['data_loader'] = batches
         self._batchify_fn = batchify_fn
         return outputs
@@ -341,8 +339,8 @@ class SkepTask(Task):
                 results.extend(labels)
                 scores.extend(score)
 
-        inputs['result'] = results
-        inputs['score'] = scores
+        inputs['result'] = self._restore_order(results, inputs['order'])
+        inputs['score'] = self._restore_order(scores, inputs['order'])
         return inputs
 
     def _postprocess(self, inputs):
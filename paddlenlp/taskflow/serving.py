@@ -0,0 +1,280 @@
+# coding:utf-8
+# Copyright (c) 2022  PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from ..utils.log import logger
+
+try:
+    from concurrent.futures import InvalidStateError
+except ImportError:
+    # Futures do not check their states before Python 3.8
+    InvalidStateError = RuntimeError
+
+__all__ = ['TaskServer']
+
+# Put into the queue to stop the serving thread
+_STOP = object()
+
+
+class _Request(object):
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.future = Future()
+        self.submit_time = time.perf_counter()
+
+
+def _set_future(future, result=None, exception=None):
+    """
+    Sets the result or exception of `future` unless it is already done.
+    """
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class TaskServer(object):
+    """
+    The in-process serving layer of a task, which coalesces the requests from
+    many threads or coroutines into micro-batches. A background thread takes
+    requests from a queue until `max_batch_size` inputs are collected or
+    `max_wait_ms` milliseconds have passed since the first request of the
+    batch arrived, runs the task once for the whole batch and scatters the
+    results back to the future of each request.
+
+    The task should be created with `batch_size` no less than
+    `max_batch_size`, thus each micro-batch runs as one predictor batch.
+
+    Args:
+        task (Taskflow): The task to serve. It is called with a list of inputs
+            and returns one result for each input.
+        max_batch_size (int, optional): The maximum number of inputs in a
+            micro-batch. Defaults to 32.
+        max_wait_ms (float, optional): The maximum time in milliseconds to wait
+            for more requests after the first request of a micro-batch.
+            Defaults to 5.
+        stats_window (int, optional): The number of latest requests and batches
+            used to compute the statistics. Defaults to 10000.
+
+    Example:
+        .. code-block::
+
+            from paddlenlp import Taskflow
+
+            seg = Taskflow("word_segmentation", batch_size=32)
+            with seg.serve(max_batch_size=32, max_wait_ms=5) as server:
+                # In any thread
+                result = server("第十四届全运会在西安举办")
+                # Or in a coroutine
+                result = await server.async_call("第十四届全运会在西安举办")
+                print(server.stats())
+    """
+
+    def __init__(self,
+                 task,
+                 max_batch_size=32,
+                 max_wait_ms=5,
+                 stats_window=10000):
+        assert max_batch_size > 0, "max_batch_size should be a positive value"
+        assert max_wait_ms >= 0, "max_wait_ms should be a non-negative value"
+        self._task = task
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue = queue.Queue()
+        # A request taken from the queue but not fitting in the last batch
+        self._pending = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._num_requests = 0
+        self._num_batches = 0
+        self._latencies = deque(maxlen=stats_window)
+        self._queue_times = deque(maxlen=stats_window)
+        self._batch_sizes = deque(maxlen=stats_window)
+
+        self._thread = threading.Thread(target=self._serve_loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, inputs):
+        """
+        Submits the inputs of a request and returns a future of the results.
+
+        Args:
+            inputs (str|list): An input or a list of inputs of the task.
+
+        Returns:
+            concurrent.futures.Future: The future of the results, which is a list
+            with one result for each input.
+        """
+        if not isinstance(inputs, list):
+            inputs = [inputs]
+        if len(inputs) == 0:
+            raise ValueError("Invalid inputs, inputs should not be empty.")
+        for input in inputs:
+            if isinstance(input, str) and len(input.strip()) == 0:
+                raise ValueError(
+                    "Invalid inputs, input text should not be empty text, please check your input."
+                )
+        request = _Request(inputs)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The server has been closed.")
+            self._queue.put(request)
+        return request.future
+
+    def __call__(self, inputs):
+        """
+        Submits the inputs and waits for the results.
+        """
+        return self.submit(inputs).result()
+
+    async def async_call(self, inputs):
+        """
+        Submits the inputs and awaits the results in a coroutine.
+        """
+        return await asyncio.wrap_future(self.submit(inputs))
+
+    def _next_batch(self):
+        """
+        Collects a micro-batch of requests. Returns None if the server is closed.
+        Requests cancelled before being collected are skipped.
+        """
+        while True:
+            if self._pending is not None:
+                request, self._pending = self._pending, None
+            else:
+                request = self._queue.get()
+            if request is _STOP:
+                return None
+            # The future can not be cancelled once running, and the requests
+            # cancelled by callers (e.g. timeouts of `async_call`) are dropped.
+            if request.future.set_running_or_notify_cancel():
+                break
+        batch = [request]
+        num_inputs = len(request.inputs)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.
+        while num_inputs < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(
+                    timeout=timeout) if timeout > 0 else self._queue.get_nowait(
+                    )
+            except queue.Empty:
+                break
+            if request is _STOP or num_inputs + len(
+                    request.inputs) > self.max_batch_size:
+                # Served in the next batch, or ends the loop after this batch
+                self._pending = request
+                break
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            batch.append(request)
+            num_inputs += len(request.inputs)
+        return batch
+
+    def _run_batch(self, batch):
+        start_time = time.perf_counter()
+        inputs = []
+        for request in batch:
+            inputs.extend(request.inputs)
+        try:
+            results = self._task(inputs)
+            if len(results) != len(inputs):
+                raise RuntimeError(
+                    "The task returns {} results for {} inputs.".format(
+                        len(results), len(inputs)))
+        except Exception as e:
+            logger.error("Failed to run a micro-batch: {}".format(e))
+            for request in batch:
+                _set_future(request.future, exception=e)
+            return
+
+        end_time = time.perf_counter()
+        start = 0
+        with self._lock:
+            self._num_batches += 1
+            self._batch_sizes.append(len(inputs))
+            for request in batch:
+                self._num_requests += 1
+                self._queue_times.append(start_time - request.submit_time)
+                self._latencies.append(end_time - request.submit_time)
+        for request in batch:
+            end = start + len(request.inputs)
+            _set_future(request.future, results[start:end])
+            start = end
+
+    def _serve_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            self._run_batch(batch)
+
+    def stats(self):
+        """
+        Returns the statistics of latest requests and micro-batches, including
+        the latencies and queueing times of requests in milliseconds, and the
+        average number of inputs in a batch and its ratio to `max_batch_size`.
+
+        Returns:
+            dict: The statistics.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000.
+            queue_times = np.array(self._queue_times) * 1000.
+            batch_sizes = np.array(self._batch_sizes)
+            stats = {
+                'num_requests': self._num_requests,
+                'num_batches': self._num_batches,
+            }
+        if len(batch_sizes) > 0:
+            stats['avg_batch_size'] = float(batch_sizes.mean())
+            stats['avg_batch_fill'] = float(batch_sizes.mean() /
+                                            self.max_batch_size)
+        if len(latencies) > 0:
+            stats['avg_latency_ms'] = float(latencies.mean())
+            stats['p50_latency_ms'] = float(np.percentile(latencies, 50))
+            stats['p99_latency_ms'] = float(np.percentile(latencies, 99))
+            stats['avg_queue_ms'] = float(queue_times.mean())
+        return stats
+
+    def close(self):
+        """
+        Stops accepting requests, and returns after the submitted requests
+        are served.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
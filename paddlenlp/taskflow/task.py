@@ -53,6 +53,9 @@ class Task(metaclass=abc.ABCMeta):
         else:
             self._task_path = os.path.join(self._home_path, "taskflow",
                                            self.task, self.model)
+        # Whether to batch the inputs of similar lengths together
+        self._sort_by_length = self.kwargs[
+            'sort_by_length'] if 'sort_by_length' in self.kwargs else True
         download_check(self._task_flag)
 
     @abstractmethod
@@ -256,6 +259,45 @@ class Task(metaclass=abc.ABCMeta):
             concat_results.append(single_results)
         return concat_results
 
+    def _get_length_order(self, lengths):
+        '''
+        Get the order to run the inputs, where the inputs are sorted by lengths if
+        `sort_by_length` is True, thus each batch pads less tokens.
+        Args:
+            lengths (List[int]): the lengths of inputs.
+        return:
+            order (List[int]): the indices of inputs in the running order.
+        '''
+        if not self._sort_by_length:
+            return list(range(len(lengths)))
+        return sorted(range(len(lengths)), key=lambda idx: lengths[idx])
+
+    def _batchify_by_length(self, examples, batch_size, lengths):
+        '''
+        Split the examples into batches in the order of `_get_length_order`.
+        Args:
+            examples (List): the examples to batch.
+            batch_size (int): the number of examples in a batch.
+            lengths (List[int]): the lengths of examples.
+        return:
+            batches (List[List]): the batches of examples.
+            order (List[int]): the indices of examples in the batches, which is used to
+                restore the order of results by `_restore_order`.
+        '''
+        order = self._get_length_order(lengths)
+        batches = [[examples[idx] for idx in order[start:start + batch_size]]
+                   for start in range(0, len(order), batch_size)]
+        return batches, order
+
+    def _restore_order(self, results, order):
+        '''
+        Restore the results of inputs run in `order` to the order of inputs.
+        '''
+        restored_results = [None] * len(results)
+        for result, idx in zip(results, order):
+            restored_results[idx] = result
+        return restored_results
+
     def help(self):
         """
         Return the usage message of the current task.
@@ -35,6 +35,7 @@ from .dependency_parsing import DDParserTask
 from .text_correction import CSCTask
 from .text_similarity import TextSimilarityTask
 from .dialogue import DialogueTask
+from .serving import TaskServer
 
 warnings.simplefilter(action='ignore', category=Warning, lineno=0, append=False)
 
@@ -292,6 +293,14 @@ class Taskflow(object):
         task_list = list(TASKS.keys())
         return task_list
 
+    def serve(self, max_batch_size=32, max_wait_ms=5):
+        """
+        Return a `TaskServer` which coalesces the concurrent requests into
+        micro-batches of the task.
+        """
+        return TaskServer(
+            self, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
     def from_segments(self, *inputs):
         results = self.task_instance.from_segments(inputs)
         return results
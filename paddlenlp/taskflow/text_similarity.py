@@ -12,10 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+
 import paddle
 from paddlenlp.transformers import BertModel, BertTokenizer
 
 from ..data import Pad, Tuple
+from ..utils.embedding_cache import EmbeddingCache
 from .utils import static_mode_guard
 from .task import Task
 
@@ -39,9 +42,15 @@ usage = r"""
 class TextSimilarityTask(Task):
     """
     Text similarity task using SimBERT to predict the similarity of sentence pair.
+    Texts are deduplicated and both sides of the pairs are encoded together,
+    and the embeddings are kept in a LRU cache across calls.
     Args:
         task(string): The name of task.
         model(string): The model name in the task.
+        cache_size(int, optional): The number of text embeddings kept in the cache, 0 to disable
+            the cache. Defaults to 4096.
+        cache_path(string, optional): The path of the sqlite database that embeddings evicted from
+            the cache are spilled to. Defaults to None, which drops evicted embeddings.
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task.
     """
 
@@ -62,7 +71,14 @@ class TextSimilarityTask(Task):
         }
     }
 
-    def __init__(self, task, model, batch_size=1, max_seq_len=128, **kwargs):
+    def __init__(self,
+                 task,
+                 model,
+                 batch_size=1,
+                 max_seq_len=128,
+                 cache_size=4096,
+                 cache_path=None,
+                 **kwargs):
         super().__init__(task=task, model=model, **kwargs)
         self._check_task_files()
         self._construct_tokenizer(model)
@@ -70,6 +86,15 @@ class TextSimilarityTask(Task):
         self._batch_size = batch_size
         self._max_seq_len = max_seq_len
         self._usage = usage
+        # Embeddings are invalid after the model file is updated
+        stat = os.stat(
+            os.path.join(self._task_path,
+                         self.resource_files_names["model_state"]))
+        self._embedding_cache = EmbeddingCache(
+            "{}:{}:{}:{}".format(model, self._max_seq_len, stat.st_size,
+                                 stat.st_mtime_ns),
+            max_size=cache_size,
+            spill_path=cache_path)
 
     def _construct_input_spec(self):
         """
@@ -115,39 +140,48 @@ class TextSimilarityTask(Task):
         lazy_load = self.kwargs[
             'lazy_load'] if 'lazy_load' in self.kwargs else False
 
-        examples = []
-
+        # Normalized texts of each pair, the cached embeddings and the first
+        # raw text of the normalized texts to encode
+        pairs = []
+        embeddings = {}
+        texts = {}
         for data in inputs:
-            text1, text2 = data[0], data[1]
-
-            text1_encoded_inputs = self._tokenizer(
-                text=text1, max_seq_len=self._max_seq_len)
-            text1_input_ids = text1_encoded_inputs["input_ids"]
-            text1_token_type_ids = text1_encoded_inputs["token_type_ids"]
+            pair = [EmbeddingCache.normalize_text(text) for text in data]
+            for key, text in zip(pair, data):
+                if key in embeddings or key in texts:
+                    continue
+                embedding = self._embedding_cache.get(key)
+                if embedding is None:
+                    texts[key] = text
+                else:
+                    embeddings[key] = embedding
+            pairs.append(pair)
 
-            text2_encoded_inputs = self._tokenizer(
-                text=text2, max_seq_len=self._max_seq_len)
-            text2_input_ids = text2_encoded_inputs["input_ids"]
-            text2_token_type_ids = text2_encoded_inputs["token_type_ids"]
-
-            examples.append((text1_input_ids, text1_token_type_ids,
-                             text2_input_ids, text2_token_type_ids))
-
-        batches = [
-            examples[idx:idx + self._batch_size]
-            for idx in range(0, len(examples), self._batch_size)
-        ]
+        examples = []
+        for text in texts.values():
+            encoded_inputs = self._tokenizer(
+                text=text, max_seq_len=self._max_seq_len)
+            examples.append((encoded_inputs["input_ids"],
+                             encoded_inputs["token_type_ids"]))
+
+        # Texts of both sides are packed into one batch, thus a batch has as
+        # many texts as `batch_size` pairs
+        batches, order = self._batchify_by_length(
+            examples, 2 * self._batch_size,
+            [len(example[0]) for example in examples])
 
         batchify_fn = lambda samples, fn=Tuple(
-            Pad(axis=0, pad_val=self._tokenizer.pad_token_id, dtype='int64'),  # text1_input_ids
-            Pad(axis=0, pad_val=self._tokenizer.pad_token_type_id, dtype='int64'),  # text1_token_type_ids
-            Pad(axis=0, pad_val=self._tokenizer.pad_token_id, dtype='int64'),  # text2_input_ids
-            Pad(axis=0, pad_val=self._tokenizer.pad_token_type_id, dtype='int64'),  # text2_token_type_ids
+            Pad(axis=0, pad_val=self._tokenizer.pad_token_id, dtype='int64'),  # input_ids
+            Pad(axis=0, pad_val=self._tokenizer.pad_token_type_id, dtype='int64'),  # token_type_ids
         ): [data for data in fn(samples)]
 
         outputs = {}
         outputs['data_loader'] = batches
+        outputs['order'] = order
         outputs['text'] = inputs
+        outputs['pairs'] = pairs
+        outputs['embeddings'] = embeddings
+        outputs['encode_texts'] = list(texts.keys())
         self._batchify_fn = batchify_fn
         return outputs
 
@@ -155,27 +189,26 @@ class TextSimilarityTask(Task):
         """
         Run the task model from the outputs of the `_tokenize` function.
         """
-        results = []
+        vecs = []
         with static_mode_guard():
             for batch in inputs['data_loader']:
-                text1_ids, text1_segment_ids, text2_ids, text2_segment_ids = self._batchify_fn(
-                    batch)
-                self.input_handles[0].copy_from_cpu(text1_ids)
-                self.input_handles[1].copy_from_cpu(text1_segment_ids)
-                self.predictor.run()
-                vecs_text1 = self.output_handle[1].copy_to_cpu()
-
-                self.input_handles[0].copy_from_cpu(text2_ids)
-                self.input_handles[1].copy_from_cpu(text2_segment_ids)
+                input_ids, segment_ids = self._batchify_fn(batch)
+                self.input_handles[0].copy_from_cpu(input_ids)
+                self.input_handles[1].copy_from_cpu(segment_ids)
                 self.predictor.run()
-                vecs_text2 = self.output_handle[1].copy_to_cpu()
-
-                vecs_text1 = vecs_text1 / (vecs_text1**2).sum(
+                batch_vecs = self.output_handle[1].copy_to_cpu()
+                batch_vecs = batch_vecs / (batch_vecs**2).sum(
                     axis=1, keepdims=True)**0.5
-                vecs_text2 = vecs_text2 / (vecs_text2**2).sum(
-                    axis=1, keepdims=True)**0.5
-                similarity = (vecs_text1 * vecs_text2).sum(axis=1)
-                results.extend(similarity)
+                vecs.extend(batch_vecs)
+        vecs = self._restore_order(vecs, inputs['order'])
+
+        embeddings = inputs['embeddings']
+        for text, vec in zip(inputs['encode_texts'], vecs):
+            self._embedding_cache.put(text, vec)
+            embeddings[text] = vec
+        results = []
+        for text1, text2 in inputs['pairs']:
+            results.append((embeddings[text1] * embeddings[text2]).sum())
         inputs['result'] = results
         return inputs
 
@@ -17,13 +17,19 @@ import os
 import re
 import csv
 import json
+import pickle
+import shutil
+import hashlib
 import warnings
 import contextlib
+from array import array
+from bisect import bisect_left
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import paddle
 from paddle.dataset.common import md5file
+from ..datasets.mmap_storage import ColumnStore
 from ..utils.log import logger
 from ..utils.downloader import get_path_from_url, DownloaderCheck
 
@@ -271,6 +277,11 @@ class TermTree(object):
             sid="root", term="root", base="cb", node_type="root", level=0)
         self._nodes["root"] = self.root
         self._index = {}
+        # Bit of each node in the ancestor masks, assigned when the node is
+        # found to be a parent
+        self._ancestor_bits = {}
+        # Bit mask of all ancestors of each node, computed on demand
+        self._ancestor_masks = {}
 
     def __build_sons(self):
         for node in self._nodes:
@@ -345,6 +356,7 @@ class TermTree(object):
                 node_type="term")
         self.__judge_term_node(new_node)
         self._nodes[new_node.sid] = new_node
+        self._ancestor_masks = {}
         self.__build_index(new_node)
 
     def add_type(self, type_name, hyper_type):
@@ -364,6 +376,7 @@ class TermTree(object):
             hyper=hyper_type,
             node_type="type",
             level=self._nodes[hyper_type].level + 1)
+        self._ancestor_masks = {}
         self.__build_index(self._nodes[type_name])
 
     def __load_file(self, file_path: str):
@@ -401,25 +414,53 @@ class TermTree(object):
                 self._index[alia] = []
             self._index[alia].append(node.sid)
 
+    def __ancestor_mask(self, node_id: str) -> int:
+        """Get the bit mask of all ancestors of a node, which are reachable by
+        the hyper type, term type or sub types of the node recursively.
+        """
+        mask = self._ancestor_masks.get(node_id)
+        if mask is not None:
+            return mask
+        # Guard against cycles
+        self._ancestor_masks[node_id] = 0
+        cur_node = self._nodes[node_id]
+        edge = []
+        if cur_node.hyper is not None:
+            edge.append(cur_node.hyper)
+        if cur_node.termtype is not None:
+            edge.append(cur_node.termtype)
+        edge.extend(cur_node.subtype)
+        mask = 0
+        for next_id in edge:
+            bit = self._ancestor_bits.setdefault(next_id,
+                                                 len(self._ancestor_bits))
+            mask |= (1 << bit) | self.__ancestor_mask(next_id)
+        self._ancestor_masks[node_id] = mask
+        return mask
+
     def __judge_hyper(self, source_id, target_id) -> bool:
-        queue = [source_id]
-        visited_node = {source_id}
-        while len(queue) > 0:
-            cur_id = queue.pop(0)
-            if cur_id == target_id:
-                return True
-            cur_node = self._nodes[cur_id]
-            edge = []
-            if cur_node.hyper is not None:
-                edge.append(cur_node.hyper)
-            if cur_node.termtype is not None:
-                edge.append(cur_node.termtype)
-            edge.extend(cur_node.subtype)
-            for next_id in edge:
-                if next_id not in visited_node:
-                    queue.append(next_id)
-                    visited_node.add(next_id)
-        return False
+        if source_id == target_id:
+            return True
+        mask = self.__ancestor_mask(source_id)
+        # All ancestors of source have been assigned bits
+        bit = self._ancestor_bits.get(target_id)
+        return bit is not None and (mask >> bit) & 1 == 1
+
+    def ancestors(self, node_id: str) -> List[str]:
+        """Get all the ancestors of a node, which are reachable by the hyper
+        type, term type or sub types of the node recursively.
+
+        Args:
+            node_id (str): id of the node.
+
+        Returns:
+            List[str]: ids of the ancestors.
+        """
+        mask = self.__ancestor_mask(node_id)
+        return [
+            ancestor_id for ancestor_id, bit in self._ancestor_bits.items()
+            if (mask >> bit) & 1
+        ]
 
     def find_term(self, term: str, term_type: Optional[str]=None) -> Tuple[
             bool, Union[List[str], None]]:
@@ -517,6 +558,204 @@ class TermTree(object):
                 if node.node_type == "term":
                     print(node, file=fp)
 
+    def save_snapshot(self, path: str, meta: Optional[Dict[str, Any]]=None):
+        """Save term tree as a binary snapshot to directory `path`, which is
+        loaded by `TermTreeSnapshot` with memory mapping.
+
+        Args:
+            path (str): Directory of the snapshot, which is replaced if exists.
+            meta (Optional[Dict[str, Any]], optional): JSON serializable data
+                saved with the snapshot, such as the version of source files.
+                Defaults to None.
+        """
+        sids = sorted(self._nodes)
+        rows = {sid: i for i, sid in enumerate(sids)}
+
+        def generate_nodes():
+            for sid in sids:
+                node = self._nodes[sid]
+                yield {
+                    "term": node.term,
+                    "base": node.base,
+                    "node_type": node.node_type,
+                    "term_type": node.termtype,
+                    "hyper": node.hyper,
+                    "level": node.level,
+                    "alias": node.alias,
+                    "alias_ext": node.alias_ext,
+                    "sub_type": node.subtype,
+                    "sub_term": node.subterm,
+                    "data": json.dumps(
+                        node._data, ensure_ascii=False)
+                    if node._data is not None else None,
+                    "sons": sorted(node.sons),
+                }
+
+        tmp_path = "{}.tmp-{}".format(path, os.getpid())
+        os.makedirs(tmp_path)
+        try:
+            ColumnStore.write(os.path.join(tmp_path, "sids"), sids)
+            ColumnStore.write(
+                os.path.join(tmp_path, "nodes"), generate_nodes())
+            ColumnStore.write(
+                os.path.join(tmp_path, "ancestors"),
+                ({
+                    "rows": sorted(rows[ancestor_id]
+                                   for ancestor_id in self.ancestors(sid))
+                } for sid in sids))
+            keys = sorted(self._index)
+            ColumnStore.write(os.path.join(tmp_path, "keys"), keys)
+            ColumnStore.write(
+                os.path.join(tmp_path, "postings"),
+                ({
+                    "rows": [rows[sid] for sid in self._index[key]]
+                } for key in keys))
+            with open(os.path.join(tmp_path, "meta.json"), "w") as fp:
+                json.dump({"meta": meta}, fp)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+
+class TermTreeSnapshot(object):
+    """Read-only TermTree loaded from a snapshot saved by `TermTree.save_snapshot`.
+
+    Node ids, nodes, ancestors of nodes and the term index are saved as columnar
+    stores and read by memory mapping, thus loading takes constant time. Ids and
+    terms are sorted and looked up by binary search, and nodes are only decoded
+    when accessed.
+
+    Args:
+        path (str): Directory of the snapshot.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as fp:
+            self.meta = json.load(fp)["meta"]
+        self._sids = ColumnStore(os.path.join(path, "sids"))
+        self._node_rows = ColumnStore(os.path.join(path, "nodes"))
+        self._ancestor_rows = ColumnStore(os.path.join(path, "ancestors"))
+        self._keys = ColumnStore(os.path.join(path, "keys"))
+        self._postings = ColumnStore(os.path.join(path, "postings"))
+        # Decoded nodes, rows of node ids and ancestors accessed before
+        self._nodes: Dict[str, TermTreeNode] = {}
+        self._rows: Dict[str, int] = {}
+        self._ancestors: Dict[int, set] = {}
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    @staticmethod
+    def _find(store: ColumnStore, key: str) -> int:
+        lo, hi = 0, len(store)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if store.get(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(store) and store.get(lo) == key:
+            return lo
+        return -1
+
+    def _find_node(self, node_id: str) -> int:
+        row = self._rows.get(node_id)
+        if row is None:
+            row = self._rows[node_id] = self._find(self._sids, node_id)
+        return row
+
+    def _ancestor_set(self, row: int) -> set:
+        ancestors = self._ancestors.get(row)
+        if ancestors is None:
+            ancestors = self._ancestors[row] = set(
+                self._ancestor_rows.get(row)["rows"])
+        return ancestors
+
+    def __getitem__(self, item):
+        node = self._nodes.get(item)
+        if node is None:
+            row = self._find_node(item)
+            if row < 0:
+                raise KeyError(item)
+            data = self._node_rows.get(row)
+            node = TermTreeNode(
+                sid=item,
+                term=data["term"],
+                base=data["base"],
+                node_type=data["node_type"],
+                term_type=data["term_type"],
+                hyper=data["hyper"],
+                level=data["level"],
+                alias=data["alias"],
+                alias_ext=data["alias_ext"],
+                sub_type=data["sub_type"],
+                sub_term=data["sub_term"],
+                data=json.loads(data["data"])
+                if data["data"] is not None else None)
+            for son in data["sons"]:
+                node.add_son(son)
+            self._nodes[item] = node
+        return node
+
+    def __contains__(self, item):
+        return self._find_node(item) >= 0
+
+    def __iter__(self):
+        for row in range(len(self._sids)):
+            yield self._sids.get(row)
+
+    def __len__(self):
+        return len(self._sids)
+
+    @property
+    def root(self):
+        return self["root"]
+
+    def ancestors(self, node_id: str) -> List[str]:
+        """Get all the ancestors of a node, which are reachable by the hyper
+        type, term type or sub types of the node recursively.
+
+        Args:
+            node_id (str): id of the node.
+
+        Returns:
+            List[str]: ids of the ancestors.
+        """
+        row = self._find_node(node_id)
+        if row < 0:
+            raise KeyError(node_id)
+        return [self._sids.get(i) for i in sorted(self._ancestor_set(row))]
+
+    def find_term(self, term: str, term_type: Optional[str]=None) -> Tuple[
+            bool, Union[List[str], None]]:
+        """Find a term in Term Tree. If term not exists, return None.
+        If `term_type` is not None, will find term with this type.
+
+        Args:
+            term (str): term to look up.
+            term_type (Optional[str], optional): find term in this term_type. Defaults to None.
+
+        Returns:
+            Union[None, List[str]]: [description]
+        """
+        key = self._find(self._keys, term)
+        if key < 0:
+            return False, None
+        rows = self._postings.get(key)["rows"]
+        if term_type is not None:
+            target = self._find_node(term_type)
+            rows = [
+                row for row in rows
+                if row == target or target in self._ancestor_set(row)
+            ]
+            if len(rows) == 0:
+                return False, None
+        return True, [self._sids.get(row) for row in rows]
+
 
 def levenstein_distance(s1: str, s2: str) -> int:
     """Calculate minimal Levenstein distance between s1 and s2.
@@ -635,6 +874,156 @@ class BurkhardKellerTree(object):
         return res
 
 
+def _myers_distance(peq: Dict[str, int], m: int, s: str) -> int:
+    """Calculate Levenstein distance with the bit-parallel algorithm of Myers.
+
+    Args:
+        peq (Dict[str, int]): the bit mask of the positions of each char in
+            the pattern, bit `i` is set if the `i`-th char is the key.
+        m (int): length of the pattern.
+        s (str): string compared with the pattern.
+
+    Returns:
+        int: the minimal distance.
+    """
+    if m == 0:
+        return len(s)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    vp, vn, dist = full, 0, m
+    for c in s:
+        eq = peq.get(c, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = (vn | ~(xh | vp)) & full
+        hn = vp & xh
+        if hp & last:
+            dist += 1
+        elif hn & last:
+            dist -= 1
+        hp = (hp << 1) | 1
+        hn = (hn << 1) & full
+        vp = (hn | ~(xv | hp)) & full
+        vn = hp & xv & full
+    return dist
+
+
+class SymSpellIndex(object):
+    """Approximate string index based on symmetric deletion, a faster alternative
+    of BK-Tree for dictionaries of short words.
+
+    Every string obtained by deleting at most `max_distance` chars of a word is
+    mapped to the word. Two strings within Levenstein distance `max_distance`
+    share such a deletion, so the candidates of a query are found by looking up
+    its own deletions, and verified by the bit-parallel Levenstein distance.
+
+    Args:
+        max_distance (int, optional): the maximal Levenstein distance of similar
+            words. Defaults to 2.
+        memo_size (int, optional): the number of latest searched words whose
+            results are memoized. Defaults to 10000.
+    """
+
+    def __init__(self, max_distance: int=2, memo_size: int=10000):
+        self.max_distance = max_distance
+        self.memo_size = memo_size
+        self.words = []
+        self.deletes = {}
+        self._word_ids = {}
+        self._memo = {}
+
+    def _generate_deletes(self, word: str) -> set:
+        deletes = {word}
+        edits = [word]
+        for _ in range(self.max_distance):
+            next_edits = []
+            for edit in edits:
+                for i in range(len(edit)):
+                    delete = edit[:i] + edit[i + 1:]
+                    if delete not in deletes:
+                        deletes.add(delete)
+                        next_edits.append(delete)
+            edits = next_edits
+        return deletes
+
+    def add(self, word: str):
+        """Insert a word into the index.
+
+        Args:
+            word (str): word to be inserted.
+        """
+        if word in self._word_ids:
+            return
+        word_id = self._word_ids[word] = len(self.words)
+        self.words.append(word)
+        for delete in self._generate_deletes(word):
+            self.deletes.setdefault(delete, []).append(word_id)
+        self._memo.clear()
+
+    def search_similar_word(self, word: str) -> List[Tuple[str, int]]:
+        """Search the similar words within `max_distance` of `word`, sorted by
+        levenstain distance and then the length of common prefix.
+
+        Args:
+            word (str): target word
+
+        Returns:
+            List[Tuple[str, int]]: similar words and their distances.
+        """
+        if word in self._memo:
+            return self._memo[word]
+        candidates = set()
+        for delete in self._generate_deletes(word):
+            candidates.update(self.deletes.get(delete, ()))
+
+        peq = {}
+        for i, c in enumerate(word):
+            peq[c] = peq.get(c, 0) | (1 << i)
+        res = []
+        for word_id in sorted(candidates):
+            candidate = self.words[word_id]
+            if abs(len(candidate) - len(word)) > self.max_distance:
+                continue
+            dist = _myers_distance(peq, len(word), candidate)
+            if dist <= self.max_distance:
+                res.append((candidate, dist))
+
+        def max_prefix(s1: str, s2: str) -> int:
+            res = 0
+            length = min(len(s1), len(s2))
+            for i in range(length):
+                if s1[i] == s2[i]:
+                    res += 1
+                else:
+                    break
+            return res
+
+        res.sort(key=lambda d: (d[1], -max_prefix(d[0], word)))
+        if len(self._memo) >= self.memo_size:
+            # Drop the earliest searched word
+            del self._memo[next(iter(self._memo))]
+        self._memo[word] = res
+        return res
+
+    def search_similar_words(self,
+                             words: List[str]) -> List[List[Tuple[str, int]]]:
+        """Search the similar words for a batch of words. Repeated words are
+        only searched once.
+
+        Args:
+            words (List[str]): target words
+
+        Returns:
+            List[List[Tuple[str, int]]]: similar words of each target word.
+        """
+        return [self.search_similar_word(word) for word in words]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_memo'] = {}
+        return state
+
+
 class TriedTree(object):
     """Implementataion of TriedTree
     """
@@ -670,6 +1059,140 @@ class TriedTree(object):
         return result
 
 
+class AhoCorasick(object):
+    """
+    Implementation of Aho-Corasick automaton, which finds all the words of a
+    dictionary in a text with a single pass.
+
+    States are numbered in breadth-first order, so the goto table is stored
+    as flat arrays: the transitions of state `s` are
+    `chars[offsets[s]:offsets[s + 1]]`, sorted by code point, with the next
+    states in `targets` at the same positions. `fail` holds the failure link
+    of each state, `outputs` the nearest state on the failure chain which
+    ends a word, and `lengths` the length of the word ending at each state
+    (0 if none). The arrays are pickled as raw buffers.
+    """
+
+    def __init__(self):
+        self._words = set()
+        self.offsets = array('I', [0, 0])
+        self.chars = array('I')
+        self.targets = array('I')
+        self.fail = array('I', [0])
+        self.outputs = array('I', [0])
+        self.lengths = array('I', [0])
+
+    def add_word(self, word):
+        """Add a single word, which takes effect after `build`."""
+        if word:
+            self._words.add(word)
+
+    def build(self):
+        """Build the goto, fail and output tables of all added words."""
+        # Temporary trie on dicts, which is dropped after building. Leaves
+        # have no dict of children.
+        children = [None]
+        lengths = [0]
+        for word in self._words:
+            state = 0
+            for char in word:
+                kids = children[state]
+                if kids is None:
+                    kids = children[state] = {}
+                next_state = kids.get(char)
+                if next_state is None:
+                    next_state = kids[char] = len(children)
+                    children.append(None)
+                    lengths.append(0)
+                state = next_state
+            lengths[state] = len(word)
+
+        # Visit states in breadth-first order, which is the new numbering of
+        # states, and parents are visited before children
+        order = [0]
+        new_ids = [0] * len(children)
+        fail = [0] * len(children)
+        offsets = array('I', [0])
+        chars = array('I')
+        targets = array('I')
+        for state in order:
+            kids = children[state]
+            if kids is None:
+                offsets.append(len(chars))
+                continue
+            for char, child in sorted(kids.items()):
+                new_ids[child] = len(order)
+                order.append(child)
+                chars.append(ord(char))
+                targets.append(new_ids[child])
+                # Children of the root fail to the root
+                link = fail[state]
+                while state != 0:
+                    next_state = children[link].get(
+                        char) if children[link] else None
+                    if next_state is not None:
+                        fail[child] = next_state
+                        break
+                    elif link == 0:
+                        break
+                    link = fail[link]
+            offsets.append(len(chars))
+
+        self.offsets = offsets
+        self.chars = chars
+        self.targets = targets
+        self.fail = array('I', (new_ids[fail[state]] for state in order))
+        self.lengths = array('I', (lengths[state] for state in order))
+        self.outputs = array('I', [0])
+        for state in range(1, len(order)):
+            link = self.fail[state]
+            self.outputs.append(link if self.lengths[link] else self.outputs[
+                link])
+
+    def search(self, content):
+        """Forward maximum matching
+
+        Args:
+            content (str): string to be searched
+        Returns:
+            List[Tuple]: list of maximum matching words, each element represents
+                the starting and ending position of the matching string. A word
+                is kept if it ends after all the words starting before it.
+        """
+        offsets, chars, targets = self.offsets, self.chars, self.targets
+        fail, outputs, lengths = self.fail, self.outputs, self.lengths
+        matches = []
+        state = 0
+        for end, char in enumerate(content, 1):
+            code = ord(char)
+            while True:
+                lo, hi = offsets[state], offsets[state + 1]
+                pos = bisect_left(chars, code, lo, hi)
+                if pos < hi and chars[pos] == code:
+                    state = targets[pos]
+                    break
+                elif state == 0:
+                    break
+                state = fail[state]
+            match = state if lengths[state] else outputs[state]
+            while match:
+                matches.append((end - lengths[match], end))
+                match = outputs[match]
+
+        matches.sort()
+        result = []
+        for start, end in matches:
+            if len(result) == 0 or end > result[-1][1]:
+                result.append((start, end))
+        return result
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Words are not needed any more after building
+        state['_words'] = set()
+        return state
+
+
 class Customization(object):
     """
     User intervention based on Aho-Corasick automaton
@@ -679,9 +1202,38 @@ class Customization(object):
         self.dictitem = {}
         self.ac = None
 
-    def load_customization(self, filename, sep=None):
-        """Load the custom vocab"""
-        self.ac = TriedTree()
+    def load_customization(self, filename, sep=None, cache_dir=None):
+        """Load the custom vocab
+
+        Args:
+            filename (str): The path of the custom vocab.
+            sep (str, optional): The separator of words in a line. Defaults to
+                None, which splits by whitespace.
+            cache_dir (str, optional): The directory to save the built
+                automaton, which is reloaded next time if the vocab is not
+                modified. Defaults to None, which disables the cache.
+        """
+        cache_file = None
+        if cache_dir is not None:
+            stat = os.stat(filename)
+            key = "{}:{}".format(os.path.abspath(filename), sep)
+            cache_file = os.path.join(
+                cache_dir, "customization_{}.pkl".format(
+                    hashlib.md5(key.encode('utf-8')).hexdigest()))
+            version = (stat.st_size, stat.st_mtime_ns)
+            if os.path.exists(cache_file):
+                try:
+                    with open(cache_file, 'rb') as f:
+                        cache = pickle.load(f)
+                    if cache['version'] == version:
+                        self.dictitem = cache['dictitem']
+                        self.ac = cache['ac']
+                        return
+                except Exception as e:
+                    logger.warning("Failed to load the customization cache "
+                                   "{}: {}".format(cache_file, e))
+
+        self.ac = AhoCorasick()
         with open(filename, 'r', encoding='utf8') as f:
             for line in f:
                 if sep == None:
@@ -710,11 +1262,30 @@ class Customization(object):
 
                 self.dictitem[phrase] = (tags, offset)
                 self.ac.add_word(phrase)
+        self.ac.build()
+
+        if cache_file is not None:
+            tmp_file = "{}.tmp-{}".format(cache_file, os.getpid())
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(tmp_file, 'wb') as f:
+                    pickle.dump(
+                        {
+                            'version': version,
+                            'dictitem': self.dictitem,
+                            'ac': self.ac
+                        },
+                        f,
+                        protocol=4)
+                os.replace(tmp_file, cache_file)
+            except OSError as e:
+                logger.warning("Failed to save the customization cache "
+                               "{}: {}".format(cache_file, e))
 
     def parse_customization(self, query, lac_tags, prefix=False):
         """Use custom vocab to modify the lac results"""
         if not self.ac:
-            logging.warning("customization dict is not load")
+            logger.warning("customization dict is not load")
             return
         ac_res = self.ac.search(query)
 
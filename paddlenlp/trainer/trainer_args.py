@@ -88,6 +88,10 @@ class TrainingArguments:
             When performing evaluation and generating predictions, only returns the loss.
         per_device_train_batch_size (`int`, *optional*, defaults to 8):
             The batch size per GPU core/CPU for training.
+        per_device_train_max_tokens (`int`, *optional*):
+            If set, the training samples are grouped by lengths and packed into batches of at most this number of
+            tokens per GPU core/CPU, instead of batches of `per_device_train_batch_size` samples. The length of a
+            sample is the length of its `input_ids`.
         per_device_eval_batch_size (`int`, *optional*, defaults to 8):
             The batch size per GPU core/CPU for evaluation.
         gradient_accumulation_steps (`int`, *optional*, defaults to 1):
@@ -104,6 +108,11 @@ class TrainingArguments:
             Number of predictions steps to accumulate the output tensors for, before moving the results to the CPU. If
             left unset, the whole predictions are accumulated on GPU before being moved to the CPU (faster but
             requires more memory).
+        batch_eval_metrics (`bool`, *optional*, defaults to `False`):
+            If set to `True`, evaluation calls `compute_metrics` at each batch with the argument `compute_result`,
+            which is `True` for the last batch and `False` otherwise. `compute_metrics` should update its statistics
+            with each batch and return the metrics when `compute_result` is `True`, thus the predictions of the whole
+            dataset are never accumulated.
         learning_rate (`float`, *optional*, defaults to 5e-5):
             The initial learning rate for [`AdamW`] optimizer.
         weight_decay (`float`, *optional*, defaults to 0):
@@ -324,6 +333,12 @@ class TrainingArguments:
     per_device_train_batch_size: int = field(
         default=8,
         metadata={"help": "Batch size per GPU core/CPU for training."})
+    per_device_train_max_tokens: Optional[int] = field(
+        default=None,
+        metadata={
+            "help":
+            "If set, training batches are packed by lengths with at most this number of tokens per GPU core/CPU."
+        })
     per_device_eval_batch_size: int = field(
         default=8,
         metadata={"help": "Batch size per GPU core/CPU for evaluation."})
@@ -340,6 +355,12 @@ class TrainingArguments:
             "help":
             "Number of predictions steps to accumulate before moving the tensors to the CPU."
         }, )
+    batch_eval_metrics: bool = field(
+        default=False,
+        metadata={
+            "help":
+            "Whether to compute metrics incrementally at each evaluation batch instead of on the whole predictions."
+        }, )
 
     learning_rate: float = field(
         default=5e-5,
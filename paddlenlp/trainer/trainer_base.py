@@ -39,9 +39,12 @@ from paddle.io import (
     Dataset,
     DataLoader,
     DistributedBatchSampler, )
+from paddlenlp.data import default_data_collator
 from paddlenlp.transformers import LinearDecayWithWarmup
 from paddlenlp.transformers.model_utils import PretrainedModel, unwrap_model
 from paddlenlp.transformers.tokenizer_utils import PretrainedTokenizer
+from paddlenlp.utils.batch_sampler import DistributedBatchSampler as NlpDistributedBatchSampler
+from paddlenlp.utils.batch_sampler import DistributedTokenBatchSampler as NlpDistributedTokenBatchSampler
 from paddlenlp.utils.log import logger
 
 from .trainer_args import (TrainingArguments, )
@@ -67,6 +70,7 @@ from .trainer_callback import (
 from .utils.helper import (
     distributed_concat,
     nested_concat,
+    nested_concat_all,
     nested_detach,
     nested_numpify,
     nested_truncate, )
@@ -148,7 +152,8 @@ class Trainer:
             interrupted training or reuse the fine-tuned model.
         compute_metrics (`Callable[[EvalPrediction], Dict]`, *optional*):
             The function that will be used to compute metrics at evaluation. Must take a [`EvalPrediction`] and return
-            a dictionary string to metric values.
+            a dictionary string to metric values. If `args.batch_eval_metrics` is `True`, it is called at each batch
+            with an additional argument `compute_result`, and should return the metrics when it is `True`.
         optimizers (`Tuple[paddle.optimizer.Optimizer, paddle.optimizer.lr.LRScheduler]`, *optional*): A tuple
             containing the optimizer and the scheduler to use. Will default to an instance of [`AdamW`] on your model
             and a scheduler given by [`get_linear_schedule_with_warmup`] controlled by `args`.
@@ -327,6 +332,10 @@ class Trainer:
         model = self._wrap_model(self.model_wrapped)
 
         self.state = TrainerState()
+        if resume_from_checkpoint is not None and os.path.isfile(
+                os.path.join(resume_from_checkpoint, TRAINER_STATE_NAME)):
+            self.state = TrainerState.load_from_json(
+                os.path.join(resume_from_checkpoint, TRAINER_STATE_NAME))
 
         total_train_batch_size = args.train_batch_size * args.gradient_accumulation_steps * args.world_size
 
@@ -384,11 +393,37 @@ class Trainer:
         start_time = time.time()
         epochs_trained = 0
         steps_trained_in_current_epoch = 0
-        steps_trained_progress_bar = None
 
         epoch_iterator = train_dataloader
         steps_in_epoch = len(epoch_iterator)
 
+        # Check if continuing training from a checkpoint
+        if resume_from_checkpoint is not None and self.state.global_step > 0:
+            epochs_trained = self.state.global_step // num_update_steps_per_epoch
+            if not args.ignore_data_skip:
+                steps_trained_in_current_epoch = self.state.global_step % (
+                    num_update_steps_per_epoch)
+                steps_trained_in_current_epoch *= args.gradient_accumulation_steps
+
+            logger.info(
+                "  Continuing training from checkpoint, will skip to saved global_step"
+            )
+            logger.info(f"  Continuing training from epoch {epochs_trained}")
+            logger.info(
+                f"  Continuing training from global step {self.state.global_step}"
+            )
+            if not args.ignore_data_skip:
+                logger.info(
+                    f"  Will skip the first {epochs_trained} epochs then the first {steps_trained_in_current_epoch} "
+                    "batches in the first epoch.")
+            self._load_rng_state(resume_from_checkpoint)
+
+        # The sampler starts an epoch from the consumed samples instead of
+        # loading and skipping the consumed batches.
+        can_fast_forward = isinstance(
+            train_dataloader.batch_sampler,
+            (NlpDistributedBatchSampler, NlpDistributedTokenBatchSampler))
+
         self.callback_handler.model = self.model
         self.callback_handler.optimizer = self.optimizer
         self.callback_handler.lr_scheduler = self.lr_scheduler
@@ -403,11 +438,26 @@ class Trainer:
 
         for epoch in range(epochs_trained, num_train_epochs):
             step = -1
+            steps_to_skip = 0
+            start_step = 0
+            if can_fast_forward:
+                batch_sampler = train_dataloader.batch_sampler
+                batch_sampler.set_epoch(epoch)
+                batch_sampler.consumed_samples = batch_sampler.get_consumed_samples(
+                    steps_trained_in_current_epoch)
+                start_step = steps_trained_in_current_epoch
+            else:
+                steps_to_skip = steps_trained_in_current_epoch
+            steps_trained_in_current_epoch = 0
 
             self.control = self.callback_handler.on_epoch_begin(
                 args, self.state, self.control)
 
-            for step, inputs in enumerate(epoch_iterator):
+            for step, inputs in enumerate(epoch_iterator, start=start_step):
+                # Skip the consumed batches if the sampler cannot start from them
+                if steps_to_skip > 0:
+                    steps_to_skip -= 1
+                    continue
 
                 if step % args.gradient_accumulation_steps == 0:
                     self.control = self.callback_handler.on_step_begin(
@@ -530,20 +580,25 @@ class Trainer:
         if not isinstance(self.train_dataset, collections.abc.Sized):
             return None
 
-        if self.args.world_size <= 1:
-            return paddle.io.BatchSampler(
-                dataset=self.train_dataset,
-                shuffle=True,
-                batch_size=self.args.per_device_train_batch_size,
-                drop_last=self.args.dataloader_drop_last)
-        else:
-            return DistributedBatchSampler(
+        # The sampler is able to start from consumed samples when resuming
+        if self.args.per_device_train_max_tokens is not None:
+            return NlpDistributedTokenBatchSampler(
                 self.train_dataset,
-                batch_size=self.args.per_device_train_batch_size,
+                max_tokens=self.args.per_device_train_max_tokens,
                 shuffle=True,
                 num_replicas=self.args.world_size,
                 rank=self.args.process_index,
-                drop_last=self.args.dataloader_drop_last)
+                drop_last=self.args.dataloader_drop_last,
+                seed=self.args.seed)
+
+        return NlpDistributedBatchSampler(
+            self.train_dataset,
+            batch_size=self.args.per_device_train_batch_size,
+            shuffle=True,
+            num_replicas=self.args.world_size,
+            rank=self.args.process_index,
+            drop_last=self.args.dataloader_drop_last,
+            seed=self.args.seed)
 
     def _set_state_dict_in_model(self, state_dict):
         load_result = self.model.set_state_dict(state_dict)
@@ -587,7 +642,8 @@ class Trainer:
         Returns the training [`~paddle.io.DataLoader`].
 
         Will use no sampler if `self.train_dataset` does not implement `__len__`, a random sampler (adapted to
-        distributed training if necessary) otherwise.
+        distributed training if necessary) otherwise. If `per_device_train_max_tokens` is set, the batches are packed
+        by the number of tokens instead.
 
         Subclass and override this method if you want to inject some custom behavior.
         """
@@ -986,9 +1042,10 @@ class Trainer:
         rng_states = {
             "python": random.getstate(),
             "numpy": np.random.get_state(),
+            "cpu": paddle.framework.core.default_cpu_generator().get_state(),
         }
-
-        # TODO: ZHUI save paddle, cudnn seed.
+        if paddle.device.is_compiled_with_cuda():
+            rng_states["cuda"] = paddle.get_cuda_rng_state()
 
         # A process can arrive here before the process 0 has a chance to save the model, in which case output_dir may
         # not yet exist.
@@ -1005,6 +1062,44 @@ class Trainer:
         if self.args.should_save:
             self._rotate_checkpoints(use_mtime=True, output_dir=run_dir)
 
+    def _load_rng_state(self, checkpoint):
+        # Load RNG states from `checkpoint`
+        if checkpoint is None:
+            return
+
+        local_rank = self.args.local_rank
+        if local_rank != -1:
+            rng_file = os.path.join(checkpoint, f"rng_state_{local_rank}.pth")
+            if not os.path.isfile(rng_file):
+                logger.info(
+                    f"Didn't find an RNG file for process {local_rank}, if you are resuming a training that "
+                    "wasn't launched in a distributed fashion, reproducibility is not guaranteed."
+                )
+                return
+        else:
+            rng_file = os.path.join(checkpoint, "rng_state.pth")
+            if not os.path.isfile(rng_file):
+                logger.info(
+                    "Didn't find an RNG file, if you are resuming a training that was launched in a distributed "
+                    "fashion, reproducibility is not guaranteed.")
+                return
+
+        checkpoint_rng_state = paddle.load(rng_file, return_numpy=True)
+        random.setstate(checkpoint_rng_state["python"])
+        np.random.set_state(checkpoint_rng_state["numpy"])
+        if "cpu" in checkpoint_rng_state:
+            paddle.framework.core.default_cpu_generator().set_state(
+                checkpoint_rng_state["cpu"])
+        if "cuda" in checkpoint_rng_state and paddle.device.is_compiled_with_cuda(
+        ):
+            try:
+                paddle.set_cuda_rng_state(checkpoint_rng_state["cuda"])
+            except Exception as e:
+                logger.info(
+                    f"Didn't manage to set back the RNG states of the GPU because of the following error:\n {e}"
+                    "\nThis won't yield the same results as if the training had not been interrupted."
+                )
+
     def _sorted_checkpoints(self,
                             output_dir=None,
                             checkpoint_prefix=PREFIX_CHECKPOINT_DIR,
@@ -1226,21 +1321,23 @@ class Trainer:
             self._past = None
 
         # Initialize containers
-        # losses/preds/labels on GPU (accumulated for eval_accumulation_steps)
-        losses_host = None
-        preds_host = None
-        labels_host = None
-        # losses/preds/labels on CPU (final containers)
-        all_losses = None
-        all_preds = None
-        all_labels = None
-        # Will be useful when we have an iterable dataset so don't know its length.
+        # losses/preds/labels of each step on GPU (accumulated for eval_accumulation_steps)
+        losses_host = []
+        preds_host = []
+        labels_host = []
+        # losses/preds/labels of each step on CPU, which are concatenated at once in the end
+        all_losses = []
+        all_preds = []
+        all_labels = []
+        # Compute metrics incrementally instead of accumulating the predictions
+        batch_eval_metrics = args.batch_eval_metrics and self.compute_metrics is not None
+        metrics = None
+        num_steps = len(dataloader)
 
         observed_num_examples = 0
         # Main evaluation loop
         losses = []
         for step, inputs in enumerate(dataloader):
-            # Update the observed num examples
             # Prediction step
             loss, logits, labels = self.prediction_step(
                 model, inputs, prediction_loss_only, ignore_keys=ignore_keys)
@@ -1251,34 +1348,54 @@ class Trainer:
                 losses = self._nested_gather(
                     paddle.tile(
                         loss, repeat_times=[batch_size, 1]))
-                losses_host = losses if losses_host is None else paddle.concat(
-                    (losses_host, losses), axis=0)
+                losses_host.append(losses)
             if labels is not None:
                 labels = self._pad_across_processes(labels)
                 labels = self._nested_gather(labels)
-                labels_host = labels if labels_host is None else nested_concat(
-                    labels_host, labels, padding_index=-100)
             if logits is not None:
                 logits = self._pad_across_processes(logits)
                 logits = self._nested_gather(logits)
-                preds_host = logits if preds_host is None else nested_concat(
-                    preds_host, logits, padding_index=-100)
+
+            if batch_eval_metrics:
+                if logits is not None and labels is not None:
+                    # Samples padded by the distributed sampler are dropped
+                    num_remaining = num_samples - observed_num_examples
+                    logits = nested_truncate(
+                        nested_numpify(logits), num_remaining)
+                    labels = nested_truncate(
+                        nested_numpify(labels), num_remaining)
+                    observed_num_examples += len(
+                        labels[0] if isinstance(labels, (list, tuple)) else
+                        labels)
+                    metrics = self.compute_metrics(
+                        EvalPrediction(
+                            predictions=logits, label_ids=labels),
+                        compute_result=step == num_steps - 1)
+            else:
+                if labels is not None:
+                    labels_host.append(labels)
+                if logits is not None:
+                    preds_host.append(logits)
             self.control = self.callback_handler.on_prediction_step(
                 args, self.state, self.control)
 
+            # Gather all tensors and put them back on the CPU if we have done enough accumulation steps.
+            if args.eval_accumulation_steps is not None and (
+                    step + 1) % args.eval_accumulation_steps == 0:
+                all_losses.extend(nested_numpify(losses_host))
+                all_preds.extend(nested_numpify(preds_host))
+                all_labels.extend(nested_numpify(labels_host))
+                losses_host, preds_host, labels_host = [], [], []
+
         # Gather all remaining tensors and put them back on the CPU
-        if losses_host is not None:
-            losses = nested_numpify(losses_host)
-            all_losses = losses if all_losses is None else np.concatenate(
-                (all_losses, losses), axis=0)
-        if preds_host is not None:
-            logits = nested_numpify(preds_host)
-            all_preds = logits if all_preds is None else nested_concat(
-                all_preds, logits, padding_index=-100)
-        if labels_host is not None:
-            labels = nested_numpify(labels_host)
-            all_labels = labels if all_labels is None else nested_concat(
-                all_labels, labels, padding_index=-100)
+        all_losses.extend(nested_numpify(losses_host))
+        all_preds.extend(nested_numpify(preds_host))
+        all_labels.extend(nested_numpify(labels_host))
+        all_losses = np.concatenate(all_losses, axis=0) if all_losses else None
+        all_preds = nested_concat_all(
+            all_preds, padding_index=-100) if all_preds else None
+        all_labels = nested_concat_all(
+            all_labels, padding_index=-100) if all_labels else None
 
         # Number of losses has been rounded to a multiple of batch_size and in a distributed training, the number of
         # samplers has been rounded to a multiple of batch_size, so we truncate.
@@ -1292,7 +1409,9 @@ class Trainer:
         model.train()
 
         # Metrics!
-        if self.compute_metrics is not None and all_preds is not None and all_labels is not None:
+        if batch_eval_metrics:
+            metrics = metrics if metrics is not None else {}
+        elif self.compute_metrics is not None and all_preds is not None and all_labels is not None:
             metrics = self.compute_metrics(
                 EvalPrediction(
                     predictions=all_preds, label_ids=all_labels))
@@ -1,3 +1,4 @@
+import numpy as np
 import paddle
 import paddle.distributed as dist
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
@@ -43,6 +44,52 @@ def paddle_pad_and_concatenate(tensor1, tensor2, padding_index=-100):
     return result
 
 
+def numpy_pad_and_concatenate(array1, array2, padding_index=-100):
+    """Concatenates `array1` and `array2` on first axis, applying padding on the second if necessary."""
+    return numpy_pad_and_concatenate_all(
+        [array1, array2], padding_index=padding_index)
+
+
+def numpy_pad_and_concatenate_all(arrays, padding_index=-100):
+    """
+    Concatenates all `arrays` on first axis at once, applying padding on the second if necessary. Each array is copied
+    only once, thus concatenating chunks of predictions takes linear time.
+    """
+    if len(arrays[0].shape) == 1 or all(array.shape[1] == arrays[0].shape[1]
+                                        for array in arrays):
+        return np.concatenate(arrays, axis=0)
+
+    # Let's figure out the new shape
+    new_shape = (sum(array.shape[0] for array in arrays),
+                 max(array.shape[1]
+                     for array in arrays)) + tuple(arrays[0].shape[2:])
+
+    # Now let's fill the result array
+    result = np.full(new_shape, padding_index, dtype=arrays[0].dtype)
+    start = 0
+    for array in arrays:
+        result[start:start + array.shape[0], :array.shape[1]] = array
+        start += array.shape[0]
+    return result
+
+
+def nested_concat_all(chunks, padding_index=-100):
+    """
+    Concat all `chunks` of numpy arrays on the first dim at once and pad them on the second if needed. Works for
+    arrays or nested list/tuples of arrays, where all chunks have the same structure.
+    """
+    if isinstance(chunks[0], (list, tuple)):
+        return type(chunks[0])(nested_concat_all(
+            [chunk[i] for chunk in chunks], padding_index=padding_index)
+                               for i in range(len(chunks[0])))
+    elif isinstance(chunks[0], np.ndarray):
+        return numpy_pad_and_concatenate_all(
+            chunks, padding_index=padding_index)
+    else:
+        raise TypeError(
+            f"Unsupported type for concatenation: got {type(chunks[0])}")
+
+
 def nested_concat(tensors, new_tensors, padding_index=-100):
     """
     Concat the `new_tensors` to `tensors` on the first dim and pad them on the second if needed. Works for tensors or
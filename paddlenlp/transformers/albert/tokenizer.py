@@ -622,7 +622,7 @@ class AlbertEnglishTokenizer(PretrainedTokenizer):
         text = self.preprocess_text(text)
 
         if not sample:
-            pieces = self.sp_model.EncodeAsPieces(text)
+            pieces = self._tokenize_words(text, self.sp_model.EncodeAsPieces)
         else:
             pieces = self.sp_model.SampleEncodeAsPieces(text, 64, 0.1)
         new_pieces = []
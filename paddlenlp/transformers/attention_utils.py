@@ -144,6 +144,59 @@ def _convert_param_attr_to_list(param_attr, n):
     return param_attrs
 
 
+def _update_preallocated_cache(cache, k, v):
+    """
+    Writes keys and values of the new steps into the buffers of a cache
+    allocated with `max_length` positions, in place at its current length.
+    Only the valid prefixes of the buffers are returned to be attended to.
+    The buffers are sliced by the length tensor of the cache, which also works
+    in the programs converted by `paddle.jit.to_static`.
+
+    Args:
+        cache (namedtuple): The cache with fields `k` and `v`, which are buffers
+            with shape `[batch_size, num_heads, max_length, head_dim]`, and
+            `length`, the number of filled positions with shape `[batch_size]`.
+        k (Tensor): The keys of new steps with shape
+            `[batch_size, num_heads, seq_len, head_dim]`.
+        v (Tensor): The values of new steps with the same shape as `k`.
+
+    Returns:
+        tuple: The valid keys and values, and the updated cache.
+    """
+    start = cache.length[0]
+    end = start + paddle.shape(k)[2]
+    k_buffer, v_buffer = cache.k, cache.v
+    k_buffer[:, :, start:end] = k
+    v_buffer[:, :, start:end] = v
+    cache = cache._replace(
+        k=k_buffer, v=v_buffer, length=cache.length + paddle.shape(k)[2])
+    return k_buffer[:, :, :end], v_buffer[:, :, :end], cache
+
+
+def _reorder_preallocated_cache(cache, index):
+    """
+    Reorders the batch of a cache allocated with `max_length` positions by
+    `index`, such as selecting beams in beam search. Only the filled prefixes
+    of the buffers are gathered and written back in place, thus the cost
+    grows with the current length rather than `max_length`.
+
+    Args:
+        cache (namedtuple): The cache with fields `k`, `v` and `length` as in
+            `_update_preallocated_cache`.
+        index (Tensor): The indices of batch items to select with shape
+            `[batch_size]`.
+
+    Returns:
+        namedtuple: The reordered cache.
+    """
+    end = cache.length[0]
+    k_buffer, v_buffer = cache.k, cache.v
+    k_buffer[:, :, :end] = paddle.index_select(k_buffer[:, :, :end], index)
+    v_buffer[:, :, :end] = paddle.index_select(v_buffer[:, :, :end], index)
+    return cache._replace(
+        k=k_buffer, v=v_buffer, length=paddle.index_select(cache.length, index))
+
+
 class Linear3D(Layer):
     def __init__(self,
                  hidden_size,
@@ -618,6 +671,8 @@ class MultiHeadAttention(Layer):
 
     Cache = collections.namedtuple("Cache", ["k", "v"])
     StaticCache = collections.namedtuple("StaticCache", ["k", "v"])
+    PreallocatedCache = collections.namedtuple("PreallocatedCache",
+                                               ["k", "v", "length"])
 
     def __init__(self,
                  embed_dim,
@@ -683,6 +738,9 @@ class MultiHeadAttention(Layer):
             k = paddle.concat([cache.k, k], axis=2)
             v = paddle.concat([cache.v, v], axis=2)
             cache = self.Cache(k, v)
+        elif isinstance(cache, self.PreallocatedCache):
+            # for decoder self-attention in inference, writes in place
+            k, v, cache = _update_preallocated_cache(cache, k, v)
 
         return (q, k, v) if cache is None else (q, k, v, cache)
 
@@ -691,10 +749,21 @@ class MultiHeadAttention(Layer):
         v = self.v_proj(value)
         return k, v
 
-    def gen_cache(self, key, value=None, type=Cache):
+    def gen_cache(self, key, value=None, type=Cache, max_length=None):
         if type == MultiHeadAttention.StaticCache:  # static_kv
             k, v = self.compute_kv(key, value)
             return self.StaticCache(k, v)
+        elif type == MultiHeadAttention.PreallocatedCache:
+            # incremental_state with buffers of `max_length` positions
+            batch_size = paddle.shape(key)[0]
+            k = paddle.zeros(
+                shape=[batch_size, self.num_heads, max_length, self.head_dim],
+                dtype=key.dtype)
+            v = paddle.zeros(
+                shape=[batch_size, self.num_heads, max_length, self.head_dim],
+                dtype=key.dtype)
+            length = paddle.zeros(shape=[batch_size], dtype="int64")
+            return self.PreallocatedCache(k, v, length)
         elif value is None:  # incremental_state
             k = paddle.full(
                 shape=[-1, self.num_heads, 0, self.head_dim],
@@ -15,10 +15,11 @@
 
 import copy
 import os
+import re
 import unicodedata
 
 from .. import PretrainedTokenizer, AddedToken
-from ..tokenizer_utils import convert_to_unicode, whitespace_tokenize, _is_whitespace, _is_control, _is_punctuation
+from ..tokenizer_utils import convert_to_unicode, whitespace_tokenize, _is_whitespace, _is_control, _is_punctuation, is_chinese_char
 
 __all__ = [
     'BasicTokenizer',
@@ -27,6 +28,76 @@ __all__ = [
 ]
 
 
+class _CharTable(dict):
+    """
+    A translation table for `str.translate`, which maps the code point of a
+    character to its replacement given by `convert`, or to itself if it is not
+    changed. Replacements are computed at the first lookups of characters and
+    then kept in the table, thus translation runs in C for seen characters.
+    """
+
+    # Characters are not kept once the table has this many entries
+    max_size = 0x10000
+
+    def __init__(self, convert):
+        super(_CharTable, self).__init__()
+        self.convert = convert
+        # ASCII characters are always in the table
+        for cp in range(128):
+            self.__missing__(cp)
+
+    def __missing__(self, cp):
+        value = self.convert(chr(cp))
+        if value is not None and len(value) == 1 and ord(value) == cp:
+            value = cp
+        if len(self) < self.max_size:
+            self[cp] = value
+        return value
+
+
+def _convert_control_char(char):
+    # Same as `BasicTokenizer._clean_text`, except that whitespaces are kept
+    cp = ord(char)
+    if cp == 0 or cp == 0xfffd or _is_control(char):
+        return None
+    return char
+
+
+def _convert_accent_char(char):
+    # Same as `BasicTokenizer._run_strip_accents` after the NFD normalization
+    return None if unicodedata.category(char) == "Mn" else char
+
+
+def _convert_split_char(char):
+    # Same as `BasicTokenizer._tokenize_chinese_chars` and `_run_split_on_punc`
+    if is_chinese_char(ord(char)) or _is_punctuation(char):
+        return " " + char + " "
+    return char
+
+
+_control_char_table = None
+_accent_char_table = None
+_split_char_table = None
+
+
+def _get_char_tables():
+    global _control_char_table, _accent_char_table, _split_char_table
+    if _control_char_table is None:
+        _control_char_table = _CharTable(_convert_control_char)
+        _accent_char_table = _CharTable(_convert_accent_char)
+        _split_char_table = _CharTable(_convert_split_char)
+    return _control_char_table, _accent_char_table, _split_char_table
+
+
+if hasattr(str, "isascii"):
+    _is_ascii = str.isascii
+else:
+    _non_ascii_pattern = re.compile(r"[^\x00-\x7f]")
+
+    def _is_ascii(text):
+        return _non_ascii_pattern.search(text) is None
+
+
 class BasicTokenizer(object):
     """
     Runs basic tokenization (punctuation splitting, lower casing, etc.).
@@ -66,6 +137,8 @@ class BasicTokenizer(object):
         """
 
         text = convert_to_unicode(text)
+        if self._use_fast_path():
+            return self._fast_tokenize(text)
         text = self._clean_text(text)
         text = self._tokenize_chinese_chars(text)
 
@@ -80,6 +153,37 @@ class BasicTokenizer(object):
         output_tokens = whitespace_tokenize(" ".join(split_tokens))
         return output_tokens
 
+    def _use_fast_path(self):
+        """
+        Whether to tokenize by `_fast_tokenize`, which is not used if any
+        step of tokenization is overridden by subclasses.
+        """
+        cls = type(self)
+        return all(
+            getattr(cls, name) is getattr(BasicTokenizer, name)
+            for name in _BASIC_TOKENIZER_STEPS)
+
+    def _fast_tokenize(self, text):
+        """
+        Tokenizes a piece of text with the same output as the steps of
+        tokenization, where each step is one pass over the whole text with a
+        translation table of characters. Adding whitespaces around CJK
+        characters is deferred to splitting on punctuations, which doesn't
+        change the output since lower casing and stripping accents never
+        change or produce CJK characters.
+        """
+        control_char_table, accent_char_table, split_char_table = _get_char_tables(
+        )
+        # Printable text has no control characters other than U+FFFD
+        if not text.isprintable() or "\ufffd" in text:
+            text = text.translate(control_char_table)
+        if self.do_lower_case:
+            text = text.lower()
+            if not _is_ascii(text):
+                text = unicodedata.normalize("NFD", text).translate(
+                    accent_char_table)
+        return text.translate(split_char_table).split()
+
     def _run_strip_accents(self, text):
         """
         Strips accents from a piece of text.
@@ -171,6 +275,13 @@ class BasicTokenizer(object):
         return "".join(output)
 
 
+# The steps of `BasicTokenizer.tokenize`, which are all replaced by its fast path
+_BASIC_TOKENIZER_STEPS = [
+    "_clean_text", "_tokenize_chinese_chars", "_is_chinese_char",
+    "_run_strip_accents", "_run_split_on_punc"
+]
+
+
 class WordpieceTokenizer(object):
     """
     Runs WordPiece tokenization.
@@ -184,12 +295,81 @@ class WordpieceTokenizer(object):
             If a word's length is more than
             max_input_chars_per_word, it will be dealt as unknown word.
             Defaults to 100.
+        cache (TokenizationCache, optional):
+            The cache of word pieces of words not in the vocab, which is
+            usually set by `PretrainedTokenizer.enable_word_cache`.
+            Defaults to None.
     """
 
-    def __init__(self, vocab, unk_token, max_input_chars_per_word=100):
+    def __init__(self,
+                 vocab,
+                 unk_token,
+                 max_input_chars_per_word=100,
+                 cache=None):
         self.vocab = vocab
         self.unk_token = unk_token
         self.max_input_chars_per_word = max_input_chars_per_word
+        self.cache = cache
+        # The prefix tries of word pieces, built at the first tokenization
+        self._tries = None
+        self._tries_vocab_size = None
+
+    def __getstate__(self):
+        # The tries are rebuilt after unpickling
+        state = self.__dict__.copy()
+        state["_tries"] = None
+        return state
+
+    def _get_tries(self):
+        """
+        Returns the prefix tries of word pieces starting words and of word
+        pieces following `##`. A node of a trie is a dict from characters to
+        child nodes, and has the key "" if the prefix is a word piece.
+        """
+        if self._tries is None or self._tries_vocab_size != len(self.vocab):
+            tries = ({}, {})
+            tokens = getattr(self.vocab, "token_to_idx", self.vocab)
+            for token in tokens:
+                pieces = [(tries[0], token)]
+                if token.startswith("##") and len(token) > 2:
+                    pieces.append((tries[1], token[2:]))
+                for node, piece in pieces:
+                    for char in piece:
+                        child = node.get(char)
+                        if child is None:
+                            child = node[char] = {}
+                        node = child
+                    node[""] = True
+            self._tries = tries
+            self._tries_vocab_size = len(self.vocab)
+            if self.cache is not None:
+                # The cached word pieces may be outdated
+                self.cache.clear()
+        return self._tries
+
+    def _match_pieces(self, token):
+        """
+        Splits a token into the longest matched word pieces from left to right
+        by walking the prefix tries, or returns None if it can't be split.
+        """
+        word_trie, suffix_trie = self._get_tries()
+        sub_tokens = []
+        start = 0
+        while start < len(token):
+            node = word_trie if start == 0 else suffix_trie
+            end = None
+            for i in range(start, len(token)):
+                node = node.get(token[i])
+                if node is None:
+                    break
+                if "" in node:
+                    end = i + 1
+            if end is None:
+                return None
+            sub_tokens.append(token[start:end] if start ==
+                              0 else "##" + token[start:end])
+            start = end
+        return sub_tokens
 
     def tokenize(self, text):
         """
@@ -223,35 +403,25 @@ class WordpieceTokenizer(object):
         """
 
         output_tokens = []
-        for token in whitespace_tokenize(text):
-            chars = list(token)
-            if len(chars) > self.max_input_chars_per_word:
-                output_tokens.append(self.unk_token)
-                continue
-
-            is_bad = False
-            start = 0
-            sub_tokens = []
-            while start < len(chars):
-                end = len(chars)
-                cur_substr = None
-                while start < end:
-                    substr = "".join(chars[start:end])
-                    if start > 0:
-                        substr = "##" + substr
-                    if substr in self.vocab:
-                        cur_substr = substr
-                        break
-                    end -= 1
-                if cur_substr is None:
-                    is_bad = True
-                    break
-                sub_tokens.append(cur_substr)
-                start = end
-
-            if is_bad:
+        vocab = self.vocab
+        cache = self.cache
+        if cache is not None:
+            # Clears the outdated cache if the vocab is changed
+            self._get_tries()
+        # Same as `whitespace_tokenize`
+        for token in text.split():
+            if len(token) > self.max_input_chars_per_word:
                 output_tokens.append(self.unk_token)
+            elif token in vocab:
+                # The whole token is the longest match
+                output_tokens.append(token)
             else:
+                sub_tokens = None if cache is None else cache.get(token)
+                if sub_tokens is None:
+                    sub_tokens = tuple(
+                        self._match_pieces(token) or (self.unk_token, ))
+                    if cache is not None:
+                        cache.put(token, sub_tokens)
                 output_tokens.extend(sub_tokens)
         return output_tokens
 
@@ -165,7 +165,7 @@ class BigBirdTokenizer(PretrainedTokenizer):
         if not isinstance(text, six.string_types):
             text = text.decode(self.encoding)
 
-        tokens = self.sp_model.EncodeAsPieces(text)
+        tokens = self._tokenize_words(text, self.sp_model.EncodeAsPieces)
         in_vocab_tokens = []
         for token in tokens:
             if token in self.vocab:
@@ -15,6 +15,7 @@
 # limitations under the License.
 
 from ..gpt.tokenizer import GPTTokenizer
+from ..tokenizer_utils import bpe_merge
 import re
 
 __all__ = ['BlenderbotSmallTokenizer']
@@ -116,8 +117,9 @@ class BlenderbotSmallTokenizer(GPTTokenizer):
         Returns:
             str: Converted token.
         """
-        if token in self.cache:
-            return self.cache[token]
+        word = self.cache.get(token)
+        if word is not None:
+            return word
         token = re.sub("([.,!?()])", r" \1", token)
         token = re.sub("(')", r" \1 ", token)
         token = re.sub(r"\s{2,}", " ", token)
@@ -139,42 +141,11 @@ class BlenderbotSmallTokenizer(GPTTokenizer):
                 words.append(token)
                 continue
 
-            while True:
-                bigram = min(
-                    pairs,
-                    key=lambda pair: self.bpe_ranks.get(pair, float("inf")))
-                if bigram not in self.bpe_ranks:
-                    break
-                first, second = bigram
-                new_word = []
-                i = 0
-
-                while i < len(word):
-                    try:
-                        j = word.index(first, i)
-                        new_word.extend(word[i:j])
-                        i = j
-                    except ValueError:
-                        new_word.extend(word[i:])
-                        break
-
-                    if word[i] == first and i < len(word) - 1 and word[
-                            i + 1] == second:
-                        new_word.append(first + second)
-                        i += 2
-                    else:
-                        new_word.append(word[i])
-                        i += 1
-                new_word = tuple(new_word)
-                word = new_word
-                if len(word) == 1:
-                    break
-                else:
-                    pairs = get_pairs(word)
+            word = bpe_merge(word, self.bpe_ranks)
             word = "@@ ".join(word)
             word = word[:-4]
 
-            self.cache[token] = word
+            self.cache.put(token, word)
             words.append(word)
         return " ".join(words)
 
@@ -18,7 +18,8 @@ import os
 import shutil
 
 from paddle.utils import try_import
-from .. import PretrainedTokenizer
+from .. import PretrainedTokenizer, TokenizationCache
+from ..tokenizer_utils import bpe_merge
 from paddlenlp.utils.log import logger
 
 __all__ = ['CTRLTokenizer']
@@ -167,7 +168,7 @@ class CTRLTokenizer(PretrainedTokenizer):
             merges = merges_handle.read().split("\n")[1:-1]
         merges = [tuple(merge.split()) for merge in merges]
         self.bpe_ranks = dict(zip(merges, range(len(merges))))
-        self.cache = {}
+        self.cache = TokenizationCache()
 
     @property
     def vocab_size(self):
@@ -180,8 +181,9 @@ class CTRLTokenizer(PretrainedTokenizer):
         return len(self.encoder)
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        word = self.cache.get(token)
+        if word is not None:
+            return word
         word = tuple(token)
         word = tuple(list(word[:-1]) + [word[-1] + "</w>"])
         pairs = get_pairs(word)
@@ -189,40 +191,10 @@ class CTRLTokenizer(PretrainedTokenizer):
         if not pairs:
             return token
 
-        while True:
-            bigram = min(
-                pairs, key=lambda pair: self.bpe_ranks.get(pair, float("inf")))
-            if bigram not in self.bpe_ranks:
-                break
-            first, second = bigram
-            new_word = []
-            i = 0
-            while i < len(word):
-                try:
-                    j = word.index(first, i)
-                except ValueError:
-                    new_word.extend(word[i:])
-                    break
-                else:
-                    new_word.extend(word[i:j])
-                    i = j
-
-                if word[i] == first and i < len(word) - 1 and word[i +
-                                                                   1] == second:
-                    new_word.append(first + second)
-                    i += 2
-                else:
-                    new_word.append(word[i])
-                    i += 1
-            new_word = tuple(new_word)
-            word = new_word
-            if len(word) == 1:
-                break
-            else:
-                pairs = get_pairs(word)
+        word = bpe_merge(word, self.bpe_ranks)
         word = "@@ ".join(word)
         word = word[:-4]
-        self.cache[token] = word
+        self.cache.put(token, word)
         return word
 
     def tokenize(self, text):
@@ -500,7 +500,7 @@ class ErnieTinyTokenizer(PretrainedTokenizer):
         text = ' '.join(text)
         text = text.lower()
 
-        tokens = self.sp_model.EncodeAsPieces(text)
+        tokens = self._tokenize_words(text, self.sp_model.EncodeAsPieces)
         in_vocab_tokens = []
         unk_token = self.vocab.unk_token
         for token in tokens:
@@ -174,7 +174,7 @@ class FNetTokenizer(AlbertEnglishTokenizer):
     def _tokenize(self, text: str) -> List[str]:
         """Tokenize a string."""
         text = self.preprocess_text(text)
-        pieces = self.sp_model.EncodeAsPieces(text)
+        pieces = self._tokenize_words(text, self.sp_model.EncodeAsPieces)
         new_pieces = []
         for piece in pieces:
             if len(piece) > 1 and piece[-1] == str(",") and piece[-2].isdigit():
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 from typing import List
+import collections
 import inspect
 from abc import ABC
 
@@ -24,7 +25,7 @@ from paddle.fluid.data_feeder import convert_dtype
 from paddle.fluid.layers.utils import map_structure
 from paddlenlp.utils.log import logger
 
-__all__ = ["GenerationMixin"]
+__all__ = ["GenerationMixin", "ContinuousBatchingEngine"]
 
 
 class BeamHypotheses:
@@ -90,6 +91,7 @@ class BeamSearchScorer(object):
                  do_early_stopping=False,
                  num_beam_hyps_to_keep=1,
                  num_beam_groups=1):
+        self.batch_size = batch_size
         self.max_length = max_length
         self.num_beams = num_beams
         self.length_penalty = length_penalty
@@ -137,7 +139,7 @@ class BeamSearchScorer(object):
                 pad_token_id=None,
                 eos_token_id=None):
         cur_len = input_ids.shape[-1]
-        batch_size = len(self._beam_hyps)
+        batch_size = self.batch_size
         assert batch_size == (input_ids.shape[0] // self.group_size)
 
         next_beam_scores = paddle.zeros(
@@ -271,6 +273,284 @@ class BeamSearchScorer(object):
         return decoded, decoded_score
 
 
+class TensorBeamSearchScorer(BeamSearchScorer):
+    """
+    implementing standard beam search decoding with tensor operations.
+
+    The finished hypotheses of all batch items are kept in fixed-size buffers
+    of shape `[batch_size, num_beams]`, and adding hypotheses, length penalty
+    and early stopping are computed for all batch items at once. Thus
+    `process` never copies to host. Too many eos tokens in `next_tokens` are
+    recorded in a flag and raised by `finalize`, which only copies the flag
+    and the lengths of the best hypotheses to host once.
+    """
+
+    def __init__(self,
+                 batch_size,
+                 max_length,
+                 num_beams,
+                 length_penalty=1.0,
+                 do_early_stopping=False,
+                 num_beam_hyps_to_keep=1,
+                 num_beam_groups=1):
+        super(TensorBeamSearchScorer, self).__init__(
+            batch_size,
+            max_length,
+            num_beams,
+            length_penalty=length_penalty,
+            do_early_stopping=do_early_stopping,
+            num_beam_hyps_to_keep=num_beam_hyps_to_keep,
+            num_beam_groups=num_beam_groups)
+        self._beam_hyps = None
+        # Buffers of finished hypotheses sorted by scores in descending order,
+        # which are created with the dtypes of the first inputs.
+        self._hyp_scores = None
+        self._hyp_tokens = None
+        self._hyp_lens = None
+        self._num_hyps = paddle.zeros([batch_size], dtype='int64')
+        # Whether the batch items ever had too many eos tokens in
+        # `next_tokens`, which is checked in `finalize`
+        self._too_many_eos = paddle.zeros([batch_size], dtype='int64')
+
+    def _init_buffers(self, input_ids, scores):
+        if self._hyp_scores is not None:
+            return
+        self._hyp_scores = paddle.full(
+            [self.batch_size, self.num_beams], float('-inf'), dtype=scores.dtype)
+        self._hyp_tokens = paddle.zeros(
+            [
+                self.batch_size, self.num_beams, max(self.max_length,
+                                                     input_ids.shape[-1])
+            ],
+            dtype=input_ids.dtype)
+        self._hyp_lens = paddle.zeros(
+            [self.batch_size, self.num_beams], dtype='int64')
+
+    def _add_hyps(self, hyps, scores, cur_len, is_valid, origin_len=0):
+        """
+        Adds hypotheses of shape `[batch_size, num_candidates, cur_len]` where
+        `is_valid` is true, and keeps the best `num_beams` hypotheses of each
+        batch item.
+        """
+        batch_size, num_candidates = scores.shape
+        buffer_len = self._hyp_tokens.shape[-1]
+        if cur_len > buffer_len:
+            self._hyp_tokens = paddle.concat(
+                [
+                    self._hyp_tokens, paddle.zeros(
+                        [batch_size, self.num_beams, cur_len - buffer_len],
+                        dtype=self._hyp_tokens.dtype)
+                ],
+                axis=-1)
+        elif cur_len < buffer_len:
+            hyps = paddle.concat(
+                [
+                    hyps, paddle.zeros(
+                        [batch_size, num_candidates, buffer_len - cur_len],
+                        dtype=hyps.dtype)
+                ],
+                axis=-1)
+
+        scores = scores / ((
+            (cur_len - origin_len + 5) / 6)**self.length_penalty)
+        scores = paddle.where(is_valid, scores,
+                              paddle.full_like(scores, float('-inf')))
+        all_scores = paddle.concat([self._hyp_scores, scores], axis=1)
+        all_hyps = paddle.concat([self._hyp_tokens, hyps], axis=1)
+        all_lens = paddle.concat(
+            [
+                self._hyp_lens, paddle.full(
+                    [batch_size, num_candidates], cur_len, dtype='int64')
+            ],
+            axis=1)
+
+        self._hyp_scores, keep_idx = paddle.topk(
+            all_scores, self.num_beams, axis=1)
+        self._hyp_tokens = paddle.take_along_axis(
+            all_hyps, keep_idx.unsqueeze(-1), axis=1)
+        self._hyp_lens = paddle.take_along_axis(all_lens, keep_idx, axis=1)
+        self._num_hyps = paddle.minimum(
+            self._num_hyps + is_valid.astype('int64').sum(axis=1),
+            paddle.full_like(self._num_hyps, self.num_beams))
+
+    def process(self,
+                input_ids,
+                next_scores,
+                next_tokens,
+                next_indices,
+                origin_len=0,
+                pad_token_id=None,
+                eos_token_id=None):
+        cur_len = input_ids.shape[-1]
+        batch_size = self.batch_size
+        assert batch_size == (input_ids.shape[0] // self.group_size)
+        num_candidates = next_tokens.shape[-1]
+        self._init_buffers(input_ids, next_scores)
+
+        is_running = paddle.tile(
+            (self._done == 0).unsqueeze(-1), [1, num_candidates])
+        ranks = paddle.tile(
+            paddle.arange(
+                num_candidates, dtype='int64').unsqueeze(0), [batch_size, 1])
+        batch_beam_idx = next_indices + paddle.arange(
+            batch_size, dtype=next_indices.dtype).unsqueeze(-1) * self.group_size
+        if eos_token_id is not None:
+            is_eos = next_tokens == eos_token_id
+        else:
+            is_eos = paddle.zeros_like(next_tokens).astype('bool')
+
+        # the running batch items need `group_size` tokens which are not eos
+        # for the next beams, and the error is raised in `finalize` to avoid
+        # copying to host at each step
+        num_beam_tokens = paddle.logical_and(
+            paddle.logical_not(is_eos), is_running).astype('int64').sum(axis=1)
+        self._too_many_eos = paddle.logical_or(
+            self._too_many_eos == 1,
+            paddle.logical_and(self._done == 0, num_beam_tokens <
+                               self.group_size)).astype('int64')
+
+        # add to generated hypotheses if end of sentence and the eos token
+        # belongs to top `group_size` tokens
+        is_hyp = paddle.logical_and(
+            paddle.logical_and(is_eos, ranks < self.group_size), is_running)
+        hyps = paddle.index_select(
+            input_ids, batch_beam_idx.reshape([-1])).reshape(
+                [batch_size, num_candidates, cur_len])
+        self._add_hyps(hyps, next_scores, cur_len, is_hyp, origin_len)
+
+        # the top `group_size` tokens which are not eos form the next beams
+        beam_order = paddle.argsort(
+            paddle.where(is_eos, ranks + num_candidates, ranks),
+            axis=1)[:, :self.group_size]
+        next_beam_scores = paddle.take_along_axis(
+            next_scores, beam_order, axis=1)
+        next_beam_tokens = paddle.take_along_axis(
+            next_tokens, beam_order, axis=1)
+        next_beam_indices = paddle.take_along_axis(
+            batch_beam_idx, beam_order, axis=1)
+
+        # pad the batch items which are done
+        is_running = is_running[:, :self.group_size]
+        next_beam_scores = paddle.where(is_running, next_beam_scores,
+                                        paddle.zeros_like(next_beam_scores))
+        next_beam_tokens = paddle.where(
+            is_running, next_beam_tokens,
+            paddle.full_like(next_beam_tokens, pad_token_id
+                             if pad_token_id is not None else 0))
+        next_beam_indices = paddle.where(is_running, next_beam_indices,
+                                         paddle.zeros_like(next_beam_indices))
+
+        # Check if we are done so that we can save a pad step if all(done)
+        is_done = self._num_hyps >= self.num_beams
+        if not self.do_early_stopping:
+            cur_scores = next_scores.max(axis=1) / ((
+                (cur_len - origin_len + 5) / 6)**self.length_penalty)
+            is_done = paddle.logical_and(
+                is_done, self._hyp_scores.min(axis=1) >= cur_scores)
+        self._done = paddle.logical_or(self._done == 1,
+                                       is_done).astype('int64')
+
+        return {
+            "next_beam_scores": next_beam_scores.reshape([-1]),
+            "next_beam_tokens": next_beam_tokens.reshape([-1]),
+            "next_beam_indices": next_beam_indices.reshape([-1])
+        }
+
+    def finalize(self,
+                 input_ids,
+                 final_beam_scores,
+                 final_beam_tokens,
+                 final_beam_indices,
+                 origin_len=0,
+                 pad_token_id=None,
+                 eos_token_id=None):
+        batch_size = self.batch_size
+        cur_len = input_ids.shape[-1]
+        self._init_buffers(input_ids, final_beam_scores)
+
+        # all open beam hypotheses are added to the beam hypotheses
+        is_running = paddle.tile(
+            (self._done == 0).unsqueeze(-1), [1, self.num_beams])
+        self._add_hyps(
+            input_ids.reshape([batch_size, self.num_beams, cur_len]),
+            final_beam_scores.reshape([batch_size, self.num_beams]), cur_len,
+            is_running, origin_len)
+
+        # retrieve best hypotheses, which are sorted by scores
+        num_hyps = batch_size * self.num_beam_hyps_to_keep
+        decoded_score = self._hyp_scores[:, :self.num_beam_hyps_to_keep]
+        decoded_score = decoded_score.reshape([num_hyps, 1]).astype('float32')
+        sent_lengths = self._hyp_lens[:, :self.num_beam_hyps_to_keep].reshape(
+            [num_hyps, 1])
+        best_hyps = self._hyp_tokens[:, :self.num_beam_hyps_to_keep].reshape(
+            [num_hyps, -1])
+
+        # the only copy to host
+        max_sent_len, min_sent_len, too_many_eos = paddle.stack([
+            sent_lengths.max(), sent_lengths.min(), self._too_many_eos.max()
+        ]).numpy().tolist()
+        if too_many_eos:
+            raise ValueError(
+                "At most {} tokens in `next_tokens[batch_idx]` can be equal "
+                "to `eos_token_id: {}`. Make sure `next_tokens[batch_idx]` "
+                "are corrected.".format(self.group_size, eos_token_id))
+        # prepare for adding eos
+        sent_max_len = min(max_sent_len + 1, self.max_length)
+        # shorter batches are padded if needed
+        if min_sent_len != max_sent_len:
+            assert pad_token_id is not None, "`pad_token_id` has to be defined"
+        positions = paddle.arange(sent_max_len, dtype='int64').unsqueeze(0)
+        decoded = best_hyps[:, :sent_max_len]
+        decoded = paddle.where(
+            positions < sent_lengths, decoded,
+            paddle.full_like(decoded, pad_token_id
+                             if pad_token_id is not None else 0))
+        # fill with eos_token_id if the latter fits in
+        if eos_token_id is not None:
+            decoded = paddle.where(
+                paddle.logical_and(positions == sent_lengths,
+                                   sent_lengths < self.max_length),
+                paddle.full_like(decoded, eos_token_id), decoded)
+        return decoded, decoded_score
+
+
+def TopKProcess(probs, top_k, min_tokens_to_keep):
+    top_k = min(max(top_k, min_tokens_to_keep), probs.shape[-1])
+    # Remove all tokens with a probability less than the last token of the top-k
+    topk_probs, _ = paddle.topk(probs, k=top_k)
+    probs = paddle.where(probs >= topk_probs[:, -1:], probs,
+                         paddle.full_like(probs, 0.0))
+    return probs
+
+
+def TopPProcess(probs, top_p, min_tokens_to_keep):
+    sorted_probs = paddle.sort(probs, descending=True)
+    sorted_indices = paddle.argsort(probs, descending=True)
+    cumulative_probs = paddle.cumsum(sorted_probs, axis=-1)
+
+    # Remove tokens with cumulative probs above the top_p, But keep at
+    # least min_tokens_to_keep tokens
+    sorted_indices_to_remove = cumulative_probs > top_p
+    if min_tokens_to_keep > 1:
+        # Set 'min_tokens_to_keep - 1' because the first token is kept
+        sorted_indices_to_remove[:, :min_tokens_to_keep - 1] = 0
+    # Keep the first token
+    sorted_indices_to_remove = paddle.cast(
+        sorted_indices_to_remove, dtype='int64')
+    sorted_indices_to_remove[:, 1:] = (sorted_indices_to_remove[:, :-1].clone())
+    sorted_indices_to_remove[:, 0] = 0
+
+    # Scatter sorted tensors to original indexing
+    sorted_indices = sorted_indices + paddle.arange(probs.shape[0]).unsqueeze(
+        -1) * probs.shape[-1]
+    condition = paddle.scatter(sorted_indices_to_remove.flatten(),
+                               sorted_indices.flatten(),
+                               sorted_indices_to_remove.flatten())
+    condition = paddle.cast(condition, 'bool').reshape(probs.shape)
+    probs = paddle.where(condition, paddle.full_like(probs, 0.0), probs)
+    return probs
+
+
 class GenerationMixin(object):
     r"""
     This class implements the interface for generation task. 
@@ -279,6 +559,10 @@ class GenerationMixin(object):
     <https://paddlenlp.readthedocs.io/zh/latest/source/paddlenlp.transformers.model_utils.html>`__.
     """
 
+    # Whether `prepare_inputs_for_generation` allocates the cache with
+    # `static_cache_length` positions, which is required by `use_static_cache`
+    supports_static_cache = False
+
     @staticmethod
     def prepare_input_ids_for_generation(bos_token_id, encoder_output=None):
         batch_size = 1
@@ -396,6 +680,14 @@ class GenerationMixin(object):
 
         return input_ids, model_kwargs
 
+    def reorder_cache(self, cache, index):
+        """
+        Reorders the batch of the model cache by `index`, which selects the
+        beams to continue in beam search. Models with caches that should not
+        be gathered entirely can override it.
+        """
+        return map_structure(lambda x: paddle.index_select(x, index), cache)
+
     @staticmethod
     def update_model_kwargs_for_generation(outputs,
                                            model_kwargs,
@@ -559,6 +851,7 @@ class GenerationMixin(object):
                  use_cache=True,
                  use_faster=False,
                  use_fp16_decoding=False,
+                 use_static_cache=False,
                  **model_kwargs):
         r"""
         The interface for generation task. This method can generate sequences 
@@ -630,6 +923,12 @@ class GenerationMixin(object):
                 for FasterGeneration. Default to False.
             use_fp16_decoding: (bool, optional): Whether to use fp16 for decoding. 
                 Only works when faster entry is avalible. Default to False.
+            use_static_cache: (bool, optional): Whether to allocate the model 
+                cache with `max_length` positions once and write each decoding 
+                step into it in place, instead of concatenating the cache at 
+                every step. Only works when `use_cache` is True and the model 
+                supports it, such as GPT, otherwise a ValueError is raised. 
+                Default to False.
             model_kwargs (dict): It can be used to specify additional kwargs 
                 passed to the model.
 
@@ -818,6 +1117,17 @@ class GenerationMixin(object):
         model_kwargs["use_cache"] = use_cache
         max_length += input_ids.shape[-1]
         min_length += input_ids.shape[-1]
+        if use_static_cache:
+            if not use_cache:
+                raise ValueError(
+                    "`use_cache` has to be True when `use_static_cache` is True."
+                )
+            if not self.supports_static_cache:
+                raise ValueError(
+                    "`use_static_cache` is not supported by {}.".format(
+                        self.__class__.__name__))
+            # the model allocates its cache in `prepare_inputs_for_generation`
+            model_kwargs["static_cache_length"] = max_length
 
         logits_processors = self.get_logits_processor(
             min_length=min_length,
@@ -862,7 +1172,7 @@ class GenerationMixin(object):
                     "`num_beams` is {}. If `num_beams` is 1, `decode_strategy` "
                     "should be 'greedy_search'".format(num_beams))
             if num_beam_groups > 1:
-                diverse_beam_scorer = BeamSearchScorer(
+                diverse_beam_scorer = TensorBeamSearchScorer(
                     batch_size=batch_size,
                     max_length=max_length,
                     num_beams=num_beams,
@@ -880,7 +1190,7 @@ class GenerationMixin(object):
                                               diversity_rate, pad_token_id,
                                               eos_token_id, **model_kwargs)
             else:
-                beam_scorer = BeamSearchScorer(
+                beam_scorer = TensorBeamSearchScorer(
                     batch_size=batch_size,
                     max_length=max_length,
                     num_beams=num_beams,
@@ -956,42 +1266,6 @@ class GenerationMixin(object):
                temperature=None,
                min_tokens_to_keep=1,
                **model_kwargs):
-        def TopKProcess(probs, top_k, min_tokens_to_keep):
-            top_k = min(max(top_k, min_tokens_to_keep), probs.shape[-1])
-            # Remove all tokens with a probability less than the last token of the top-k
-            topk_probs, _ = paddle.topk(probs, k=top_k)
-            probs = paddle.where(probs >= topk_probs[:, -1:], probs,
-                                 paddle.full_like(probs, 0.0))
-            return probs
-
-        def TopPProcess(probs, top_p, min_tokens_to_keep):
-            sorted_probs = paddle.sort(probs, descending=True)
-            sorted_indices = paddle.argsort(probs, descending=True)
-            cumulative_probs = paddle.cumsum(sorted_probs, axis=-1)
-
-            # Remove tokens with cumulative probs above the top_p, But keep at
-            # least min_tokens_to_keep tokens
-            sorted_indices_to_remove = cumulative_probs > top_p
-            if min_tokens_to_keep > 1:
-                # Set 'min_tokens_to_keep - 1' because the first token is kept
-                sorted_indices_to_remove[:, :min_tokens_to_keep - 1] = 0
-            # Keep the first token
-            sorted_indices_to_remove = paddle.cast(
-                sorted_indices_to_remove, dtype='int64')
-            sorted_indices_to_remove[:, 1:] = (
-                sorted_indices_to_remove[:, :-1].clone())
-            sorted_indices_to_remove[:, 0] = 0
-
-            # Scatter sorted tensors to original indexing
-            sorted_indices = sorted_indices + paddle.arange(probs.shape[
-                0]).unsqueeze(-1) * probs.shape[-1]
-            condition = paddle.scatter(sorted_indices_to_remove.flatten(),
-                                       sorted_indices.flatten(),
-                                       sorted_indices_to_remove.flatten())
-            condition = paddle.cast(condition, 'bool').reshape(probs.shape)
-            probs = paddle.where(condition, paddle.full_like(probs, 0.0), probs)
-            return probs
-
         batch_size, cur_len = input_ids.shape
         origin_len = cur_len
         unfinished_flag = paddle.full([batch_size, 1], True, dtype='bool')
@@ -1051,7 +1325,7 @@ class GenerationMixin(object):
 
     def beam_search(self, input_ids, beam_scorer, logits_processors, max_length,
                     diversity_rate, pad_token_id, eos_token_id, **model_kwargs):
-        batch_size = len(beam_scorer._beam_hyps)
+        batch_size = beam_scorer.batch_size
         num_beams = beam_scorer.num_beams
         batch_beam_size, cur_len = input_ids.shape
         origin_len = cur_len
@@ -1158,9 +1432,8 @@ class GenerationMixin(object):
                 is_encoder_decoder=self.is_encoder_decoder)
             if model_kwargs["cache"] is not None:
                 # reorder the cache
-                model_kwargs["cache"] = map_structure(
-                    lambda x: paddle.index_select(x, beam_idx),
-                    model_kwargs["cache"])
+                model_kwargs["cache"] = self.reorder_cache(
+                    model_kwargs["cache"], beam_idx)
 
         pred_ids, scores = beam_scorer.finalize(
             input_ids,
@@ -1176,7 +1449,7 @@ class GenerationMixin(object):
                           max_length, diversity_rate, pad_token_id,
                           eos_token_id, **model_kwargs):
 
-        batch_size = len(beam_scorer._beam_hyps)
+        batch_size = beam_scorer.batch_size
         num_beams = beam_scorer.num_beams
         num_beam_groups = beam_scorer.num_beam_groups
         num_sub_beams = num_beams // num_beam_groups
@@ -1295,9 +1568,8 @@ class GenerationMixin(object):
                 is_encoder_decoder=self.is_encoder_decoder)
             if model_kwargs["cache"] is not None:
                 # reorder the cache
-                model_kwargs["cache"] = map_structure(
-                    lambda x: paddle.index_select(x, reordering_indices),
-                    model_kwargs["cache"])
+                model_kwargs["cache"] = self.reorder_cache(
+                    model_kwargs["cache"], reordering_indices)
 
         pred_ids, scores = beam_scorer.finalize(
             input_ids,
@@ -1310,6 +1582,427 @@ class GenerationMixin(object):
         return pred_ids[:, origin_len:], scores
 
 
+class _GenerationRequest(object):
+    def __init__(self, request_id, input_ids, max_length):
+        self.request_id = request_id
+        self.input_ids = input_ids
+        self.max_length = max_length
+        self.num_generated = 0
+        # The number of tokens including the prompt and generated tokens
+        self.length = len(input_ids)
+        self.done = False
+
+
+class ContinuousBatchingEngine(object):
+    r"""
+    The generation engine with continuous batching for decoder-only models.
+    It keeps a pool of running sequences which are decoded together step by
+    step. Sequences are removed from the running batch as soon as they
+    finish, and queued requests are admitted into the freed slots between
+    decoding steps, so a long sequence does not hold up the others and the
+    batch stays full as long as there are queued requests.
+
+    Sequences are left padded in the running batch, and each of them keeps
+    its own cache, position ids and attention mask. The model should
+    implement `prepare_inputs_for_generation` accepting `attention_mask` and
+    `position_ids`, and return caches of `MultiHeadAttention.Cache` with keys
+    and values of shape `[batch_size, num_heads, length, head_dim]`, such as
+    `GPTLMHeadModel`.
+
+    Args:
+        model (GenerationMixin): The model to generate with.
+        max_batch_size (int, optional): The maximum number of running
+            sequences. Defaults to 8.
+        max_length (int, optional): The default maximum number of tokens to
+            generate for a request. Defaults to 20.
+        min_length (int, optional): The minimum number of tokens to generate
+            for a request. Defaults to 0.
+        decode_strategy (str, optional): The decoding strategy, which can be
+            "greedy_search" or "sampling". Defaults to "greedy_search".
+        temperature (float, optional): The value used to module the next
+            token probabilities in the "sampling" strategy. Defaults to 1.0.
+        top_k (int, optional): The number of highest probability tokens to
+            keep for top-k-filtering in the "sampling" strategy. Defaults to 0,
+            which means no effect.
+        top_p (float, optional): The cumulative probability for
+            top-p-filtering in the "sampling" strategy. Defaults to 1.0, which
+            means no effect.
+        repetition_penalty (float, optional): The parameter for repetition
+            penalty. Defaults to 1.0, which means no penalty.
+        eos_token_id (int, optional): The id of the `eos_token`. Defaults to
+            the `eos_token_id` of the model.
+        pad_token_id (int, optional): The id of the `pad_token`. Defaults to
+            the `pad_token_id` of the model, or `eos_token_id` if not defined.
+
+    Example:
+        .. code-block::
+
+            from paddlenlp.transformers import GPTLMHeadModel, GPTTokenizer
+            from paddlenlp.transformers.generation_utils import ContinuousBatchingEngine
+
+            tokenizer = GPTTokenizer.from_pretrained('gpt2-medium-en')
+            model = GPTLMHeadModel.from_pretrained('gpt2-medium-en')
+            model.eval()
+
+            engine = ContinuousBatchingEngine(
+                model, max_batch_size=16, max_length=64,
+                eos_token_id=tokenizer.eos_token_id)
+            for text in ["Question: Where is the capital of France?",
+                         "Question: What is PaddleNLP?"]:
+                engine.add_request(tokenizer(text)["input_ids"])
+            while engine.has_unfinished_requests():
+                for request_id, ids, score in engine.step():
+                    print(request_id, tokenizer.convert_ids_to_string(ids))
+    """
+
+    def __init__(self,
+                 model,
+                 max_batch_size=8,
+                 max_length=20,
+                 min_length=0,
+                 decode_strategy='greedy_search',
+                 temperature=1.0,
+                 top_k=0,
+                 top_p=1.0,
+                 repetition_penalty=1.0,
+                 eos_token_id=None,
+                 pad_token_id=None):
+        assert (
+            decode_strategy in ["greedy_search", "sampling"]
+        ), "`decode_strategy` must be one of 'greedy_search' or 'sampling' but received {}.".format(
+            decode_strategy)
+        assert max_batch_size > 0, "`max_batch_size` should be a positive value"
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+        self.min_length = min_length
+        self.decode_strategy = decode_strategy
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.eos_token_id = eos_token_id if eos_token_id is not None else getattr(
+            model, 'eos_token_id', None)
+        pad_token_id = pad_token_id if pad_token_id is not None else getattr(
+            model, 'pad_token_id', None)
+        if pad_token_id is None:
+            pad_token_id = self.eos_token_id if self.eos_token_id is not None else 0
+        self.pad_token_id = pad_token_id
+        self.logits_processors = LogitsProcessorList()
+        if repetition_penalty is not None and repetition_penalty != 1.0:
+            self.logits_processors.append(
+                RepetitionPenaltyLogitsProcessor(penalty=repetition_penalty))
+
+        self._waiting = collections.deque()
+        self._running = []
+        self._next_request_id = 0
+        # The states of the running batch, which are left padded
+        self._input_ids = None
+        self._attention_mask = None
+        self._position_ids = None
+        self._cache = None
+        self._scores = None
+
+    def add_request(self, input_ids, max_length=None, request_id=None):
+        """
+        Queues a request to be admitted into the running batch.
+
+        Args:
+            input_ids (list[int]|Tensor): The token ids of the prompt.
+            max_length (int, optional): The maximum number of tokens to
+                generate for this request. Defaults to None, which means
+                `max_length` of the engine.
+            request_id (hashable, optional): The id of the request. Defaults to
+                None, which means an increasing integer.
+
+        Returns:
+            The id of the request.
+        """
+        if isinstance(input_ids, paddle.Tensor):
+            input_ids = input_ids.numpy().reshape([-1]).tolist()
+        if len(input_ids) == 0:
+            raise ValueError("`input_ids` of a request should not be empty.")
+        if request_id is None:
+            request_id = self._next_request_id
+            self._next_request_id += 1
+        self._waiting.append(
+            _GenerationRequest(request_id,
+                               list(input_ids), max_length
+                               if max_length is not None else self.max_length))
+        return request_id
+
+    def has_unfinished_requests(self):
+        return len(self._waiting) > 0 or len(self._running) > 0
+
+    @property
+    def num_running(self):
+        return len(self._running)
+
+    @property
+    def num_waiting(self):
+        return len(self._waiting)
+
+    @paddle.no_grad()
+    def step(self):
+        """
+        Admits queued requests into the free slots of the running batch and
+        runs one decoding step for the running batch.
+
+        Returns:
+            list[tuple]: The requests finished in this step. Each of them is a
+            tuple `(request_id, ids, score)`, where `ids` is the list of
+            generated token ids and `score` is the average log probability of
+            them.
+        """
+        finished = []
+        num_free = self.max_batch_size - len(self._running)
+        if num_free > 0 and len(self._waiting) > 0:
+            requests = [
+                self._waiting.popleft()
+                for _ in range(min(num_free, len(self._waiting)))
+            ]
+            self._prefill(requests)
+            finished.extend(self._retire())
+        if len(self._running) > 0:
+            self._decode()
+            finished.extend(self._retire())
+        return finished
+
+    def generate(self, input_ids, max_length=None):
+        """
+        Generates for a list of prompts with continuous batching.
+
+        Args:
+            input_ids (list[list[int]]): The token ids of prompts.
+            max_length (int, optional): The maximum number of tokens to
+                generate. Defaults to None, which means `max_length` of the
+                engine.
+
+        Returns:
+            tuple[list]: The generated token ids and the scores of prompts in
+            the same order as `input_ids`.
+        """
+        request_ids = [
+            self.add_request(
+                ids, max_length=max_length) for ids in input_ids
+        ]
+        results = {}
+        while self.has_unfinished_requests():
+            for request_id, ids, score in self.step():
+                results[request_id] = (ids, score)
+        ids, scores = zip(* [results[request_id]
+                             for request_id in request_ids])
+        return list(ids), list(scores)
+
+    def _forward(self, input_ids, attention_mask, position_ids, cache):
+        model_inputs = self.model.prepare_inputs_for_generation(
+            input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            use_cache=True,
+            cache=cache)
+        outputs = self.model(**model_inputs)
+        logits, cache = outputs[:2]
+        # [batch_size, vocab_size]
+        return logits[:, -1, :], cache
+
+    def _next_tokens(self, logits, requests):
+        logits = self.model.adjust_logits_during_generation(logits)
+        if len(self.logits_processors) > 0:
+            # Paddings are replaced by the last token of each sequence, which
+            # is never a padding, thus the tokens seen by the processors such
+            # as the repetition penalty don't depend on the other sequences.
+            is_pad = self._attention_mask[:, 0, 0, :] < 0
+            input_ids = paddle.where(
+                is_pad,
+                self._input_ids[:, -1:].expand_as(self._input_ids),
+                self._input_ids)
+            logits = self.logits_processors(input_ids, logits)
+        if self.eos_token_id is not None and self.min_length > 0:
+            is_short = [[r.num_generated < self.min_length] for r in requests]
+            if any(flag for flag, in is_short):
+                is_eos = paddle.arange(logits.shape[-1]) == self.eos_token_id
+                logits = paddle.where(
+                    paddle.logical_and(
+                        paddle.to_tensor(is_short), is_eos.unsqueeze(0)),
+                    paddle.full_like(logits, -1e9), logits)
+        log_probs = paddle.log(F.softmax(logits))
+        if self.decode_strategy == 'greedy_search':
+            next_tokens = paddle.argmax(log_probs, axis=-1).unsqueeze(-1)
+        else:
+            if self.temperature is not None and self.temperature != 1.0:
+                logits = logits / self.temperature
+            probs = F.softmax(logits)
+            if self.top_k is not None and self.top_k != 0:
+                probs = TopKProcess(probs, self.top_k, 1)
+            if self.top_p is not None and self.top_p < 1.0:
+                probs = TopPProcess(probs, self.top_p, 1)
+            next_tokens = paddle.multinomial(probs)
+        next_scores = paddle.index_sample(log_probs, next_tokens)
+        return next_tokens, next_scores
+
+    def _append_tokens(self, logits, requests):
+        next_tokens, next_scores = self._next_tokens(logits, requests)
+        batch_size = next_tokens.shape[0]
+        self._input_ids = paddle.concat(
+            [self._input_ids, next_tokens.astype(self._input_ids.dtype)],
+            axis=1)
+        self._attention_mask = paddle.concat(
+            [
+                self._attention_mask, paddle.zeros(
+                    [batch_size, 1, 1, 1], dtype=self._attention_mask.dtype)
+            ],
+            axis=-1)
+        self._position_ids = paddle.concat(
+            [self._position_ids, self._position_ids[:, -1:] + 1], axis=-1)
+        num_generated = paddle.to_tensor(
+            [[r.num_generated] for r in requests], dtype=self._scores.dtype)
+        self._scores = (self._scores * num_generated + next_scores.astype(
+            self._scores.dtype)) / (num_generated + 1)
+
+        for request, token in zip(requests, next_tokens.numpy()[:, 0]):
+            request.num_generated += 1
+            request.length += 1
+            request.done = (self.eos_token_id is not None and
+                            token == self.eos_token_id
+                            ) or request.num_generated >= request.max_length
+
+    def _prefill(self, requests):
+        max_len = max(len(r.input_ids) for r in requests)
+        input_ids, attention_mask, position_ids = [], [], []
+        for request in requests:
+            num_pad = max_len - len(request.input_ids)
+            input_ids.append([self.pad_token_id] * num_pad + request.input_ids)
+            attention_mask.append([-1e9] * num_pad + [0.0] *
+                                  len(request.input_ids))
+            position_ids.append([0] * num_pad +
+                                list(range(len(request.input_ids))))
+        input_ids = paddle.to_tensor(input_ids, dtype='int64')
+        attention_mask = paddle.to_tensor(
+            attention_mask, dtype=paddle.get_default_dtype()).unsqueeze([1, 2])
+        position_ids = paddle.to_tensor(position_ids, dtype='int64')
+        logits, cache = self._forward(input_ids, attention_mask, position_ids,
+                                      None)
+
+        running = (self._input_ids, self._attention_mask, self._position_ids,
+                   self._cache, self._scores)
+        self._input_ids = input_ids
+        self._attention_mask = attention_mask
+        self._position_ids = position_ids
+        self._cache = cache
+        self._scores = paddle.zeros(
+            [len(requests), 1], dtype=paddle.get_default_dtype())
+        self._append_tokens(logits, requests)
+
+        if len(self._running) > 0:
+            self._merge(*running)
+        self._running.extend(requests)
+
+    def _decode(self):
+        logits, self._cache = self._forward(
+            self._input_ids, self._attention_mask, self._position_ids,
+            self._cache)
+        self._append_tokens(logits, self._running)
+
+    def _left_pad(self, input_ids, attention_mask, position_ids, cache,
+                  num_pad):
+        if num_pad == 0:
+            return input_ids, attention_mask, position_ids, cache
+        batch_size = input_ids.shape[0]
+        input_ids = paddle.concat(
+            [
+                paddle.full(
+                    [batch_size, num_pad],
+                    self.pad_token_id,
+                    dtype=input_ids.dtype), input_ids
+            ],
+            axis=1)
+        attention_mask = paddle.concat(
+            [
+                paddle.full(
+                    [batch_size, 1, 1, num_pad],
+                    -1e9,
+                    dtype=attention_mask.dtype), attention_mask
+            ],
+            axis=-1)
+        position_ids = paddle.concat(
+            [
+                paddle.zeros(
+                    [batch_size, num_pad], dtype=position_ids.dtype),
+                position_ids
+            ],
+            axis=1)
+        cache = map_structure(
+            lambda x: paddle.concat(
+                [
+                    paddle.zeros(
+                        [x.shape[0], x.shape[1], num_pad, x.shape[3]],
+                        dtype=x.dtype), x
+                ],
+                axis=2),
+            cache)
+        return input_ids, attention_mask, position_ids, cache
+
+    def _merge(self, input_ids, attention_mask, position_ids, cache, scores):
+        # Concatenates the running batch before the newly admitted sequences,
+        # after left padding them to the same length
+        max_len = max(input_ids.shape[1], self._input_ids.shape[1])
+        running = self._left_pad(input_ids, attention_mask, position_ids,
+                                 cache, max_len - input_ids.shape[1])
+        admitted = self._left_pad(self._input_ids, self._attention_mask,
+                                  self._position_ids, self._cache,
+                                  max_len - self._input_ids.shape[1])
+        self._input_ids = paddle.concat([running[0], admitted[0]])
+        self._attention_mask = paddle.concat([running[1], admitted[1]])
+        self._position_ids = paddle.concat([running[2], admitted[2]])
+        self._cache = map_structure(lambda x, y: paddle.concat([x, y]),
+                                    running[3], admitted[3])
+        self._scores = paddle.concat([scores, self._scores])
+
+    def _retire(self):
+        finished_idx = [i for i, r in enumerate(self._running) if r.done]
+        if len(finished_idx) == 0:
+            return []
+        ids = paddle.index_select(
+            self._input_ids, paddle.to_tensor(finished_idx)).numpy()
+        scores = paddle.index_select(
+            self._scores, paddle.to_tensor(finished_idx)).numpy()
+        finished = []
+        for i, row_ids, score in zip(finished_idx, ids, scores):
+            request = self._running[i]
+            finished.append((request.request_id,
+                             row_ids[-request.num_generated:].tolist(),
+                             float(score[0])))
+
+        keep_idx = [i for i, r in enumerate(self._running) if not r.done]
+        self._running = [self._running[i] for i in keep_idx]
+        if len(keep_idx) == 0:
+            self._input_ids = None
+            self._attention_mask = None
+            self._position_ids = None
+            self._cache = None
+            self._scores = None
+            return finished
+
+        index = paddle.to_tensor(keep_idx)
+        self._input_ids = paddle.index_select(self._input_ids, index)
+        self._attention_mask = paddle.index_select(self._attention_mask, index)
+        self._position_ids = paddle.index_select(self._position_ids, index)
+        self._cache = map_structure(lambda x: paddle.index_select(x, index),
+                                    self._cache)
+        self._scores = paddle.index_select(self._scores, index)
+
+        # Drops the columns which are padding for all running sequences
+        num_trim = self._input_ids.shape[1] - max(r.length
+                                                  for r in self._running)
+        if num_trim > 0:
+            self._input_ids = self._input_ids[:, num_trim:]
+            self._attention_mask = self._attention_mask[:, :, :, num_trim:]
+            self._position_ids = self._position_ids[:, num_trim:]
+            self._cache = map_structure(lambda x: x[:, :, num_trim:],
+                                        self._cache)
+        return finished
+
+
 class LogitsProcessorList(List):
     def __call__(self, input_ids, logits, **kwargs):
         for processor in self:
@@ -23,6 +23,8 @@ from paddle.fluid import layers
 from paddle.nn.layer.transformer import _convert_param_attr_to_list
 
 from .. import PretrainedModel, register_base_model
+from ..attention_utils import (_reorder_preallocated_cache,
+                               _update_preallocated_cache)
 
 __all__ = [
     'GPTModel',
@@ -47,6 +49,8 @@ class MultiHeadAttention(nn.Layer):
 
     Cache = collections.namedtuple("Cache", ["k", "v"])
     StaticCache = collections.namedtuple("StaticCache", ["k", "v"])
+    PreallocatedCache = collections.namedtuple("PreallocatedCache",
+                                               ["k", "v", "length"])
 
     def __init__(self,
                  embed_dim,
@@ -111,6 +115,11 @@ class MultiHeadAttention(nn.Layer):
         else:
             k, v = self.compute_kv(key, value)
 
+        if isinstance(cache, self.PreallocatedCache):
+            # for decoder self-attention in inference, writes in place
+            k, v, cache = _update_preallocated_cache(cache, k, v)
+            return (q, k, v) if use_cache is False else (q, k, v, cache)
+
         if isinstance(cache, self.Cache):
             # for decoder self-attention in inference
             k = tensor.concat([cache.k, k], axis=2)
@@ -140,15 +149,32 @@ class MultiHeadAttention(nn.Layer):
         v = tensor.transpose(x=v, perm=[0, 2, 1, 3])
         return k, v
 
-    def gen_cache(self, key, value=None, type=Cache):
+    def gen_cache(self, key, value=None, type=Cache, max_length=None):
         """
         Generates cache for `forward` usage in inference accroding to arguments.
-        The generated cache is an instance of `MultiHeadAttention.Cache` or an
-        instance of `MultiHeadAttention.StaticCache`.
+        The generated cache is an instance of `MultiHeadAttention.Cache`, an
+        instance of `MultiHeadAttention.StaticCache` or an instance of
+        `MultiHeadAttention.PreallocatedCache`, whose keys and values are
+        buffers of `max_length` positions written in place at each step.
         """
         if type == MultiHeadAttention.StaticCache:  # static_kv
             k, v = self.compute_kv(key, value)
             return self.StaticCache(k, v)
+        elif type == MultiHeadAttention.PreallocatedCache:
+            # incremental_state with buffers of `max_length` positions
+            k = layers.fill_constant_batch_size_like(
+                input=key,
+                shape=[-1, self.num_heads, max_length, self.head_dim],
+                dtype=key.dtype,
+                value=0)
+            v = layers.fill_constant_batch_size_like(
+                input=key,
+                shape=[-1, self.num_heads, max_length, self.head_dim],
+                dtype=key.dtype,
+                value=0)
+            length = layers.fill_constant_batch_size_like(
+                input=key, shape=[-1], dtype='int64', value=0)
+            return self.PreallocatedCache(k, v, length)
         elif value is None:  # incremental_state
             k = layers.fill_constant_batch_size_like(
                 input=key,
@@ -287,15 +313,19 @@ class TransformerDecoder(nn.Layer):
             output = self.norm(output)
         return output if use_cache is False else (output, new_caches)
 
-    def gen_cache(self, memory, do_zip=False):
+    def gen_cache(self, memory, do_zip=False, max_length=None):
         r"""
         Generates cache for `forward` usage. The generated cache is a list, and
         each element in it is a tuple( :code:`(incremental_cache, static_cache)` )
         produced by `TransformerDecoderLayer.gen_cache`. See `TransformerDecoderLayer.gen_cache`
         for more details. If `do_zip` is True, apply `zip` on these tuples to get
-        a list with two elements.
+        a list with two elements. If `max_length` is not None, the caches are
+        preallocated with `max_length` positions.
        """
-        cache = [layer.gen_cache(memory) for layer in self.layers]
+        cache = [
+            layer.gen_cache(
+                memory, max_length=max_length) for layer in self.layers
+        ]
         if do_zip:
             cache = list(zip(*cache))
         return cache
@@ -378,7 +408,12 @@ class TransformerDecoderLayer(nn.Layer):
 
         return tgt if use_cache is False else (tgt, incremental_cache)
 
-    def gen_cache(self, memory):
+    def gen_cache(self, memory, max_length=None):
+        if max_length is not None:
+            return self.self_attn.gen_cache(
+                memory,
+                type=self.self_attn.PreallocatedCache,
+                max_length=max_length)
         incremental_cache = self.self_attn.gen_cache(
             memory, type=self.self_attn.Cache)
         return incremental_cache
@@ -792,7 +827,10 @@ class GPTModel(GPTPretrainedModel):
         if position_ids is None:
             past_length = 0
             if cache is not None:
-                past_length = paddle.shape(cache[0].k)[-2]
+                if isinstance(cache[0], MultiHeadAttention.PreallocatedCache):
+                    past_length = cache[0].length[0]
+                else:
+                    past_length = paddle.shape(cache[0].k)[-2]
             position_ids = paddle.arange(
                 past_length,
                 paddle.shape(input_ids)[-1] + past_length,
@@ -828,6 +866,29 @@ class GPTModel(GPTPretrainedModel):
         self.checkpoints.extend(self.decoder.checkpoints)
         return encoder_outputs
 
+    def gen_cache(self, input_ids, max_length):
+        r"""
+        Generates preallocated caches for incremental decoding. The keys and
+        values of each layer are buffers with shape
+        `[batch_size, num_attention_heads, max_length, head_dim]` allocated
+        once, and each decoding step writes into them in place instead of
+        concatenating to the previous cache.
+
+        Args:
+            input_ids (Tensor):
+                The input ids with shape [batch_size, sequence_length], which
+                decides the batch size of caches.
+            max_length (int):
+                The maximum number of positions of the caches, including the
+                tokens of `input_ids`.
+
+        Returns:
+            list: A list of `MultiHeadAttention.PreallocatedCache`, which can
+            be passed to `forward` as `cache` along with `use_cache=True`.
+        """
+        memory = self.embeddings(input_ids=input_ids[:, :1])
+        return self.decoder.gen_cache(memory, max_length=max_length)
+
 
 class GPTForPretraining(GPTPretrainedModel):
     """
@@ -1066,6 +1127,8 @@ class GPTLMHeadModel(GPTPretrainedModel):
 
     """
 
+    supports_static_cache = True
+
     def __init__(self, gpt):
         super(GPTLMHeadModel, self).__init__()
         self.gpt = gpt
@@ -1156,6 +1219,7 @@ class GPTLMHeadModel(GPTPretrainedModel):
         # only last token for inputs_ids if cache is defined in kwargs
         position_ids = kwargs.get("position_ids", None)
         attention_mask = kwargs.get("attention_mask", None)
+        static_cache_length = kwargs.get("static_cache_length", None)
         if attention_mask is not None:
             if len(attention_mask.shape) == 4:
                 attention_mask = attention_mask[:, -1, -1, :]
@@ -1166,6 +1230,9 @@ class GPTLMHeadModel(GPTPretrainedModel):
             input_ids = input_ids[:, -1].unsqueeze(-1)
             if position_ids is not None:
                 position_ids = position_ids[:, -1].unsqueeze(-1)
+        elif use_cache and static_cache_length is not None:
+            # the caches are allocated once for the whole generation
+            cache = self.gpt.gen_cache(input_ids, static_cache_length)
         return {
             "input_ids": input_ids,
             "position_ids": position_ids,
@@ -1174,6 +1241,12 @@ class GPTLMHeadModel(GPTPretrainedModel):
             "cache": cache
         }
 
+    def reorder_cache(self, cache, index):
+        if isinstance(cache[0], MultiHeadAttention.PreallocatedCache):
+            # only the filled positions of the buffers are reordered
+            return [_reorder_preallocated_cache(c, index) for c in cache]
+        return super(GPTLMHeadModel, self).reorder_cache(cache, index)
+
     def __getattr__(self, name):
         try:
             return super().__getattr__(name)
@@ -23,7 +23,8 @@ from paddle.utils import try_import
 
 from paddlenlp.utils.log import logger
 
-from .. import PretrainedTokenizer, AddedToken
+from .. import PretrainedTokenizer, AddedToken, TokenizationCache
+from ..tokenizer_utils import bpe_merge
 
 __all__ = [
     'GPTTokenizer',
@@ -408,7 +409,7 @@ class GPTTokenizer(PretrainedTokenizer):
         bpe_data = open(merges_file, encoding='utf-8').read().split('\n')[1:-1]
         bpe_merges = [tuple(merge.split()) for merge in bpe_data]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = TokenizationCache()
         re = try_import("regex")
         self.pat = re.compile(
             r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
@@ -427,46 +428,18 @@ class GPTTokenizer(PretrainedTokenizer):
         return len(self.encoder)
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        word = self.cache.get(token)
+        if word is not None:
+            return word
         word = tuple(token)
         pairs = get_pairs(word)
 
         if not pairs:
             return token
 
-        while True:
-            bigram = min(
-                pairs, key=lambda pair: self.bpe_ranks.get(pair, float('inf')))
-            if bigram not in self.bpe_ranks:
-                break
-            first, second = bigram
-            new_word = []
-            i = 0
-            while i < len(word):
-                try:
-                    j = word.index(first, i)
-                    new_word.extend(word[i:j])
-                    i = j
-                except:
-                    new_word.extend(word[i:])
-                    break
-
-                if word[i] == first and i < len(word) - 1 and word[i +
-                                                                   1] == second:
-                    new_word.append(first + second)
-                    i += 2
-                else:
-                    new_word.append(word[i])
-                    i += 1
-            new_word = tuple(new_word)
-            word = new_word
-            if len(word) == 1:
-                break
-            else:
-                pairs = get_pairs(word)
+        word = bpe_merge(word, self.bpe_ranks)
         word = ' '.join(word)
-        self.cache[token] = word
+        self.cache.put(token, word)
         return word
 
     def _tokenize(self, text):
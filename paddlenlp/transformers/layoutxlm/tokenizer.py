@@ -155,7 +155,7 @@ class LayoutXLMTokenizer(PretrainedTokenizer):
         return vocab
 
     def _tokenize(self, text):
-        return self.sp_model.EncodeAsPieces(text)
+        return self._tokenize_words(text, self.sp_model.EncodeAsPieces)
 
     def _convert_token_to_id(self, token):
         """ Converts a token (str) in an id using the vocab. """
@@ -23,7 +23,8 @@ except:
 import sys
 import json
 import itertools
-from .. import RobertaTokenizer
+from .. import RobertaTokenizer, TokenizationCache
+from ..tokenizer_utils import bpe_merge
 from itertools import repeat
 import warnings
 
@@ -193,7 +194,7 @@ class LukeTokenizer(RobertaTokenizer):
             bpe_merges = merges_handle.read().split('\n')[1:-1]
         bpe_merges = [tuple(merge.split()) for merge in bpe_merges]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = TokenizationCache()
         self.added_tokens_encoder = {}
         self.added_tokens_decoder = {}
 
@@ -516,46 +517,18 @@ class LukeTokenizer(RobertaTokenizer):
         return tokenized_text
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        word = self.cache.get(token)
+        if word is not None:
+            return word
         word = tuple(token)
         pairs = get_pairs(word)
 
         if not pairs:
             return token
 
-        while True:
-            bigram = min(
-                pairs, key=lambda pair: self.bpe_ranks.get(pair, float('inf')))
-            if bigram not in self.bpe_ranks:
-                break
-            first, second = bigram
-            new_word = []
-            i = 0
-            while i < len(word):
-                try:
-                    j = word.index(first, i)
-                    new_word.extend(word[i:j])
-                    i = j
-                except:
-                    new_word.extend(word[i:])
-                    break
-
-                if word[i] == first and i < len(word) - 1 and word[i +
-                                                                   1] == second:
-                    new_word.append(first + second)
-                    i += 2
-                else:
-                    new_word.append(word[i])
-                    i += 1
-            new_word = tuple(new_word)
-            word = new_word
-            if len(word) == 1:
-                break
-            else:
-                pairs = get_pairs(word)
+        word = bpe_merge(word, self.bpe_ranks)
         word = ' '.join(word)
-        self.cache[token] = word
+        self.cache.put(token, word)
         return word
 
     def convert_tokens_to_string(self, tokens):
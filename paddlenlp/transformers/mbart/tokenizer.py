@@ -303,7 +303,8 @@ class _MBartTokenizer(PretrainedTokenizer):
             self.lang_code_to_id) + self.fairseq_offset + 1
 
     def _tokenize(self, text):
-        return self.sp_model.encode(text, out_type=str)
+        return self._tokenize_words(
+            text, lambda word: self.sp_model.encode(word, out_type=str))
 
     def _convert_token_to_id(self, token):
         """
@@ -483,7 +484,8 @@ class _MBart50Tokenizer(PretrainedTokenizer):
             return_overflowing_tokens, return_special_tokens_mask)
 
     def _tokenize(self, text):
-        return self.sp_model.encode(text, out_type=str)
+        return self._tokenize_words(
+            text, lambda word: self.sp_model.encode(word, out_type=str))
 
     @property
     def vocab_size(self):
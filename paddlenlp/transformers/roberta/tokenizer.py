@@ -18,7 +18,7 @@ import os
 import json
 from paddle.utils import try_import
 
-from .. import BasicTokenizer, PretrainedTokenizer, WordpieceTokenizer, GPTTokenizer, AddedToken
+from .. import BasicTokenizer, PretrainedTokenizer, WordpieceTokenizer, GPTTokenizer, AddedToken, TokenizationCache
 from ..gpt.tokenizer import bytes_to_unicode
 from ...utils.downloader import get_path_from_url, COMMUNITY_MODEL_PREFIX
 from ...utils.env import MODEL_HOME
@@ -426,7 +426,7 @@ class RobertaBPETokenizer(GPTTokenizer):
             bpe_data = merges_handle.read().split('\n')[1:-1]
         bpe_merges = [tuple(merge.split()) for merge in bpe_data]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = TokenizationCache()
         re = try_import("regex")
         self.pat = re.compile(
             r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
@@ -12,11 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import uuid
+
+import numpy as np
 import paddle
 import paddle.nn as nn
 import paddle.nn.functional as F
 
 from ..ernie.modeling import ErniePretrainedModel
+from ...utils.embedding_cache import EmbeddingCache
 
 __all__ = ['ErnieDualEncoder', 'ErnieCrossEncoder']
 
@@ -72,6 +76,17 @@ class ErnieDualEncoder(nn.Layer):
             # Get title embedding
             title_embedding = model.get_pooled_embedding(**inputs, is_query=False)
 
+    If `embedding_cache_size` or `embedding_cache_path` is given, embeddings
+    computed in eval mode without gradients are cached by token ids, and
+    repeated inputs of a batch are only encoded once. Cached embeddings are
+    keyed by a version of the encoder parameters as well, which is increased
+    after `train()` or `set_state_dict()` is called. If parameters are changed
+    in other ways, call `clear_embedding_caches()` before using the caches
+    again. Embeddings spilled to `embedding_cache_path` with the parameters
+    just loaded from `query_model_name_or_path` and `title_model_name_or_path`
+    are reused by other processes, thus the spill database should be removed
+    if the parameters saved in these paths are changed.
+
     """
 
     def __init__(self,
@@ -79,7 +94,9 @@ class ErnieDualEncoder(nn.Layer):
                  title_model_name_or_path=None,
                  share_parameters=False,
                  dropout=None,
-                 use_cross_batch=False):
+                 use_cross_batch=False,
+                 embedding_cache_size=0,
+                 embedding_cache_path=None):
 
         super().__init__()
         self.query_ernie, self.title_ernie = None, None
@@ -91,6 +108,50 @@ class ErnieDualEncoder(nn.Layer):
         elif title_model_name_or_path is not None:
             self.title_ernie = ErnieEncoder.from_pretrained(
                 title_model_name_or_path)
+        self.embedding_caches = None
+        if embedding_cache_size > 0 or embedding_cache_path is not None:
+            if share_parameters:
+                title_model_name_or_path = query_model_name_or_path
+            # Caches of query and title embeddings
+            self._embedding_cache_names = {
+                True: "query:{}".format(query_model_name_or_path),
+                False: "title:{}".format(title_model_name_or_path),
+            }
+            self.embedding_caches = {
+                is_query: EmbeddingCache(
+                    name,
+                    max_size=embedding_cache_size,
+                    spill_path=embedding_cache_path)
+                for is_query, name in self._embedding_cache_names.items()
+            }
+        # The version of parameters, which is increased whenever parameters
+        # may be changed, and the id of this model to tell its changed
+        # parameters from the ones of other processes in the spill database
+        self._parameter_version = 0
+        self._model_id = uuid.uuid4().hex
+
+    def clear_embedding_caches(self):
+        """
+        Drops the cached embeddings computed with the current parameters,
+        which should be called after the parameters are changed other than
+        by `train()` or `set_state_dict()`.
+        """
+        self._parameter_version += 1
+        if self.embedding_caches is not None:
+            for cache in self.embedding_caches.values():
+                cache.clear()
+
+    def train(self):
+        # Parameters would be updated by training
+        self.clear_embedding_caches()
+        super().train()
+
+    def set_state_dict(self, *args, **kwargs):
+        self.clear_embedding_caches()
+        return super().set_state_dict(*args, **kwargs)
+
+    set_dict = set_state_dict
+    load_dict = set_state_dict
 
     def get_semantic_embedding(self, data_loader):
         self.eval()
@@ -113,6 +174,11 @@ class ErnieDualEncoder(nn.Layer):
                              is_query=True):
         assert (is_query and self.query_ernie is not None) or (not is_query and self.title_ernie), \
             "Please check whether your parameter for `is_query` are consistent with DualEncoder initialization."
+        if (self.embedding_caches is not None and not self.training and
+                not paddle.is_grad_enabled() and position_ids is None and
+                attention_mask is None):
+            return self._get_cached_pooled_embedding(input_ids, token_type_ids,
+                                                     is_query)
         if is_query:
             sequence_output, _ = self.query_ernie(input_ids, token_type_ids,
                                                   position_ids, attention_mask)
@@ -122,6 +188,45 @@ class ErnieDualEncoder(nn.Layer):
                                                   position_ids, attention_mask)
         return sequence_output[:, 0]
 
+    def _get_cached_pooled_embedding(self, input_ids, token_type_ids,
+                                     is_query):
+        ernie = self.query_ernie if is_query else self.title_ernie
+        # Embeddings computed with other parameters are never hit, either in
+        # memory or in the spill database.
+        fingerprint = self._embedding_cache_names[is_query]
+        if self._parameter_version > 0:
+            fingerprint = "{}:{}:{}".format(fingerprint, self._model_id,
+                                            self._parameter_version)
+        self.embedding_caches[is_query].set_fingerprint(fingerprint)
+        pad_token_id = ernie.ernie.pad_token_id
+        input_ids_np = input_ids.numpy()
+        token_type_ids_np = token_type_ids.numpy(
+        ) if token_type_ids is not None else np.zeros_like(input_ids_np)
+        # Padding doesn't change the embedding, thus the key is the token ids
+        # without trailing paddings
+        lengths = input_ids_np.shape[1] - np.argmax(
+            (input_ids_np != pad_token_id)[:, ::-1], axis=1)
+        keys = [
+            input_ids_np[i, :length].tobytes() +
+            token_type_ids_np[i, :length].tobytes()
+            for i, length in enumerate(lengths)
+        ]
+        first_rows = {}
+        for i, key in enumerate(keys):
+            first_rows.setdefault(key, i)
+
+        def encode_fn(missing_keys):
+            index = paddle.to_tensor(
+                [first_rows[key] for key in missing_keys], dtype="int64")
+            sequence_output, _ = ernie(
+                paddle.gather(input_ids, index),
+                paddle.gather(token_type_ids, index)
+                if token_type_ids is not None else None)
+            return sequence_output[:, 0].numpy()
+
+        embeddings = self.embedding_caches[is_query].encode(keys, encode_fn)
+        return paddle.to_tensor(embeddings)
+
     def cosine_sim(self,
                    query_input_ids,
                    title_input_ids,
@@ -18,7 +18,8 @@ import os
 import shutil
 
 from paddle.utils import try_import
-from paddlenlp.transformers import BasicTokenizer, PretrainedTokenizer, WordpieceTokenizer
+from paddlenlp.transformers import BasicTokenizer, PretrainedTokenizer, WordpieceTokenizer, TokenizationCache
+from paddlenlp.transformers.tokenizer_utils import bpe_merge
 from paddlenlp.utils.log import logger
 from paddlenlp.utils.env import MODEL_HOME
 
@@ -77,7 +78,7 @@ class BpeEncoder(object):
         self.byte_encoder = bytes_to_unicode()
         self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
         self.bpe_ranks = self.__get_bpe_ranks(vocab_bpe_file)
-        self.cache = {}
+        self.cache = TokenizationCache()
         re = try_import("regex")
         self.pat = re.compile(
             r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
@@ -101,46 +102,18 @@ class BpeEncoder(object):
         """
         bpe
         """
-        if token in self.cache:
-            return self.cache[token]
+        word = self.cache.get(token)
+        if word is not None:
+            return word
         word = tuple(token)
         pairs = get_pairs(word)
 
         if not pairs:
             return token
 
-        while True:
-            bigram = min(
-                pairs, key=lambda pair: self.bpe_ranks.get(pair, float('inf')))
-            if bigram not in self.bpe_ranks:
-                break
-            first, second = bigram
-            new_word = []
-            i = 0
-            while i < len(word):
-                try:
-                    j = word.index(first, i)
-                    new_word.extend(word[i:j])
-                    i = j
-                except:
-                    new_word.extend(word[i:])
-                    break
-
-                if word[i] == first and i < len(word) - 1 and word[i +
-                                                                   1] == second:
-                    new_word.append(first + second)
-                    i += 2
-                else:
-                    new_word.append(word[i])
-                    i += 1
-            new_word = tuple(new_word)
-            word = new_word
-            if len(word) == 1:
-                break
-            else:
-                pairs = get_pairs(word)
+        word = bpe_merge(word, self.bpe_ranks)
         word = ' '.join(word)
-        self.cache[token] = word
+        self.cache.put(token, word)
         return word
 
     def encode(self, text):
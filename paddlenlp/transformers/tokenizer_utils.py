@@ -16,11 +16,17 @@
 # limitations under the License.
 
 import copy
+import heapq
 import io
+import itertools
 import json
+import math
 import os
 import six
+import threading
 import unicodedata
+import weakref
+import numpy as np
 from collections import OrderedDict, UserDict
 from shutil import copyfile
 from typing import Iterable, Iterator, Optional, List, Any, Callable, Union
@@ -30,6 +36,8 @@ from paddlenlp.utils.downloader import get_path_from_url, COMMUNITY_MODEL_PREFIX
 from paddlenlp.utils.env import MODEL_HOME
 from paddlenlp.utils.log import logger
 from dataclasses import dataclass, field
+from multiprocess import Pool
+from multiprocess.reduction import ForkingPickler
 
 try:
     from functools import lru_cache
@@ -42,10 +50,60 @@ from collections import OrderedDict
 
 __all__ = [
     'PretrainedTokenizer', 'BPETokenizer', 'tokenize_chinese_chars',
-    'is_chinese_char', 'normalize_chars', 'tokenize_special_chars'
+    'is_chinese_char', 'normalize_chars', 'tokenize_special_chars',
+    'TokenizationCache'
 ]
 
 
+# The tokenizer held by a `batch_encode` worker process.
+_worker_tokenizer = None
+
+
+def _init_batch_encode_worker(tokenizer_state):
+    global _worker_tokenizer
+    _worker_tokenizer = ForkingPickler.loads(tokenizer_state)
+
+
+def _batch_encode_chunk(args):
+    examples, encode_kwargs = args
+    return [
+        _worker_tokenizer._batch_encode_example(example_id,
+                                                tokens_or_pair_tokens,
+                                                **encode_kwargs)
+        for example_id, tokens_or_pair_tokens in examples
+    ]
+
+
+def _close_pool(pool):
+    pool.close()
+    pool.join()
+
+
+class _BatchEncodePool(object):
+    """
+    The persistent process pool of `PretrainedTokenizer.batch_encode`. Workers
+    are initialized with a pickled copy of the tokenizer instead of the
+    tokenizer itself, thus the pool doesn't keep the tokenizer alive and is
+    closed when the tokenizer is collected. It is pickled as None, so copies
+    of the tokenizer don't share the pool.
+    """
+
+    def __init__(self, tokenizer, num_workers):
+        self.num_workers = num_workers
+        self.config = tokenizer._get_batch_encode_config()
+        self.pool = Pool(
+            num_workers,
+            initializer=_init_batch_encode_worker,
+            initargs=(bytes(ForkingPickler.dumps(tokenizer)), ))
+        self._finalizer = weakref.finalize(tokenizer, _close_pool, self.pool)
+
+    def close(self):
+        self._finalizer()
+
+    def __reduce__(self):
+        return (type(None), ())
+
+
 class BatchEncoding(UserDict):
     def __init__(self, data=None):
         super().__init__(data)
@@ -238,6 +296,63 @@ def tokenize_special_chars(text):
     return "".join(output)
 
 
+def bpe_merge(word, bpe_ranks):
+    """
+    Merges the symbols of a word by BPE, which is the same as repeatedly
+    merging all occurrences of the adjacent pair with the lowest rank from left
+    to right, until no adjacent pair is in `bpe_ranks`.
+
+    The symbols are kept in a linked list, and the pairs in a heap ordered by
+    ranks and positions. Pairs broken by earlier merges are skipped when they
+    are popped, thus a word of n symbols is merged in O(n log n) rather than
+    O(n^2) time.
+
+    Args:
+        word (tuple[str]): The symbols of the word.
+        bpe_ranks (dict): The dict mapping pairs of symbols to their ranks.
+
+    Returns:
+        tuple[str]: The merged symbols.
+    """
+    symbols = list(word)
+    size = len(symbols)
+    # Merged symbols are set to None, and `size` marks the end of the list
+    next_index = list(range(1, size + 1))
+    prev_index = list(range(-1, size - 1))
+    heap = []
+    for i in range(size - 1):
+        rank = bpe_ranks.get((symbols[i], symbols[i + 1]))
+        if rank is not None:
+            heap.append((rank, i))
+    heapq.heapify(heap)
+
+    while heap:
+        rank, i = heapq.heappop(heap)
+        # All occurrences of the pair are merged before the new pairs made by
+        # the merges, since the new pairs are pushed after the occurrences
+        # are popped, and always have different ranks
+        positions = [i]
+        while heap and heap[0][0] == rank:
+            positions.append(heapq.heappop(heap)[1])
+        for i in positions:
+            j = next_index[i]
+            # Ranks are unique, so a pair is stale if its rank has changed
+            if symbols[i] is None or j == size or bpe_ranks.get(
+                (symbols[i], symbols[j])) != rank:
+                continue
+            symbols[i] += symbols[j]
+            symbols[j] = None
+            next_index[i] = k = next_index[j]
+            if k != size:
+                prev_index[k] = i
+            for left, right in ((prev_index[i], i), (i, k)):
+                if left != -1 and right != size:
+                    new_rank = bpe_ranks.get((symbols[left], symbols[right]))
+                    if new_rank is not None:
+                        heapq.heappush(heap, (new_rank, left))
+    return tuple(symbol for symbol in symbols if symbol is not None)
+
+
 @dataclass(frozen=True, eq=True)
 class AddedToken:
     """
@@ -460,6 +575,120 @@ class Trie:
         return tokens
 
 
+class TokenizationCache(object):
+    """
+    A bounded LRU cache of tokenization results, which maps words to their
+    sub-tokens, so that frequent words skip the subword algorithm such as BPE,
+    WordPiece or sentencepiece. When the cache is full, the least recently used
+    words are evicted. The cache is thread-safe, and can be shared by the
+    copies of a tokenizer used by many threads.
+
+    Args:
+        max_size (int, optional): The maximum number of words kept in the
+            cache. If 0, nothing is cached. Defaults to 65536.
+
+    Example:
+        .. code-block::
+
+            from paddlenlp.transformers import BertTokenizer
+
+            tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
+            tokenizer.enable_word_cache(max_size=10000)
+            tokens = tokenizer.tokenize('He was a puppeteer')
+            print(tokenizer.word_cache.stats())
+    """
+
+    def __init__(self, max_size=65536):
+        assert max_size >= 0, "max_size should be a non-negative value"
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __getstate__(self):
+        # Locks can't be pickled, and the cached words are not copied to
+        # other processes
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_cache"] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def get(self, key):
+        """
+        Gets the sub-tokens of `key`, or None if it is not cached.
+
+        Args:
+            key (str): The word.
+
+        Returns:
+            Any: The cached sub-tokens.
+        """
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self._misses += 1
+            else:
+                self._cache.move_to_end(key)
+                self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Puts the sub-tokens of `key` into the cache.
+
+        Args:
+            key (str): The word.
+            value (Any): The sub-tokens, which should be immutable such as a
+                str or a tuple.
+        """
+        with self._lock:
+            if self.max_size == 0:
+                return
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self):
+        """
+        Returns the numbers of hits, misses and evictions, the hit rate and the
+        number of cached words.
+
+        Returns:
+            dict: The statistics.
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': self._hits / total if total > 0 else 0.,
+                'size': len(self._cache),
+            }
+
+    def clear(self):
+        """
+        Drops all cached words and resets the statistics.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._hits = self._misses = self._evictions = 0
+
+
 def tokenize_chinese_chars(text):
     """Adds whitespace around any CJK character."""
     output = []
@@ -523,6 +752,10 @@ class PretrainedTokenizer(object):
     pad_token_type_id = 0
     special_tokens_map_extended = {}
     _additional_special_tokens = []
+    # The `TokenizationCache` of words, which is enabled by `enable_word_cache`
+    word_cache = None
+    # The `_BatchEncodePool` of `batch_encode` with `num_workers`
+    _batch_encode_pool = None
 
     def _wrap_init(self, original_init, *args, **kwargs):
         """
@@ -813,6 +1046,8 @@ class PretrainedTokenizer(object):
         return self.vocab_size + len(self.added_tokens_encoder)
 
     def _add_tokens(self, new_tokens, special_tokens=True):
+        # Workers of `batch_encode` hold a stale copy of this tokenizer now
+        self.close()
         if special_tokens:
             add_special_tokens = []
             add_special_tokens_extended = []
@@ -902,6 +1137,60 @@ class PretrainedTokenizer(object):
                 tokenized_text.extend(self._tokenize(token, **kwargs))
         return tokenized_text
 
+    def enable_word_cache(self, max_size=65536, cache=None):
+        """
+        Enables the cache of words, by which the sub-tokens of frequent words
+        are reused rather than computed by the subword algorithm again. It is
+        used by the WordPiece tokenizer of BERT-like tokenizers and the
+        sentencepiece-based tokenizers, and replaces the default cache of BPE
+        tokenizers.
+
+        For sentencepiece-based tokenizers, the text is split by whitespaces
+        and each word is encoded separately, which gives the same pieces as
+        encoding the whole text when the sentencepiece model splits pieces by
+        whitespaces and adds a dummy whitespace prefix, as the default.
+
+        Args:
+            max_size (int, optional): The maximum number of cached words.
+                Defaults to 65536.
+            cache (TokenizationCache, optional): The cache to use, which could
+                be shared by the copies of the tokenizer. Defaults to None,
+                which creates a cache of `max_size` words.
+
+        Returns:
+            TokenizationCache: The cache of words.
+        """
+        if cache is None:
+            cache = TokenizationCache(max_size)
+        self.word_cache = cache
+        # The subword tokenizers keeping their caches in `cache`
+        subword_tokenizers = [
+            self, getattr(self, "wordpiece_tokenizer", None),
+            getattr(self, "encoder", None)
+        ]
+        for subword_tokenizer in subword_tokenizers:
+            if hasattr(subword_tokenizer, "cache"):
+                subword_tokenizer.cache = cache
+        return cache
+
+    def _tokenize_words(self, text, tokenize_fn):
+        """
+        Tokenizes `text` by `tokenize_fn`. If the cache of words is enabled,
+        `text` is split by whitespaces and each word is tokenized separately,
+        with the sub-tokens of words looked up in the cache first.
+        """
+        cache = self.word_cache
+        if cache is None:
+            return tokenize_fn(text)
+        tokens = []
+        for word in text.split():
+            sub_tokens = cache.get(word)
+            if sub_tokens is None:
+                sub_tokens = tuple(tokenize_fn(word))
+                cache.put(word, sub_tokens)
+            tokens.extend(sub_tokens)
+        return tokens
+
     def convert_tokens_to_ids(self, tokens):
         if tokens is None:
             return None
@@ -1628,7 +1917,11 @@ class PretrainedTokenizer(object):
                      return_special_tokens_mask=False,
                      return_dict=True,
                      return_offsets_mapping=False,
-                     add_special_tokens=True):
+                     add_special_tokens=True,
+                     num_workers=0,
+                     chunk_size=None,
+                     return_tensors=None,
+                     pad_to_multiple_of=None):
         """
         Performs tokenization and uses the tokenized tokens to prepare model
         inputs. It supports batch inputs of sequence or sequence pair.
@@ -1710,6 +2003,29 @@ class PretrainedTokenizer(object):
             add_special_tokens (bool, optional):
                 Whether to add the special tokens associated with the corresponding model
                 to the encoded inputs. Defaults to `True`
+            num_workers (int, optional):
+                Number of processes used to encode the batch. If greater than 1,
+                examples are split into chunks and encoded by a persistent process
+                pool whose workers hold a copy of this tokenizer, and the results
+                are identical to serial encoding. The workers are restarted when
+                tokens are added or attributes such as `padding_side` change,
+                and are stopped by `close()`. Defaults to 0.
+            chunk_size (int, optional):
+                Number of examples dispatched to a worker at a time. Only works
+                when `num_workers` is greater than 1. If None, it is decided by
+                the batch size and `num_workers`. Defaults to None.
+            return_tensors (str, optional):
+                If set to 'np', returns a dict of padded numpy arrays instead of
+                lists. Sequence items such as `input_ids` are written into
+                preallocated int64 arrays shaped `[batch_size, max_len]`
+                (`offset_mapping` is shaped `[batch_size, max_len, 2]`), where
+                `max_len` is `max_seq_len` if `pad_to_max_seq_len` is `True`,
+                otherwise the longest length in the batch. `attention_mask` is
+                also padded with 0 when returned. Only works when `return_dict`
+                is `True`. Defaults to None.
+            pad_to_multiple_of (int, optional):
+                If set, `max_len` of the arrays returned for `return_tensors`
+                would be rounded up to a multiple of it. Defaults to None.
 
         Returns:
             list[dict]:
@@ -1742,6 +2058,98 @@ class PretrainedTokenizer(object):
                   feature is generated. Included when `stride` works.
         """
 
+        if return_tensors is not None:
+            if return_tensors != "np":
+                raise ValueError(
+                    "return_tensors should be 'np' or None, but received {}.".
+                    format(return_tensors))
+            if not return_dict:
+                raise ValueError(
+                    "return_tensors is only supported when return_dict is True."
+                )
+
+        encode_kwargs = dict(
+            max_seq_len=max_seq_len,
+            # Padding is done when writing arrays for `return_tensors`
+            pad_to_max_seq_len=pad_to_max_seq_len and return_tensors is None,
+            stride=stride,
+            is_split_into_words=is_split_into_words,
+            truncation_strategy=truncation_strategy,
+            return_position_ids=return_position_ids,
+            return_token_type_ids=return_token_type_ids,
+            return_attention_mask=return_attention_mask,
+            return_length=return_length,
+            return_overflowing_tokens=return_overflowing_tokens,
+            return_special_tokens_mask=return_special_tokens_mask,
+            return_offsets_mapping=return_offsets_mapping,
+            add_special_tokens=add_special_tokens)
+
+        if num_workers > 1 and len(batch_text_or_text_pairs) > 1:
+            examples = list(enumerate(batch_text_or_text_pairs))
+            if chunk_size is None:
+                # Several chunks per worker to balance uneven text lengths
+                chunk_size = max(
+                    1, int(math.ceil(len(examples) / (num_workers * 4.0))))
+            chunks = [(examples[i:i + chunk_size], encode_kwargs)
+                      for i in range(0, len(examples), chunk_size)]
+            pool = self._get_batch_encode_pool(num_workers)
+            # `imap` yields results in the order of submitted chunks, thus the
+            # features keep the same order as serial encoding.
+            encoded_examples = itertools.chain.from_iterable(
+                itertools.chain.from_iterable(
+                    pool.imap(_batch_encode_chunk, chunks)))
+        else:
+            encoded_examples = itertools.chain.from_iterable(
+                self._batch_encode_example(example_id, tokens_or_pair_tokens,
+                                           **encode_kwargs)
+                for example_id, tokens_or_pair_tokens in enumerate(
+                    batch_text_or_text_pairs))
+
+        if return_tensors is not None:
+            return BatchEncoding(
+                self._pad_to_arrays(
+                    list(encoded_examples),
+                    max_seq_len=max_seq_len
+                    if pad_to_max_seq_len else None,
+                    pad_to_multiple_of=pad_to_multiple_of,
+                    return_attention_mask=return_attention_mask))
+
+        batch_outputs = {}
+        batch_encode_inputs = []
+        for encoded_inputs in encoded_examples:
+            if return_dict:
+                for key, value in encoded_inputs.items():
+                    if key not in batch_outputs:
+                        batch_outputs[key] = []
+                    batch_outputs[key].append(value)
+            else:
+                batch_encode_inputs.append(encoded_inputs)
+
+        return BatchEncoding(
+            batch_outputs) if return_dict else batch_encode_inputs
+
+    def _batch_encode_example(self,
+                              example_id,
+                              tokens_or_pair_tokens,
+                              max_seq_len=512,
+                              pad_to_max_seq_len=False,
+                              stride=0,
+                              is_split_into_words=False,
+                              truncation_strategy="longest_first",
+                              return_position_ids=False,
+                              return_token_type_ids=True,
+                              return_attention_mask=False,
+                              return_length=False,
+                              return_overflowing_tokens=False,
+                              return_special_tokens_mask=False,
+                              return_offsets_mapping=False,
+                              add_special_tokens=True):
+        """
+        Encodes one example of `batch_encode` and returns the list of features
+        generated from it. More than one feature would be generated when
+        `stride` works on sequence pair.
+        """
+
         def get_input_ids(text):
             if isinstance(text, str):
                 tokens = self.tokenize(text)
@@ -1759,148 +2167,20 @@ class PretrainedTokenizer(object):
                     "Input is not valid. Should be a string, a list/tuple of strings or a list/tuple of integers."
                 )
 
-        batch_outputs = {}
-        batch_encode_inputs = []
-        for example_id, tokens_or_pair_tokens in enumerate(
-                batch_text_or_text_pairs):
-            if not isinstance(tokens_or_pair_tokens, (list, tuple)):
-                text, text_pair = tokens_or_pair_tokens, None
-            elif is_split_into_words and not isinstance(
-                    tokens_or_pair_tokens[0], (list, tuple)):
-                text, text_pair = tokens_or_pair_tokens, None
-            else:
-                text, text_pair = tokens_or_pair_tokens
-
-            first_ids = get_input_ids(text)
-            second_ids = get_input_ids(
-                text_pair) if text_pair is not None else None
-
-            if stride > 0 and second_ids is not None:
-
-                max_len_for_pair = max_seq_len - len(first_ids) - (
-                    self.num_special_tokens_to_add(pair=True)
-                    if add_special_tokens else 0)
-
-                token_offset_mapping = self.get_offset_mapping(text)
-                token_pair_offset_mapping = self.get_offset_mapping(text_pair)
-
-                offset = 0
-                while offset < len(second_ids):
-                    encoded_inputs = {}
-                    length = len(second_ids) - offset
-                    if length > max_len_for_pair:
-                        length = max_len_for_pair
-
-                    ids = first_ids
-                    pair_ids = second_ids[offset:offset + length]
-                    mapping = token_offset_mapping
-                    pair_mapping = token_pair_offset_mapping[offset:offset +
-                                                             length]
-                    if add_special_tokens:
-                        offset_mapping = self.build_offset_mapping_with_special_tokens(
-                            mapping, pair_mapping)
-                        sequence = self.build_inputs_with_special_tokens(
-                            ids, pair_ids)
-                        token_type_ids = self.create_token_type_ids_from_sequences(
-                            ids, pair_ids)
-                    else:
-                        offset_mapping = mapping + pair_mapping
-                        sequence = ids + pair_ids if pair else ids
-                        token_type_ids = [0] * len(ids) + ([0] * len(pair_ids)
-                                                           if pair else [])
-                    encoded_inputs['offset_mapping'] = offset_mapping
-
-                    # Build output dictionnary
-                    encoded_inputs["input_ids"] = sequence
-                    if return_token_type_ids:
-                        encoded_inputs["token_type_ids"] = token_type_ids
-                    if return_special_tokens_mask:
-                        if add_special_tokens:
-                            encoded_inputs[
-                                "special_tokens_mask"] = self.get_special_tokens_mask(
-                                    ids, pair_ids)
-                        else:
-                            encoded_inputs["special_tokens_mask"] = [0] * len(
-                                sequence)
-                    if return_length:
-                        encoded_inputs["seq_len"] = len(encoded_inputs[
-                            "input_ids"])
-
-                    # Check lengths
-                    assert max_seq_len is None or len(encoded_inputs[
-                        "input_ids"]) <= max_seq_len
-
-                    # Padding
-                    needs_to_be_padded = pad_to_max_seq_len and \
-                                        max_seq_len and len(encoded_inputs["input_ids"]) < max_seq_len
-
-                    if needs_to_be_padded:
-                        difference = max_seq_len - len(encoded_inputs[
-                            "input_ids"])
-                        if self.padding_side == 'right':
-                            if return_attention_mask:
-                                encoded_inputs["attention_mask"] = [1] * len(
-                                    encoded_inputs[
-                                        "input_ids"]) + [0] * difference
-                            if return_token_type_ids:
-                                # 0 for padding token mask
-                                encoded_inputs["token_type_ids"] = (
-                                    encoded_inputs["token_type_ids"] +
-                                    [self.pad_token_type_id] * difference)
-                            if return_special_tokens_mask:
-                                encoded_inputs[
-                                    "special_tokens_mask"] = encoded_inputs[
-                                        "special_tokens_mask"] + [1
-                                                                  ] * difference
-                            encoded_inputs["input_ids"] = encoded_inputs[
-                                "input_ids"] + [self.pad_token_id] * difference
-                            encoded_inputs['offset_mapping'] = encoded_inputs[
-                                'offset_mapping'] + [(0, 0)] * difference
-                        elif self.padding_side == 'left':
-                            if return_attention_mask:
-                                encoded_inputs["attention_mask"] = [
-                                    0
-                                ] * difference + [1] * len(encoded_inputs[
-                                    "input_ids"])
-                            if return_token_type_ids:
-                                # 0 for padding token mask
-                                encoded_inputs["token_type_ids"] = (
-                                    [self.pad_token_type_id] * difference +
-                                    encoded_inputs["token_type_ids"])
-                            if return_special_tokens_mask:
-                                encoded_inputs["special_tokens_mask"] = [
-                                    1
-                                ] * difference + encoded_inputs[
-                                    "special_tokens_mask"]
-                            encoded_inputs["input_ids"] = [
-                                self.pad_token_id
-                            ] * difference + encoded_inputs["input_ids"]
-                            encoded_inputs['offset_mapping'] = [
-                                (0, 0)
-                            ] * difference + encoded_inputs['offset_mapping']
-                    else:
-                        if return_attention_mask:
-                            encoded_inputs["attention_mask"] = [1] * len(
-                                encoded_inputs["input_ids"])
-
-                    if return_position_ids:
-                        encoded_inputs["position_ids"] = list(
-                            range(len(encoded_inputs["input_ids"])))
-
-                    encoded_inputs['overflow_to_sample'] = example_id
-                    if return_dict:
-                        for key, value in encoded_inputs.items():
-                            if key not in batch_outputs:
-                                batch_outputs[key] = []
-                            batch_outputs[key].append(value)
-                    else:
-                        batch_encode_inputs.append(encoded_inputs)
-                    if offset + length == len(second_ids):
-                        break
-                    offset += min(length, stride)
+        if not isinstance(tokens_or_pair_tokens, (list, tuple)):
+            text, text_pair = tokens_or_pair_tokens, None
+        elif is_split_into_words and not isinstance(tokens_or_pair_tokens[0],
+                                                    (list, tuple)):
+            text, text_pair = tokens_or_pair_tokens, None
+        else:
+            text, text_pair = tokens_or_pair_tokens
 
-            else:
-                encoded_inputs = self.encode(
+        first_ids = get_input_ids(text)
+        second_ids = get_input_ids(text_pair) if text_pair is not None else None
+
+        if not (stride > 0 and second_ids is not None):
+            return [
+                self.encode(
                     text,
                     text_pair,
                     max_seq_len=max_seq_len,
@@ -1914,17 +2194,234 @@ class PretrainedTokenizer(object):
                     return_special_tokens_mask=return_special_tokens_mask,
                     return_offsets_mapping=return_offsets_mapping,
                     add_special_tokens=add_special_tokens)
+            ]
+
+        encoded_features = []
+        max_len_for_pair = max_seq_len - len(first_ids) - (
+            self.num_special_tokens_to_add(pair=True)
+            if add_special_tokens else 0)
+
+        token_offset_mapping = self.get_offset_mapping(text)
+        token_pair_offset_mapping = self.get_offset_mapping(text_pair)
+
+        offset = 0
+        while offset < len(second_ids):
+            encoded_inputs = {}
+            length = len(second_ids) - offset
+            if length > max_len_for_pair:
+                length = max_len_for_pair
+
+            ids = first_ids
+            pair_ids = second_ids[offset:offset + length]
+            mapping = token_offset_mapping
+            pair_mapping = token_pair_offset_mapping[offset:offset + length]
+            if add_special_tokens:
+                offset_mapping = self.build_offset_mapping_with_special_tokens(
+                    mapping, pair_mapping)
+                sequence = self.build_inputs_with_special_tokens(ids, pair_ids)
+                token_type_ids = self.create_token_type_ids_from_sequences(
+                    ids, pair_ids)
+            else:
+                offset_mapping = mapping + pair_mapping
+                sequence = ids + pair_ids
+                token_type_ids = [0] * len(ids) + [0] * len(pair_ids)
+            encoded_inputs['offset_mapping'] = offset_mapping
 
-                if return_dict:
-                    for key, value in encoded_inputs.items():
-                        if key not in batch_outputs:
-                            batch_outputs[key] = []
-                        batch_outputs[key].append(value)
+            # Build output dictionnary
+            encoded_inputs["input_ids"] = sequence
+            if return_token_type_ids:
+                encoded_inputs["token_type_ids"] = token_type_ids
+            if return_special_tokens_mask:
+                if add_special_tokens:
+                    encoded_inputs[
+                        "special_tokens_mask"] = self.get_special_tokens_mask(
+                            ids, pair_ids)
                 else:
-                    batch_encode_inputs.append(encoded_inputs)
+                    encoded_inputs["special_tokens_mask"] = [0] * len(sequence)
+            if return_length:
+                encoded_inputs["seq_len"] = len(encoded_inputs["input_ids"])
+
+            # Check lengths
+            assert max_seq_len is None or len(encoded_inputs[
+                "input_ids"]) <= max_seq_len
+
+            # Padding
+            needs_to_be_padded = pad_to_max_seq_len and \
+                                max_seq_len and len(encoded_inputs["input_ids"]) < max_seq_len
+
+            if needs_to_be_padded:
+                difference = max_seq_len - len(encoded_inputs["input_ids"])
+                if self.padding_side == 'right':
+                    if return_attention_mask:
+                        encoded_inputs["attention_mask"] = [1] * len(
+                            encoded_inputs["input_ids"]) + [0] * difference
+                    if return_token_type_ids:
+                        # 0 for padding token mask
+                        encoded_inputs["token_type_ids"] = (
+                            encoded_inputs["token_type_ids"] +
+                            [self.pad_token_type_id] * difference)
+                    if return_special_tokens_mask:
+                        encoded_inputs["special_tokens_mask"] = encoded_inputs[
+                            "special_tokens_mask"] + [1] * difference
+                    encoded_inputs["input_ids"] = encoded_inputs[
+                        "input_ids"] + [self.pad_token_id] * difference
+                    encoded_inputs['offset_mapping'] = encoded_inputs[
+                        'offset_mapping'] + [(0, 0)] * difference
+                elif self.padding_side == 'left':
+                    if return_attention_mask:
+                        encoded_inputs["attention_mask"] = [0] * difference + [
+                            1
+                        ] * len(encoded_inputs["input_ids"])
+                    if return_token_type_ids:
+                        # 0 for padding token mask
+                        encoded_inputs["token_type_ids"] = (
+                            [self.pad_token_type_id] * difference +
+                            encoded_inputs["token_type_ids"])
+                    if return_special_tokens_mask:
+                        encoded_inputs["special_tokens_mask"] = [
+                            1
+                        ] * difference + encoded_inputs["special_tokens_mask"]
+                    encoded_inputs["input_ids"] = [
+                        self.pad_token_id
+                    ] * difference + encoded_inputs["input_ids"]
+                    encoded_inputs['offset_mapping'] = [
+                        (0, 0)
+                    ] * difference + encoded_inputs['offset_mapping']
+            else:
+                if return_attention_mask:
+                    encoded_inputs["attention_mask"] = [1] * len(encoded_inputs[
+                        "input_ids"])
 
-        return BatchEncoding(
-            batch_outputs) if return_dict else batch_encode_inputs
+            if return_position_ids:
+                encoded_inputs["position_ids"] = list(
+                    range(len(encoded_inputs["input_ids"])))
+
+            encoded_inputs['overflow_to_sample'] = example_id
+            encoded_features.append(encoded_inputs)
+            if offset + length == len(second_ids):
+                break
+            offset += min(length, stride)
+
+        return encoded_features
+
+    def _pad_to_arrays(self,
+                       encoded_features,
+                       max_seq_len=None,
+                       pad_to_multiple_of=None,
+                       return_attention_mask=False):
+        """
+        Pads unpadded features generated by `_batch_encode_example` and writes
+        them into preallocated numpy arrays by column.
+        """
+        batch_size = len(encoded_features)
+        lengths = [len(features["input_ids"]) for features in encoded_features]
+        if max_seq_len:
+            max_len = max_seq_len
+        else:
+            max_len = max(lengths) if lengths else 0
+        if pad_to_multiple_of:
+            max_len = int(math.ceil(
+                max_len / float(pad_to_multiple_of))) * pad_to_multiple_of
+
+        pad_values = {
+            "input_ids": self.pad_token_id,
+            "token_type_ids": self.pad_token_type_id,
+            "special_tokens_mask": 1,
+            "offset_mapping": 0,
+        }
+        # Overflowing items only exist in features truncated
+        keys = OrderedDict()
+        for features in encoded_features:
+            keys.update(dict.fromkeys(features.keys()))
+        batch_outputs = {}
+        for key in keys:
+            if key == "attention_mask":
+                continue
+            elif key in pad_values:
+                shape = (batch_size, max_len, 2) if key == "offset_mapping" \
+                    else (batch_size, max_len)
+                array = np.full(shape, pad_values[key], dtype="int64")
+                for i, features in enumerate(encoded_features):
+                    if self.padding_side == "right":
+                        array[i, :lengths[i]] = features[key]
+                    else:
+                        array[i, max_len - lengths[i]:] = features[key]
+                batch_outputs[key] = array
+            elif key == "position_ids":
+                # Keep the same as position ids of padded list outputs
+                batch_outputs[key] = np.tile(
+                    np.arange(
+                        max_len, dtype="int64"), (batch_size, 1))
+            elif key == "overflowing_tokens":
+                batch_outputs[key] = [
+                    features.get(key, []) for features in encoded_features
+                ]
+            else:
+                batch_outputs[key] = np.array(
+                    [features.get(key, 0) for features in encoded_features],
+                    dtype="int64")
+
+        if return_attention_mask:
+            attention_mask = np.zeros((batch_size, max_len), dtype="int64")
+            for i, length in enumerate(lengths):
+                if self.padding_side == "right":
+                    attention_mask[i, :length] = 1
+                else:
+                    attention_mask[i, max_len - length:] = 1
+            batch_outputs["attention_mask"] = attention_mask
+        return batch_outputs
+
+    def _get_batch_encode_config(self):
+        """
+        Returns the special tokens and the scalar attributes of this tokenizer
+        and of its components, such as `padding_side` and `do_lower_case` of
+        `basic_tokenizer`, which are compared to decide whether workers of
+        `batch_encode` hold a stale copy of this tokenizer.
+        """
+        scalar_types = (str, int, float, bool, type(None), AddedToken)
+        config = [(name, value) for name, value in vars(self).items()
+                  if isinstance(value, scalar_types)]
+        config.append(("special_tokens_map", dict(self.special_tokens_map)))
+        for name, value in vars(self).items():
+            if isinstance(value, (scalar_types, TokenizationCache,
+                                  _BatchEncodePool)) or not isinstance(
+                                      getattr(value, "__dict__", None), dict):
+                continue
+            # Private attributes of components are states such as lazily
+            # built tables rather than configurations
+            config.append((name, [(key, item)
+                                  for key, item in vars(value).items()
+                                  if not key.startswith("_") and
+                                  isinstance(item, scalar_types)]))
+        return config
+
+    def _get_batch_encode_pool(self, num_workers):
+        """
+        Returns the persistent process pool used by `batch_encode`. Workers of
+        the pool are initialized only once with a copy of this tokenizer, and
+        the pool would be recreated when `num_workers` or the configuration of
+        this tokenizer changes.
+        """
+        pool = self._batch_encode_pool
+        if pool is not None and (pool.num_workers != num_workers or
+                                 pool.config != self._get_batch_encode_config()):
+            self.close()
+            pool = None
+        if pool is None:
+            pool = _BatchEncodePool(self, num_workers)
+            self._batch_encode_pool = pool
+        return pool.pool
+
+    def close(self):
+        """
+        Closes the worker processes of `batch_encode` with `num_workers`, which
+        are also closed when the tokenizer is garbage collected. It's safe to
+        call `batch_encode` with `num_workers` again after closing, which
+        starts new workers.
+        """
+        if self._batch_encode_pool is not None:
+            self._batch_encode_pool.close()
+            self._batch_encode_pool = None
 
     def get_offset_mapping(self, text):
         """
@@ -2020,7 +2517,7 @@ class BPETokenizer(PretrainedTokenizer):
             self.byte_encoder = self._bytes_to_unicode()
             self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
             self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-            self.cache = {}
+            self.cache = TokenizationCache()
             self.re = try_import("regex")
             self.special_tokens = special_tokens
 
@@ -2070,47 +2567,18 @@ class BPETokenizer(PretrainedTokenizer):
             return pairs
 
         def bpe(self, token):
-            if token in self.cache:
-                return self.cache[token]
+            word = self.cache.get(token)
+            if word is not None:
+                return word
             word = tuple(token)
             pairs = self._get_pairs(word)
 
             if not pairs:
                 return token
 
-            while True:
-                bigram = min(
-                    pairs,
-                    key=lambda pair: self.bpe_ranks.get(pair, float('inf')))
-                if bigram not in self.bpe_ranks:
-                    break
-                first, second = bigram
-                new_word = []
-                i = 0
-                while i < len(word):
-                    try:
-                        j = word.index(first, i)
-                        new_word.extend(word[i:j])
-                        i = j
-                    except:
-                        new_word.extend(word[i:])
-                        break
-
-                    if word[i] == first and i < len(word) - 1 and word[
-                            i + 1] == second:
-                        new_word.append(first + second)
-                        i += 2
-                    else:
-                        new_word.append(word[i])
-                        i += 1
-                new_word = tuple(new_word)
-                word = new_word
-                if len(word) == 1:
-                    break
-                else:
-                    pairs = self._get_pairs(word)
+            word = bpe_merge(word, self.bpe_ranks)
             word = ' '.join(word)
-            self.cache[token] = word
+            self.cache.put(token, word)
 
             return word
 
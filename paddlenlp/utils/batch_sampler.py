@@ -19,7 +19,7 @@ import numpy as np
 import math
 import paddle
 
-__all__ = ["DistributedBatchSampler"]
+__all__ = ["DistributedBatchSampler", "DistributedTokenBatchSampler"]
 
 
 class DistributedBatchSampler(paddle.io.BatchSampler):
@@ -49,6 +49,12 @@ class DistributedBatchSampler(paddle.io.BatchSampler):
             batch indices. Default False.
         drop_last(bool): whether drop the last incomplete batch dataset size
             is not divisible by the batch size. Default False
+        consumed_samples(int, optional): the number of samples of the current
+            epoch already consumed by all processes, which are skipped without
+            being loaded. It is used to resume training in the middle of an
+            epoch. Default 0.
+        seed(int, optional): the random seed to shuffle indices, and the seed
+            of each epoch is :attr:`seed` plus the epoch number. Default 0.
 
     Examples:
         .. code-block:: python
@@ -85,7 +91,8 @@ class DistributedBatchSampler(paddle.io.BatchSampler):
                  rank=None,
                  shuffle=False,
                  drop_last=False,
-                 consumed_samples=0):
+                 consumed_samples=0,
+                 seed=0):
         self.dataset = dataset
 
         assert isinstance(batch_size, int) and batch_size > 0, \
@@ -115,6 +122,7 @@ class DistributedBatchSampler(paddle.io.BatchSampler):
 
         self.drop_last = drop_last
         self.epoch = 0
+        self.seed = seed
 
         self.consumed_samples = consumed_samples
         self.num_samples = int(math.ceil(len(self.dataset) * 1.0 / self.nranks))
@@ -123,16 +131,16 @@ class DistributedBatchSampler(paddle.io.BatchSampler):
     def __iter__(self):
         assert self.consumed_samples % self.nranks == 0, \
             "The consumed_samples should be divided by nranks. consumed_samples=%d, nranks=%s" % (
-            self.consumed_samples, nranks)
-        self.remain_num_samples = int(
-            math.ceil((len(self.dataset) - self.consumed_samples) * 1.0 /
-                      self.nranks))
-        self.remain_total_size = self.remain_num_samples * self.nranks
+            self.consumed_samples, self.nranks)
+        indices = np.arange(len(self.dataset))
+        if self.shuffle:
+            np.random.RandomState(self.seed + self.epoch).shuffle(indices)
+        # add extra samples to make it evenly divisible
+        indices = np.resize(indices, self.total_size)
 
         batch_indices = []
-        for idx in range(self.consumed_samples + self.local_rank,
-                         self.consumed_samples + self.remain_total_size,
-                         self.nranks):
+        for idx in indices[self.consumed_samples + self.local_rank::
+                           self.nranks].tolist():
             batch_indices.append(idx)
             if len(batch_indices) == self.batch_size:
                 yield batch_indices
@@ -155,6 +163,8 @@ class DistributedBatchSampler(paddle.io.BatchSampler):
 
         Arguments:
             epoch (int): Epoch number.
+            consumed_samples (int, optional): The number of samples of the
+                epoch already consumed by all processes. Default 0.
 
         Examples:
             .. code-block:: python
@@ -181,5 +191,269 @@ class DistributedBatchSampler(paddle.io.BatchSampler):
                     sampler.set_epoch(epoch)
         """
         self.epoch = epoch
-        # if we reset the epoch, the consumed_samples should be set to 0.
-        self.consumed_samples = 0
+        # Samples of a new epoch are not consumed unless resuming training
+        self.consumed_samples = consumed_samples
+
+    def get_consumed_samples(self, num_steps):
+        """
+        Returns the number of samples consumed by all processes in the first
+        `num_steps` batches of the epoch, which can be passed to
+        :meth:`set_epoch` to resume training.
+
+        Arguments:
+            num_steps (int): The number of batches consumed by each process.
+        """
+        return num_steps * self.batch_size * self.nranks
+
+
+def _default_length_fn(example):
+    if isinstance(example, dict):
+        return len(example["input_ids"])
+    return len(example[0])
+
+
+class DistributedTokenBatchSampler(paddle.io.BatchSampler):
+    """Sampler that packs samples of similar lengths into batches with a
+    budget of tokens, and restricts data loading to a subset of the batches.
+
+    Samples are grouped into buckets and sorted by lengths in each bucket,
+    then packed into batches whose numbers of tokens, computed as the number
+    of samples times the maximum length in the batch, don't exceed
+    :attr:`max_tokens`. A sample longer than :attr:`max_tokens` makes a batch
+    by itself. The batches are shuffled and dealt to the processes in turn,
+    and each process gets the same number of batches in an epoch.
+
+    .. note::
+        Dataset is assumed to be of constant size.
+
+    Args:
+        dataset(paddle.io.Dataset): this could be a `paddle.io.Dataset` implement
+                     or other python object which implemented
+                     `__len__` and `__getitem__`.
+        max_tokens(int): the maximum number of tokens of a batch, including
+            paddings.
+        lengths(list|numpy.ndarray, optional): the lengths of samples. If None,
+            the lengths are computed by :attr:`length_fn`. Default None.
+        length_fn(callable, optional): the function taking a sample and
+            returning its length. If None, the length of a dict sample is the
+            length of its `input_ids`, and the length of other samples is the
+            length of their first fields. Default None.
+        max_batch_size(int, optional): the maximum number of samples of a batch.
+            Default None, which means no limit.
+        num_replicas(int, optional): porcess number in distributed training.
+            If :attr:`num_replicas` is None, :attr:`num_replicas` will be
+            retrieved from :code:`paddle.distributed.ParallenEnv`.
+            Default None.
+        rank(int, optional): the rank of the current process among :attr:`num_replicas`
+            processes. If :attr:`rank` is None, :attr:`rank` is retrieved from
+            :code:`paddle.distributed.ParallenEnv`. Default None.
+        shuffle(bool): whther to shuffle samples before grouping them into
+            buckets, and to shuffle the batches. Default False.
+        drop_last(bool): whether to drop the last batches if the number of
+            batches is not divisible by :attr:`num_replicas`. Otherwise, the
+            first batches are repeated to make it divisible. Default False.
+        bucket_size(int, optional): the number of samples of a bucket. If
+            None, all samples are sorted as one bucket. Default None.
+        consumed_samples(int, optional): the number of samples of the current
+            epoch already consumed by all processes, which are skipped without
+            being loaded. It should be the value returned by
+            :meth:`get_consumed_samples`. Default 0.
+        seed(int, optional): the random seed to shuffle samples and batches,
+            and the seed of each epoch is :attr:`seed` plus the epoch number.
+            Default 0.
+
+    Examples:
+        .. code-block:: python
+
+            import numpy as np
+
+            from paddle.io import Dataset
+            from paddlenlp.utils.batch_sampler import DistributedTokenBatchSampler
+
+            class RandomDataset(Dataset):
+                def __init__(self, num_samples):
+                    self.num_samples = num_samples
+
+                def __getitem__(self, idx):
+                    length = idx % 50 + 1
+                    return {"input_ids": np.random.randint(0, 100, [length])}
+
+                def __len__(self):
+                    return self.num_samples
+
+            dataset = RandomDataset(100)
+            sampler = DistributedTokenBatchSampler(
+                dataset, max_tokens=256, shuffle=True)
+
+            for data in sampler:
+                # do something
+                break
+    """
+
+    def __init__(self,
+                 dataset,
+                 max_tokens,
+                 lengths=None,
+                 length_fn=None,
+                 max_batch_size=None,
+                 num_replicas=None,
+                 rank=None,
+                 shuffle=False,
+                 drop_last=False,
+                 bucket_size=None,
+                 consumed_samples=0,
+                 seed=0):
+        self.dataset = dataset
+
+        assert isinstance(max_tokens, int) and max_tokens > 0, \
+                "max_tokens should be a positive integer"
+        self.max_tokens = max_tokens
+        assert max_batch_size is None or max_batch_size > 0, \
+                "max_batch_size should be a positive integer"
+        self.max_batch_size = max_batch_size
+        assert bucket_size is None or bucket_size > 0, \
+                "bucket_size should be a positive integer"
+        self.bucket_size = bucket_size
+        assert isinstance(shuffle, bool), \
+                "shuffle should be a boolean value"
+        self.shuffle = shuffle
+        assert isinstance(drop_last, bool), \
+                "drop_last should be a boolean number"
+        self.drop_last = drop_last
+
+        from paddle.fluid.dygraph.parallel import ParallelEnv
+
+        if num_replicas is not None:
+            assert isinstance(num_replicas, int) and num_replicas > 0, \
+                    "num_replicas should be a positive integer"
+            self.nranks = num_replicas
+        else:
+            self.nranks = ParallelEnv().nranks
+
+        if rank is not None:
+            assert isinstance(rank, int) and rank >= 0, \
+                    "rank should be a non-negative integer"
+            self.local_rank = rank
+        else:
+            self.local_rank = ParallelEnv().local_rank
+
+        if lengths is None:
+            length_fn = length_fn or _default_length_fn
+            lengths = [length_fn(dataset[i]) for i in range(len(dataset))]
+        self.lengths = np.asarray(lengths, dtype="int64")
+        assert len(self.lengths) == len(self.dataset), \
+                "lengths should have the same size as the dataset"
+
+        self.epoch = 0
+        self.seed = seed
+        self.consumed_samples = consumed_samples
+        # The batches of the cached epoch
+        self._batches_epoch = None
+        self._batches = None
+
+    def _pack(self, bucket):
+        """
+        Packs the samples of a bucket sorted by lengths into batches, and
+        returns the start and end positions of the batches.
+        """
+        lengths = np.maximum(self.lengths[bucket], 1)
+        # A batch starting at `start` can end at `end` if
+        # `lengths[end - 1] * (end - start) <= max_tokens`, i.e.
+        # `limits[end - 1] <= start`, and `limits` is increasing.
+        limits = np.arange(1, len(bucket) + 1) - self.max_tokens // lengths
+        starts = []
+        ends = []
+        start = 0
+        while start < len(bucket):
+            end = max(
+                int(np.searchsorted(
+                    limits, start, side="right")), start + 1)
+            if self.max_batch_size is not None:
+                end = min(end, start + self.max_batch_size)
+            starts.append(start)
+            ends.append(end)
+            start = end
+        return starts, ends
+
+    def _get_batches(self):
+        """
+        Returns the sample indices of the epoch, the start and end positions
+        of batches in the indices in the order of loading, and the number of
+        samples consumed by all processes after each step.
+        """
+        if self._batches_epoch == self.epoch:
+            return self._batches
+        rng = np.random.RandomState(self.seed + self.epoch)
+        indices = np.arange(len(self.dataset))
+        if self.shuffle:
+            rng.shuffle(indices)
+        bucket_size = self.bucket_size or max(len(indices), 1)
+        starts = []
+        ends = []
+        for offset in range(0, len(indices), bucket_size):
+            bucket = indices[offset:offset + bucket_size]
+            # The stable sort keeps the shuffled order of samples of the same length
+            bucket = bucket[np.argsort(self.lengths[bucket], kind="stable")]
+            indices[offset:offset + bucket_size] = bucket
+            bucket_starts, bucket_ends = self._pack(bucket)
+            starts.extend(offset + start for start in bucket_starts)
+            ends.extend(offset + end for end in bucket_ends)
+
+        order = np.arange(len(starts))
+        if self.shuffle:
+            rng.shuffle(order)
+        # Every process gets the same number of batches
+        if self.drop_last:
+            order = order[:len(order) // self.nranks * self.nranks]
+        else:
+            order = np.resize(order,
+                              -(-len(order) // self.nranks) * self.nranks)
+        starts = np.asarray(starts, dtype="int64")[order]
+        ends = np.asarray(ends, dtype="int64")[order]
+        step_samples = (ends - starts).reshape([-1, self.nranks]).sum(axis=1)
+        consumed_samples = np.concatenate([[0], np.cumsum(step_samples)])
+
+        self._batches_epoch = self.epoch
+        self._batches = (indices, starts, ends, consumed_samples)
+        return self._batches
+
+    def __iter__(self):
+        indices, starts, ends, consumed_samples = self._get_batches()
+        step = int(np.searchsorted(consumed_samples, self.consumed_samples))
+        assert step < len(consumed_samples) and consumed_samples[
+            step] == self.consumed_samples, \
+            "The consumed_samples should be the number of samples of whole steps. consumed_samples=%d" % (
+            self.consumed_samples)
+        for i in range(step * self.nranks + self.local_rank, len(starts),
+                       self.nranks):
+            yield indices[starts[i]:ends[i]].tolist()
+
+    def __len__(self):
+        return len(self._get_batches()[1]) // self.nranks
+
+    def set_epoch(self, epoch, consumed_samples=0):
+        """
+        Sets the epoch number. When :attr:`shuffle=True`, this number is used
+        as seeds of random numbers. If set same number at each epoch, this
+        sampler will yield the same batches at all epoches.
+
+        Arguments:
+            epoch (int): Epoch number.
+            consumed_samples (int, optional): The number of samples of the
+                epoch already consumed by all processes. Default 0.
+        """
+        self.epoch = epoch
+        # Samples of a new epoch are not consumed unless resuming training
+        self.consumed_samples = consumed_samples
+
+    def get_consumed_samples(self, num_steps):
+        """
+        Returns the number of samples consumed by all processes in the first
+        `num_steps` batches of the epoch, which can be passed to
+        :meth:`set_epoch` to resume training.
+
+        Arguments:
+            num_steps (int): The number of batches consumed by each process.
+        """
+        consumed_samples = self._get_batches()[3]
+        return int(consumed_samples[min(num_steps, len(consumed_samples) - 1)])
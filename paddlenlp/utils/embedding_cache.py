@@ -0,0 +1,228 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+__all__ = ['EmbeddingCache']
+
+
+class EmbeddingCache(object):
+    """
+    A bounded LRU cache of embeddings, keyed by texts or token ids together
+    with the fingerprint of the model producing the embeddings. When the cache
+    is full, the least recently used embeddings are evicted, and they are
+    spilled to a sqlite database if `spill_path` is given, from which they are
+    loaded again on later misses. The cache is thread-safe.
+
+    Args:
+        fingerprint (str): The fingerprint of the model and its settings, such
+            as the model name and the maximum sequence length. Embeddings of
+            different fingerprints never hit each other, even if they are
+            spilled to the same database.
+        max_size (int, optional): The maximum number of embeddings kept in
+            memory. If 0, embeddings are not cached in memory. Defaults to 4096.
+        spill_path (str, optional): The path of the sqlite database which
+            embeddings evicted from memory are written to. Defaults to None,
+            which drops evicted embeddings.
+
+    Example:
+        .. code-block::
+
+            import numpy as np
+            from paddlenlp.utils.embedding_cache import EmbeddingCache
+
+            cache = EmbeddingCache("simbert-base-chinese:128", max_size=2)
+            encode_fn = lambda texts: np.random.rand(len(texts), 4)
+            # "a" is only encoded once
+            embeddings = cache.encode(["a", "b", "a"], encode_fn)
+            print(cache.stats())
+    """
+
+    def __init__(self, fingerprint, max_size=4096, spill_path=None):
+        assert max_size >= 0, "max_size should be a non-negative value"
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        self.spill_path = spill_path
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._db = None
+        if spill_path is not None:
+            dirname = os.path.dirname(spill_path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self._db = sqlite3.connect(spill_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings "
+                             "(key TEXT PRIMARY KEY, dtype TEXT, value BLOB)")
+            self._db.commit()
+
+    @staticmethod
+    def normalize_text(text):
+        """
+        Normalizes the whitespaces of a text, which don't change the tokens of
+        the text.
+        """
+        return " ".join(text.split())
+
+    def _spill_key(self, key):
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        return hashlib.sha1(
+            self.fingerprint.encode("utf-8") + b"\x00" + key).hexdigest()
+
+    def _spill(self, items):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+            [(self._spill_key(key), value.dtype.str, value.tobytes())
+             for key, value in items])
+        self._db.commit()
+
+    def _load_spilled(self, key):
+        row = self._db.execute("SELECT dtype, value FROM embeddings WHERE key=?",
+                               (self._spill_key(key), )).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[1], dtype=row[0])
+
+    def _put(self, key, value):
+        # Should be called with the lock held
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        evicted = []
+        while len(self._cache) > self.max_size:
+            evicted.append(self._cache.popitem(last=False))
+        if evicted and self._db is not None:
+            self._spill(evicted)
+
+    def get(self, key):
+        """
+        Gets the embedding of `key`, or None if it is not cached.
+
+        Args:
+            key (str|bytes): The text or token ids.
+
+        Returns:
+            numpy.ndarray|None: The embedding.
+        """
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            elif self._db is not None:
+                value = self._load_spilled(key)
+                if value is not None:
+                    self._put(key, value)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Puts the embedding of `key` into the cache.
+
+        Args:
+            key (str|bytes): The text or token ids.
+            value (numpy.ndarray): The embedding.
+        """
+        value = np.asarray(value)
+        with self._lock:
+            if self.max_size > 0:
+                self._put(key, value)
+            elif self._db is not None:
+                self._spill([(key, value)])
+
+    def encode(self, keys, encode_fn):
+        """
+        Gets the embeddings of `keys`. Keys are deduplicated, and only the
+        keys missing in the cache are encoded by one call of `encode_fn`.
+
+        Args:
+            keys (list[str|bytes]): The texts or token ids.
+            encode_fn (callable): The function taking a list of unique keys
+                missing in the cache and returning their embeddings as a
+                numpy.ndarray or a list of numpy.ndarray.
+
+        Returns:
+            numpy.ndarray: The embeddings of `keys` stacked in order.
+        """
+        embeddings = {}
+        missing_keys = []
+        for key in keys:
+            if key in embeddings:
+                continue
+            embeddings[key] = self.get(key)
+            if embeddings[key] is None:
+                missing_keys.append(key)
+        if missing_keys:
+            for key, value in zip(missing_keys, encode_fn(missing_keys)):
+                self.put(key, value)
+                embeddings[key] = np.asarray(value)
+        return np.stack([embeddings[key] for key in keys])
+
+    def stats(self):
+        """
+        Returns the numbers of hits and misses, the hit rate and the number of
+        embeddings in memory.
+
+        Returns:
+            dict: The statistics.
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total > 0 else 0.,
+                'size': len(self._cache),
+            }
+
+    def set_fingerprint(self, fingerprint):
+        """
+        Sets the fingerprint of the model, e.g. after its parameters change.
+        Embeddings in memory are dropped if the fingerprint changes, while the
+        spilled ones are kept and only hit by their own fingerprint.
+
+        Args:
+            fingerprint (str): The new fingerprint.
+        """
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self.fingerprint = fingerprint
+                self._cache.clear()
+
+    def clear(self):
+        """
+        Drops all embeddings in memory. Spilled embeddings are kept.
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """
+        Spills the embeddings in memory and closes the spill database.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._spill(list(self._cache.items()))
+                self._db.close()
+                self._db = None
@@ -0,0 +1,106 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from paddle.io import DataLoader
+from paddlenlp.datasets import IterDataset, load_dataset, read_lines
+
+from common_test import CpuCommonTest
+
+
+def read(data_files, num_shards=1, index=0):
+    for line in read_lines(data_files, num_shards, index):
+        yield {'text': line.rstrip('\n')}
+
+
+class TestIterDataset(CpuCommonTest):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.data_files = []
+        self.lines = []
+        for i in range(3):
+            path = os.path.join(self.data_dir, 'part-{}'.format(i))
+            lines = [
+                'line {} {}'.format(i, 'x' * (j % 7))
+                for j in range(20 + i * 5)
+            ]
+            with open(path, 'w') as f:
+                f.write(''.join(line + '\n' for line in lines))
+            self.data_files.append(path)
+            self.lines.extend(lines)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_read_lines(self):
+        for num_shards in [1, 2, 3, 7, 100]:
+            lines = []
+            for index in range(num_shards):
+                lines.extend(
+                    read_lines(self.data_files, num_shards, index))
+            self.check_output_equal([line.rstrip('\n') for line in lines],
+                                    self.lines)
+
+    def test_shard(self):
+        ds = load_dataset(read, data_files=self.data_files, lazy=True)
+        ds.filter(lambda x: x['text'].endswith('x')).map(lambda x: x['text'])
+        expected = [line for line in self.lines if line.endswith('x')]
+        # Lazy datasets can be iterated more than once.
+        self.check_output_equal(list(iter(ds)), expected)
+        self.check_output_equal(list(iter(ds)), expected)
+
+        texts = []
+        for index in range(3):
+            texts.extend(iter(ds.shard(3, index)))
+        self.check_output_equal(sorted(texts), sorted(expected))
+
+    def test_shard_non_shard_aware(self):
+        ds = IterDataset(lambda: iter(range(20))).shard(3, 1)
+        self.check_output_equal(list(iter(ds)), list(range(1, 20, 3)))
+
+    def test_shuffle_prefetch(self):
+        ds = IterDataset(lambda: iter(range(100))).shuffle(
+            10, seed=1).prefetch(4)
+        first_epoch = list(iter(ds))
+        self.check_output_equal(sorted(first_epoch), list(range(100)))
+        self.assertNotEqual(first_epoch, list(range(100)))
+
+    def test_set_epoch(self):
+        ds = IterDataset(lambda: iter(range(100))).shuffle(10, seed=1)
+        first_epoch = list(iter(ds))
+        self.assertEqual(list(iter(ds)), first_epoch)
+        second_epoch = list(iter(ds.set_epoch(1)))
+        self.assertEqual(sorted(second_epoch), list(range(100)))
+        self.assertNotEqual(second_epoch, first_epoch)
+        self.assertEqual(list(iter(ds.set_epoch(0))), first_epoch)
+
+    def test_set_epoch_num_workers(self):
+        ds = IterDataset(lambda: iter(range(100))).shuffle(10, seed=1)
+        loader = DataLoader(ds, batch_size=5, num_workers=2)
+        epochs = []
+        for epoch in range(2):
+            ds.set_epoch(epoch)
+            epochs.append(
+                [x for batch in loader for x in batch.numpy().tolist()])
+        self.assertEqual(sorted(epochs[0]), list(range(100)))
+        self.assertEqual(sorted(epochs[1]), list(range(100)))
+        self.assertNotEqual(epochs[0], epochs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
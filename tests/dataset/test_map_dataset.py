@@ -0,0 +1,193 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from functools import partial
+
+import paddlenlp.datasets.dataset as dataset_module
+from paddlenlp.datasets import MapDataset, load_dataset
+
+from common_test import CpuCommonTest
+
+
+def convert_example(example, prefix):
+    return {'text': prefix + example['text'], 'label': example['label']}
+
+
+PREFIX = 'global '
+LOCK = threading.Lock()
+
+
+def convert_example_with_global(example):
+    return convert_example(example, PREFIX)
+
+
+def get_examples(num_examples=20):
+    return [{
+        'text': 'text {}'.format(i),
+        'label': i % 2
+    } for i in range(num_examples)]
+
+
+class TestMapDatasetCache(CpuCommonTest):
+    def setUp(self):
+        self.data_home = tempfile.mkdtemp()
+        self.origin_data_home = dataset_module.DATA_HOME
+        dataset_module.DATA_HOME = self.data_home
+
+    def tearDown(self):
+        dataset_module.DATA_HOME = self.origin_data_home
+        shutil.rmtree(self.data_home)
+
+    def test_map_cache(self):
+        fn = partial(convert_example, prefix='cached ')
+        expected = [fn(example) for example in get_examples()]
+        ds = MapDataset(get_examples()).map(fn, use_cache=True)
+        self.check_output_equal(len(ds), len(expected))
+        for idx in range(len(ds)):
+            self.assertEqual(ds[idx], expected[idx])
+
+        cache_dir = os.path.join(self.data_home, 'map_cache')
+        cache_files = sorted(os.listdir(cache_dir))
+        # Loading from the cache would not add new cache files.
+        ds = MapDataset(get_examples()).map(fn, use_cache=True)
+        self.check_output_equal(sorted(os.listdir(cache_dir)), cache_files)
+        self.assertEqual(ds[-1], expected[-1])
+
+    def test_map_cache_fingerprint(self):
+        MapDataset(get_examples()).map(
+            partial(
+                convert_example, prefix='a '), use_cache=True)
+        ds = MapDataset(get_examples()).map(
+            partial(
+                convert_example, prefix='b '), use_cache=True)
+        self.check_output_equal(ds[0]['text'], 'b text 0')
+        ds = MapDataset(get_examples(10)).map(
+            partial(
+                convert_example, prefix='b '), use_cache=True)
+        self.check_output_equal(len(ds), 10)
+
+    def test_map_cache_global_fingerprint(self):
+        global PREFIX
+        MapDataset(get_examples()).map(
+            convert_example_with_global, use_cache=True)
+        origin_prefix, PREFIX = PREFIX, 'changed '
+        try:
+            ds = MapDataset(get_examples()).map(
+                convert_example_with_global, use_cache=True)
+        finally:
+            PREFIX = origin_prefix
+        self.check_output_equal(ds[0]['text'], 'changed text 0')
+
+    def test_map_cache_unhashable(self):
+        # Functions referring to values which can't be fingerprinted are not
+        # cached
+        ds = MapDataset(get_examples()).map(
+            lambda example: dict(example, locked=LOCK.locked()),
+            use_cache=True)
+        self.assertEqual(ds[0], dict(get_examples()[0], locked=False))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.data_home, 'map_cache')))
+
+
+def read_examples(num_examples):
+    for example in get_examples(num_examples):
+        yield example
+
+
+class TestMapDatasetMMap(CpuCommonTest):
+    def setUp(self):
+        self.data_home = tempfile.mkdtemp()
+        self.origin_data_home = dataset_module.DATA_HOME
+        dataset_module.DATA_HOME = self.data_home
+
+    def tearDown(self):
+        dataset_module.DATA_HOME = self.origin_data_home
+        shutil.rmtree(self.data_home)
+
+    def test_load(self):
+        ds = load_dataset(
+            read_examples, num_examples=20, lazy=False, mmap=True)
+        expected = get_examples(20)
+        self.check_output_equal(len(ds), len(expected))
+        for idx in range(len(ds)):
+            self.assertEqual(ds[idx], expected[idx])
+
+    def test_map_filter_shard(self):
+        ds = load_dataset(
+            read_examples, num_examples=20, lazy=False, mmap=True)
+        expected = MapDataset(get_examples(20))
+        for dataset in [ds, expected]:
+            dataset.map(partial(
+                convert_example, prefix='mmap '), lazy=False)
+            dataset.filter(lambda example: example['label'] == 1)
+            dataset.shard(num_shards=2, index=1)
+        self.check_output_equal(len(ds), len(expected))
+        for idx in range(len(ds)):
+            self.assertEqual(ds[idx], expected[idx])
+
+    def test_map_num_workers(self):
+        ds = load_dataset(
+            read_examples, num_examples=20, lazy=False, mmap=True)
+        fn = partial(convert_example, prefix='mmap ')
+        ds.map(fn, num_workers=2)
+        expected = [fn(example) for example in get_examples(20)]
+        self.check_output_equal(len(ds), len(expected))
+        for idx in range(len(ds)):
+            self.assertEqual(ds[idx], expected[idx])
+
+    def test_map_filter_num_workers_from_list(self):
+        fn = partial(convert_example, prefix='mmap ')
+        ds = MapDataset(get_examples(20)).map(fn, num_workers=3, mmap=True)
+        ds.filter(lambda x: x['label'] == 0, num_workers=2)
+        expected = [
+            fn(example) for example in get_examples(20)
+            if example['label'] == 0
+        ]
+        self.assertIsInstance(ds.new_data, dataset_module.MMapExamples)
+        self.check_output_equal(len(ds), len(expected))
+        for idx in range(len(ds)):
+            self.assertEqual(ds[idx], expected[idx])
+
+    def test_temporary_stores(self):
+        ds = load_dataset(
+            read_examples, num_examples=20, lazy=False, mmap=True)
+        fn = partial(convert_example, prefix='mmap ')
+        ds.map(fn, lazy=False)
+        ds.filter(lambda example: example['label'] == 1)
+        ds.map(fn, num_workers=2)
+        self.assertEqual(ds[0], fn(fn(get_examples(2)[1])))
+        # Stores and index files are removed with the dataset
+        del ds
+        gc.collect()
+        self.assertEqual(os.listdir(os.path.join(self.data_home, 'mmap')), [])
+
+    def test_concat(self):
+        examples = load_dataset(
+            read_examples, num_examples=4, lazy=False, mmap=True).new_data
+        concated = dataset_module.MMapExamples.concat([
+            dataset_module.MMapExamples([]), examples, examples.select([3, 0])
+        ])
+        expected = get_examples(4)
+        self.assertEqual(list(concated), expected + [expected[3], expected[0]])
+        self.assertEqual(len(dataset_module.MMapExamples.concat([])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,6 +16,7 @@ import os
 import unittest
 import paddle
 from paddlenlp.embeddings import TokenEmbedding
+from paddlenlp.embeddings.token_embedding import EMBEDDING_HOME, _load_vectors
 from paddlenlp.utils.log import logger
 from util import get_vocab_list, create_test_data
 
@@ -54,6 +55,83 @@ class TestTokenEmbeddingUNK(TestTokenEmbedding):
             self.embedding.search(self.embedding.unknown_token)[0])
 
 
+class TestTokenEmbeddingConvertedVectors(TestTokenEmbedding):
+    def test_converted_vectors(self):
+        self.embedding = TokenEmbedding(**self.config)
+        name = self.config["embedding_name"]
+        table = np.load(
+            os.path.join(EMBEDDING_HOME, name + ".npy"), mmap_mode="r")
+        # The rows of unk and pad are reserved in the converted table
+        self.check_output_equal(table.shape, self.embedding.weight.shape)
+        self.check_output_equal(table[-2:], np.zeros_like(table[-2:]))
+        self.check_output_equal(
+            self.embedding.search(self.embedding.unknown_token).shape,
+            (1, table.shape[1]))
+        self.check_output_equal(
+            self.embedding.search(self.embedding.vocab.to_tokens(0))[0],
+            table[0])
+
+
+class TestLoadVectors(CommonTest):
+    def setUp(self):
+        self.name = "test.load_vectors.{}".format(os.getpid())
+        self.words = ["a", "b\r", "\rc", "d\r\re", "f\u2028g", ""]
+        self.embedding = np.random.rand(len(self.words), 4).astype("float32")
+        np.savez(
+            os.path.join(EMBEDDING_HOME, self.name + ".npz"),
+            vocab=np.array(self.words),
+            embedding=self.embedding)
+
+    def tearDown(self):
+        for suffix in [".npz", ".npy", ".vocab"]:
+            path = os.path.join(EMBEDDING_HOME, self.name + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_carriage_returns(self):
+        # Loads twice, converting the vectors and then loading the results
+        for _ in range(2):
+            words, table = _load_vectors(self.name)
+            self.assertEqual(words, self.words)
+            np.testing.assert_array_equal(table[:len(self.words)],
+                                          self.embedding)
+
+    def test_lazy_word_index(self):
+        embedding = TokenEmbedding(self.name, trainable=False)
+        # The index of words is only built at the first lookup
+        self.assertIsNone(embedding._word_index)
+        num_words = len(self.words)
+        self.assertEqual(embedding.weight.shape, [num_words + 2, 4])
+        self.assertEqual(embedding._padding_idx, num_words + 1)
+        self.assertEqual(
+            embedding.get_idx_list_from_words(["b\r", "unseen", "[PAD]"]),
+            [1, num_words, num_words + 1])
+        self.assertIsNotNone(embedding._word_index)
+        np.testing.assert_allclose(
+            embedding.search("d\r\re")[0], self.embedding[3], rtol=1e-6)
+        self.assertEqual(embedding.vocab.to_indices("a"), 0)
+
+    def test_lazy_word_index_extended_vocab(self):
+        vocab_path = os.path.join(EMBEDDING_HOME, self.name + ".ext")
+        with open(vocab_path, "w", encoding="utf-8") as f:
+            f.write("x\n[PAD]\na\n")
+        try:
+            embedding = TokenEmbedding(
+                self.name, extended_vocab_path=vocab_path)
+        finally:
+            os.remove(vocab_path)
+        self.assertIsNone(embedding._word_index)
+        # The extended words, the other pretrained words and then unk
+        num_words = 3 + len(self.words) - 1
+        self.assertEqual(embedding.weight.shape, [num_words + 1, 4])
+        self.assertEqual(embedding._padding_idx, 1)
+        self.assertEqual(
+            embedding.get_idx_list_from_words(["x", "a", "b\r", "unseen"]),
+            [0, 2, 3, num_words])
+        np.testing.assert_allclose(
+            embedding.search(["a", "b\r"]), self.embedding[:2], rtol=1e-6)
+
+
 class TestTokenEmbeddingExtendedVocab(TestTokenEmbedding):
     def setUp(self):
         super().setUp()
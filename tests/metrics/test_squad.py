@@ -0,0 +1,127 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import numpy as np
+from paddlenlp.metrics.squad import compute_prediction
+from paddlenlp.metrics.utils import best_spans
+
+from common_test import CpuCommonTest
+
+
+class TestSpanPostprocessing(CpuCommonTest):
+    def setUp(self):
+        np.random.seed(2022)
+        lengths = np.random.randint(1, 40, 20)
+        # Integer logits make ties of logits and scores
+        self.start_logits = [
+            np.random.randint(0, 10, length).astype("float32")
+            for length in lengths
+        ]
+        self.end_logits = [
+            np.random.randint(0, 10, length).astype("float32")
+            for length in lengths
+        ]
+        self.valid = [np.random.rand(length) < 0.8 for length in lengths]
+
+    def get_expected_spans(self, n_best_size, max_answer_length, stable):
+        def get_best_indexes(logits):
+            if stable:
+                # DuReader: sorted(enumerate(logits), reverse=True)
+                return sorted(
+                    range(len(logits)), key=lambda x: -logits[x])[:n_best_size]
+            # SQuAD: the reversed argsort, where the stable kind fixes the
+            # order of ties, which the default kind leaves unspecified.
+            return np.argsort(
+                logits, kind="stable")[-1:-n_best_size - 1:-1].tolist()
+
+        spans = []
+        for i, (start_logits, end_logits, valid) in enumerate(
+                zip(self.start_logits, self.end_logits, self.valid)):
+            start_indexes = get_best_indexes(start_logits)
+            end_indexes = get_best_indexes(end_logits)
+            for start_index in start_indexes:
+                for end_index in end_indexes:
+                    if not valid[start_index] or not valid[end_index]:
+                        continue
+                    if end_index < start_index or end_index - start_index + 1 > max_answer_length:
+                        continue
+                    spans.append((i, start_index, end_index,
+                                  start_logits[start_index],
+                                  end_logits[end_index]))
+        return spans
+
+    def is_valid(self, feature_index, indexes):
+        valid = self.valid[feature_index]
+        return [index < len(valid) and valid[index] for index in indexes]
+
+    def test_best_spans(self):
+        for n_best_size, max_answer_length in [(5, 10), (20, 3), (50, 50)]:
+            for stable in [True, False]:
+                spans = best_spans(
+                    self.start_logits,
+                    self.end_logits,
+                    n_best_size,
+                    max_answer_length,
+                    self.is_valid,
+                    self.is_valid,
+                    batch_size=8,
+                    stable=stable)
+                self.assertEqual(
+                    list(zip(*[x.tolist() for x in spans])),
+                    self.get_expected_spans(n_best_size, max_answer_length,
+                                            stable))
+
+    def test_compute_prediction(self):
+        examples = _Examples(["0", "1"],
+                             ["The quick brown fox", "jumps over the lazy dog"])
+        features = [{
+            "example_id": "0",
+            "offset_mapping": [None, (0, 3), (4, 9), (10, 15), (16, 19), None]
+        }, {
+            "example_id": "1",
+            "offset_mapping": [None, (0, 5), (6, 10), (11, 14), (15, 19),
+                               (20, 23)]
+        }]
+        start_logits = [
+            np.array([0, 1, 5, 2, 0, 9], dtype="float32"),
+            np.array([0, 1, 2, 3, 6, 1], dtype="float32")
+        ]
+        end_logits = [
+            np.array([0, 1, 2, 6, 0, 9], dtype="float32"),
+            np.array([0, 1, 2, 3, 1, 7], dtype="float32")
+        ]
+        all_predictions, all_nbest_json, _ = compute_prediction(
+            examples, features, (start_logits, end_logits), n_best_size=3)
+        self.assertEqual(all_predictions["0"], "quick brown")
+        self.assertEqual(all_predictions["1"], "lazy dog")
+        self.assertEqual([pred["text"] for pred in all_nbest_json["0"]],
+                         ["quick brown", "brown", "quick"])
+        self.assertEqual([pred["text"] for pred in all_nbest_json["1"]],
+                         ["lazy dog", "the lazy dog", "over the lazy dog"])
+
+
+class _Examples(list):
+    def __init__(self, ids, contexts):
+        super(_Examples, self).__init__(
+            {"id": i, "context": c} for i, c in zip(ids, contexts))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return [example[key] for example in self]
+        return super(_Examples, self).__getitem__(key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import random
+import unittest
+
+from paddlenlp.metrics import BLEU, RougeL, Distinct
+from paddlenlp.metrics.utils import lcs_lengths
+
+from common_test import CpuCommonTest
+
+
+class TestBatchScoring(CpuCommonTest):
+    def setUp(self):
+        random.seed(2022)
+        self.vocab = ["w%d" % i for i in range(10)] + ["a b", "a", "b"]
+        num_insts = 50
+        self.cands = [self.get_sentence() for _ in range(num_insts)]
+        self.ref_lists = [[
+            self.get_sentence() for _ in range(random.randint(1, 3))
+        ] for _ in range(num_insts)]
+
+    def get_sentence(self):
+        return [
+            random.choice(self.vocab) for _ in range(random.randint(0, 20))
+        ]
+
+    def test_lcs_lengths(self):
+        rouge = RougeL()
+        seqs_a = [[random.randint(0, 3) for _ in range(random.randint(0, 15))]
+                  for _ in range(30)]
+        seqs_b = [[random.randint(0, 3) for _ in range(random.randint(0, 15))]
+                  for _ in range(30)]
+        expected = [rouge.lcs(a, b) for a, b in zip(seqs_a, seqs_b)]
+        self.assertEqual(
+            lcs_lengths(seqs_a, seqs_b, batch_size=8).tolist(), expected)
+
+    def test_bleu(self):
+        for n_size in [1, 2, 4]:
+            bleu = BLEU(n_size=n_size)
+            batch_bleu = BLEU(n_size=n_size)
+            for cand, ref_list in zip(self.cands, self.ref_lists):
+                bleu.add_inst(cand, ref_list)
+            batch_bleu.add_insts(self.cands, self.ref_lists)
+            self.assertEqual(bleu.match_ngram, batch_bleu.match_ngram)
+            self.assertEqual(bleu.candi_ngram, batch_bleu.candi_ngram)
+            self.assertEqual(bleu.score(), batch_bleu.score())
+
+    def test_rouge_l(self):
+        rouge = RougeL()
+        batch_rouge = RougeL()
+        for cand, ref_list in zip(self.cands, self.ref_lists):
+            rouge.add_inst(cand, ref_list)
+        batch_rouge.add_insts(self.cands, self.ref_lists)
+        self.assertEqual(rouge.inst_scores, batch_rouge.inst_scores)
+
+    def test_distinct(self):
+        distinct = Distinct()
+        batch_distinct = Distinct()
+        for cand in self.cands:
+            distinct.add_inst(cand)
+        batch_distinct.add_insts(self.cands)
+        self.assertEqual(distinct.diff_ngram, batch_distinct.diff_ngram)
+        self.assertEqual(distinct.score(), batch_distinct.score())
+
+    def test_num_workers(self):
+        bleu = BLEU()
+        batch_bleu = BLEU()
+        bleu.add_insts(self.cands, self.ref_lists)
+        batch_bleu.add_insts(self.cands, self.ref_lists, num_workers=2)
+        self.assertEqual(bleu.score(), batch_bleu.score())
+
+
+if __name__ == "__main__":
+    unittest.main()
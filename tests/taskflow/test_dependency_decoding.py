@@ -0,0 +1,129 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib.util
+import itertools
+import os
+import unittest
+
+import numpy as np
+from paddlenlp.taskflow.dependency_decoding import (chuliu_edmonds, eisner,
+                                                    istree, istree_batch)
+
+from common_test import CpuCommonTest
+
+
+def load_reference_utils():
+    # The decoders of the DDParser example
+    path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "..", "examples",
+        "dependency_parsing", "ddparser", "utils.py")
+    spec = importlib.util.spec_from_file_location("ddparser_utils", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def is_tree(heads):
+    # Whether all words reach the root, which has exactly one dependent
+    if sum(head == 0 for head in heads[1:]) != 1:
+        return False
+    for start in range(1, len(heads)):
+        node, steps = start, 0
+        while node != 0 and steps < len(heads):
+            node, steps = heads[node], steps + 1
+        if node != 0:
+            return False
+    return True
+
+
+def brute_force_mst(scores):
+    # The highest scoring tree among all head assignments
+    n = scores.shape[0]
+    best_heads, best_score = None, float('-inf')
+    for heads in itertools.product(range(n), repeat=n - 1):
+        heads = (0, ) + heads
+        if any(head == i for i, head in enumerate(heads[1:], 1)):
+            continue
+        if not is_tree(heads):
+            continue
+        score = sum(scores[i, head] for i, head in enumerate(heads[1:], 1))
+        if score > best_score:
+            best_heads, best_score = heads, score
+    return list(best_heads)
+
+
+class TestDependencyDecoding(CpuCommonTest):
+    @classmethod
+    def setUpClass(cls):
+        super(TestDependencyDecoding, cls).setUpClass()
+        cls.reference = load_reference_utils()
+
+    def setUp(self):
+        self.rng = np.random.RandomState(2022)
+
+    def create_batch(self, batch_size, min_len, max_len):
+        lens = self.rng.randint(min_len, max_len + 1, batch_size)
+        # The root and eos are included in the sequence
+        seq_len = lens.max() + 2
+        scores = self.rng.randn(batch_size, seq_len,
+                                seq_len).astype("float32")
+        mask = np.zeros((batch_size, seq_len), dtype=bool)
+        for i, length in enumerate(lens):
+            mask[i, 1:length + 1] = True
+        return scores, mask
+
+    def test_eisner(self):
+        for min_len, max_len in [(1, 5), (5, 40)]:
+            scores, mask = self.create_batch(16, min_len, max_len)
+            heads = eisner(scores, mask)
+            expected = self.reference.eisner(scores, mask)
+            self.assertEqual(heads[mask].tolist(), expected[mask].tolist())
+            self.assertTrue(np.all(istree_batch(heads, mask)))
+
+    def test_chuliu_edmonds(self):
+        scores, mask = self.create_batch(30, 1, 5)
+        heads = chuliu_edmonds(scores, mask)
+        for i, length in enumerate(mask.sum(1).tolist()):
+            self.assertEqual(
+                heads[i, :length + 1].tolist(),
+                brute_force_mst(scores[i, :length + 1, :length + 1]))
+        self.assertTrue(np.all(istree_batch(heads, mask, projective=False)))
+
+    def test_istree_batch(self):
+        scores, mask = self.create_batch(200, 1, 7)
+        lens = mask.sum(1)
+        # Random heads, and trees which may be non-projective
+        batches = [
+            self.rng.randint(0, lens[:, np.newaxis] + 1, mask.shape),
+            chuliu_edmonds(scores, mask)
+        ]
+        for heads in batches:
+            sequences = [
+                heads[i, :length + 1].tolist()
+                for i, length in enumerate(lens.tolist())
+            ]
+            self.assertEqual(
+                istree_batch(heads, mask).tolist(),
+                [self.reference.istree(seq) for seq in sequences])
+            self.assertEqual([istree(seq) for seq in sequences],
+                             [self.reference.istree(seq) for seq in sequences])
+            self.assertEqual(
+                istree_batch(
+                    heads, mask, projective=False).tolist(),
+                [is_tree(seq) for seq in sequences])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from paddlenlp.taskflow.knowledge_mining import NPTagTask
+from paddlenlp.taskflow.utils import SymSpellIndex
+
+from common_test import CpuCommonTest
+
+
+class FakeTokenizer(object):
+    class Vocab(object):
+        def to_indices(self, tokens):
+            return list(range(len(tokens)))
+
+    vocab = Vocab()
+
+
+class FakeNPTagTask(NPTagTask):
+    def _construct_tokenizer(self, model):
+        self._tokenizer = FakeTokenizer()
+
+    def _get_inference_model(self):
+        pass
+
+
+class TestNPTagTaskSimilarWordIndex(CpuCommonTest):
+    def setUp(self):
+        self.task_path = tempfile.mkdtemp()
+        for file_name in NPTagTask.resource_files_names.values():
+            with open(os.path.join(self.task_path, file_name), "w") as f:
+                f.write("")
+        self.write_name_dict({"苹果": "植物", "苹果树": "植物", "香蕉": "水果"})
+        self.index_path = os.path.join(self.task_path,
+                                       "name_category_index.pkl")
+
+    def tearDown(self):
+        shutil.rmtree(self.task_path)
+
+    def write_name_dict(self, name_dict):
+        with open(
+                os.path.join(self.task_path, "name_category_map.json"),
+                "w",
+                encoding="utf-8") as f:
+            json.dump(name_dict, f, ensure_ascii=False)
+
+    def create_task(self):
+        return FakeNPTagTask(
+            task="knowledge_mining", model="nptag", task_path=self.task_path)
+
+    def test_index(self):
+        task = self.create_task()
+        self.assertTrue(os.path.exists(self.index_path))
+        self.assertEqual(task._tree.words, ["苹果", "苹果树", "香蕉"])
+        self.assertEqual(
+            task._tree.search_similar_word("苹果"), [("苹果", 0), ("苹果树", 1),
+                                                   ("香蕉", 2)])
+
+    def test_cache_reloaded(self):
+        words = self.create_task()._tree.words
+        # The index is loaded from the cache instead of being built
+        with mock.patch.object(
+                SymSpellIndex, "add", side_effect=AssertionError):
+            task = self.create_task()
+        self.assertEqual(task._tree.words, words)
+
+    def test_cache_invalidated(self):
+        self.create_task()
+        self.write_name_dict({"苹果": "植物", "西瓜": "水果"})
+        task = self.create_task()
+        self.assertEqual(task._tree.words, ["苹果", "西瓜"])
+        self.assertEqual(
+            task._tree.search_similar_word("西"), [("西瓜", 1), ("苹果", 2)])
+        with mock.patch.object(
+                SymSpellIndex, "add", side_effect=AssertionError):
+            self.assertEqual(self.create_task()._tree.words, ["苹果", "西瓜"])
+
+    def test_broken_cache(self):
+        self.create_task()
+        with open(self.index_path, "wb") as f:
+            f.write(b"broken")
+        task = self.create_task()
+        self.assertEqual(task._tree.words, ["苹果", "苹果树", "香蕉"])
+
+
+if __name__ == "__main__":
+    unittest.main()
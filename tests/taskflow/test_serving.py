@@ -0,0 +1,95 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import unittest
+
+from paddlenlp.taskflow.serving import TaskServer
+
+from common_test import CpuCommonTest
+
+TIMEOUT = 10
+
+
+class FakeTask(object):
+    """
+    Upper-cases the inputs, and blocks until released once a batch starts.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.batches = []
+
+    def __call__(self, inputs):
+        self.batches.append(list(inputs))
+        self.started.set()
+        self.released.wait(TIMEOUT)
+        return [input.upper() for input in inputs]
+
+
+class TestTaskServer(CpuCommonTest):
+    def setUp(self):
+        self.task = FakeTask()
+        self.server = TaskServer(self.task, max_batch_size=4, max_wait_ms=0)
+
+    def tearDown(self):
+        self.task.released.set()
+        self.server.close()
+
+    def test_micro_batch(self):
+        self.task.released.set()
+        futures = [self.server.submit(["a", "b"]), self.server.submit("c")]
+        self.assertEqual(futures[0].result(TIMEOUT), ["A", "B"])
+        self.assertEqual(futures[1].result(TIMEOUT), ["C"])
+        self.assertEqual(self.server(["d"]), ["D"])
+        self.assertEqual(self.server.stats()['num_requests'], 3)
+
+    def test_cancelled_request(self):
+        first = self.server.submit("a")
+        self.assertTrue(self.task.started.wait(TIMEOUT))
+        # Queued while the first batch runs, and then cancelled
+        cancelled = self.server.submit("b")
+        self.assertTrue(cancelled.cancel())
+        second = self.server.submit("c")
+        self.task.released.set()
+        self.assertEqual(first.result(TIMEOUT), ["A"])
+        self.assertEqual(second.result(TIMEOUT), ["C"])
+        self.assertNotIn("b", sum(self.task.batches, []))
+        # The serving thread keeps running after the cancelled request
+        self.assertEqual(self.server.submit("d").result(TIMEOUT), ["D"])
+
+    def test_async_call_timeout(self):
+        first = self.server.submit("a")
+        self.assertTrue(self.task.started.wait(TIMEOUT))
+
+        async def call():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.server.async_call("b"), 0.01)
+            self.task.released.set()
+            return await asyncio.wait_for(
+                self.server.async_call("c"), TIMEOUT)
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(call()), ["C"])
+        finally:
+            loop.close()
+        self.assertEqual(first.result(TIMEOUT), ["A"])
+        self.assertNotIn("b", sum(self.task.batches, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from paddlenlp.taskflow.sentiment_analysis import SentaTask
+from paddlenlp.taskflow.task import Task
+
+from common_test import CpuCommonTest
+
+
+class ToyTask(Task):
+    def _construct_model(self, model):
+        pass
+
+    def _construct_tokenizer(self, model):
+        pass
+
+    def _preprocess(self, inputs):
+        pass
+
+    def _run_model(self, inputs):
+        pass
+
+    def _postprocess(self, inputs):
+        pass
+
+    def _construct_input_spec(self):
+        pass
+
+
+class TestTaskBatchify(CpuCommonTest):
+    def setUp(self):
+        self.task = ToyTask(model="toy", task="toy")
+        self.unsorted_task = ToyTask(
+            model="toy", task="toy", sort_by_length=False)
+
+    def test_get_length_order(self):
+        lengths = [3, 1, 2, 1, 3, 2]
+        # Ties are kept in the input order
+        self.assertEqual(
+            self.task._get_length_order(lengths), [1, 3, 2, 5, 0, 4])
+        self.assertEqual(
+            self.unsorted_task._get_length_order(lengths), list(range(6)))
+        self.assertEqual(self.task._get_length_order([]), [])
+
+    def test_batchify_by_length(self):
+        examples = ["ccc", "a", "bb", "d", "eee", "ff", "g"]
+        lengths = [len(example) for example in examples]
+        batches, order = self.task._batchify_by_length(examples, 3, lengths)
+        self.assertEqual(batches,
+                         [["a", "d", "g"], ["bb", "ff", "ccc"], ["eee"]])
+        self.assertEqual(order, [1, 3, 6, 2, 5, 0, 4])
+        batches, order = self.unsorted_task._batchify_by_length(examples, 3,
+                                                                lengths)
+        self.assertEqual(batches,
+                         [["ccc", "a", "bb"], ["d", "eee", "ff"], ["g"]])
+        self.assertEqual(order, list(range(7)))
+
+    def test_restore_order(self):
+        rng = np.random.RandomState(2022)
+        lengths = rng.randint(1, 5, 50).tolist()
+        examples = list(range(len(lengths)))
+        for task in [self.task, self.unsorted_task]:
+            for batch_size in [1, 4, 64]:
+                batches, order = task._batchify_by_length(examples,
+                                                          batch_size, lengths)
+                results = [example for batch in batches for example in batch]
+                self.assertEqual(
+                    task._restore_order(results, order), examples)
+
+
+class FakeTokenizer(object):
+    class Vocab(object):
+        token_to_idx = {'[PAD]': 0}
+
+    vocab = Vocab()
+
+    def encode(self, text):
+        return [ord(char) for char in text]
+
+
+class FakeHandle(object):
+    def __init__(self, outputs=None, key=None):
+        self.outputs = outputs
+        self.key = key
+
+    def copy_from_cpu(self, data):
+        self.data = data
+
+    def copy_to_cpu(self):
+        return self.outputs[self.key]
+
+
+class FakePredictor(object):
+    # The label is the parity of the first token, and the score is the length
+    def __init__(self, input_handles):
+        self.input_handles = input_handles
+        self.outputs = {}
+        self.batch_lengths = []
+
+    def run(self):
+        ids, lens = [handle.data for handle in self.input_handles]
+        self.batch_lengths.append(lens.tolist())
+        self.outputs["labels"] = ids[:, 0] % 2
+        self.outputs["probs"] = np.stack(
+            [lens / 100, np.zeros_like(lens)], axis=-1)
+
+
+class FakeSentaTask(SentaTask):
+    def _construct_tokenizer(self, model):
+        self._tokenizer = FakeTokenizer()
+
+    def _get_inference_model(self):
+        self.input_handles = [FakeHandle(), FakeHandle()]
+        self.predictor = FakePredictor(self.input_handles)
+        self.output_handle = [
+            FakeHandle(self.predictor.outputs, "labels"),
+            FakeHandle(self.predictor.outputs, "probs")
+        ]
+
+
+class TestTaskOrder(CpuCommonTest):
+    def setUp(self):
+        self.task_path = tempfile.mkdtemp()
+        for file_name in SentaTask.resource_files_names.values():
+            with open(os.path.join(self.task_path, file_name), "w") as f:
+                f.write("")
+        rng = np.random.RandomState(2022)
+        self.texts = [
+            "".join(rng.choice(list("abcdef"), rng.randint(1, 8)))
+            for _ in range(20)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.task_path)
+
+    def test_results_order(self):
+        expected = [{
+            "text": text,
+            "label": "positive" if ord(text[0]) % 2 else "negative",
+            "score": len(text) / 100
+        } for text in self.texts]
+        for sort_by_length in [True, False]:
+            task = FakeSentaTask(
+                task="sentiment_analysis",
+                model="bilstm",
+                task_path=self.task_path,
+                batch_size=3,
+                sort_by_length=sort_by_length)
+            self.assertEqual(task((self.texts, )), expected)
+            batch_lengths = task.predictor.batch_lengths
+            self.assertTrue(all(len(lengths) <= 3 for lengths in batch_lengths))
+            lengths = sum(batch_lengths, [])
+            if sort_by_length:
+                self.assertEqual(lengths, sorted(lengths))
+            else:
+                self.assertEqual(lengths, [len(text) for text in self.texts])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from paddlenlp.taskflow.utils import TermTree, TermTreeSnapshot
+
+from common_test import CpuCommonTest
+
+
+class TestTermTreeSnapshot(CpuCommonTest):
+    def setUp(self):
+        self.tree = TermTree()
+        for type_name, hyper_type in [
+            ("生物", "root"), ("动物", "生物"), ("哺乳动物", "动物"), ("鸟类", "动物"),
+            ("植物", "生物"), ("食品", "root"), ("水果", "食品"), ("肉类", "食品")
+        ]:
+            self.tree.add_type(type_name, hyper_type)
+        # Terms sharing names and aliases, and linked to several types
+        for term, term_type, sub_type, alias in [
+            ("苹果", "水果", ["植物"], ["苹果果实"]),
+            ("苹果", "植物", [], []),
+            ("牛", "哺乳动物", ["肉类"], ["黄牛"]),
+            ("鸡", "鸟类", ["肉类"], ["家鸡"]),
+            ("黄牛", "哺乳动物", [], []),
+            ("香蕉", "水果", [], ["芭蕉"]),
+        ]:
+            self.tree.add_term(
+                term=term,
+                base="cb",
+                term_type=term_type,
+                sub_type=sub_type,
+                alias=alias)
+        for node_id in self.tree:
+            self.tree.build_son(node_id)
+        self.save_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.save_dir, "snapshot")
+        self.tree.save_snapshot(self.path, meta={"version": 1})
+
+    def tearDown(self):
+        shutil.rmtree(self.save_dir)
+
+    def test_meta(self):
+        self.assertTrue(TermTreeSnapshot.exists(self.path))
+        snapshot = TermTreeSnapshot(self.path)
+        self.assertEqual(snapshot.meta, {"version": 1})
+        self.assertEqual(sorted(snapshot), sorted(self.tree))
+        for node_id in self.tree:
+            self.assertIn(node_id, snapshot)
+            self.assertEqual(snapshot[node_id].sons, self.tree[node_id].sons)
+        self.assertNotIn("不存在", snapshot)
+
+    def test_ancestors(self):
+        snapshot = TermTreeSnapshot(self.path)
+        for node_id in self.tree:
+            self.assertEqual(
+                sorted(snapshot.ancestors(node_id)),
+                sorted(self.tree.ancestors(node_id)))
+
+    def test_find_term(self):
+        snapshot = TermTreeSnapshot(self.path)
+        terms = ["苹果", "苹果果实", "牛", "黄牛", "家鸡", "芭蕉", "不存在"]
+        for term in terms:
+            for term_type in [None] + list(self.tree):
+                self.assertEqual(
+                    snapshot.find_term(term, term_type),
+                    self.tree.find_term(term, term_type))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from paddlenlp.taskflow.text_similarity import TextSimilarityTask
+
+from common_test import CpuCommonTest
+
+
+class FakeTokenizer(object):
+    pad_token_id = 0
+    pad_token_type_id = 0
+
+    def __call__(self, text, max_seq_len):
+        input_ids = [ord(char) % 97 + 1 for char in text][:max_seq_len]
+        return {"input_ids": input_ids, "token_type_ids": [0] * len(input_ids)}
+
+
+class FakeHandle(object):
+    def __init__(self, predictor=None):
+        self.predictor = predictor
+        self.data = None
+
+    def copy_from_cpu(self, data):
+        self.data = data
+
+    def copy_to_cpu(self):
+        return self.predictor.pooled_output
+
+
+class FakePredictor(object):
+    # The pooled output is the sum of the embeddings of tokens except paddings
+    def __init__(self, input_handles):
+        self.input_handles = input_handles
+        self.embeddings = np.random.RandomState(2022).rand(
+            98, 8).astype("float32")
+        self.embeddings[0] = 0
+        self.batch_sizes = []
+
+    def run(self):
+        input_ids = self.input_handles[0].data
+        self.batch_sizes.append(input_ids.shape[0])
+        self.pooled_output = self.embeddings[input_ids].sum(axis=1)
+
+
+class FakeTextSimilarityTask(TextSimilarityTask):
+    def _construct_tokenizer(self, model):
+        self._tokenizer = FakeTokenizer()
+
+    def _get_inference_model(self):
+        self.input_handles = [FakeHandle(), FakeHandle()]
+        self.predictor = FakePredictor(self.input_handles)
+        self.output_handle = [None, FakeHandle(self.predictor)]
+
+
+class TestTextSimilarityTask(CpuCommonTest):
+    def setUp(self):
+        self.task_path = tempfile.mkdtemp()
+        for file_name in TextSimilarityTask.resource_files_names.values():
+            with open(os.path.join(self.task_path, file_name), "w") as f:
+                f.write("{}")
+        rng = np.random.RandomState(2022)
+        texts = [
+            "".join(rng.choice(list("abcdefg"), rng.randint(1, 10)))
+            for _ in range(12)
+        ]
+        # Repeated texts, which are the same after normalizing whitespaces
+        self.inputs = [[texts[i], texts[j]]
+                       for i, j in rng.randint(0, len(texts), [15, 2])]
+        self.inputs.append([texts[0], " " + texts[0] + "\t"])
+        self.num_texts = len(set(sum(self.inputs, [])) - {" " + texts[0] +
+                                                          "\t"})
+
+    def tearDown(self):
+        shutil.rmtree(self.task_path)
+
+    def create_task(self, **kwargs):
+        return FakeTextSimilarityTask(
+            task="text_similarity",
+            model="simbert-base-chinese",
+            task_path=self.task_path,
+            batch_size=2,
+            **kwargs)
+
+    def get_similarity(self, task, text1, text2):
+        tokenizer = FakeTokenizer()
+        vecs = []
+        for text in [text1, text2]:
+            vec = task.predictor.embeddings[tokenizer(
+                text.strip(), max_seq_len=128)["input_ids"]].sum(axis=0)
+            vecs.append(vec / np.linalg.norm(vec))
+        return (vecs[0] * vecs[1]).sum()
+
+    def check_results(self, task, results):
+        self.assertEqual([[result["text1"], result["text2"]]
+                          for result in results], self.inputs)
+        for result in results:
+            self.assertAlmostEqual(
+                float(result["similarity"]),
+                float(
+                    self.get_similarity(task, result["text1"], result[
+                        "text2"])),
+                places=5)
+
+    def test_similarity(self):
+        for sort_by_length in [True, False]:
+            task = self.create_task(sort_by_length=sort_by_length)
+            self.check_results(task, task((self.inputs, )))
+            # Unique texts of both sides are packed into batches
+            self.assertEqual(sum(task.predictor.batch_sizes), self.num_texts)
+            self.assertEqual(
+                len(task.predictor.batch_sizes),
+                math.ceil(self.num_texts / 4))
+            self.assertLessEqual(max(task.predictor.batch_sizes), 4)
+
+    def test_cache(self):
+        task = self.create_task()
+        results = task((self.inputs, ))
+        task.predictor.batch_sizes = []
+        self.assertEqual(task((self.inputs, )), results)
+        self.assertEqual(task.predictor.batch_sizes, [])
+        task = self.create_task(cache_size=0)
+        self.check_results(task, task((self.inputs, )))
+        task.predictor.batch_sizes = []
+        self.check_results(task, task((self.inputs, )))
+        self.assertEqual(sum(task.predictor.batch_sizes), self.num_texts)
+
+
+if __name__ == "__main__":
+    unittest.main()
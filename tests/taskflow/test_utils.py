@@ -0,0 +1,229 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from paddlenlp.taskflow.utils import (
+    AhoCorasick, BurkhardKellerTree, Customization, SymSpellIndex, TriedTree,
+    _myers_distance, levenstein_distance)
+
+from common_test import CpuCommonTest
+
+
+class TestAhoCorasick(CpuCommonTest):
+    def setUp(self):
+        self.rng = np.random.RandomState(2022)
+
+    def random_text(self, chars, max_len):
+        return "".join(self.rng.choice(chars, self.rng.randint(1, max_len)))
+
+    def build(self, words):
+        tried_tree = TriedTree()
+        ac = AhoCorasick()
+        for word in words:
+            tried_tree.add_word(word)
+            ac.add_word(word)
+        ac.build()
+        return tried_tree, ac
+
+    def test_search(self):
+        # Small alphabets for many overlapping words and shared suffixes
+        for chars in [list("ab"), list("abcd"), list("苹果香蕉")]:
+            for _ in range(20):
+                words = [
+                    self.random_text(chars, 6)
+                    for _ in range(self.rng.randint(1, 10))
+                ]
+                tried_tree, ac = self.build(words)
+                for _ in range(10):
+                    content = self.random_text(chars, 30)
+                    self.assertEqual(
+                        ac.search(content), tried_tree.search(content))
+
+    def test_search_empty(self):
+        tried_tree, ac = self.build([])
+        self.assertEqual(ac.search("abc"), [])
+        tried_tree, ac = self.build(["ab", "abc"])
+        self.assertEqual(ac.search(""), [])
+        self.assertEqual(ac.search("xabcab"), tried_tree.search("xabcab"))
+        self.assertEqual(ac.search("xabcab"), [(1, 3), (1, 4), (4, 6)])
+
+    def test_pickle(self):
+        chars = list("abc")
+        words = [self.random_text(chars, 5) for _ in range(30)]
+        tried_tree, ac = self.build(words)
+        loaded = pickle.loads(pickle.dumps(ac))
+        # Only the built tables are kept
+        self.assertEqual(loaded._words, set())
+        for _ in range(20):
+            content = self.random_text(chars, 30)
+            self.assertEqual(loaded.search(content), tried_tree.search(content))
+
+
+class TestCustomization(CpuCommonTest):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "cache")
+        self.filename = os.path.join(self.temp_dir, "custom.txt")
+        self.write_dict(["苹果/n 手机/n", "香蕉"])
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_dict(self, lines):
+        with open(self.filename, "w", encoding="utf8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def load(self):
+        custom = Customization()
+        custom.load_customization(self.filename, cache_dir=self.cache_dir)
+        return custom
+
+    def test_cache(self):
+        custom = self.load()
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.assertEqual(custom.ac.search("买苹果手机和香蕉"), [(1, 5), (6, 8)])
+        # The automaton is loaded from the cache instead of being built
+        with mock.patch.object(
+                AhoCorasick, "build", side_effect=AssertionError):
+            cached = self.load()
+        self.assertEqual(cached.dictitem, custom.dictitem)
+        self.assertEqual(
+            cached.ac.search("买苹果手机和香蕉"), custom.ac.search("买苹果手机和香蕉"))
+        lac_tags = ["O"] * 8
+        cached.parse_customization("买苹果手机和香蕉", lac_tags, prefix=True)
+        self.assertEqual(lac_tags,
+                         ["O", "B-n", "I-n", "B-n", "I-n", "B", "B", "I"])
+
+    def test_cache_invalidated(self):
+        self.load()
+        self.write_dict(["苹果/n 手机/n", "香蕉", "西瓜/n"])
+        with mock.patch.object(
+                AhoCorasick, "build", autospec=True,
+                side_effect=AhoCorasick.build) as build:
+            custom = self.load()
+        build.assert_called_once()
+        self.assertIn("西瓜", custom.dictitem)
+        self.assertEqual(custom.ac.search("香蕉西瓜"), [(0, 2), (2, 4)])
+        # The cache is replaced by the new vocab
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        with mock.patch.object(
+                AhoCorasick, "build", side_effect=AssertionError):
+            self.assertIn("西瓜", self.load().dictitem)
+
+    def test_broken_cache(self):
+        self.load()
+        for file_name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, file_name), "wb") as f:
+                f.write(b"broken")
+        custom = self.load()
+        self.assertEqual(custom.ac.search("苹果手机"), [(0, 4)])
+
+
+def get_peq(pattern):
+    peq = {}
+    for i, c in enumerate(pattern):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    return peq
+
+
+def max_prefix(s1, s2):
+    res = 0
+    for c1, c2 in zip(s1, s2):
+        if c1 != c2:
+            break
+        res += 1
+    return res
+
+
+class TestSymSpellIndex(CpuCommonTest):
+    def setUp(self):
+        self.rng = np.random.RandomState(2022)
+
+    def random_text(self, chars, min_len, max_len):
+        return "".join(
+            self.rng.choice(chars, self.rng.randint(min_len, max_len)))
+
+    def test_myers_distance(self):
+        pairs = [("", ""), ("", "abc"), ("abc", ""), ("kitten", "sitting"),
+                 ("苹果手机", "苹果")]
+        for chars in [list("ab"), list("abcdef")]:
+            for _ in range(200):
+                pairs.append((self.random_text(chars, 0, 12),
+                              self.random_text(chars, 0, 12)))
+        # Patterns longer than a machine word
+        for _ in range(10):
+            pairs.append((self.random_text(list("abc"), 60, 100),
+                          self.random_text(list("abc"), 60, 100)))
+        for pattern, s in pairs:
+            self.assertEqual(
+                _myers_distance(get_peq(pattern), len(pattern), s),
+                levenstein_distance(pattern, s))
+
+    def test_search_similar_word(self):
+        chars = list("abcd")
+        words = [self.random_text(chars, 1, 7) for _ in range(300)]
+        index = SymSpellIndex()
+        tree = BurkhardKellerTree()
+        for word in words:
+            index.add(word)
+            tree.add(word)
+        unique_words = list(dict.fromkeys(words))
+        self.assertEqual(index.words, unique_words)
+        for _ in range(50):
+            query = self.random_text(chars, 1, 8)
+            expected = []
+            for word in unique_words:
+                dist = levenstein_distance(query, word)
+                if dist <= 2:
+                    expected.append((word, dist))
+            # Ties are kept in the insertion order of the words
+            expected.sort(key=lambda d: (d[1], -max_prefix(d[0], query)))
+            res = index.search_similar_word(query)
+            self.assertEqual(res, expected)
+            # The results of BK-Tree are found as well
+            self.assertTrue(set(tree.search_similar_word(query)) <= set(res))
+        self.assertEqual(
+            index.search_similar_words(["ab", "ab"]),
+            [index.search_similar_word("ab")] * 2)
+
+    def test_memo(self):
+        index = SymSpellIndex(max_distance=1, memo_size=2)
+        for word in ["苹果", "苹果树", "香蕉"]:
+            index.add(word)
+        self.assertEqual(
+            index.search_similar_word("苹果"), [("苹果", 0), ("苹果树", 1)])
+        index.search_similar_word("香")
+        index.search_similar_word("果")
+        self.assertEqual(list(index._memo), ["香", "果"])
+        # Adding words invalidates the memoized results
+        index.add("苹")
+        self.assertEqual(index._memo, {})
+        self.assertEqual(
+            index.search_similar_word("苹果"), [("苹果", 0), ("苹果树", 1),
+                                              ("苹", 1)])
+        loaded = pickle.loads(pickle.dumps(index))
+        self.assertEqual(loaded._memo, {})
+        self.assertEqual(
+            loaded.search_similar_word("苹果"), index.search_similar_word("苹果"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+from paddlenlp.trainer.utils.helper import (
+    nested_concat_all, numpy_pad_and_concatenate,
+    numpy_pad_and_concatenate_all)
+
+from common_test import CpuCommonTest
+
+
+class TestNestedConcatAll(CpuCommonTest):
+    def setUp(self):
+        self.rng = np.random.RandomState(2022)
+        # Chunks of different batch sizes and sequence lengths
+        self.chunks = [
+            self.rng.rand(batch_size, seq_len, 2).astype("float32")
+            for batch_size, seq_len in [(3, 5), (1, 7), (4, 2), (2, 7)]
+        ]
+
+    def pairwise_concat(self, chunks, padding_index=-100):
+        result = chunks[0]
+        for chunk in chunks[1:]:
+            result = numpy_pad_and_concatenate(
+                result, chunk, padding_index=padding_index)
+        return result
+
+    def test_pad_and_concatenate_all(self):
+        result = numpy_pad_and_concatenate_all(self.chunks)
+        self.assertEqual(result.shape, (10, 7, 2))
+        self.assertEqual(result.dtype, np.float32)
+        start = 0
+        for chunk in self.chunks:
+            end = start + chunk.shape[0]
+            np.testing.assert_array_equal(result[start:end, :chunk.shape[1]],
+                                          chunk)
+            self.assertTrue(np.all(result[start:end, chunk.shape[1]:] == -100))
+            start = end
+        np.testing.assert_array_equal(
+            numpy_pad_and_concatenate_all(
+                self.chunks, padding_index=0),
+            self.pairwise_concat(
+                self.chunks, padding_index=0))
+        # Arrays of the same sequence length, and 1-D arrays are concatenated
+        for chunks in [[chunk[:, :2] for chunk in self.chunks],
+                       [chunk[:, 0, 0] for chunk in self.chunks]]:
+            np.testing.assert_array_equal(
+                numpy_pad_and_concatenate_all(chunks),
+                np.concatenate(
+                    chunks, axis=0))
+
+    def test_nested_concat_all(self):
+        labels = [
+            self.rng.randint(0, 5, chunk.shape[:2]) for chunk in self.chunks
+        ]
+        nested_chunks = [(chunk, (label, label[:, 0]))
+                         for chunk, label in zip(self.chunks, labels)]
+        result = nested_concat_all(nested_chunks)
+        self.assertIsInstance(result, tuple)
+        self.assertIsInstance(result[1], tuple)
+        np.testing.assert_array_equal(result[0],
+                                      self.pairwise_concat(self.chunks))
+        np.testing.assert_array_equal(result[1][0],
+                                      self.pairwise_concat(labels))
+        np.testing.assert_array_equal(
+            result[1][1], np.concatenate([label[:, 0] for label in labels]))
+        with self.assertRaises(TypeError):
+            nested_concat_all([1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+import paddle.nn as nn
+from paddlenlp.trainer import Trainer, TrainingArguments
+
+from common_test import CpuCommonTest
+
+
+class TokenClassifier(nn.Layer):
+    def __init__(self):
+        super(TokenClassifier, self).__init__()
+        self.embeddings = nn.Embedding(20, 8)
+        self.classifier = nn.Linear(8, 3)
+
+    def forward(self, input_ids):
+        return self.classifier(self.embeddings(input_ids))
+
+
+class PaddedBatchSampler(paddle.io.BatchSampler):
+    # Pads the samples to a multiple of `num_replicas * batch_size` as the
+    # distributed sampler does, as if the batches of all processes were
+    # gathered
+    def __init__(self, dataset, batch_size, num_replicas=2):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.num_replicas = num_replicas
+
+    def __iter__(self):
+        total_batch_size = self.batch_size * self.num_replicas
+        indices = np.resize(
+            np.arange(len(self.dataset)),
+            len(self) * total_batch_size).tolist()
+        for start in range(0, len(indices), total_batch_size):
+            yield indices[start:start + total_batch_size]
+
+    def __len__(self):
+        total_batch_size = self.batch_size * self.num_replicas
+        return (len(self.dataset) + total_batch_size - 1) // total_batch_size
+
+
+class PaddedTrainer(Trainer):
+    def _get_eval_sampler(self, eval_dataset):
+        return PaddedBatchSampler(eval_dataset, self.args.eval_batch_size)
+
+
+def collate_fn(samples):
+    # Batches of different sequence lengths, padded with -100 for labels
+    max_len = max(len(sample["input_ids"]) for sample in samples)
+    input_ids = np.zeros([len(samples), max_len], dtype="int64")
+    labels = np.full([len(samples), max_len], -100, dtype="int64")
+    for i, sample in enumerate(samples):
+        input_ids[i, :len(sample["input_ids"])] = sample["input_ids"]
+        labels[i, :len(sample["labels"])] = sample["labels"]
+    return {
+        "input_ids": paddle.to_tensor(input_ids),
+        "labels": paddle.to_tensor(labels)
+    }
+
+
+def compute_accuracy(eval_pred):
+    predictions = eval_pred.predictions.argmax(-1)
+    mask = eval_pred.label_ids != -100
+    return {
+        "correct": int((predictions == eval_pred.label_ids)[mask].sum()),
+        "tokens": int(mask.sum()),
+        "samples": len(eval_pred.label_ids),
+    }
+
+
+class StreamingAccuracy(object):
+    def __init__(self):
+        self.metrics = []
+
+    def __call__(self, eval_pred, compute_result=False):
+        self.metrics.append(compute_accuracy(eval_pred))
+        if not compute_result:
+            return None
+        metrics = {
+            key: sum(metrics[key] for metrics in self.metrics)
+            for key in self.metrics[0]
+        }
+        self.metrics = []
+        return metrics
+
+
+class TestEvaluationLoop(CpuCommonTest):
+    def setUp(self):
+        paddle.seed(2022)
+        self.model = TokenClassifier()
+        rng = np.random.RandomState(2022)
+        self.dataset = []
+        for length in rng.randint(1, 9, 11):
+            self.dataset.append({
+                "input_ids": rng.randint(1, 20, length).tolist(),
+                "labels": rng.randint(0, 3, length).tolist()
+            })
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def get_expected_metrics(self):
+        expected = {"eval_correct": 0, "eval_tokens": 0, "eval_samples": 0}
+        self.model.eval()
+        with paddle.no_grad():
+            for sample in self.dataset:
+                logits = self.model(paddle.to_tensor([sample["input_ids"]]))
+                expected["eval_correct"] += int(
+                    (logits.argmax(-1).numpy()[0] == sample["labels"]).sum())
+                expected["eval_tokens"] += len(sample["labels"])
+                expected["eval_samples"] += 1
+        return expected
+
+    def evaluate(self, trainer_class=Trainer, **kwargs):
+        batch_eval_metrics = kwargs.get("batch_eval_metrics", False)
+        args = TrainingArguments(
+            output_dir=self.output_dir, per_device_eval_batch_size=3, **kwargs)
+        trainer = trainer_class(
+            model=self.model,
+            criterion=nn.CrossEntropyLoss(),
+            args=args,
+            data_collator=collate_fn,
+            compute_metrics=StreamingAccuracy()
+            if batch_eval_metrics else compute_accuracy)
+        metrics = trainer.evaluate(self.dataset)
+        return {key: metrics[key] for key in self.get_expected_metrics()}
+
+    def test_batch_eval_metrics(self):
+        expected = self.get_expected_metrics()
+        for trainer_class in [Trainer, PaddedTrainer]:
+            for eval_accumulation_steps in [None, 2]:
+                # Samples padded by the distributed sampler are dropped
+                self.assertEqual(
+                    self.evaluate(
+                        trainer_class,
+                        eval_accumulation_steps=eval_accumulation_steps),
+                    expected)
+                self.assertEqual(
+                    self.evaluate(
+                        trainer_class,
+                        eval_accumulation_steps=eval_accumulation_steps,
+                        batch_eval_metrics=True),
+                    expected)
+
+    def test_predict(self):
+        args = TrainingArguments(
+            output_dir=self.output_dir, per_device_eval_batch_size=3)
+        trainer = PaddedTrainer(
+            model=self.model,
+            criterion=nn.CrossEntropyLoss(),
+            args=args,
+            data_collator=collate_fn)
+        output = trainer.predict(self.dataset)
+        max_len = max(len(sample["input_ids"]) for sample in self.dataset)
+        self.assertEqual(output.predictions.shape,
+                         (len(self.dataset), max_len, 3))
+        self.assertEqual(output.label_ids.shape, (len(self.dataset), max_len))
+        self.model.eval()
+        with paddle.no_grad():
+            for i, sample in enumerate(self.dataset):
+                length = len(sample["input_ids"])
+                logits = self.model(paddle.to_tensor([sample["input_ids"]]))
+                np.testing.assert_allclose(
+                    output.predictions[i, :length],
+                    logits.numpy()[0],
+                    rtol=1e-5)
+                self.assertEqual(output.label_ids[i].tolist(), sample["labels"]
+                                 + [-100] * (max_len - length))
+
+
+if __name__ == "__main__":
+    unittest.main()
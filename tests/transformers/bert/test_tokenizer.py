@@ -14,8 +14,9 @@
 
 import numpy as np
 import os
+import random
 import unittest
-from paddlenlp.transformers import BertTokenizer, BasicTokenizer, WordpieceTokenizer
+from paddlenlp.transformers import BertTokenizer, BasicTokenizer, WordpieceTokenizer, TokenizationCache
 from paddlenlp.data import Vocab
 
 from common_test import CpuCommonTest
@@ -121,6 +122,105 @@ class TestWordpieceTokenizer(CpuCommonTest):
         text_array = self.tokenizer.tokenize(text)
         self.check_output_equal(text_array, expected_text_array)
 
+    def test_tokenize_cache(self):
+        cache = TokenizationCache(max_size=1)
+        self.tokenizer = WordpieceTokenizer(
+            self.vocab_dict, "[UNK]", cache=cache)
+        text = "this is a simple text this"
+        expected_text_array = [
+            'th', '##is', 'is', '[UNK]', 'simple', 'text', 'th', '##is'
+        ]
+        text_array = self.tokenizer.tokenize(text)
+        self.check_output_equal(text_array, expected_text_array)
+        # Words in the vocab are not cached
+        self.assertEqual(cache.stats()['misses'], 3)
+        self.assertEqual(cache.stats()['evictions'], 2)
+        self.assertEqual(self.tokenizer.tokenize("this"), ['th', '##is'])
+        self.assertEqual(cache.stats()['hits'], 1)
+
+
+class _StepwiseBasicTokenizer(BasicTokenizer):
+    # Overriding a step disables the fast path of BasicTokenizer
+    def _clean_text(self, text):
+        return super(_StepwiseBasicTokenizer, self)._clean_text(text)
+
+
+def _reference_wordpiece_tokenize(vocab, unk_token, max_input_chars_per_word,
+                                  text):
+    output_tokens = []
+    for token in text.split():
+        if len(token) > max_input_chars_per_word:
+            output_tokens.append(unk_token)
+            continue
+        start = 0
+        sub_tokens = []
+        while start < len(token):
+            end = len(token)
+            cur_substr = None
+            while start < end:
+                substr = token[start:end]
+                if start > 0:
+                    substr = "##" + substr
+                if substr in vocab:
+                    cur_substr = substr
+                    break
+                end -= 1
+            if cur_substr is None:
+                sub_tokens = [unk_token]
+                break
+            sub_tokens.append(cur_substr)
+            start = end
+        output_tokens.extend(sub_tokens)
+    return output_tokens
+
+
+class TestTokenizerFastPathParity(CpuCommonTest):
+    def setUp(self):
+        random.seed(2022)
+        chars = [
+            "abcXYZ019 .,;!?'\"#$^`~\t\n\r", "àÄéÍñØüÿßİıΣσςﬁǅ",
+            "这是个简单的文本。“”《》", "\x00\x01\x7f\x85\u200b\u200d\ufeff\ufffd\u00a0\u2028\u3000\u0301",
+            "한국어日本語カタカナｆｕｌｌ①²½\U00020000\U0001f600"
+        ]
+        self.texts = []
+        for _ in range(500):
+            text = []
+            for _ in range(random.randint(0, 50)):
+                if random.random() < 0.05:
+                    text.append(chr(random.randint(0, 0x10ffff)))
+                else:
+                    text.append(random.choice(random.choice(chars)))
+            self.texts.append("".join(text))
+
+    def test_basic_tokenizer(self):
+        for do_lower_case in [True, False]:
+            tokenizer = BasicTokenizer(do_lower_case)
+            expected_tokenizer = _StepwiseBasicTokenizer(do_lower_case)
+            for text in self.texts:
+                self.assertEqual(
+                    tokenizer.tokenize(text),
+                    expected_tokenizer.tokenize(text), repr(text))
+
+    def test_wordpiece_tokenizer(self):
+        words = sum([BasicTokenizer().tokenize(text) for text in self.texts],
+                    [])
+        vocab = {"[UNK]": 0, "##": 1, "###": 2}
+        for word in words:
+            start = random.randint(0, len(word) - 1)
+            piece = word[start:start + random.randint(1, 4)]
+            if start > 0 or random.random() < 0.3:
+                piece = "##" + piece
+            vocab.setdefault(piece, len(vocab))
+        words.extend(["#" + "ab" * 20, "abc###x"])
+        for max_input_chars_per_word in [100, 5]:
+            tokenizer = WordpieceTokenizer(vocab, "[UNK]",
+                                           max_input_chars_per_word)
+            for word in words:
+                self.assertEqual(
+                    tokenizer.tokenize(word),
+                    _reference_wordpiece_tokenize(
+                        vocab, "[UNK]", max_input_chars_per_word, word))
+
 
 class TestBertTokenizer(CpuCommonTest):
     def set_attr(self):
@@ -195,6 +295,74 @@ class TestBertTokenizer(CpuCommonTest):
             self.check_output_equal(result['token_type_ids'],
                                     expected_token_type_ids)
 
+    def test_word_cache(self):
+        texts = ["This is a simple text", "which is easy for children"] * 4
+        expected = [self.tokenizer.tokenize(text) for text in texts]
+        cache = self.tokenizer.enable_word_cache(max_size=16)
+        self.assertIs(self.tokenizer.wordpiece_tokenizer.cache, cache)
+        results = [self.tokenizer.tokenize(text) for text in texts]
+        self.check_output_equal(results, expected)
+        self.assertGreater(cache.stats()['hits'], 0)
+        self.assertLessEqual(cache.stats()['size'], 16)
+
+    def test_batch_encode_num_workers(self):
+        texts = ["This is a simple text", "which is easy for children"] * 4
+        batch = list(zip(texts, texts[::-1]))
+        expected = self.tokenizer.batch_encode(
+            batch, max_seq_len=12, stride=2, return_attention_mask=True)
+        results = self.tokenizer.batch_encode(
+            batch,
+            max_seq_len=12,
+            stride=2,
+            return_attention_mask=True,
+            num_workers=2,
+            chunk_size=3)
+        for key in expected.keys():
+            self.check_output_equal(results[key], expected[key])
+        self.tokenizer.close()
+
+    def test_batch_encode_num_workers_config(self):
+        texts = ["This is a simple text", "which is easy for children"] * 2
+        self.tokenizer.batch_encode(texts, num_workers=2)
+        # Workers are restarted with the changed configuration
+        self.tokenizer.padding_side = "left"
+        self.tokenizer.basic_tokenizer.do_lower_case = False
+        expected = self.tokenizer.batch_encode(
+            texts, max_seq_len=12, pad_to_max_seq_len=True)
+        results = self.tokenizer.batch_encode(
+            texts, max_seq_len=12, pad_to_max_seq_len=True, num_workers=2)
+        for key in expected.keys():
+            self.check_output_equal(results[key], expected[key])
+        self.tokenizer.close()
+        self.assertIsNone(self.tokenizer._batch_encode_pool)
+
+    def test_batch_encode_return_tensors(self):
+        texts = ["This is a simple text", "which is easy for children", "a"]
+        expected = self.tokenizer.batch_encode(
+            texts,
+            max_seq_len=16,
+            pad_to_max_seq_len=True,
+            return_attention_mask=True,
+            return_special_tokens_mask=True)
+        results = self.tokenizer.batch_encode(
+            texts,
+            max_seq_len=16,
+            pad_to_max_seq_len=True,
+            return_attention_mask=True,
+            return_special_tokens_mask=True,
+            return_tensors="np")
+        for key in expected.keys():
+            self.check_output_equal(results[key], np.array(expected[key]))
+
+        results = self.tokenizer.batch_encode(
+            texts,
+            return_attention_mask=True,
+            return_tensors="np",
+            pad_to_multiple_of=4)
+        self.check_output_equal(results["input_ids"].shape, (3, 8))
+        self.check_output_equal(results["attention_mask"].sum(axis=1),
+                                np.array([8, 7, 3]))
+
     def test_call_truncate_seq(self):
         expected_input_ids = [1, 3, 2, 3, 2]
         expected_token_type_ids = [0, 0, 0, 1, 1]
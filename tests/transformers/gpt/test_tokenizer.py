@@ -0,0 +1,95 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import unittest
+
+from paddlenlp.transformers.gpt.tokenizer import get_pairs
+from paddlenlp.transformers.tokenizer_utils import bpe_merge
+
+from common_test import CpuCommonTest
+
+
+def _reference_bpe_merge(word, bpe_ranks):
+    # The merge loop scanning all pairs for each merge
+    pairs = get_pairs(word)
+    while True:
+        bigram = min(
+            pairs, key=lambda pair: bpe_ranks.get(pair, float('inf')))
+        if bigram not in bpe_ranks:
+            break
+        first, second = bigram
+        new_word = []
+        i = 0
+        while i < len(word):
+            if i < len(word) - 1 and word[i] == first and word[i +
+                                                               1] == second:
+                new_word.append(first + second)
+                i += 2
+            else:
+                new_word.append(word[i])
+                i += 1
+        word = tuple(new_word)
+        if len(word) == 1:
+            break
+        pairs = get_pairs(word)
+    return word
+
+
+class TestBPEMerge(CpuCommonTest):
+    def setUp(self):
+        self.rng = random.Random(2022)
+
+    def create_bpe_ranks(self, alphabet):
+        symbols = list(alphabet)
+        merges = []
+        for _ in range(self.rng.randint(1, 30)):
+            first, second = self.rng.choice(symbols), self.rng.choice(symbols)
+            merges.append((first, second))
+            symbols.append(first + second)
+        self.rng.shuffle(merges)
+        return dict(zip(merges, range(len(merges))))
+
+    def test_merge(self):
+        bpe_ranks = {("a", "b"): 0, ("ab", "c"): 1, ("c", "c"): 2}
+        self.assertEqual(
+            bpe_merge(tuple("abccc"), bpe_ranks), ("abc", "cc"))
+        self.assertEqual(bpe_merge(tuple("x"), bpe_ranks), ("x", ))
+
+    def test_overlapped_pairs(self):
+        # All occurrences of a pair are merged before the pairs made by them
+        bpe_ranks = {("a", "a"): 0, ("aa", "a"): 1, ("aa", "aa"): 2}
+        for length in range(2, 10):
+            word = ("a", ) * length
+            self.assertEqual(
+                bpe_merge(word, bpe_ranks),
+                _reference_bpe_merge(word, bpe_ranks))
+        bpe_ranks = {("a", "b"): 1, ("ab", "a"): 0}
+        self.assertEqual(bpe_merge(tuple("abab"), bpe_ranks), ("ab", "ab"))
+
+    def test_random_merges(self):
+        for _ in range(100):
+            alphabet = "abc"[:self.rng.randint(1, 3)]
+            bpe_ranks = self.create_bpe_ranks(alphabet)
+            for _ in range(20):
+                word = tuple(
+                    self.rng.choice(alphabet)
+                    for _ in range(self.rng.randint(2, 40)))
+                self.assertEqual(
+                    bpe_merge(word, bpe_ranks),
+                    _reference_bpe_merge(word, bpe_ranks))
+
+
+if __name__ == "__main__":
+    unittest.main()
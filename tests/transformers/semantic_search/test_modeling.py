@@ -0,0 +1,114 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+from paddlenlp.transformers import ErnieDualEncoder, ErnieModel
+from paddlenlp.transformers.semantic_search.modeling import ErnieEncoder
+
+from common_test import CpuCommonTest
+
+
+class TestErnieDualEncoderEmbeddingCache(CpuCommonTest):
+    @classmethod
+    def setUpClass(cls):
+        super(TestErnieDualEncoderEmbeddingCache, cls).setUpClass()
+        cls.save_dir = tempfile.mkdtemp()
+        cls.model_paths = []
+        for seed in [1, 2]:
+            paddle.seed(seed)
+            ernie = ErnieModel(
+                vocab_size=50,
+                num_hidden_layers=1,
+                num_attention_heads=4,
+                intermediate_size=32,
+                max_position_embeddings=32)
+            model_path = os.path.join(cls.save_dir, str(seed))
+            ErnieEncoder(ernie).save_pretrained(model_path)
+            cls.model_paths.append(model_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.save_dir)
+
+    def setUp(self):
+        self.spill_path = os.path.join(self.save_dir, "spill.db")
+        self.model = ErnieDualEncoder(*self.model_paths)
+        self.cached_model = ErnieDualEncoder(
+            *self.model_paths,
+            embedding_cache_size=3,
+            embedding_cache_path=self.spill_path)
+        self.model.eval()
+        self.cached_model.eval()
+        # Repeated rows, and a row repeated with more trailing paddings
+        self.input_ids = paddle.to_tensor(
+            [[1, 5, 6, 2, 0], [1, 7, 8, 9, 2], [1, 5, 6, 2, 0], [1, 5, 2, 0, 0],
+             [1, 7, 8, 9, 2]],
+            dtype="int64")
+        self.token_type_ids = paddle.to_tensor(
+            [[0, 0, 0, 0, 0], [0, 0, 1, 1, 1], [0, 0, 0, 0, 0],
+             [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]],
+            dtype="int64")
+
+    def tearDown(self):
+        for cache in self.cached_model.embedding_caches.values():
+            cache.close()
+        os.remove(self.spill_path)
+
+    def check_embeddings(self, input_ids, token_type_ids=None):
+        for is_query in [True, False]:
+            with paddle.no_grad():
+                expected = self.model.get_pooled_embedding(
+                    input_ids, token_type_ids, is_query=is_query)
+                embeddings = self.cached_model.get_pooled_embedding(
+                    input_ids, token_type_ids, is_query=is_query)
+            np.testing.assert_allclose(
+                embeddings.numpy(), expected.numpy(), rtol=1e-5, atol=1e-5)
+
+    def test_cached_embeddings(self):
+        self.check_embeddings(self.input_ids, self.token_type_ids)
+        self.check_embeddings(self.input_ids)
+        query_cache = self.cached_model.embedding_caches[True]
+        stats = query_cache.stats()
+        self.assertEqual(stats["size"], 3)
+        # Trailing paddings are not a part of the key
+        self.check_embeddings(
+            paddle.concat(
+                [self.input_ids, paddle.zeros_like(self.input_ids)], axis=1))
+        self.assertEqual(query_cache.stats()["misses"], stats["misses"])
+        self.assertGreater(query_cache.stats()["hits"], stats["hits"])
+
+    def test_parameters_changed(self):
+        self.check_embeddings(self.input_ids, self.token_type_ids)
+        # The query encoder is replaced by the title encoder
+        self.model.query_ernie.set_state_dict(
+            self.model.title_ernie.state_dict())
+        state_dict = {}
+        for name, value in self.cached_model.title_ernie.state_dict().items():
+            state_dict["query_ernie." + name] = value
+            state_dict["title_ernie." + name] = value
+        self.cached_model.set_state_dict(state_dict)
+        self.check_embeddings(self.input_ids, self.token_type_ids)
+        self.cached_model.train()
+        self.cached_model.eval()
+        self.check_embeddings(self.input_ids, self.token_type_ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
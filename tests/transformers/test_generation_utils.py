@@ -0,0 +1,399 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import functools
+import unittest
+from unittest import mock
+
+import numpy as np
+import paddle
+from paddle.static import InputSpec
+from paddlenlp.transformers import GPTLMHeadModel, GPTModel
+from paddlenlp.transformers.attention_utils import _update_preallocated_cache
+from paddlenlp.transformers.generation_utils import (
+    BeamSearchScorer, ContinuousBatchingEngine, TensorBeamSearchScorer)
+
+from common_test import CpuCommonTest
+
+
+@functools.lru_cache()
+def create_small_gpt(seed=2022):
+    # Shared by the tests, since the parameter names of GPT are fixed
+    paddle.seed(seed)
+    gpt = GPTModel(
+        vocab_size=100,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        intermediate_size=64,
+        hidden_dropout_prob=0.0,
+        attention_probs_dropout_prob=0.0,
+        max_position_embeddings=64)
+    model = GPTLMHeadModel(gpt)
+    model.eval()
+    return model
+
+
+class TestStaticCache(CpuCommonTest):
+    @classmethod
+    def setUpClass(cls):
+        super(TestStaticCache, cls).setUpClass()
+        cls.model = create_small_gpt()
+
+    def setUp(self):
+        paddle.seed(2022)
+        self.input_ids = paddle.randint(3, 100, [3, 5])
+
+    def check_static_cache(self, **kwargs):
+        ids, scores = self.model.generate(
+            self.input_ids, eos_token_id=1, pad_token_id=0, **kwargs)
+        static_ids, static_scores = self.model.generate(
+            self.input_ids,
+            eos_token_id=1,
+            pad_token_id=0,
+            use_static_cache=True,
+            **kwargs)
+        self.assertEqual(ids.numpy().tolist(), static_ids.numpy().tolist())
+        np.testing.assert_allclose(
+            scores.numpy(), static_scores.numpy(), rtol=1e-5, atol=1e-6)
+
+    def test_greedy_search(self):
+        self.check_static_cache(max_length=8, decode_strategy="greedy_search")
+
+    def test_beam_search(self):
+        for num_return_sequences in [1, 3]:
+            self.check_static_cache(
+                max_length=8,
+                decode_strategy="beam_search",
+                num_beams=4,
+                num_return_sequences=num_return_sequences)
+            self.check_static_cache(
+                max_length=8,
+                decode_strategy="beam_search",
+                num_beams=4,
+                num_beam_groups=2,
+                diversity_rate=0.5,
+                num_return_sequences=num_return_sequences)
+
+
+    def test_unsupported_model(self):
+        with mock.patch.object(GPTLMHeadModel, "supports_static_cache", False):
+            with self.assertRaises(ValueError):
+                self.model.generate(
+                    self.input_ids, max_length=8, use_static_cache=True)
+        with self.assertRaises(ValueError):
+            self.model.generate(
+                self.input_ids,
+                max_length=8,
+                use_cache=False,
+                use_static_cache=True)
+
+    def test_update_preallocated_cache_to_static(self):
+        # The buffers are sliced by the length in the cache, which is a tensor
+        Cache = collections.namedtuple("PreallocatedCache",
+                                       ["k", "v", "length"])
+
+        def update(k_buffer, v_buffer, length, k, v):
+            k, v, cache = _update_preallocated_cache(
+                Cache(k_buffer, v_buffer, length), k, v)
+            return k, v, cache.k, cache.v, cache.length
+
+        static_update = paddle.jit.to_static(
+            update,
+            input_spec=[
+                InputSpec([None, 2, 8, 4]), InputSpec([None, 2, 8, 4]),
+                InputSpec([None], dtype="int64"), InputSpec([None, 2, None, 4]),
+                InputSpec([None, 2, None, 4])
+            ])
+        buffers = [paddle.zeros([3, 2, 8, 4]) for _ in range(2)]
+        length = paddle.zeros([3], dtype="int64")
+        caches = [(buffers[0].clone(), buffers[1].clone(), length)
+                  for _ in range(2)]
+        # A prefill step and decoding steps
+        for seq_len in [3, 1, 1]:
+            k, v = paddle.rand([3, 2, seq_len, 4]), paddle.rand(
+                [3, 2, seq_len, 4])
+            outputs = update(*caches[0], k, v)
+            static_outputs = static_update(*caches[1], k, v)
+            for output, static_output in zip(outputs, static_outputs):
+                self.assertEqual(output.shape, static_output.shape)
+                np.testing.assert_allclose(output.numpy(),
+                                           static_output.numpy())
+            caches = [outputs[2:], static_outputs[2:]]
+        self.assertEqual(outputs[0].shape, [3, 2, 5, 4])
+
+
+class TestContinuousBatchingEngine(CpuCommonTest):
+    @classmethod
+    def setUpClass(cls):
+        super(TestContinuousBatchingEngine, cls).setUpClass()
+        cls.model = create_small_gpt()
+
+    def setUp(self):
+        rng = np.random.RandomState(2022)
+        self.prompts = [
+            rng.randint(3, 100, rng.randint(2, 9)).tolist() for _ in range(7)
+        ]
+        self.max_lengths = rng.randint(2, 10, len(self.prompts)).tolist()
+
+    def greedy_search(self, prompt, max_length, eos_token_id=None):
+        ids, scores = self.model.generate(
+            paddle.to_tensor([prompt]),
+            max_length=max_length,
+            decode_strategy="greedy_search",
+            eos_token_id=eos_token_id,
+            pad_token_id=0)
+        return ids.numpy()[0].tolist(), float(scores.numpy()[0, 0])
+
+    def run_engine(self, engine, num_initial):
+        # Requests arrive one by one after the first ones
+        for prompt, max_length in zip(self.prompts[:num_initial],
+                                      self.max_lengths[:num_initial]):
+            engine.add_request(prompt, max_length=max_length)
+        pending = list(
+            zip(self.prompts[num_initial:], self.max_lengths[num_initial:]))
+        results = {}
+        while engine.has_unfinished_requests() or pending:
+            if pending:
+                prompt, max_length = pending.pop(0)
+                engine.add_request(prompt, max_length=max_length)
+            num_running = engine.num_running
+            num_waiting = engine.num_waiting
+            finished = engine.step()
+            self.assertLessEqual(engine.num_running, engine.max_batch_size)
+            # The free slots are filled by the waiting requests
+            num_admitted = min(engine.max_batch_size - num_running,
+                               num_waiting)
+            self.assertEqual(engine.num_waiting, num_waiting - num_admitted)
+            self.assertEqual(engine.num_running,
+                             num_running + num_admitted - len(finished))
+            for request_id, ids, score in finished:
+                self.assertNotIn(request_id, results)
+                results[request_id] = (ids, score)
+        return [results[i] for i in range(len(self.prompts))]
+
+    def check_results(self, results, expected):
+        for (ids, score), (expected_ids, expected_score) in zip(results,
+                                                                 expected):
+            self.assertEqual(ids, expected_ids)
+            self.assertAlmostEqual(score, expected_score, places=4)
+
+    def test_greedy_search(self):
+        expected = [
+            self.greedy_search(prompt, max_length)
+            for prompt, max_length in zip(self.prompts, self.max_lengths)
+        ]
+        engine = ContinuousBatchingEngine(
+            self.model, max_batch_size=3, pad_token_id=0)
+        self.check_results(self.run_engine(engine, num_initial=4), expected)
+
+    def test_eos(self):
+        expected = [
+            self.greedy_search(prompt, max_length)
+            for prompt, max_length in zip(self.prompts, self.max_lengths)
+        ]
+        # Uses a frequently generated token as eos to finish requests early
+        tokens = [token for ids, _ in expected for token in ids]
+        eos_token_id = max(set(tokens), key=tokens.count)
+        expected = [
+            self.greedy_search(prompt, max_length, eos_token_id)
+            for prompt, max_length in zip(self.prompts, self.max_lengths)
+        ]
+        engine = ContinuousBatchingEngine(
+            self.model,
+            max_batch_size=2,
+            eos_token_id=eos_token_id,
+            pad_token_id=0)
+        self.check_results(self.run_engine(engine, num_initial=3), expected)
+
+    def test_repetition_penalty(self):
+        # The outputs of a request don't depend on the requests batched with
+        # it, even if the padding is one of its tokens
+        expected = [
+            self.greedy_search(prompt, max_length)
+            for prompt, max_length in zip(self.prompts, self.max_lengths)
+        ]
+        tokens = [token for ids, _ in expected for token in ids]
+        pad_token_id = max(set(tokens), key=tokens.count)
+        expected = []
+        for prompt, max_length in zip(self.prompts, self.max_lengths):
+            engine = ContinuousBatchingEngine(
+                self.model,
+                max_batch_size=1,
+                repetition_penalty=2.0,
+                pad_token_id=pad_token_id)
+            expected.append(engine.generate([prompt], max_length)[0][0])
+        engine = ContinuousBatchingEngine(
+            self.model,
+            max_batch_size=4,
+            repetition_penalty=2.0,
+            pad_token_id=pad_token_id)
+        results = self.run_engine(engine, num_initial=4)
+        self.assertEqual([ids for ids, _ in results], expected)
+
+    def test_generate(self):
+        expected = [
+            self.greedy_search(prompt, 5)[0] for prompt in self.prompts
+        ]
+        engine = ContinuousBatchingEngine(
+            self.model, max_batch_size=3, max_length=5, pad_token_id=0)
+        ids, scores = engine.generate(self.prompts)
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(scores), len(self.prompts))
+        self.assertFalse(engine.has_unfinished_requests())
+
+
+class TestTensorBeamSearchScorer(CpuCommonTest):
+    def setUp(self):
+        self.rng = np.random.RandomState(2022)
+        self.batch_size = 3
+        self.num_beams = 4
+        self.vocab_size = 6
+        self.eos_token_id = 1
+        self.origin_len = 3
+
+    def create_scorers(self, max_length, **kwargs):
+        return [
+            scorer_class(self.batch_size, max_length, self.num_beams,
+                         **kwargs)
+            for scorer_class in (BeamSearchScorer, TensorBeamSearchScorer)
+        ]
+
+    def create_candidates(self, cur_len):
+        # Candidates are distinct pairs of beams and tokens as in beam search
+        num_candidates = 2 * self.num_beams
+        candidates = np.stack([
+            self.rng.choice(
+                self.num_beams * self.vocab_size,
+                num_candidates,
+                replace=False) for _ in range(self.batch_size)
+        ])
+        scores = -np.sort(
+            self.rng.rand(self.batch_size, num_candidates), axis=1)
+        scores *= cur_len - self.origin_len + 1
+        return (paddle.to_tensor(
+            scores, dtype="float32"), paddle.to_tensor(
+                candidates % self.vocab_size, dtype="int64"),
+                paddle.to_tensor(
+                    candidates // self.vocab_size, dtype="int64"))
+
+    def check_scorers(self, max_length, **kwargs):
+        scorers = self.create_scorers(max_length, **kwargs)
+        input_ids = paddle.to_tensor(
+            self.rng.randint(2, self.vocab_size, [
+                self.batch_size * self.num_beams, self.origin_len
+            ]),
+            dtype="int64")
+        for cur_len in range(self.origin_len, max_length):
+            next_scores, next_tokens, next_indices = self.create_candidates(
+                cur_len)
+            outputs = [
+                scorer.process(
+                    input_ids,
+                    next_scores,
+                    next_tokens,
+                    next_indices,
+                    origin_len=self.origin_len,
+                    pad_token_id=0,
+                    eos_token_id=self.eos_token_id) for scorer in scorers
+            ]
+            for key in ["next_beam_tokens", "next_beam_indices"]:
+                self.assertEqual(outputs[0][key].numpy().tolist(),
+                                 outputs[1][key].numpy().tolist())
+            np.testing.assert_allclose(
+                outputs[0]["next_beam_scores"].numpy(),
+                outputs[1]["next_beam_scores"].numpy(),
+                rtol=1e-6)
+            self.assertEqual(scorers[0]._done.numpy().tolist(),
+                             scorers[1]._done.numpy().tolist())
+            beam_scores = outputs[0]["next_beam_scores"]
+            input_ids = paddle.concat(
+                [
+                    paddle.index_select(input_ids,
+                                        outputs[0]["next_beam_indices"]),
+                    outputs[0]["next_beam_tokens"].unsqueeze(-1)
+                ],
+                axis=-1)
+            if scorers[0].is_done:
+                break
+        results = [
+            scorer.finalize(
+                input_ids,
+                beam_scores,
+                None,
+                None,
+                origin_len=self.origin_len,
+                pad_token_id=0,
+                eos_token_id=self.eos_token_id) for scorer in scorers
+        ]
+        self.assertEqual(results[0][0].numpy().tolist(),
+                         results[1][0].numpy().tolist())
+        np.testing.assert_allclose(
+            results[0][1].numpy(), results[1][1].numpy(), rtol=1e-6)
+
+    def test_process_and_finalize(self):
+        for do_early_stopping in [False, True]:
+            for num_beam_hyps_to_keep in [1, 3]:
+                for max_length in [6, 12]:
+                    self.check_scorers(
+                        max_length,
+                        do_early_stopping=do_early_stopping,
+                        num_beam_hyps_to_keep=num_beam_hyps_to_keep)
+
+    def test_too_many_eos_tokens(self):
+        input_ids = paddle.zeros(
+            [self.batch_size * self.num_beams, self.origin_len],
+            dtype="int64")
+        next_scores, next_tokens, next_indices = self.create_candidates(
+            self.origin_len)
+        # Only `num_beams - 1` tokens of the last batch item are not eos
+        next_tokens[-1, :] = self.eos_token_id
+        next_tokens[-1, :self.num_beams - 1] = 2
+        scorer, tensor_scorer = self.create_scorers(10)
+        with self.assertRaises(ValueError):
+            scorer.process(
+                input_ids,
+                next_scores,
+                next_tokens,
+                next_indices,
+                pad_token_id=0,
+                eos_token_id=self.eos_token_id)
+        # The error is raised in `finalize` to avoid copying to host at each
+        # step
+        outputs = tensor_scorer.process(
+            input_ids,
+            next_scores,
+            next_tokens,
+            next_indices,
+            pad_token_id=0,
+            eos_token_id=self.eos_token_id)
+        with self.assertRaises(ValueError):
+            tensor_scorer.finalize(
+                paddle.concat(
+                    [
+                        paddle.index_select(input_ids,
+                                            outputs["next_beam_indices"]),
+                        outputs["next_beam_tokens"].unsqueeze(-1)
+                    ],
+                    axis=-1),
+                outputs["next_beam_scores"],
+                None,
+                None,
+                pad_token_id=0,
+                eos_token_id=self.eos_token_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
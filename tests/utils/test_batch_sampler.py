@@ -0,0 +1,155 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import numpy as np
+from paddlenlp.utils.batch_sampler import (DistributedBatchSampler,
+                                           DistributedTokenBatchSampler)
+
+from common_test import CpuCommonTest
+
+
+class TestDistributedBatchSampler(CpuCommonTest):
+    def setUp(self):
+        self.dataset = list(range(103))
+        self.batch_size = 4
+
+    def get_samplers(self, num_replicas, **kwargs):
+        return [
+            DistributedBatchSampler(
+                self.dataset,
+                self.batch_size,
+                num_replicas=num_replicas,
+                rank=rank,
+                seed=2022,
+                **kwargs) for rank in range(num_replicas)
+        ]
+
+    def test_batches(self):
+        for num_replicas in [1, 3]:
+            for drop_last in [False, True]:
+                samplers = self.get_samplers(
+                    num_replicas, shuffle=True, drop_last=drop_last)
+                batches = [list(sampler) for sampler in samplers]
+                for sampler, sampler_batches in zip(samplers, batches):
+                    self.assertEqual(len(sampler_batches), len(sampler))
+                indices = [idx for x in batches for batch in x for idx in batch]
+                if drop_last:
+                    self.assertEqual(len(set(indices)), len(indices))
+                else:
+                    # Indices are wrapped to make all processes have the same
+                    # number of samples
+                    self.assertEqual(set(indices), set(self.dataset))
+                    self.assertEqual(len(indices), samplers[0].total_size)
+
+    def test_shuffle(self):
+        sampler = self.get_samplers(1)[0]
+        self.assertEqual(sum(list(sampler), []), self.dataset)
+        samplers = [self.get_samplers(1, shuffle=True)[0] for _ in range(2)]
+        for epoch in range(2):
+            for sampler in samplers:
+                sampler.set_epoch(epoch)
+            # The order only depends on the seed and the epoch
+            self.assertEqual(list(samplers[0]), list(samplers[1]))
+            self.assertEqual(sorted(sum(list(samplers[0]), [])), self.dataset)
+        samplers[1].set_epoch(0)
+        self.assertNotEqual(list(samplers[0]), list(samplers[1]))
+
+    def test_resume(self):
+        for num_replicas in [1, 3]:
+            for drop_last in [False, True]:
+                samplers = self.get_samplers(
+                    num_replicas, shuffle=True, drop_last=drop_last)
+                for sampler in samplers:
+                    sampler.set_epoch(1)
+                batches = [list(sampler) for sampler in samplers]
+                for num_steps in [0, 1, len(samplers[0]) // 2,
+                                  len(samplers[0])]:
+                    consumed_samples = samplers[0].get_consumed_samples(
+                        num_steps)
+                    # An epoch started from the consumed samples is the rest
+                    # of the uninterrupted epoch
+                    for sampler, expected in zip(samplers, batches):
+                        sampler.set_epoch(1, consumed_samples=consumed_samples)
+                        self.assertEqual(list(sampler), expected[num_steps:])
+
+    def test_consumed_samples(self):
+        for num_replicas in [1, 3]:
+            batches = [
+                list(sampler)
+                for sampler in self.get_samplers(
+                    num_replicas, shuffle=True)
+            ]
+            samplers = self.get_samplers(
+                num_replicas,
+                shuffle=True,
+                consumed_samples=2 * self.batch_size * num_replicas)
+            for sampler, expected in zip(samplers, batches):
+                self.assertEqual(list(sampler), expected[2:])
+
+
+class TestDistributedTokenBatchSampler(CpuCommonTest):
+    def setUp(self):
+        np.random.seed(2022)
+        self.lengths = np.random.randint(1, 100, 1000)
+        self.dataset = [{"input_ids": [0] * length} for length in self.lengths]
+        self.max_tokens = 512
+        self.num_replicas = 3
+
+    def get_samplers(self, **kwargs):
+        return [
+            DistributedTokenBatchSampler(
+                self.dataset,
+                self.max_tokens,
+                num_replicas=self.num_replicas,
+                rank=rank,
+                shuffle=True,
+                seed=2022,
+                **kwargs) for rank in range(self.num_replicas)
+        ]
+
+    def test_batches(self):
+        for drop_last in [False, True]:
+            samplers = self.get_samplers(drop_last=drop_last, bucket_size=300)
+            batches = [list(sampler) for sampler in samplers]
+            self.assertEqual(
+                [len(x) for x in batches],
+                [len(samplers[0])] * self.num_replicas)
+            indices = []
+            for batch in sum(batches, []):
+                self.assertLessEqual(
+                    self.lengths[batch].max() * len(batch), self.max_tokens)
+                indices.extend(batch)
+            self.assertEqual(len(set(indices)), len(indices) if drop_last
+                             else len(self.dataset))
+
+    def test_resume(self):
+        samplers = self.get_samplers(max_batch_size=8)
+        for sampler in samplers:
+            sampler.set_epoch(1)
+        batches = [list(sampler) for sampler in samplers]
+        num_steps = len(samplers[0]) // 2
+        consumed_samples = sum(
+            len(batch) for x in batches for batch in x[:num_steps])
+        for sampler, expected in zip(samplers, batches):
+            self.assertEqual(
+                sampler.get_consumed_samples(num_steps), consumed_samples)
+            sampler.set_epoch(1, consumed_samples=consumed_samples)
+            self.assertEqual(list(sampler), expected[num_steps:])
+            sampler.set_epoch(2)
+            self.assertNotEqual(list(sampler), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from paddlenlp.utils.embedding_cache import EmbeddingCache
+
+from common_test import CpuCommonTest
+
+
+class TestEmbeddingCache(CpuCommonTest):
+    def setUp(self):
+        self.rng = np.random.RandomState(2022)
+        self.embeddings = {
+            key: self.rng.rand(4).astype("float32")
+            for key in ["a", "b", "c", "d"]
+        }
+        self.save_dir = tempfile.mkdtemp()
+        self.spill_path = os.path.join(self.save_dir, "cache", "spill.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.save_dir)
+
+    def encode_fn(self, keys):
+        self.encoded_keys.append(list(keys))
+        return np.stack([self.embeddings[key] for key in keys])
+
+    def test_lru(self):
+        cache = EmbeddingCache("model", max_size=2)
+        cache.put("a", self.embeddings["a"])
+        cache.put("b", self.embeddings["b"])
+        # "a" is used more recently than "b", thus "b" is evicted
+        np.testing.assert_array_equal(cache.get("a"), self.embeddings["a"])
+        cache.put("c", self.embeddings["c"])
+        self.assertIsNone(cache.get("b"))
+        np.testing.assert_array_equal(cache.get("c"), self.embeddings["c"])
+        self.assertEqual(
+            cache.stats(),
+            {'hits': 2,
+             'misses': 1,
+             'hit_rate': 2 / 3,
+             'size': 2})
+
+    def test_spill(self):
+        cache = EmbeddingCache(
+            "model", max_size=1, spill_path=self.spill_path)
+        for key in ["a", "b", "c"]:
+            cache.put(key, self.embeddings[key])
+        self.assertEqual(cache.stats()["size"], 1)
+        # Evicted embeddings are loaded from the spill database
+        for key in ["a", "b", "c", "a"]:
+            value = cache.get(key)
+            self.assertEqual(value.dtype, np.float32)
+            np.testing.assert_array_equal(value, self.embeddings[key])
+        self.assertEqual(cache.stats()["misses"], 0)
+        cache.close()
+        # Embeddings in memory are spilled when the cache is closed
+        cache = EmbeddingCache(
+            "model", max_size=0, spill_path=self.spill_path)
+        for key in ["a", "b", "c"]:
+            np.testing.assert_array_equal(
+                cache.get(key), self.embeddings[key])
+        self.assertIsNone(cache.get("d"))
+        cache.put("d", self.embeddings["d"])
+        np.testing.assert_array_equal(cache.get("d"), self.embeddings["d"])
+        self.assertEqual(cache.stats()["size"], 0)
+        cache.close()
+
+    def test_fingerprint(self):
+        cache = EmbeddingCache(
+            "model:1", max_size=1, spill_path=self.spill_path)
+        cache.put("a", self.embeddings["a"])
+        cache.put("b", self.embeddings["b"])
+        other_cache = EmbeddingCache(
+            "model:2", max_size=1, spill_path=self.spill_path)
+        # Embeddings of other fingerprints are never hit
+        self.assertIsNone(other_cache.get("a"))
+        other_cache.put("a", self.embeddings["c"])
+        other_cache.put("b", self.embeddings["d"])
+        np.testing.assert_array_equal(cache.get("a"), self.embeddings["a"])
+        cache.set_fingerprint("model:2")
+        self.assertEqual(cache.stats()["size"], 0)
+        np.testing.assert_array_equal(cache.get("a"), self.embeddings["c"])
+        cache.set_fingerprint("model:1")
+        np.testing.assert_array_equal(cache.get("a"), self.embeddings["a"])
+        # The same fingerprint keeps the embeddings in memory
+        cache.set_fingerprint("model:1")
+        self.assertEqual(cache.stats()["size"], 1)
+        cache.close()
+        other_cache.close()
+
+    def test_encode(self):
+        cache = EmbeddingCache("model", max_size=3)
+        self.encoded_keys = []
+        keys = ["a", "b", "a", "c", "b"]
+        embeddings = cache.encode(keys, self.encode_fn)
+        np.testing.assert_array_equal(
+            embeddings, np.stack([self.embeddings[key] for key in keys]))
+        # Keys are deduplicated and encoded by one call
+        self.assertEqual(self.encoded_keys, [["a", "b", "c"]])
+        embeddings = cache.encode(["d", "c", "d"], self.encode_fn)
+        np.testing.assert_array_equal(
+            embeddings,
+            np.stack([self.embeddings[key] for key in ["d", "c", "d"]]))
+        self.assertEqual(self.encoded_keys, [["a", "b", "c"], ["d"]])
+
+    def test_normalize_text(self):
+        self.assertEqual(
+            EmbeddingCache.normalize_text(" 世界上\t什么东西  最小\n"),
+            "世界上 什么东西 最小")
+
+
+if __name__ == "__main__":
+    unittest.main()